@@ -1,8 +1,9 @@
 # app/api/routes.py - API路由（使用ORM）
-from fastapi import APIRouter, HTTPException, BackgroundTasks, Query
+from fastapi import APIRouter, HTTPException, Query, Request
 from app.models import MathRequest, TaskResponse, TaskStatusResponse
-from app.services import TaskService, ChainService
+from app.services import TaskService, ChainService, AdmissionRejected
 from app.database import ORMDatabaseManager
+from tasks.reports import get_report_cache
 
 # 创建路由器
 router = APIRouter()
@@ -22,10 +23,12 @@ async def root():
         "endpoints": {
             "submit_task": "/submit",
             "get_status": "/status/{task_id}",
+            "get_timeline": "/status/{task_id}/timeline",
             "list_tasks": "/tasks",
             "get_chains": "/chains",
             "get_statistics": "/statistics",
-            "get_tasks_by_status": "/tasks/status/{status}"
+            "get_tasks_by_status": "/tasks/status/{status}",
+            "report_cache_stats": "/reports/cache"
         }
     }
 
@@ -37,23 +40,21 @@ async def get_available_chains():
     }
 
 @router.post("/submit", response_model=TaskResponse)
-async def submit_math_task(request: MathRequest, background_tasks: BackgroundTasks):
-    """提交数学运算任务"""
+async def submit_math_task(request: MathRequest, http_request: Request):
+    """提交数学运算任务（队列积压过多或客户端提交过快时返回 429 与 Retry-After）"""
     
     try:
         # 提交任务
         result = task_service.submit_task(
             a=request.a,
             b=request.b,
-            operation_chain=request.operation_chain
+            operation_chain=request.operation_chain,
+            priority=request.priority,
+            tenant=request.tenant,
+            client=http_request.client.host if http_request.client else None
         )
         
-        # 添加后台任务监控Celery任务状态
-        background_tasks.add_task(
-            task_service.monitor_celery_task, 
-            result["task_id"], 
-            result["celery_result"]
-        )
+        # 任务链结束后由 task_service 的结果跟踪线程更新任务状态并释放准入计数
         
         return TaskResponse(
             task_id=result["task_id"],
@@ -63,10 +64,14 @@ async def submit_math_task(request: MathRequest, background_tasks: BackgroundTas
                 "a": request.a,
                 "b": request.b,
                 "operation_chain": request.operation_chain,
+                "priority": request.priority,
+                "tenant": request.tenant,
                 "celery_task_id": result["celery_task_id"]
             }
         )
         
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -98,6 +103,17 @@ async def get_task_status(task_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取任务状态失败: {str(e)}")
 
+@router.get("/status/{task_id}/timeline")
+async def get_task_timeline(task_id: str):
+    """获取任务链各步骤的排队/执行耗时与关键路径"""
+    
+    try:
+        return task_service.get_task_timeline(task_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取任务时间线失败: {str(e)}")
+
 @router.get("/tasks")
 async def list_tasks(limit: int = Query(10, ge=1, le=100), offset: int = Query(0, ge=0)):
     """获取任务列表"""
@@ -134,6 +150,18 @@ async def get_task_statistics():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取统计信息失败: {str(e)}")
 
+@router.get("/reports/cache")
+async def get_report_cache_stats():
+    """获取报告缓存统计（与 worker 共享同一缓存目录时有效）"""
+    
+    try:
+        return {
+            "cache": get_report_cache().stats(),
+            "message": "报告缓存统计信息"
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取报告缓存统计失败: {str(e)}")
+
 @router.delete("/tasks/{task_id}")
 async def delete_task(task_id: str):
     """删除任务记录"""
@@ -6,7 +6,7 @@ from typing import Optional, Dict, Any, List
 from datetime import datetime
 import uuid
 
-from app.models.database_models import Base, TaskRecord
+from app.models.database_models import Base, TaskRecord, TaskStep
 
 class ORMDatabaseManager:
     """基于SQLAlchemy ORM的数据库管理器"""
@@ -125,6 +125,21 @@ class ORMDatabaseManager:
                 print(f"❌ 获取任务记录失败: {e}")
                 raise
     
+    def get_task_steps(self, task_id: str) -> List[Dict[str, Any]]:
+        """获取任务的步骤耗时记录"""
+        with self.get_session() as session:
+            try:
+                steps = session.query(TaskStep)\
+                    .filter(TaskStep.trace_id == task_id)\
+                    .order_by(TaskStep.started_at)\
+                    .all()
+                
+                return [step.to_dict() for step in steps]
+                
+            except SQLAlchemyError as e:
+                print(f"❌ 获取任务步骤记录失败: {e}")
+                raise
+    
     def get_task_list(self, limit: int = 10, offset: int = 0) -> Dict[str, Any]:
         """获取任务列表"""
         with self.get_session() as session:
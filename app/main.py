@@ -1,8 +1,101 @@
 # app/main.py - FastAPI主应用（使用ORM自动建表）
+import json
+import threading
+import time
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from app.api import router
 from app.database import ORMDatabaseManager
+from config import EmbeddedConfig, MetricsConfig, TrafficRecordConfig
+from tasks.metrics import collect_metrics, get_metrics, render_prometheus
+
+class RequestMetricsMiddleware:
+    """记录每个请求的处理耗时（ASGI 中间件，按路由模板聚合，避免路径参数造成高基数）"""
+    
+    def __init__(self, app, fastapi_app: FastAPI):
+        self.app = app
+        self.fastapi_app = fastapi_app
+        self._route_paths = None
+    
+    def _route_of(self, scope) -> str:
+        if self._route_paths is None:
+            self._route_paths = {getattr(route, "endpoint", None): route.path for route in self.fastapi_app.routes}
+        return self._route_paths.get(scope.get("endpoint"), "<unmatched>")
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        start = time.perf_counter()
+        status = 500
+        
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            labels = (("method", scope["method"]), ("route", self._route_of(scope)), ("status", str(status)))
+            get_metrics().observe("http_request_duration_seconds", time.perf_counter() - start, labels)
+
+class TrafficRecorderMiddleware:
+    """把 POST /submit 请求录制为 JSONL（时间戳、任务链、a、b、响应状态与耗时），供 benchmarks.replay 回放"""
+    
+    def __init__(self, app, path: str = None):
+        self.app = app
+        self.path = path or TrafficRecordConfig.FILE
+        self._file = None
+        self._lock = threading.Lock()
+    
+    def _write(self, record: dict):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(line)
+            self._file.flush()
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] != "/submit":
+            await self.app(scope, receive, send)
+            return
+        
+        received_at = time.time()
+        start = time.perf_counter()
+        chunks = []
+        status = 500
+        
+        async def receive_with_body():
+            message = await receive()
+            if message["type"] == "http.request":
+                chunks.append(message.get("body", b""))
+            return message
+        
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive_with_body, send_with_status)
+        finally:
+            try:
+                body = json.loads(b"".join(chunks))
+                record = {"ts": received_at, "chain": body.get("operation_chain"), "a": body.get("a"),
+                          "b": body.get("b"), "status": status,
+                          "latency_ms": round((time.perf_counter() - start) * 1000, 3)}
+                record.update({key: body[key] for key in ("priority", "tenant") if body.get(key) is not None})
+            except (ValueError, AttributeError):
+                record = None  # 请求体不是 JSON 对象，无法回放
+            if record is not None:
+                self._write(record)
 
 def create_app() -> FastAPI:
     """创建FastAPI应用"""
@@ -25,9 +118,24 @@ def create_app() -> FastAPI:
         allow_headers=["*"],
     )
     
+    # 记录请求耗时
+    if MetricsConfig.ENABLED:
+        app.add_middleware(RequestMetricsMiddleware, fastapi_app=app)
+    
+    # 录制 /submit 流量（默认关闭）
+    if TrafficRecordConfig.ENABLED:
+        app.add_middleware(TrafficRecorderMiddleware)
+    
     # 注册路由
     app.include_router(router)
     
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        """Prometheus 指标：本进程与共享目录中所有 worker 进程的直方图合并"""
+        get_metrics().flush()
+        return PlainTextResponse(render_prometheus(collect_metrics()),
+                                 media_type="text/plain; version=0.0.4; charset=utf-8")
+    
     # 启动事件
     @app.on_event("startup")
     async def startup_event():
@@ -36,6 +144,8 @@ def create_app() -> FastAPI:
         db_manager = ORMDatabaseManager()
         print("🚀 FastAPI应用启动完成（ORM自动建表）")
         print("📊 数据库表已根据模型自动创建")
+        if EmbeddedConfig.ENABLED:
+            print("🧩 嵌入模式: 任务链在本进程内执行，不需要 Redis 与 Celery Worker")
     
     return app
 
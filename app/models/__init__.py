@@ -1,6 +1,6 @@
 # app/models/__init__.py
 from .request_models import MathRequest
 from .response_models import TaskResponse, TaskStatusResponse, TaskListResponse
-from .database_models import TaskRecord, Base
+from .database_models import TaskRecord, TaskStep, Base
 
-__all__ = ["MathRequest", "TaskResponse", "TaskStatusResponse", "TaskListResponse", "TaskRecord", "Base"]
+__all__ = ["MathRequest", "TaskResponse", "TaskStatusResponse", "TaskListResponse", "TaskRecord", "TaskStep", "Base"]
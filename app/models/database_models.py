@@ -1,5 +1,5 @@
 # app/models/database_models.py - 数据库ORM模型
-from sqlalchemy import Column, String, Integer, DateTime, Text, create_engine
+from sqlalchemy import Column, String, Integer, Float, DateTime, Text, create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
@@ -49,3 +49,37 @@ class TaskRecord(Base):
     
     def __repr__(self):
         return f"<TaskRecord(id='{self.id}', status='{self.status}', operation='{self.operation_chain}')>"
+
+
+class TaskStep(Base):
+    """任务链步骤耗时模型（追踪记录，由 worker 与 API 批量写入）"""
+    __tablename__ = 'task_steps'
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    trace_id = Column(String, nullable=False, index=True, comment='任务记录ID')
+    step_id = Column(String, nullable=False, comment='Celery任务ID或API阶段名')
+    parent_id = Column(String, nullable=True, comment='触发本步骤的Celery任务ID')
+    name = Column(String, nullable=False, comment='任务名或API阶段名')
+    queue = Column(String, nullable=True, comment='队列')
+    worker = Column(String, nullable=True, comment='执行的worker')
+    state = Column(String, nullable=True, comment='结束状态')
+    enqueued_at = Column(Float, nullable=True, comment='发布时间(时间戳)')
+    started_at = Column(Float, nullable=False, comment='开始时间(时间戳)')
+    finished_at = Column(Float, nullable=False, comment='结束时间(时间戳)')
+    
+    def to_dict(self) -> dict:
+        """转换为字典"""
+        return {
+            'step_id': self.step_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'queue': self.queue,
+            'worker': self.worker,
+            'state': self.state,
+            'enqueued_at': self.enqueued_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+    
+    def __repr__(self):
+        return f"<TaskStep(trace_id='{self.trace_id}', name='{self.name}', state='{self.state}')>"
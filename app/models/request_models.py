@@ -1,6 +1,6 @@
 # app/models/request_models.py - 请求模型
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Literal, Optional
 
 class MathRequest(BaseModel):
     """数学运算请求模型"""
@@ -11,12 +11,25 @@ class MathRequest(BaseModel):
         description="运算链类型",
         example="add_multiply_divide"
     )
+    priority: Optional[Literal["high", "normal", "low"]] = Field(
+        default="normal",
+        description="优先级: high / normal / low，路由到对应的优先级队列",
+        example="normal"
+    )
+    tenant: Optional[str] = Field(
+        default=None,
+        max_length=64,
+        description="客户端/租户标识，worker 按租户加权公平调度（未指定时为默认租户）",
+        example="team-a"
+    )
 
     class Config:
         schema_extra = {
             "example": {
                 "a": 10,
                 "b": 5,
-                "operation_chain": "add_multiply_divide"
+                "operation_chain": "add_multiply_divide",
+                "priority": "normal",
+                "tenant": "team-a"
             }
         }
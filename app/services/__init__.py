@@ -1,5 +1,7 @@
 # app/services/__init__.py
 from .task_service import TaskService
 from .chain_service import ChainService
+from .admission import AdmissionController, AdmissionRejected
+from .embedded_executor import EmbeddedExecutor
 
-__all__ = ["TaskService", "ChainService"]
+__all__ = ["TaskService", "ChainService", "AdmissionController", "AdmissionRejected", "EmbeddedExecutor"]
@@ -0,0 +1,158 @@
+# app/services/admission.py - /submit 准入控制
+"""
+准入控制
+
+- 按队列统计未完成的任务链（提交时加一，结果跟踪发现任务链结束时减一），达到高水位时拒绝，
+  Retry-After 按最近的完成间隔估算积压降到高水位以下所需时间
+- 按优先级拆分的队列（math.high / math / math.low）合计受原队列名的高水位约束；
+  单独为子队列配置的高水位只额外限制该子队列
+- 可选的按客户端令牌桶：每秒补充 CLIENT_RATE 个令牌，容量 CLIENT_BURST。客户端按连接地址区分，
+  不使用请求体中的 tenant（未经认证，换一个 tenant 即可绕过限速）
+- 计数只在本进程内存中，每次判断为几次字典操作；多个 API 进程时各自按自己的计数准入
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+from config import AdmissionConfig
+from scheduling import base_queue
+
+
+class AdmissionRejected(Exception):
+    """请求被准入控制拒绝（API 返回 429）"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """单个客户端的令牌桶"""
+
+    __slots__ = ("tokens", "updated_at")
+
+    def __init__(self, tokens: float, updated_at: float):
+        self.tokens = tokens
+        self.updated_at = updated_at
+
+
+class AdmissionController:
+    """按队列高水位与客户端令牌桶决定是否接受提交"""
+
+    # 完成间隔的指数滑动平均系数
+    EWMA_ALPHA = 0.1
+
+    def __init__(self, high_water: Dict[str, int] = None, default_high_water: int = None,
+                 client_rate: float = None, client_burst: int = None, max_clients: int = None,
+                 max_retry_after: int = None, clock: Callable[[], float] = time.monotonic):
+        self.high_water = AdmissionConfig.HIGH_WATER if high_water is None else high_water
+        self.default_high_water = default_high_water or AdmissionConfig.DEFAULT_HIGH_WATER
+        self.client_rate = AdmissionConfig.CLIENT_RATE if client_rate is None else client_rate
+        self.client_burst = client_burst or AdmissionConfig.CLIENT_BURST
+        self.max_clients = max_clients or AdmissionConfig.MAX_CLIENTS
+        self.max_retry_after = max_retry_after or AdmissionConfig.MAX_RETRY_AFTER
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        # 未完成任务链数: 按实际队列（math.low）与按原队列（math，各子队列合计）
+        self._outstanding: Dict[str, int] = {}
+        self._group_outstanding: Dict[str, int] = {}
+        self._groups: Dict[str, str] = {}
+        # 各原队列最近一次完成的时间与完成间隔的滑动平均（秒）
+        self._released_at: Dict[str, float] = {}
+        self._interval: Dict[str, float] = {}
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self.stats = {"admitted": 0, "rejected_queue": 0, "rejected_client": 0}
+
+    def _group(self, queue: str) -> str:
+        group = self._groups.get(queue)
+        if group is None:
+            group = self._groups[queue] = base_queue(queue)
+        return group
+
+    def limit(self, queue: str) -> int:
+        """队列（原队列名，各优先级子队列合计）的高水位"""
+        return self.high_water.get(queue, self.default_high_water)
+
+    def _reject_queue(self, queue: str, group: str, outstanding: int, limit: int) -> AdmissionRejected:
+        self.stats["rejected_queue"] += 1
+        # 估算积压降到高水位以下所需时间；还没有完成记录时按 1 秒
+        retry_after = (outstanding - limit + 1) * self._interval.get(group, 1.0)
+        return AdmissionRejected(f"队列 {queue} 积压 {outstanding} 个任务，已达到上限 {limit}",
+                                 self._retry_after(retry_after))
+
+    def admit(self, queue: str, client: Optional[str] = None) -> None:
+        """
+        准入一次提交，接受时该队列的未完成数加一
+
+        Args:
+            queue: 任务链的实际队列（含优先级后缀）
+            client: 客户端地址（令牌桶的键）
+
+        Raises:
+            AdmissionRejected: 队列达到高水位或客户端超出速率
+        """
+        with self._lock:
+            now = self.clock()
+            group = self._group(queue)
+            group_outstanding = self._group_outstanding.get(group, 0)
+            group_limit = self.limit(group)
+            if group_outstanding >= group_limit:
+                raise self._reject_queue(group, group, group_outstanding, group_limit)
+            outstanding = self._outstanding.get(queue, 0)
+            if queue != group and queue in self.high_water and outstanding >= self.high_water[queue]:
+                raise self._reject_queue(queue, group, outstanding, self.high_water[queue])
+
+            if self.client_rate > 0 and client is not None:
+                bucket = self._buckets.get(client)
+                if bucket is None:
+                    bucket = self._buckets[client] = TokenBucket(self.client_burst, now)
+                    if len(self._buckets) > self.max_clients:
+                        self._buckets.popitem(last=False)
+                else:
+                    self._buckets.move_to_end(client)
+                    bucket.tokens = min(self.client_burst, bucket.tokens + (now - bucket.updated_at) * self.client_rate)
+                    bucket.updated_at = now
+                if bucket.tokens < 1:
+                    self.stats["rejected_client"] += 1
+                    raise AdmissionRejected(f"客户端 {client} 提交过快，限制为每秒 {self.client_rate:g} 个",
+                                            self._retry_after((1 - bucket.tokens) / self.client_rate))
+                bucket.tokens -= 1
+
+            self._outstanding[queue] = outstanding + 1
+            self._group_outstanding[group] = group_outstanding + 1
+            self.stats["admitted"] += 1
+
+    def release(self, queue: str) -> None:
+        """一个已准入的任务链结束，计入完成间隔"""
+        with self._lock:
+            group = self._decrement(queue)
+            now = self.clock()
+            previous = self._released_at.get(group)
+            if previous is not None:
+                interval = self._interval.get(group)
+                elapsed = now - previous
+                self._interval[group] = elapsed if interval is None else \
+                    interval + self.EWMA_ALPHA * (elapsed - interval)
+            self._released_at[group] = now
+
+    def cancel(self, queue: str) -> None:
+        """一个已准入的任务链未能提交（没有执行），只减少计数，不影响完成间隔与 Retry-After"""
+        with self._lock:
+            self._decrement(queue)
+
+    def _decrement(self, queue: str) -> str:
+        group = self._group(queue)
+        self._outstanding[queue] = max(self._outstanding.get(queue, 0) - 1, 0)
+        self._group_outstanding[group] = max(self._group_outstanding.get(group, 0) - 1, 0)
+        return group
+
+    def _retry_after(self, seconds: float) -> int:
+        return min(max(math.ceil(seconds), 1), self.max_retry_after)
+
+    def outstanding(self) -> Dict[str, int]:
+        """各队列的未完成任务链数"""
+        with self._lock:
+            return dict(self._outstanding)
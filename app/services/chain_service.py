@@ -1,14 +1,25 @@
 # app/services/chain_service.py - 任务链服务
 from celery import chain
+from celery.canvas import _chain
 from celery_app import app as celery_app
+from config import MapReduceConfig, MathCostConfig, ResultPolicyConfig
+from scheduling import priority_queue
+from tasks.numeric import estimate_power_digits
+from workflows import build_map_reduce
 
 class ChainService:
     """任务链服务"""
     
+    # 结果策略: 只持久化最后一步 / 每一步都持久化
+    RESULT_POLICY_FINAL_ONLY = "final_only"
+    RESULT_POLICY_ALL = "all"
+    RESULT_POLICIES = (RESULT_POLICY_FINAL_ONLY, RESULT_POLICY_ALL)
+    
     # 任务链定义
     OPERATION_CHAINS = {
         "add_multiply_divide": {
             "description": "加法 -> 乘法 -> 除法",
+            "queue": "math",
             "chain": lambda a, b: chain(
                 celery_app.signature('math.add', args=[a, b]),      # a + b
                 celery_app.signature('math.multiply', args=[2]),    # 结果 * 2
@@ -17,6 +28,8 @@ class ChainService:
         },
         "power_sqrt": {
             "description": "幂运算 -> 开方",
+            "queue": "math",
+            "cost": estimate_power_digits,                          # 计算前估算 a ^ b 的十进制位数
             "chain": lambda a, b: chain(
                 celery_app.signature('math.power', args=[a, b]),    # a ^ b
                 celery_app.signature('math.sqrt')                   # √结果
@@ -24,12 +37,23 @@ class ChainService:
         },
         "complex_math": {
             "description": "复杂数学运算链",
+            "queue": "math",
             "chain": lambda a, b: chain(
                 celery_app.signature('math.add', args=[a, b]),          # a + b
                 celery_app.signature('math.multiply', args=[a]),        # 结果 * a
                 celery_app.signature('math.subtract', args=[b]),        # 结果 - b
                 celery_app.signature('math.divide', args=[2])           # 结果 / 2
             )
+        },
+        "map_reduce_statistics": {
+            "description": "分片并行统计: 1..a 切分为 b 个分片（不超过 MAP_REDUCE_MAX_SHARDS）-> 合并摘要",
+            "type": "map_reduce",
+            "queue": "data",
+            "result_policy": "all",                                     # chord 需要读取各分片结果
+            "chain": lambda a, b: build_map_reduce(
+                range(1, a + 1),                                        # 数据 1..a
+                shards=max(b, 1)                                        # b 个分片并行
+            )
         }
     }
     
@@ -37,7 +61,11 @@ class ChainService:
     def get_available_chains(cls):
         """获取可用的任务链"""
         return {
-            name: {"description": chain_info["description"]}
+            name: {
+                "description": chain_info["description"],
+                "type": chain_info.get("type", "chain"),
+                "result_policy": cls.get_result_policy(name)
+            }
             for name, chain_info in cls.OPERATION_CHAINS.items()
         }
     
@@ -47,13 +75,76 @@ class ChainService:
         return chain_name in cls.OPERATION_CHAINS
     
     @classmethod
-    def create_chain(cls, chain_name: str, a: int, b: int):
+    def estimate_digits(cls, chain_name: str, a: int, b: int) -> int:
+        """估算任务链中间结果的十进制位数（没有规模估算的任务链为 1）"""
+        cost = cls.OPERATION_CHAINS.get(chain_name, {}).get("cost")
+        return cost(a, b) if cost else 1
+    
+    @classmethod
+    def check_cost(cls, chain_name: str, a: int, b: int) -> None:
+        """
+        提交前检查结果规模与分片数
+        
+        Raises:
+            ValueError: 结果超过 MATH_EXACT_MAX_DIGITS 位且 MATH_OVERSIZE_POLICY 为 reject，
+                或 map-reduce 的分片数超过 MAP_REDUCE_MAX_SHARDS
+        """
+        chain_info = cls.OPERATION_CHAINS.get(chain_name, {})
+        if chain_info.get("type") == "map_reduce" and b > MapReduceConfig.MAX_SHARDS:
+            raise ValueError(f"分片数量超过上限: {b} > {MapReduceConfig.MAX_SHARDS}")
+        digits = cls.estimate_digits(chain_name, a, b)
+        if digits > MathCostConfig.EXACT_MAX_DIGITS and MathCostConfig.OVERSIZE_POLICY == "reject":
+            raise ValueError(f"结果约 {digits} 位，超过上限 {MathCostConfig.EXACT_MAX_DIGITS} 位")
+    
+    @classmethod
+    def is_heavy(cls, chain_name: str, a: int, b: int) -> bool:
+        """是否需要精确计算超过 MATH_HEAVY_DIGITS 位的大整数（超过精确上限的在对数空间计算，开销很小）"""
+        return MathCostConfig.HEAVY_DIGITS < cls.estimate_digits(chain_name, a, b) <= MathCostConfig.EXACT_MAX_DIGITS
+    
+    @classmethod
+    def get_queue(cls, chain_name: str, priority: str = None, a: int = None, b: int = None) -> str:
+        """任务链在该优先级下主要占用的队列（准入控制按此队列计数；给出 a、b 时重计算任务链为重计算队列）"""
+        if a is not None and b is not None and cls.is_heavy(chain_name, a, b):
+            return MathCostConfig.HEAVY_QUEUE
+        chain_info = cls.OPERATION_CHAINS.get(chain_name, {})
+        return priority_queue(chain_info.get("queue", "celery"), priority)
+    
+    @classmethod
+    def get_result_policy(cls, chain_name: str) -> str:
+        """获取任务链的结果策略（任务链自身配置优先）"""
+        chain_info = cls.OPERATION_CHAINS.get(chain_name, {})
+        return chain_info.get("result_policy", ResultPolicyConfig.CHAIN_RESULT_POLICY)
+    
+    @classmethod
+    def apply_result_policy(cls, workflow, result_policy: str):
+        """
+        按结果策略设置任务链各步骤的结果存储
+        
+        final_only: 中间步骤忽略结果（不写结果后端），只有最后一步的结果被持久化；
+        中间步骤出错时错误仍会沿任务链传播到最后一步。
+        """
+        if result_policy not in cls.RESULT_POLICIES:
+            raise ValueError(f"不支持的结果策略: {result_policy}")
+        
+        if result_policy == cls.RESULT_POLICY_FINAL_ONLY and isinstance(workflow, _chain):
+            for step in workflow.tasks[:-1]:
+                step.set(ignore_result=True)
+        
+        return workflow
+    
+    @classmethod
+    def create_chain(cls, chain_name: str, a: int, b: int, result_policy: str = None):
         """创建任务链"""
         if not cls.is_valid_chain(chain_name):
             raise ValueError(f"不支持的任务链: {chain_name}")
         
         chain_info = cls.OPERATION_CHAINS[chain_name]
-        return chain_info["chain"](a, b)
+        workflow = chain_info["chain"](a, b)
+        if cls.is_heavy(chain_name, a, b) and isinstance(workflow, _chain):
+            # 显式队列优先于按任务名的路由，整条链都在重计算 worker 上执行
+            for step in workflow.tasks:
+                step.set(queue=MathCostConfig.HEAVY_QUEUE)
+        return cls.apply_result_policy(workflow, result_policy or cls.get_result_policy(chain_name))
     
     @classmethod
     def get_chain_description(cls, chain_name: str) -> str:
@@ -0,0 +1,372 @@
+# app/services/embedded_executor.py - 嵌入模式的进程内任务链执行器
+"""
+嵌入模式（EMBEDDED_MODE=true）
+
+任务链不经过 broker 与 worker，直接在 API 进程内执行:
+
+- 按 task_routes（与 worker 相同的 PriorityRouter 与显式 queue 选项）为每个队列建立独立的有界执行线程池，
+  线程数取 EMBEDDED_POOL_SIZES，未配置时取同名 worker 配置的并发数；优先级子队列
+  （math.high / math / math.low）共用原队列的线程，空闲线程先执行高优先级的步骤
+- 每一步在所属队列的线程中用 Task.apply 执行（同一个任务函数，任务信号、指标、追踪ID与优先级/租户
+  消息头照常生效），结束后把下一步放入下一步队列的线程池；任务链在步骤之间不占用线程
+- 支持 chain / group / chord 及其嵌套，任一步骤失败时任务链以该异常结束
+- apply_async 返回 EmbeddedResult，提供 TaskService 用到的 AsyncResult 接口（id / ready / get / forget）；
+  任务链结束时调用 add_done_callback 注册的回调，TaskService 由此直接更新数据库
+
+io 任务的协程仍在进程级事件循环（tasks.async_support）上执行，执行线程只等待结果，与 AsyncIOPool 相同。
+
+嵌入模式没有 celery beat: start_periodic 按 beat_schedule 中的固定间隔定时提交任务（如负载存储回收），
+启动时先执行一次，之后按间隔执行；crontab 等非固定间隔的计划不支持，启动时提示并跳过。
+"""
+import itertools
+import queue
+import threading
+import time
+from datetime import timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from celery.canvas import Signature, _chain, chord, group, maybe_signature
+from celery.exceptions import TimeoutError
+from kombu.utils.uuid import uuid
+
+from config import EmbeddedConfig
+from scheduling import (DEFAULT_PRIORITY, PRIORITY_HEADER, PRIORITY_LEVELS, TENANT_HEADER, base_queue,
+                        current_schedule, schedule_context)
+from tasks.base import PUBLISHED_AT_HEADER
+from tasks.tracing import TRACE_HEADER, current_trace_id
+from worker_profiles import load_profiles
+
+# 上一步没有结果（任务链的第一步）
+_NO_PARENT = object()
+
+# 步骤结束的回调 (结果, 异常)
+Continuation = Callable[[Any, Optional[BaseException]], None]
+
+
+class EmbeddedResult:
+    """进程内执行的任务链结果（AsyncResult 的子集）"""
+
+    def __init__(self, task_id: str):
+        self.id = task_id
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._value: Any = None
+        self._error: Optional[BaseException] = None
+        self._callbacks: List[Callable[['EmbeddedResult'], None]] = []
+
+    @property
+    def state(self) -> str:
+        if not self._done.is_set():
+            return 'PENDING'
+        return 'FAILURE' if self._error is not None else 'SUCCESS'
+
+    @property
+    def result(self) -> Any:
+        return self._error if self._error is not None else self._value
+
+    def ready(self) -> bool:
+        return self._done.is_set()
+
+    def successful(self) -> bool:
+        return self.state == 'SUCCESS'
+
+    def failed(self) -> bool:
+        return self.state == 'FAILURE'
+
+    def get(self, timeout: float = None, propagate: bool = True, **kwargs) -> Any:
+        if not self._done.wait(timeout):
+            raise TimeoutError("任务链尚未结束")
+        if self._error is not None and propagate:
+            raise self._error
+        return self.result
+
+    def forget(self) -> None:
+        """结果只在内存中，没有需要清理的结果后端"""
+
+    def add_done_callback(self, callback: Callable[['EmbeddedResult'], None]) -> None:
+        """任务链结束时调用 callback(result)；已结束时立即在当前线程调用"""
+        with self._lock:
+            if not self._done.is_set():
+                self._callbacks.append(callback)
+                return
+        self._invoke(callback)
+
+    def _finish(self, value: Any, error: Optional[BaseException]) -> None:
+        with self._lock:
+            self._value, self._error = value, error
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            self._invoke(callback)
+
+    def _invoke(self, callback) -> None:
+        try:
+            callback(self)
+        except Exception as e:
+            print(f"⚠️ 任务链 {self.id} 的结束回调失败: {e}")
+
+
+class QueuePool:
+    """单个队列（含优先级子队列）的有界执行线程，按需启动，最多 size 个"""
+
+    def __init__(self, name: str, size: int):
+        self.name = name
+        self.size = max(size, 1)
+        self._queue: "queue.PriorityQueue[Tuple[int, int, Optional[Callable[[], None]]]]" = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._busy = 0
+        self._closed = False
+
+    def submit(self, rank: int, func: Callable[[], None]) -> None:
+        """放入一个步骤，rank 越小越先执行（同一优先级按提交顺序）"""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError(f"队列 {self.name} 的执行线程已停止")
+            self._queue.put((rank, next(self._sequence), func))
+            # 等待的步骤多于空闲线程时增加线程，直到上限
+            if len(self._threads) < self.size and self._queue.qsize() > len(self._threads) - self._busy:
+                thread = threading.Thread(target=self._run, name=f"embedded-{self.name}-{len(self._threads) + 1}",
+                                          daemon=True)
+                self._threads.append(thread)
+                thread.start()
+
+    def _run(self) -> None:
+        while True:
+            _, _, func = self._queue.get()
+            if func is None:
+                return
+            with self._lock:
+                self._busy += 1
+            try:
+                func()
+            except Exception as e:
+                print(f"⚠️ 队列 {self.name} 的步骤执行失败: {e}")
+            finally:
+                with self._lock:
+                    self._busy -= 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"threads": len(self._threads), "busy": self._busy, "size": self.size,
+                    "pending": self._queue.qsize()}
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            threads = list(self._threads)
+        # 停止标记排在所有已提交的步骤之后
+        for _ in threads:
+            self._queue.put((len(PRIORITY_LEVELS), next(self._sequence), None))
+
+
+class EmbeddedExecutor:
+    """在本进程内按队列的线程池执行任务链"""
+
+    def __init__(self, app=None, pool_sizes: Dict[str, int] = None, default_pool_size: int = None):
+        if app is None:
+            from celery_app import app
+        self.app = app
+        self.pool_sizes = self._default_pool_sizes() if pool_sizes is None else pool_sizes
+        self.default_pool_size = default_pool_size or EmbeddedConfig.DEFAULT_POOL_SIZE
+        self._pools: Dict[str, QueuePool] = {}
+        self._lock = threading.Lock()
+        self._periodic: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    @staticmethod
+    def _default_pool_sizes() -> Dict[str, int]:
+        sizes = {name: profile.resolved_concurrency() for name, profile in load_profiles().items()
+                 if profile.concurrency is not None}
+        sizes.update((name, int(size)) for name, size in EmbeddedConfig.POOL_SIZES.items())
+        return sizes
+
+    def pool(self, name: str) -> QueuePool:
+        """队列（原队列名）的执行线程池"""
+        pool = self._pools.get(name)
+        if pool is None:
+            with self._lock:
+                pool = self._pools.get(name)
+                if pool is None:
+                    pool = self._pools[name] = QueuePool(name, self.pool_sizes.get(name, self.default_pool_size))
+        return pool
+
+    def apply_async(self, workflow) -> EmbeddedResult:
+        """
+        开始执行任务链（签名、chain、group 或 chord），立即返回
+
+        与发布到 broker 相同，在调用方的 trace_context / schedule_context 中调用时，
+        追踪ID与优先级、租户随每一步传递。
+        """
+        headers = {}
+        trace_id = current_trace_id()
+        if trace_id is not None:
+            headers[TRACE_HEADER] = trace_id
+        priority, tenant = current_schedule()
+        if priority is not None:
+            headers[PRIORITY_HEADER] = priority
+        if tenant is not None:
+            headers[TENANT_HEADER] = tenant
+
+        result = EmbeddedResult(uuid())
+        self._run(maybe_signature(workflow, app=self.app), _NO_PARENT, headers, result._finish)
+        return result
+
+    def _run(self, signature: Signature, parent: Any, headers: Dict[str, Any], done: Continuation) -> None:
+        if isinstance(signature, _chain):
+            self._run_chain(list(signature.tasks), parent, headers, done)
+        elif isinstance(signature, chord):
+            def run_body(value, error):
+                if error is not None:
+                    done(None, error)
+                else:
+                    self._run(maybe_signature(signature.body, app=self.app), value, headers, done)
+
+            self._run_group(list(signature.tasks), parent, headers, run_body)
+        elif isinstance(signature, group):
+            self._run_group(list(signature.tasks), parent, headers, done)
+        else:
+            self._submit_step(signature, parent, headers, done)
+
+    def _run_chain(self, steps: List[Signature], parent: Any, headers: Dict[str, Any], done: Continuation) -> None:
+        if not steps:
+            done(None if parent is _NO_PARENT else parent, None)
+            return
+
+        def next_step(value, error):
+            if error is not None:
+                done(None, error)
+            else:
+                self._run_chain(steps[1:], value, headers, done)
+
+        self._run(maybe_signature(steps[0], app=self.app), parent, headers, next_step)
+
+    def _run_group(self, members: List[Signature], parent: Any, headers: Dict[str, Any], done: Continuation) -> None:
+        """并行执行各成员，全部成功时结果为按成员顺序的列表，第一个失败的成员结束整个 group"""
+        if not members:
+            done([], None)
+            return
+        results = [None] * len(members)
+        remaining = [len(members)]
+        lock = threading.Lock()
+
+        def member_done(index, value, error):
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                if error is not None:
+                    remaining[0] = 0
+                else:
+                    results[index] = value
+                    remaining[0] -= 1
+                    if remaining[0]:
+                        return
+            if error is not None:
+                done(None, error)
+            else:
+                done(results, None)
+
+        for index, member in enumerate(members):
+            self._run(maybe_signature(member, app=self.app), parent, headers,
+                      lambda value, error, index=index: member_done(index, value, error))
+
+    def route(self, signature: Signature, priority: Optional[str]) -> str:
+        """步骤的实际队列: 显式 queue 选项优先，否则按 task_routes 与优先级"""
+        queue_name = signature.options.get('queue')
+        if queue_name is None:
+            with schedule_context(priority, None):
+                queue_name = self.app.amqp.router.route(dict(signature.options), signature.task).get('queue')
+        return getattr(queue_name, 'name', queue_name) or self.app.conf.task_default_queue
+
+    def _submit_step(self, signature: Signature, parent: Any, headers: Dict[str, Any], done: Continuation) -> None:
+        priority = headers.get(PRIORITY_HEADER)
+        queue_name = self.route(signature, priority)
+        args = tuple(signature.args)
+        if parent is not _NO_PARENT and not signature.immutable:
+            args = (parent,) + args
+        step_headers = dict(headers, **{PUBLISHED_AT_HEADER: time.time()})
+        rank = PRIORITY_LEVELS.index(priority or DEFAULT_PRIORITY)
+        self.pool(base_queue(queue_name)).submit(
+            rank, lambda: self._execute(signature, args, queue_name, step_headers, done))
+
+    def _execute(self, signature: Signature, args: tuple, queue_name: str, headers: Dict[str, Any],
+                 done: Continuation) -> None:
+        value, error = None, None
+        try:
+            task = self.app.tasks[signature.task]
+            result = task.apply(args, signature.kwargs, task_id=uuid(), throw=False, headers=headers,
+                                routing_key=queue_name)
+            if result.failed():
+                error = result.result
+            else:
+                value = result.result
+        except Exception as e:
+            error = e
+        done(value, error)
+
+    def start_periodic(self, schedule: Dict[str, Dict[str, Any]] = None) -> None:
+        """
+        代替 celery beat 定时提交任务（重复调用无副作用）
+
+        Args:
+            schedule: 与 beat_schedule 格式相同的计划，默认使用 app.conf.beat_schedule
+        """
+        schedule = self.app.conf.beat_schedule if schedule is None else schedule
+        entries = {}
+        for name, entry in schedule.items():
+            interval = _interval_seconds(entry['schedule'])
+            if interval is None or interval <= 0:
+                print(f"⚠️ 嵌入模式只支持固定间隔的定时任务，跳过: {name}")
+                continue
+            signature = self.app.signature(entry['task'], args=entry.get('args', ()),
+                                           kwargs=entry.get('kwargs', {}), **entry.get('options', {}))
+            entries[name] = (signature, interval)
+        with self._lock:
+            if self._periodic is not None or not entries:
+                return
+            self._periodic = threading.Thread(target=self._run_periodic, args=(entries,),
+                                              name="embedded-beat", daemon=True)
+            self._periodic.start()
+
+    def _run_periodic(self, entries: Dict[str, Tuple[Signature, float]]) -> None:
+        due = dict.fromkeys(entries, time.monotonic())
+        while not self._stopping.is_set():
+            now = time.monotonic()
+            for name, (signature, interval) in entries.items():
+                if due[name] <= now:
+                    due[name] = now + interval
+                    self._apply_periodic(name, signature)
+            self._stopping.wait(max(min(due.values()) - time.monotonic(), 0))
+
+    def _apply_periodic(self, name: str, signature: Signature) -> None:
+        def report(result: EmbeddedResult) -> None:
+            if result.failed():
+                print(f"⚠️ 定时任务 {name} 执行失败: {result.result}")
+
+        try:
+            self.apply_async(signature.clone()).add_done_callback(report)
+        except Exception as e:
+            print(f"⚠️ 定时任务 {name} 提交失败: {e}")
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """各队列的线程数、执行中的步骤数、上限与等待执行的步骤数"""
+        return {name: pool.stats() for name, pool in list(self._pools.items())}
+
+    def close(self) -> None:
+        """停止定时任务；已提交的步骤执行完后停止全部线程（之后产生的下一步不再执行）"""
+        self._stopping.set()
+        if self._periodic is not None:
+            self._periodic.join()
+        for pool in list(self._pools.values()):
+            pool.close()
+
+
+def _interval_seconds(schedule: Any) -> Optional[float]:
+    """beat 计划的固定间隔（秒）：数值、timedelta 或 celery.schedules.schedule，其他计划为 None"""
+    if isinstance(schedule, (int, float)):
+        return float(schedule)
+    if isinstance(schedule, timedelta):
+        return schedule.total_seconds()
+    run_every = getattr(schedule, 'run_every', None)
+    return run_every.total_seconds() if isinstance(run_every, timedelta) else None
@@ -0,0 +1,106 @@
+# app/services/result_tracker.py - 任务链结果跟踪
+"""
+结果跟踪
+
+API 进程中的一个后台线程按 TRACK_INTERVAL_MS 轮询所有已提交、尚未结束的任务链的结果状态
+（非阻塞读取，不占用请求线程池），任务链结束（SUCCESS / FAILURE 等就绪状态）时调用 on_done:
+更新任务记录并释放准入计数。
+
+仍在排队的任务链一直保持跟踪；超过 TRACK_TIMEOUT（默认为结果后端的过期时间，之后结果已不可读）
+仍未结束的才放弃跟踪，以 TimeoutError 回调。
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, NamedTuple, Optional
+
+from config import AdmissionConfig
+
+
+class TrackedResult(NamedTuple):
+    celery_result: Any
+    queue: Optional[str]
+    deadline: float
+
+
+class ResultTracker:
+    """轮询已提交任务链的结果，结束时回调 on_done(task_id, celery_result, queue, error)"""
+
+    def __init__(self, on_done: Callable[[str, Any, Optional[str], Optional[Exception]], None],
+                 interval_ms: int = None, timeout: float = None, clock: Callable[[], float] = time.monotonic):
+        self.on_done = on_done
+        self.interval = (interval_ms or AdmissionConfig.TRACK_INTERVAL_MS) / 1000
+        self.timeout = timeout or AdmissionConfig.TRACK_TIMEOUT
+        self.clock = clock
+
+        self._pending: Dict[str, TrackedResult] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._poller: Optional[threading.Thread] = None
+        self.stats = {"tracked": 0, "finished": 0, "timeouts": 0, "errors": 0}
+
+    def track(self, task_id: str, celery_result, queue: str = None) -> None:
+        """开始跟踪一个已发布的任务链"""
+        with self._lock:
+            self._pending[task_id] = TrackedResult(celery_result, queue, self.clock() + self.timeout)
+            self.stats["tracked"] += 1
+        if self._poller is None:
+            self._start_poller()
+        self._wakeup.set()
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def poll(self) -> int:
+        """检查一遍全部跟踪中的任务链，返回本次结束的数量"""
+        with self._lock:
+            pending = list(self._pending.items())
+        finished = 0
+        now = self.clock()
+        for task_id, tracked in pending:
+            error = None
+            try:
+                if not tracked.celery_result.ready():
+                    if now < tracked.deadline:
+                        continue
+                    self.stats["timeouts"] += 1
+                    error = TimeoutError(f"任务链 {self.timeout:g} 秒内未结束，停止跟踪")
+            except Exception as e:
+                # 结果后端暂时不可用时保持跟踪，下一轮重试
+                self.stats["errors"] += 1
+                if now < tracked.deadline:
+                    continue
+                error = e
+
+            with self._lock:
+                self._pending.pop(task_id, None)
+            finished += 1
+            self.stats["finished"] += 1
+            try:
+                self.on_done(task_id, tracked.celery_result, tracked.queue, error)
+            except Exception as e:
+                print(f"⚠️ 处理任务 {task_id} 的结果失败: {e}")
+        return finished
+
+    def _start_poller(self) -> None:
+        with self._lock:
+            if self._poller is not None:
+                return
+            self._poller = threading.Thread(target=self._run_poller, name="result-tracker", daemon=True)
+        self._poller.start()
+
+    def _run_poller(self) -> None:
+        while not self._stopped:
+            if not self.pending():
+                # 没有跟踪中的任务链时等待下一次 track
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            self.poll()
+            time.sleep(self.interval)
+
+    def close(self) -> None:
+        """停止后台线程（不再回调未结束的任务链）"""
+        self._stopped = True
+        self._wakeup.set()
@@ -1,49 +1,101 @@
 # app/services/task_service.py - 任务服务（使用ORM）
 import uuid
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from app.database import ORMDatabaseManager
+from app.services.admission import AdmissionController
 from app.services.chain_service import ChainService
+from app.services.embedded_executor import EmbeddedExecutor
+from app.services.result_tracker import ResultTracker
+from config import AdmissionConfig, EmbeddedConfig, ResultPolicyConfig
+from scheduling import schedule_context, validate_priority
+from tasks.tracing import critical_path, get_step_writer, trace_context, trace_span
 
 class TaskService:
     """任务服务（基于ORM）"""
     
-    def __init__(self, db_manager: ORMDatabaseManager = None):
+    def __init__(self, db_manager: ORMDatabaseManager = None, admission: AdmissionController = None,
+                 executor: EmbeddedExecutor = None):
         self.db_manager = db_manager or ORMDatabaseManager()
         self.chain_service = ChainService()
+        self.admission = admission or (AdmissionController() if AdmissionConfig.ENABLED else None)
+        # 嵌入模式: 任务链在本进程内执行，不发布到 broker；没有 celery beat，由执行器定时执行 beat_schedule
+        if executor is None and EmbeddedConfig.ENABLED:
+            executor = EmbeddedExecutor()
+            executor.start_periodic()
+        self.executor = executor
+        # 任务链结束时更新任务记录并释放准入计数
+        self.result_tracker = ResultTracker(self._on_chain_done)
     
-    def submit_task(self, a: int, b: int, operation_chain: str) -> Dict[str, Any]:
-        """提交任务"""
-        # 验证任务链
+    def submit_task(self, a: int, b: int, operation_chain: str, priority: str = None,
+                    tenant: str = None, client: str = None) -> Dict[str, Any]:
+        """
+        提交任务（priority / tenant 决定任务链各步骤的队列与 worker 上的公平调度）
+        
+        Raises:
+            ValueError: 任务链或优先级无效，或结果规模超过上限（MATH_OVERSIZE_POLICY=reject）
+            AdmissionRejected: 队列积压达到高水位或客户端（client，连接地址）提交过快
+        """
+        # 验证任务链与优先级
         if not self.chain_service.is_valid_chain(operation_chain):
             raise ValueError(f"不支持的任务链: {operation_chain}")
+        priority = validate_priority(priority)
+        self.chain_service.check_cost(operation_chain, a, b)
+        
+        # 准入控制（在构建与发布任务链之前拒绝，被拒绝的请求不产生任何开销）
+        queue = self.chain_service.get_queue(operation_chain, priority, a, b)
+        if self.admission:
+            self.admission.admit(queue, client)
         
         # 生成任务ID
         task_id = str(uuid.uuid4())
         
-        # 创建任务链
-        task_chain = self.chain_service.create_chain(operation_chain, a, b)
-        
-        # 提交到Celery
-        celery_result = task_chain.apply_async()
-        celery_task_id = celery_result.id
+        try:
+            # 创建任务链
+            with trace_span(task_id, "api.build_chain"):
+                task_chain = self.chain_service.create_chain(operation_chain, a, b)
+            
+            # 提交到Celery或本进程的执行器（任务ID作为追踪ID随任务链的每一步传递）
+            with trace_context(task_id), schedule_context(priority, tenant), trace_span(task_id, "api.publish"):
+                celery_result = self.executor.apply_async(task_chain) if self.executor else task_chain.apply_async()
+            celery_task_id = celery_result.id
+            
+            # 保存到数据库（使用ORM）
+            with trace_span(task_id, "api.db_insert"):
+                task_record = self.db_manager.save_task_record(
+                    task_id=task_id,
+                    input_a=a,
+                    input_b=b,
+                    operation_chain=operation_chain,
+                    celery_task_id=celery_task_id
+                )
+        except Exception:
+            # 提交失败时不会开始跟踪结果，由这里释放准入计数（没有执行，不计入完成间隔）
+            self.release(queue, completed=False)
+            raise
         
-        # 保存到数据库（使用ORM）
-        task_record = self.db_manager.save_task_record(
-            task_id=task_id,
-            input_a=a,
-            input_b=b,
-            operation_chain=operation_chain,
-            celery_task_id=celery_task_id
-        )
+        if self.executor:
+            # 执行器在任务链结束时直接回调（已结束时立即回调），不需要轮询结果
+            celery_result.add_done_callback(lambda result: self._on_chain_done(task_id, result, queue))
+        else:
+            self.result_tracker.track(task_id, celery_result, queue)
         
         return {
             "task_id": task_id,
             "celery_result": celery_result,
             "celery_task_id": celery_task_id,
             "description": self.chain_service.get_chain_description(operation_chain),
+            "queue": queue,
             "task_record": task_record
         }
     
+    def release(self, queue: Optional[str], completed: bool = True):
+        """已准入的任务链结束（completed=False 表示未能提交），释放准入计数"""
+        if self.admission and queue:
+            if completed:
+                self.admission.release(queue)
+            else:
+                self.admission.cancel(queue)
+    
     def get_task_status(self, task_id: str) -> Dict[str, Any]:
         """获取任务状态"""
         task_record = self.db_manager.get_task_record(task_id)
@@ -53,6 +105,23 @@ class TaskService:
         
         return task_record.to_dict()
     
+    def get_task_timeline(self, task_id: str) -> Dict[str, Any]:
+        """获取任务链的步骤时间线与关键路径"""
+        task_record = self.db_manager.get_task_record(task_id)
+        
+        if not task_record:
+            raise ValueError("任务不存在")
+        
+        # 先写入本进程缓冲中的 API 阶段记录
+        get_step_writer().flush()
+        
+        return {
+            "task_id": task_id,
+            "status": task_record.status,
+            "operation_chain": task_record.operation_chain,
+            **critical_path(self.db_manager.get_task_steps(task_id))
+        }
+    
     def get_task_list(self, limit: int = 10, offset: int = 0) -> Dict[str, Any]:
         """获取任务列表"""
         return self.db_manager.get_task_list(limit, offset)
@@ -75,11 +144,14 @@ class TaskService:
         tasks = self.db_manager.get_tasks_by_status(status, limit)
         return [task.to_dict() for task in tasks]
     
-    def monitor_celery_task(self, task_id: str, celery_result):
-        """监控Celery任务状态并更新数据库"""
+    def _on_chain_done(self, task_id: str, celery_result, queue: str, error: Exception = None):
+        """任务链结束（结果跟踪发现或执行器回调，或放弃跟踪）: 更新数据库并释放准入计数"""
+        self.release(queue)
         try:
-            # 等待任务完成
-            result = celery_result.get(timeout=60)  # 60秒超时
+            if error is not None:
+                raise error
+            # 已就绪，不会阻塞；任务失败时抛出任务的异常
+            result = celery_result.get(timeout=1)
             
             # 更新数据库状态为成功
             self.db_manager.update_task_status(task_id, 'completed', result)
@@ -89,3 +161,11 @@ class TaskService:
             # 更新数据库状态为失败
             self.db_manager.update_task_status(task_id, 'failed', error=str(e))
             print(f"❌ 任务 {task_id} 执行失败: {e}")
+            return
+        
+        # 结果已持久化到数据库，从结果后端删除
+        if ResultPolicyConfig.FORGET_AFTER_READ:
+            try:
+                celery_result.forget()
+            except Exception as e:
+                print(f"⚠️ 清理结果后端失败: {task_id}, {e}")
@@ -0,0 +1,274 @@
+# autoscaler.py - 按队列深度自动伸缩 worker
+"""
+队列自动伸缩
+
+按固定间隔采样每个队列在 broker 中的积压消息数，以及本次间隔内开始执行的任务的排队等待 p95
+（/metrics 共享目录中的 task_queue_wait_seconds），为每个队列分别决定 worker 进程数:
+
+- 扩容: 每个 worker 的积压超过 TARGET_BACKLOG 时立即扩到 ceil(积压 / TARGET_BACKLOG)；
+  等待 p95 超过 TARGET_WAIT_MS 时至少增加 1 个
+- 缩容: 积压与等待都低于目标的 SCALE_DOWN_RATIO，并持续 SCALE_DOWN_DELAY 秒后减少 1 个；
+  介于两个阈值之间时保持不变（滞回），避免负载在阈值附近波动时反复伸缩
+- worker 数始终在每个队列的 [最小, 最大] 之内
+
+按优先级拆分的队列（math.high / math / math.low）合并为一个队列计算，worker 同时消费这几个队列。
+
+伸缩单位是本机的 worker 进程（LocalWorkerPool，每个进程只消费一个队列及其优先级子队列），停止时发送 SIGTERM，
+进程执行完当前任务后退出。io 队列使用的 AsyncIOPool 等线程池不支持 pool_grow/pool_shrink
+远程控制命令，因此不通过调整进程内并发数来伸缩。每个进程的执行池、并发数与预取倍数取同名的
+worker 配置（worker_profiles.py）。
+
+启动方式:
+    python autoscaler.py
+"""
+import itertools
+import math
+import shlex
+import signal
+import subprocess
+import sys
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from config import AutoscaleConfig
+from scheduling import base_queue, priority_queues
+from tasks.metrics import HdrHistogram, collect_metrics
+from worker_profiles import WorkerProfile, load_profiles
+
+
+def parse_bounds(bounds: Dict[str, str]) -> Dict[str, Tuple[int, int]]:
+    """解析 {"io": "1:4"} 形式的 worker 数范围"""
+    parsed = {}
+    for queue, value in bounds.items():
+        minimum, _, maximum = value.partition(':')
+        parsed[queue] = (int(minimum), int(maximum or minimum))
+        if not 0 <= parsed[queue][0] <= parsed[queue][1]:
+            raise ValueError(f"队列 {queue} 的 worker 数范围无效: {value}")
+    return parsed
+
+
+def queue_depths(app, queues: Iterable[str], connection=None) -> Dict[str, int]:
+    """broker 中各队列（含优先级子队列）的消息数（不含 worker 已预取的消息；队列尚不存在时为 0）"""
+    depths = {}
+    with (connection.clone() if connection is not None else app.connection_for_read()) as conn:
+        channel = conn.channel()
+        for queue in queues:
+            depths[queue] = 0
+            for name in priority_queues(queue):
+                try:
+                    depths[queue] += channel.queue_declare(queue=name, passive=True).message_count
+                except conn.channel_errors:
+                    # AMQP 中被动声明不存在的队列会关闭通道
+                    channel = conn.channel()
+        channel.close()
+    return depths
+
+
+def _subtract(current: HdrHistogram, previous: Optional[HdrHistogram]) -> HdrHistogram:
+    """两次累计直方图之差（计数减少说明进程重启，视为从零开始）"""
+    if previous is None or previous.count > current.count:
+        return current
+    delta = HdrHistogram()
+    for index, count in current.counts.items():
+        count -= previous.counts.get(index, 0)
+        if count > 0:
+            delta.counts[index] = count
+    delta.count = current.count - previous.count
+    delta.total = current.total - previous.total
+    delta.min = 0
+    delta.max = current.max
+    return delta
+
+
+class QueueWaitSampler:
+    """按队列汇总 task_queue_wait_seconds，返回两次采样之间新增样本的分位数（秒）"""
+
+    def __init__(self, quantile: float = 0.95, directory: str = None):
+        self.quantile = quantile
+        self.directory = directory
+        self._previous: Dict[str, HdrHistogram] = {}
+
+    def __call__(self) -> Dict[str, float]:
+        current: Dict[str, HdrHistogram] = {}
+        for (name, labels), histogram in collect_metrics(self.directory).histograms.items():
+            if name == 'task_queue_wait_seconds':
+                queue = base_queue(dict(labels).get('queue'))
+                current.setdefault(queue, HdrHistogram()).merge(histogram)
+
+        waits = {}
+        for queue, histogram in current.items():
+            delta = _subtract(histogram, self._previous.get(queue))
+            if delta.count:
+                waits[queue] = delta.quantile(self.quantile) * 1e-6
+        self._previous = current
+        return waits
+
+
+class QueueScaler:
+    """单个队列的伸缩决策（带滞回与缩容延迟）"""
+
+    def __init__(self, queue: str, minimum: int, maximum: int, target_backlog: int = None,
+                 target_wait: float = None, scale_down_ratio: float = None, scale_down_delay: float = None):
+        self.queue = queue
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_backlog = target_backlog or AutoscaleConfig.TARGET_BACKLOG
+        self.target_wait = target_wait if target_wait is not None else AutoscaleConfig.TARGET_WAIT_MS / 1000
+        self.scale_down_ratio = scale_down_ratio if scale_down_ratio is not None else AutoscaleConfig.SCALE_DOWN_RATIO
+        self.scale_down_delay = scale_down_delay if scale_down_delay is not None else AutoscaleConfig.SCALE_DOWN_DELAY
+        self._idle_since: Optional[float] = None
+
+    def decide(self, current: int, depth: int, wait: Optional[float], now: float) -> int:
+        """根据积压 depth 与等待 p95 wait（秒，无样本时为 None）返回目标 worker 数"""
+        desired = current
+        backlog = depth / max(current, 1)
+        wait_high = wait is not None and wait > self.target_wait
+        wait_low = wait is None or wait <= self.target_wait * self.scale_down_ratio
+
+        if backlog > self.target_backlog or wait_high or (depth and not current):
+            desired = max(math.ceil(depth / self.target_backlog), current + 1 if wait_high or not current else current)
+            self._idle_since = None
+        elif backlog < self.target_backlog * self.scale_down_ratio and wait_low:
+            if self._idle_since is None:
+                self._idle_since = now
+            if now - self._idle_since >= self.scale_down_delay:
+                desired = current - 1
+                # 下一次缩容重新等待
+                self._idle_since = now
+        else:
+            self._idle_since = None
+
+        return min(max(desired, self.minimum), self.maximum)
+
+
+class LocalWorkerPool:
+    """在本机以子进程运行 worker，每个进程只消费一个队列
+
+    启动参数依次取 worker_args 中的队列参数、同名 worker 配置（worker_profiles）、default_args。
+    """
+
+    def __init__(self, app_name: str = 'celery_app', worker_args: Dict[str, str] = None,
+                 default_args: str = None, profiles: Dict[str, WorkerProfile] = None):
+        self.app_name = app_name
+        self.worker_args = AutoscaleConfig.WORKER_ARGS if worker_args is None else worker_args
+        self.default_args = AutoscaleConfig.DEFAULT_WORKER_ARGS if default_args is None else default_args
+        self.profiles = load_profiles() if profiles is None else profiles
+        self._workers: Dict[str, List[subprocess.Popen]] = {}
+        self._stopping: List[subprocess.Popen] = []
+        self._sequence = itertools.count(1)
+
+    def command(self, queue: str) -> List[str]:
+        if queue in self.worker_args:
+            args = shlex.split(self.worker_args[queue])
+        elif queue in self.profiles:
+            args = self.profiles[queue].worker_args()
+        else:
+            args = shlex.split(self.default_args)
+        return [sys.executable, '-m', 'celery', '-A', self.app_name, 'worker', '-Q', ','.join(priority_queues(queue)),
+                '-n', f'{queue}-{next(self._sequence)}@%h', *args]
+
+    def size(self, queue: str) -> int:
+        workers = self._workers.get(queue, [])
+        for process in [process for process in workers if process.poll() is not None]:
+            print(f"⚠️ 队列 {queue} 的 worker 进程 {process.pid} 已退出，退出码 {process.returncode}")
+            workers.remove(process)
+        self._stopping = [process for process in self._stopping if process.poll() is None]
+        return len(workers)
+
+    def scale(self, queue: str, count: int) -> None:
+        workers = self._workers.setdefault(queue, [])
+        while len(workers) < count:
+            workers.append(subprocess.Popen(self.command(queue)))
+        while len(workers) > count:
+            # 先停止最新启动的进程；SIGTERM 为热关闭，执行完当前任务再退出
+            process = workers.pop()
+            process.terminate()
+            self._stopping.append(process)
+
+    def close(self, timeout: float = 60) -> None:
+        """停止全部 worker，超时未退出的强制结束"""
+        for queue in list(self._workers):
+            self.scale(queue, 0)
+        deadline = time.monotonic() + timeout
+        for process in self._stopping:
+            try:
+                process.wait(max(deadline - time.monotonic(), 0))
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self._stopping = []
+
+
+class Autoscaler:
+    """按间隔采样各队列并调整 worker 数"""
+
+    def __init__(self, pool, depth_sampler: Callable[[Iterable[str]], Dict[str, int]],
+                 wait_sampler: Optional[Callable[[], Dict[str, float]]] = None,
+                 bounds: Dict[str, Tuple[int, int]] = None, clock: Callable[[], float] = time.monotonic,
+                 **scaler_options):
+        self.pool = pool
+        self.depth_sampler = depth_sampler
+        self.wait_sampler = wait_sampler
+        self.clock = clock
+        bounds = bounds or parse_bounds(AutoscaleConfig.BOUNDS)
+        self.scalers = {queue: QueueScaler(queue, minimum, maximum, **scaler_options)
+                        for queue, (minimum, maximum) in bounds.items()}
+
+    def step(self) -> Dict[str, Dict[str, float]]:
+        """采样一次并伸缩，返回各队列的 {depth, wait, workers}"""
+        now = self.clock()
+        depths = self.depth_sampler(self.scalers)
+        waits = self.wait_sampler() if self.wait_sampler else {}
+
+        state = {}
+        for queue, scaler in self.scalers.items():
+            current = self.pool.size(queue)
+            depth, wait = depths.get(queue, 0), waits.get(queue)
+            desired = scaler.decide(current, depth, wait, now)
+            if desired != current:
+                wait_text = f"{wait * 1000:.0f}ms" if wait is not None else "-"
+                print(f"{'📈' if desired > current else '📉'} 队列 {queue}: worker {current} -> {desired}"
+                      f"（积压 {depth}，等待 p95 {wait_text}）")
+                self.pool.scale(queue, desired)
+            state[queue] = {"depth": depth, "wait": wait, "workers": desired}
+        return state
+
+    def run(self, interval: float = None, stop: threading.Event = None) -> None:
+        """循环采样直到 stop 被设置，退出时停止全部 worker"""
+        interval = interval or AutoscaleConfig.INTERVAL
+        stop = stop or threading.Event()
+        try:
+            while not stop.is_set():
+                try:
+                    self.step()
+                except Exception as e:
+                    # broker 暂时不可用时保持当前 worker 数
+                    print(f"⚠️ 自动伸缩采样失败: {e}")
+                stop.wait(interval)
+        finally:
+            self.pool.close()
+
+
+def main():
+    from celery_app import app
+
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop.set())
+
+    bounds = parse_bounds(AutoscaleConfig.BOUNDS)
+    autoscaler = Autoscaler(
+        LocalWorkerPool(),
+        depth_sampler=lambda queues: queue_depths(app, queues),
+        wait_sampler=QueueWaitSampler(),
+        bounds=bounds
+    )
+    print(f"🚀 自动伸缩启动: {', '.join(f'{queue}={low}:{high}' for queue, (low, high) in bounds.items())}, "
+          f"间隔 {AutoscaleConfig.INTERVAL}s, 每个 worker 目标积压 {AutoscaleConfig.TARGET_BACKLOG}, "
+          f"目标等待 {AutoscaleConfig.TARGET_WAIT_MS}ms")
+    autoscaler.run(stop=stop)
+    print("🛑 自动伸缩已停止，worker 已全部退出")
+
+
+if __name__ == '__main__':
+    main()
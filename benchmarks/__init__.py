@@ -0,0 +1,7 @@
+# benchmarks/__init__.py - 性能基准测试
+"""
+性能基准测试脚本
+
+在项目根目录运行，例如:
+    python -m benchmarks.bench_map_reduce
+"""
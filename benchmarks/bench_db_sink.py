@@ -0,0 +1,76 @@
+# benchmarks/bench_db_sink.py - 数据库写入基准
+"""
+测量 io.save_to_database 数据库写入的吞吐:
+
+1. 不同批量大小的多行插入（每批一个事务），报告 rows/s；批量为1即逐行提交
+2. 大量并发小保存：每次保存一个事务 vs 合并窗口内同表组提交，报告 saves/s 与 transactions/save
+
+用法:
+    python -m benchmarks.bench_db_sink [总行数] [小保存次数]
+"""
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import print_table
+from tasks.async_support import run_coroutine
+from tasks.db_sink import DatabaseSink, to_rows
+
+BATCH_SIZES = (1, 10, 100, 1000, 10000)
+
+def make_rows(count: int):
+    return [{"item": i, "score": i * 0.5, "label": f"row-{i}"} for i in range(count)]
+
+def bench_batch_sizes(root: str, total: int):
+    rows = []
+    data = make_rows(total)
+    for batch_size in BATCH_SIZES:
+        # 逐行提交太慢，按比例缩小行数
+        count = min(total, batch_size * 2000)
+        sink = DatabaseSink(database_url=f"sqlite:///{os.path.join(root, f'batch_{batch_size}.db')}")
+        sink.write_rows("bench", [("warmup", data[:1])])
+        start = time.perf_counter()
+        for offset in range(0, count, batch_size):
+            sink.write_rows("bench", [(f"rec_{offset}", data[offset:offset + batch_size])])
+        elapsed = time.perf_counter() - start
+        rows.append([batch_size, count, elapsed, count / elapsed])
+        sink.dispose()
+    print_table(["batch_size", "rows", "seconds", "rows/s"], rows)
+
+def bench_small_saves(root: str, saves: int, concurrency: int = 100):
+    rows = []
+    
+    sink = DatabaseSink(database_url=f"sqlite:///{os.path.join(root, 'per_save.db')}")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(lambda i: sink.write_rows("results", [(f"rec_{i}", to_rows([i] * 10))]), range(saves)))
+    elapsed = time.perf_counter() - start
+    rows.append(["transaction per save", saves, elapsed, saves / elapsed,
+                 sink.stats["transactions"] / saves, sink.stats["rows"] / elapsed])
+    sink.dispose()
+    
+    sink = DatabaseSink(database_url=f"sqlite:///{os.path.join(root, 'grouped.db')}")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(lambda i: run_coroutine(sink.save("results", [i] * 10)), range(saves)))
+    elapsed = time.perf_counter() - start
+    rows.append(["group commit", saves, elapsed, saves / elapsed,
+                 sink.stats["transactions"] / saves, sink.stats["rows"] / elapsed])
+    sink.dispose()
+    
+    print_table(["mode", "saves", "seconds", "saves/s", "transactions/save", "rows/s"], rows)
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    small = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    
+    with tempfile.TemporaryDirectory() as root:
+        print(f"🚀 多行插入: 最多 {total} 行, 批量 {', '.join(map(str, BATCH_SIZES))}")
+        bench_batch_sizes(root, total)
+        print(f"\n🚀 小保存: {small} 次, 每次10行, 并发100")
+        bench_small_saves(root, small)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# benchmarks/bench_embedded.py - 嵌入模式与分布式模式的延迟与吞吐
+"""
+经 TaskService 提交任务链，比较两种执行方式:
+
+- distributed: 发布到 broker，由 worker 执行，API 进程的结果跟踪线程轮询结果后更新数据库
+  （这里为内存 broker、内存结果后端与同进程的 solo worker；生产环境为 Redis 与独立的 worker 进程，
+  还要加上网络往返）
+- embedded: EmbeddedExecutor 在本进程按队列的线程池执行，任务链结束时直接更新数据库
+
+测量:
+- 延迟: 串行提交，每条任务链从提交到结果可读（result ready）与到数据库记录更新（db updated）的耗时
+- 吞吐: 连续提交一批任务链，到全部写入数据库的 chains/s
+
+使用临时 SQLite 数据库，不依赖 Redis。内存结果后端不支持原生 chord，分布式模式的 map_reduce_statistics
+由 celery.chord_unlock 每秒轮询一次分片结果，延迟偏高（Redis 结果后端在最后一个分片结束时直接触发回调）。
+API 层的对比见 python -m benchmarks.loadgen run --celery embedded。
+
+用法:
+    python -m benchmarks.bench_embedded [任务链数] [任务链名...]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+_db_dir = tempfile.mkdtemp(prefix="embedded-bench-")
+os.environ.setdefault("TRACE_DATABASE_URL", f"sqlite:///{os.path.join(_db_dir, 'steps.db')}")
+
+from celery_app import QUEUES, app
+
+app.conf.update(
+    broker_url='memory://',
+    result_backend='cache+memory://',
+    broker_transport_options={'polling_interval': 0.001},
+)
+
+from celery.contrib.testing.worker import start_worker
+
+import tasks  # noqa: F401  注册任务
+from app.database import ORMDatabaseManager
+from app.services import AdmissionController, EmbeddedExecutor, TaskService
+from benchmarks.common import print_table, quiet
+
+CHAINS = {"complex_math": (7, 3), "map_reduce_statistics": (10000, 4)}
+
+
+class TimedTaskService(TaskService):
+    """记录每条任务链写入数据库的时间"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.completed_at = {}
+        self.all_done = threading.Event()
+        self.expected = 0
+
+    def _on_chain_done(self, task_id, celery_result, queue, error=None):
+        super()._on_chain_done(task_id, celery_result, queue, error)
+        self.completed_at[task_id] = time.perf_counter()
+        if len(self.completed_at) >= self.expected:
+            self.all_done.set()
+
+
+def make_service(name: str, executor=None) -> TimedTaskService:
+    # 不限制积压，吞吐只受执行方式限制
+    admission = AdmissionController(high_water={}, default_high_water=10 ** 9, client_rate=0)
+    return TimedTaskService(ORMDatabaseManager(f"sqlite:///{os.path.join(_db_dir, name + '.db')}"),
+                            admission=admission, executor=executor)
+
+
+def measure_latency(service: TimedTaskService, chain_name: str, count: int):
+    """串行提交，返回每条任务链到结果可读与到数据库更新的耗时（毫秒）"""
+    a, b = CHAINS[chain_name]
+    ready, updated = [], []
+    for _ in range(count):
+        service.expected = len(service.completed_at) + 1
+        service.all_done.clear()
+        start = time.perf_counter()
+        submitted = service.submit_task(a, b, chain_name)
+        submitted["celery_result"].get(timeout=60, interval=0.001)
+        ready.append((time.perf_counter() - start) * 1000)
+        service.all_done.wait(60)
+        updated.append((service.completed_at[submitted["task_id"]] - start) * 1000)
+    return ready, updated
+
+
+def measure_throughput(service: TimedTaskService, chain_name: str, count: int) -> float:
+    a, b = CHAINS[chain_name]
+    service.expected = len(service.completed_at) + count
+    service.all_done.clear()
+    start = time.perf_counter()
+    for _ in range(count):
+        service.submit_task(a, b, chain_name)
+    if not service.all_done.wait(300):
+        raise TimeoutError(f"{chain_name}: 300 秒内未全部完成")
+    return count / (time.perf_counter() - start)
+
+
+def run(mode: str, service: TimedTaskService, chain_names, count: int, rows) -> None:
+    for chain_name in chain_names:
+        measure_latency(service, chain_name, 5)  # 预热
+        ready, updated = measure_latency(service, chain_name, max(count // 10, 10))
+        throughput = measure_throughput(service, chain_name, count)
+        rows.append([mode, chain_name, statistics.median(ready), statistics.median(updated),
+                     sorted(updated)[int(len(updated) * 0.95) - 1], throughput])
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    chain_names = sys.argv[2:] or list(CHAINS)
+
+    print(f"🚀 嵌入模式 vs 分布式模式: {', '.join(chain_names)}，吞吐每种 {count} 条任务链")
+
+    rows = []
+    with quiet():
+        service = make_service("distributed")
+        with start_worker(app, pool='solo', perform_ping_check=False, queues=QUEUES, loglevel='ERROR'):
+            run("distributed", service, chain_names, count, rows)
+        service.result_tracker.close()
+
+        executor = EmbeddedExecutor(app)
+        run("embedded", make_service("embedded", executor), chain_names, count, rows)
+        executor.close()
+
+    print_table(["mode", "chain", "ready p50 ms", "db p50 ms", "db p95 ms", "chains/s"], rows)
+    pool_sizes = ', '.join(f"{name}={stats['size']}" for name, stats in executor.stats().items())
+    print(f"ℹ️ 分布式模式的数据库更新由结果跟踪线程每 {service.result_tracker.interval * 1000:.0f}ms 轮询一次"
+          f"（ADMISSION_TRACK_INTERVAL_MS）；嵌入模式各队列线程数: {pool_sizes}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# benchmarks/bench_file_sink.py - 文件写入基准
+"""
+测量 io.save_to_file 文件写入的吞吐与每次保存的 fsync 次数:
+
+1. 大负载覆盖写入（json / ndjson / binary），报告 MB/s
+2. 大量小保存：逐个原子写文件 vs 追加模式组提交，报告 saves/s 与 fsyncs/save
+
+用法:
+    python -m benchmarks.bench_file_sink [大负载元素数] [小保存次数]
+"""
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import print_table
+from tasks.async_support import run_coroutine
+from tasks.file_sink import FileSink
+
+def bench_large(root: str, size: int):
+    data = list(range(size))
+    rows = []
+    for format_type in ("json", "ndjson", "binary"):
+        sink = FileSink(root_dir=root)
+        start = time.perf_counter()
+        written = sink.write_atomic(f"large.{format_type}", data, format_type)
+        elapsed = time.perf_counter() - start
+        rows.append([format_type, written["size"] / 1024 / 1024, elapsed,
+                     written["size"] / elapsed / 1024 / 1024, sink.stats["fsyncs"]])
+    print_table(["format", "MB", "seconds", "MB/s", "fsyncs/save"], rows)
+
+def bench_small(root: str, saves: int, concurrency: int = 100):
+    rows = []
+    
+    sink = FileSink(root_dir=root)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(lambda i: sink.write_atomic(f"small/{i}.json", [i] * 10, "json"), range(saves)))
+    elapsed = time.perf_counter() - start
+    rows.append(["write (atomic per save)", saves, elapsed, saves / elapsed,
+                 sink.stats["fsyncs"] / saves, sink.stats["bytes"] / elapsed / 1024])
+    
+    sink = FileSink(root_dir=root)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(lambda i: run_coroutine(sink.append("small.ndjson", [i] * 10, "ndjson")), range(saves)))
+    elapsed = time.perf_counter() - start
+    rows.append(["append (group commit)", saves, elapsed, saves / elapsed,
+                 sink.stats["fsyncs"] / saves, sink.stats["bytes"] / elapsed / 1024])
+    
+    print_table(["mode", "saves", "seconds", "saves/s", "fsyncs/save", "KB/s"], rows)
+
+def main():
+    large = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    small = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    
+    with tempfile.TemporaryDirectory() as root:
+        print(f"🚀 大负载覆盖写入: {large} 个整数")
+        bench_large(root, large)
+        print(f"\n🚀 小保存: {small} 次, 每次10个整数, 并发100")
+        bench_small(root, small)
+
+if __name__ == "__main__":
+    main()
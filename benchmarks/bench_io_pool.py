@@ -0,0 +1,77 @@
+# benchmarks/bench_io_pool.py - io 执行池吞吐基准
+"""
+比较单个 worker 进程上 io 任务的吞吐:
+
+- prefork: 每个子进程同一时间只执行一个任务，用 solo 池（单进程串行）测量单进程吞吐
+- threads: celery 自带的线程池，与 asyncio 相同的并发数（基线: 同样的并发下比较执行池本身）
+- asyncio: worker_pools.AsyncIOPool，协程在进程级事件循环上并发
+
+同并发下 threads 与 asyncio 的吞吐接近（都只是在等待网络），asyncio 的优势在于不为每个并发任务占用
+一个线程（栈内存与线程切换），并发数可以继续增大。
+
+使用内存 broker 与内存结果后端，不依赖 Redis；通知推送到本地 webhook 替身（每个请求0.3秒），
+关闭合并窗口，使每个任务对应一次请求。
+
+用法:
+    python -m benchmarks.bench_io_pool [任务数] [并发数]
+"""
+import sys
+import time
+
+from celery_app import QUEUES, app
+from config import NotificationConfig
+
+app.conf.update(
+    broker_url='memory://',
+    result_backend='cache+memory://',
+    broker_transport_options={'polling_interval': 0.001},
+)
+
+from celery.contrib.testing.worker import start_worker
+
+import tasks  # noqa: F401  注册任务
+from benchmarks.common import print_table, quiet
+from benchmarks.http_stub import WebhookStubServer
+from worker_pools import AsyncIOPool
+
+def run_batch(task_count: int) -> float:
+    """提交一批 send_notification（0.3秒I/O）并等待全部完成"""
+    task = app.tasks['io.send_notification']
+    start = time.perf_counter()
+    results = [task.delay(f"benchmark {i}", "webhook") for i in range(task_count)]
+    for result in results:
+        result.get(timeout=120, interval=0.005)
+    return time.perf_counter() - start
+
+def main():
+    task_count = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    
+    print(f"🚀 io 执行池吞吐基准: io.send_notification, 每个任务0.3秒I/O")
+    
+    # 推送器的连接上限不低于池并发数，吞吐只受执行池限制
+    NotificationConfig.COALESCE_WINDOW_MS = 0
+    NotificationConfig.MAX_CONNECTIONS = NotificationConfig.PER_HOST_LIMIT = concurrency
+    server = WebhookStubServer(latency=0.3).start()
+    NotificationConfig.WEBHOOK_URL = server.url
+    
+    rows = []
+    # prefork 子进程串行执行，任务数取少量即可得到稳定吞吐
+    prefork_count = min(task_count, 10)
+    with quiet(), start_worker(app, pool='solo', perform_ping_check=False, queues=QUEUES, loglevel='ERROR'):
+        elapsed = run_batch(prefork_count)
+    rows.append(["prefork (1 process)", 1, prefork_count, elapsed, prefork_count / elapsed])
+    
+    for label, pool in (("threads", 'threads'), ("asyncio", AsyncIOPool)):
+        with quiet(), start_worker(app, pool=pool, concurrency=concurrency,
+                                   perform_ping_check=False, queues=QUEUES, loglevel='ERROR'):
+            elapsed = run_batch(task_count)
+        rows.append([f"{label} (1 process)", concurrency, task_count, elapsed, task_count / elapsed])
+    server.stop()
+    
+    print_table(["pool", "concurrency", "tasks", "seconds", "tasks/s"], rows)
+    print(f"📈 单进程吞吐: asyncio 为同并发 threads 的 {rows[2][-1] / rows[1][-1]:.1f}x，"
+          f"为 prefork 单进程的 {rows[2][-1] / rows[0][-1]:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# benchmarks/bench_map_reduce.py - map-reduce 分片并行扩展性基准
+"""
+用 1/2/4/8 个 worker 进程执行 data.map_shard，再由 data.merge_statistics 归约，
+测量相对单 worker 的加速比与并行效率。
+
+worker 进程直接执行任务函数体，分片通过进程间 pickle 传递（近似 broker 传输开销），
+因此结果反映任务本身的扩展性，不依赖 Redis。
+
+用法:
+    python -m benchmarks.bench_map_reduce [数据量] [分片/worker倍数]
+"""
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.common import print_table, quiet
+from tasks.data_tasks import map_shard, merge_statistics
+from workflows import split_shards
+
+WORKER_COUNTS = (1, 2, 4, 8)
+
+def _run_shard(shard):
+    with quiet():
+        return map_shard(shard, operation="square", threshold=10, with_quantiles=True)
+
+def run_map_reduce(data, workers: int, shards_per_worker: int):
+    """在进程池上执行一次完整的 map-reduce"""
+    shards = split_shards(data, workers * shards_per_worker)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        start = time.perf_counter()
+        partials = list(pool.map(_run_shard, shards))
+        with quiet():
+            result = merge_statistics(partials)
+        elapsed = time.perf_counter() - start
+    return result, elapsed
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    shards_per_worker = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    data = list(range(size))
+    
+    print(f"🚀 map-reduce 扩展性基准: {size} 条数据, CPU核数: {os.cpu_count()}")
+    
+    rows = []
+    baseline = None
+    expected = None
+    for workers in WORKER_COUNTS:
+        result, elapsed = run_map_reduce(data, workers, shards_per_worker)
+        if baseline is None:
+            baseline, expected = elapsed, result
+        assert result["count"] == expected["count"] and result["sum"] == expected["sum"], "归约结果不一致"
+        speedup = baseline / elapsed
+        rows.append([workers, elapsed, speedup, speedup / workers, size / elapsed])
+    
+    print_table(["workers", "seconds", "speedup", "efficiency", "items/s"], rows)
+    if os.cpu_count() and os.cpu_count() < max(WORKER_COUNTS):
+        print(f"⚠️ CPU核数({os.cpu_count()})少于最大worker数，超出部分无法获得线性加速")
+
+if __name__ == "__main__":
+    main()
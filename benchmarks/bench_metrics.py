@@ -0,0 +1,127 @@
+# benchmarks/bench_metrics.py - 任务指标开销与精度基准
+"""
+- 单次记录耗时: HdrHistogram.record 与 MetricsRegistry.observe（含加锁）
+- 每个任务的额外开销: math.add 本地执行（apply，同样触发 prerun/postrun 信号）开启与关闭指标的耗时差
+- 分位数精度: 10万个对数正态延迟样本，HDR 分位数与精确分位数的相对误差
+- 多进程汇总: 4 个进程各自记录并写出快照，collect_metrics 合并后的计数与耗时
+
+用法:
+    python -m benchmarks.bench_metrics
+"""
+import multiprocessing
+import random
+import tempfile
+import time
+
+from celery import signals
+
+from benchmarks.common import measure, print_table, quiet
+from tasks.base import _record_postrun, _record_prerun, install_task_metrics
+from tasks.math_tasks import add
+from tasks.metrics import HdrHistogram, MetricsRegistry, collect_metrics
+
+PROCESSES = 4
+SAMPLES_PER_PROCESS = 100_000
+
+
+def bench_record():
+    values = [int(random.lognormvariate(8, 1.5)) for _ in range(100_000)]
+    histogram = HdrHistogram()
+    registry = MetricsRegistry(directory=tempfile.mkdtemp(prefix="metrics-bench-"), flush_interval=3600)
+    labels = (("task", "math.add"), ("queue", "math"))
+
+    def record():
+        for value in values:
+            histogram.record(value)
+
+    def observe():
+        for value in values:
+            registry.observe("task_runtime_seconds", value * 1e-6, labels)
+
+    rows = [
+        ["HdrHistogram.record", measure(record, repeat=5)["median"] / len(values) * 1e9],
+        ["MetricsRegistry.observe", measure(observe, repeat=5)["median"] / len(values) * 1e9],
+    ]
+    print_table(["operation", "ns/op"], rows)
+
+
+def bench_task_overhead():
+    calls = 2000
+
+    def run():
+        for _ in range(calls):
+            add.apply((1, 2))
+
+    with quiet():
+        install_task_metrics()
+        enabled = measure(run, repeat=5)["median"] / calls
+        signals.task_prerun.disconnect(_record_prerun, dispatch_uid="metrics.prerun")
+        signals.task_postrun.disconnect(_record_postrun, dispatch_uid="metrics.postrun")
+        disabled = measure(run, repeat=5)["median"] / calls
+        install_task_metrics()
+
+    print_table(["math.add.apply", "us/task"], [
+        ["指标关闭", disabled * 1e6],
+        ["指标开启", enabled * 1e6],
+        ["额外开销", (enabled - disabled) * 1e6],
+    ])
+
+
+def bench_accuracy():
+    samples = sorted(int(random.lognormvariate(8, 1.5)) for _ in range(100_000))
+    histogram = HdrHistogram()
+    for value in samples:
+        histogram.record(value)
+
+    rows = []
+    for q in (0.5, 0.9, 0.99, 0.999):
+        exact = samples[max(0, int(q * len(samples)) - 1)]
+        estimate = histogram.quantile(q)
+        rows.append([q, exact, estimate, f"{abs(estimate - exact) / exact:.2%}"])
+    print_table(["quantile", "exact us", "hdr us", "error"], rows)
+    print(f"   桶数: {len(histogram.counts)}（{len(samples)} 个样本）")
+
+
+def _worker(directory: str, seed: int) -> None:
+    rng = random.Random(seed)
+    registry = MetricsRegistry(directory=directory, flush_interval=3600)
+    labels = (("task", "data.filter_data"), ("queue", "data"))
+    for _ in range(SAMPLES_PER_PROCESS):
+        registry.observe("task_runtime_seconds", rng.lognormvariate(-6, 1), labels)
+    registry.increment("task_total", labels + (("state", "SUCCESS"),), SAMPLES_PER_PROCESS)
+    registry.close()
+
+
+def bench_aggregation():
+    directory = tempfile.mkdtemp(prefix="metrics-bench-")
+    processes = [multiprocessing.Process(target=_worker, args=(directory, seed)) for seed in range(PROCESSES)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    start = time.perf_counter()
+    merged = collect_metrics(directory)
+    elapsed = time.perf_counter() - start
+
+    histogram = next(iter(merged.histograms.values()))
+    total = sum(merged.counters.values())
+    print_table(["processes", "merged count", "task_total", "expected", "collect ms"], [
+        [PROCESSES, histogram.count, int(total), PROCESSES * SAMPLES_PER_PROCESS, elapsed * 1000]
+    ])
+
+
+def main():
+    random.seed(42)
+    print("🚀 指标记录开销")
+    bench_record()
+    print("\n🚀 每个任务的指标开销")
+    bench_task_overhead()
+    print("\n🚀 HDR 分位数精度")
+    bench_accuracy()
+    print("\n🚀 多进程快照汇总")
+    bench_aggregation()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# benchmarks/bench_notifier.py - webhook 通知推送基准
+"""
+对本地 webhook 替身服务器（模拟每个请求的延迟）测量 io.send_notification 的吞吐:
+
+1. 每条通知新建连接（requests.post）
+2. keep-alive 连接池，不合并
+3. keep-alive 连接池 + 合并窗口
+
+突发的通知全部发往同一渠道，三种方式使用相同的单主机并发上限，
+报告 notifications/s、实际请求数与建立的连接数。
+
+用法:
+    python -m benchmarks.bench_notifier [通知数] [请求延迟毫秒]
+"""
+import asyncio
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.common import print_table
+from benchmarks.http_stub import WebhookStubServer
+from tasks.async_support import run_coroutine
+from tasks.notifier import WebhookNotifier, format_payload
+
+PER_HOST_LIMIT = 8
+
+def connect_per_notification(server: WebhookStubServer, count: int):
+    def send(i):
+        requests.post(server.url, json=format_payload("webhook", [f"event {i}"]), timeout=10).raise_for_status()
+    
+    with ThreadPoolExecutor(PER_HOST_LIMIT) as pool:
+        list(pool.map(send, range(count)))
+
+def pooled(server: WebhookStubServer, count: int, window_ms: int):
+    notifier = WebhookNotifier(webhook_url=server.url, channel_urls={}, per_host_limit=PER_HOST_LIMIT,
+                               coalesce_window_ms=window_ms)
+    
+    async def burst():
+        return await asyncio.gather(*(notifier.notify("webhook", f"event {i}") for i in range(count)))
+    
+    try:
+        run_coroutine(burst())
+    finally:
+        notifier.close()
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.005
+    
+    scenarios = [
+        ("connect per notification", lambda server: connect_per_notification(server, count)),
+        ("keep-alive pool", lambda server: pooled(server, count, 0)),
+        ("keep-alive pool + coalescing 20ms", lambda server: pooled(server, count, 20)),
+    ]
+    
+    print(f"🚀 {count} 条通知, 单主机并发 {PER_HOST_LIMIT}, 请求延迟 {latency * 1000:g}ms")
+    rows = []
+    for name, send in scenarios:
+        with WebhookStubServer(latency=latency) as server:
+            start = time.perf_counter()
+            send(server)
+            elapsed = time.perf_counter() - start
+            stats = dict(server.stats)
+        assert stats["notifications"] == count, stats
+        rows.append([name, count, elapsed, count / elapsed, stats["requests"], stats["connections"]])
+    
+    print_table(["mode", "notifications", "seconds", "notifications/s", "requests", "connections"], rows)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# benchmarks/bench_power.py - math.power 规模估算与快速路径基准
+"""
+按指数规模比较 power_sqrt 的两步计算（幂运算 -> 开方 -> 结果按 json 序列化）:
+
+- before: 改造前的任务体，base ** exponent 精确计算后 math.sqrt
+- after: tasks.numeric，超过 MATH_EXACT_MAX_DIGITS 位时在对数空间计算，超出浮点范围的整数用 math.isqrt
+
+另外测量提交前规模估算的耗时，以及 power_sqrt 任务链经内存 broker、solo worker 的端到端耗时
+（不依赖 Redis）。
+
+用法:
+    python -m benchmarks.bench_power [底数] [最大指数]
+    # 默认精确计算百万位以内的结果，十万位以上的走 heavy 队列；只精确计算 json 默认上限以内的结果:
+    MATH_EXACT_MAX_DIGITS=4300 python -m benchmarks.bench_power
+"""
+import json
+import math
+import sys
+import time
+
+from celery_app import QUEUES, app
+
+app.conf.update(
+    broker_url='memory://',
+    result_backend='cache+memory://',
+    broker_transport_options={'polling_interval': 0.001},
+)
+
+from celery.contrib.testing.worker import start_worker
+
+import tasks  # noqa: F401  注册任务
+from app.services import ChainService
+from benchmarks.common import print_table, quiet
+from config import MathCostConfig
+from tasks import numeric
+
+EXPONENTS = (10, 100, 1_000, 4_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+
+def before(base: int, exponent: int):
+    value = base ** exponent
+    return json.dumps([value, math.sqrt(value)])
+
+
+def after(base: int, exponent: int):
+    value = numeric.power(base, exponent)
+    return json.dumps([value, numeric.sqrt(value)])
+
+
+def timed(func, *args, repeat: int = 5):
+    """返回最快一次的耗时（秒）与结果；出错时结果为异常"""
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        try:
+            result = func(*args)
+        except Exception as e:
+            return time.perf_counter() - start, e
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        # 单次超过 1 秒的不再重复
+        if elapsed > 1:
+            break
+    return best, result
+
+
+def cell(seconds: float, result) -> str:
+    """毫秒数；出错时为异常名与出错前的耗时"""
+    if isinstance(result, Exception):
+        return f"{type(result).__name__} @{seconds * 1000:.1f}"
+    return f"{seconds * 1000:.3f}"
+
+
+def main():
+    base = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    max_exponent = int(sys.argv[2]) if len(sys.argv) > 2 else EXPONENTS[-1]
+    exponents = [exponent for exponent in EXPONENTS if exponent <= max_exponent]
+
+    print(f"🚀 power_sqrt 按指数规模: 底数 {base}，精确计算上限 {MathCostConfig.EXACT_MAX_DIGITS} 位"
+          f"（{MathCostConfig.OVERSIZE_POLICY}），重计算队列阈值 {MathCostConfig.HEAVY_DIGITS} 位")
+
+    rows = []
+    with quiet(), start_worker(app, pool='solo', perform_ping_check=False, queues=QUEUES, loglevel='ERROR'):
+        for exponent in exponents:
+            estimate, _ = timed(numeric.estimate_power_digits, base, exponent, repeat=1000)
+            old, old_result = timed(before, base, exponent)
+            new, new_result = timed(after, base, exponent)
+
+            start = time.perf_counter()
+            try:
+                workflow = ChainService.create_chain("power_sqrt", base, exponent)
+                chain_result = workflow.apply_async().get(timeout=300, interval=0.001)
+            except Exception as e:
+                chain_result = e
+            chain = time.perf_counter() - start
+            sqrt_value = json.loads(new_result)[1]
+            rows.append([
+                exponent, numeric.estimate_power_digits(base, exponent), estimate * 1e6,
+                cell(old, old_result), cell(new, new_result),
+                "log10" if numeric.is_log_value(sqrt_value) else type(sqrt_value).__name__,
+                cell(chain, chain_result), ChainService.get_queue("power_sqrt", None, base, exponent),
+            ])
+
+    print_table(["exponent", "digits", "estimate us", "before ms", "after ms", "sqrt result", "chain ms", "queue"],
+                rows)
+
+
+if __name__ == "__main__":
+    main()
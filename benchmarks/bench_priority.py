@@ -0,0 +1,123 @@
+# benchmarks/bench_priority.py - 优先级队列与公平调度基准
+"""
+一个租户的大量 complex_math 任务链已在队列中积压（洪峰），另一个租户在洪峰期间按固定间隔提交
+add_multiply_divide 任务链，测量后者从提交到拿到结果的延迟:
+
+- idle: 无洪峰，high 优先级
+- fifo: 两者都是 normal（改造前: 同一个 math 队列先进先出），线程池
+- priority queues: 洪峰 low / 交互 high，分队列，线程池按预取顺序执行
+- priority queues + fair pool: 同上，FairThreadPool 对预取窗口加权公平排队
+- tenants + fair pool: 两者都是 normal，只按租户公平排队
+
+单 worker、4 并发，内存 broker 与内存结果后端，不依赖 Redis。内存 broker 在预取窗口占满后要等
+消费循环的轮询超时才补充消息，这里不限制预取，整个洪峰都在 worker 的预取窗口中，
+结果反映的是 worker 端排队策略本身。
+
+用法:
+    python -m benchmarks.bench_priority [洪峰任务链数] [交互任务链数]
+"""
+import sys
+import time
+
+from celery_app import QUEUES, app
+
+app.conf.update(
+    broker_url='memory://',
+    result_backend='cache+memory://',
+    broker_transport_options={'polling_interval': 0.001},
+)
+
+from celery import signals
+from celery.contrib.testing.worker import start_worker
+
+import tasks  # noqa: F401  注册任务
+from app.services import ChainService
+from benchmarks.common import print_table, quiet
+from benchmarks.loadgen import percentile
+from scheduling import schedule_context
+from worker_pools import FairThreadPool
+
+CONCURRENCY = 4
+# 0 表示不限制预取
+PREFETCH_MULTIPLIER = 0
+# 交互请求的提交间隔（秒）
+INTERVAL = 0.02
+
+
+def submit(chain_name: str, a: int, b: int, priority: str, tenant: str):
+    """与 API 相同的发布路径（不写任务记录）"""
+    with schedule_context(priority, tenant):
+        return ChainService.create_chain(chain_name, a, b).apply_async()
+
+
+def purge():
+    with app.connection_for_write() as connection:
+        channel = connection.channel()
+        for queue in QUEUES:
+            app.amqp.queues[queue](channel).declare()
+            channel.queue_purge(queue)
+
+
+def run_scenario(pool, flood_count: int, interactive_count: int, flood_priority: str, interactive_priority: str):
+    """返回交互任务链的延迟（秒）列表与洪峰的任务吞吐（tasks/s）"""
+    purge()
+    # 洪峰在 worker 启动前全部入队（提交线程与 worker 线程竞争 GIL，边提交边消费形不成积压）
+    flood = [submit("complex_math", index, 3, flood_priority, "batch") for index in range(flood_count)]
+
+    # 在 worker 中记录任务完成时间，避免主线程轮询结果与 worker 线程争抢 GIL
+    finished = {}
+
+    def on_success(sender=None, **kwargs):
+        finished[sender.request.id] = time.perf_counter()
+
+    signals.task_success.connect(on_success, weak=False)
+    try:
+        with quiet(), start_worker(app, pool=pool, concurrency=CONCURRENCY, prefetch_multiplier=PREFETCH_MULTIPLIER,
+                                   perform_ping_check=False, queues=QUEUES, loglevel='ERROR'):
+            start = time.perf_counter()
+            interactive = []
+            for index in range(interactive_count):
+                time.sleep(max(start + index * INTERVAL - time.perf_counter(), 0))
+                submitted_at = time.perf_counter()
+                interactive.append((submit("add_multiply_divide", index, 5, interactive_priority, "interactive"),
+                                    submitted_at))
+            for result, _ in interactive:
+                result.get(timeout=300, interval=0.05)
+            for result in flood:
+                result.get(timeout=300, interval=0.05)
+            elapsed = max(finished[result.id] for result in flood) - start if flood else None
+    finally:
+        signals.task_success.disconnect(on_success)
+
+    latencies = [finished[result.id] - submitted_at for result, submitted_at in interactive]
+    return latencies, flood_count * 4 / elapsed if flood else None
+
+
+def main():
+    flood_count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    interactive_count = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    print(f"🚀 优先级与公平调度基准: 洪峰 {flood_count} 条 complex_math（4步），"
+          f"期间每 {INTERVAL * 1000:.0f}ms 提交 1 条 add_multiply_divide，共 {interactive_count} 条")
+
+    scenarios = [
+        ("idle", FairThreadPool, 0, "low", "high"),
+        ("fifo", "threads", flood_count, "normal", "normal"),
+        ("priority queues", "threads", flood_count, "low", "high"),
+        ("priority queues + fair pool", FairThreadPool, flood_count, "low", "high"),
+        ("tenants + fair pool", FairThreadPool, flood_count, "normal", "normal"),
+    ]
+    rows = []
+    for name, pool, count, flood_priority, interactive_priority in scenarios:
+        latencies, throughput = run_scenario(pool, count, interactive_count, flood_priority, interactive_priority)
+        values = sorted(latencies)
+        rows.append([name, f"{flood_priority}/{interactive_priority}" if count else interactive_priority,
+                     *(percentile(values, q) * 1000 for q in (0.5, 0.95, 0.99)), values[-1] * 1000,
+                     throughput if throughput is not None else "-"])
+
+    print_table(["scenario", "flood/interactive", "p50 ms", "p95 ms", "p99 ms", "max ms", "flood tasks/s"], rows)
+    print(f"📈 洪峰下 high 优先级请求 p99: {rows[3][4]:.1f}ms（无洪峰 {rows[0][4]:.1f}ms，先进先出 {rows[1][4]:.1f}ms）")
+
+
+if __name__ == "__main__":
+    main()
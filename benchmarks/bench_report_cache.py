@@ -0,0 +1,67 @@
+# benchmarks/bench_report_cache.py - 报告缓存基准
+"""
+测量 io.generate_report 报告缓存的效果:
+
+1. 未命中（生成报告）与命中的耗时，数据分别为内联数据与负载引用
+   （超过阈值的数据在任务间以负载引用传递，不含对象时命中只需对 mmap 缓冲区求哈希）
+2. 并发相同请求（负载引用）：N 个请求只生成一次
+
+用法:
+    python -m benchmarks.bench_report_cache [数据项数] [并发请求数]
+"""
+import asyncio
+import random
+import sys
+import tempfile
+import time
+
+from benchmarks.common import print_table
+from tasks.async_support import run_coroutine
+from tasks.payload_store import LocalPayloadStore, PayloadHandle, REF_KEY, encode_payload, register_store
+from tasks.reports import ReportCache
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    rng = random.Random(42)
+    data = [rng.random() * 1000 for _ in range(count)]
+    
+    with tempfile.TemporaryDirectory() as root:
+        store = LocalPayloadStore(root_dir=f"{root}/payloads")
+        register_store("bench", lambda: store)
+        encoded = encode_payload(data)
+        ref = {REF_KEY: store.put(encoded), "size": len(encoded), "store": "bench"}
+        
+        rows = []
+        for report_type in ("summary", "detailed", "chart"):
+            cache = ReportCache(root_dir=f"{root}/{report_type}")
+            miss, _ = timed(cache.get_or_generate, data, report_type)
+            hit_inline, _ = timed(cache.get_or_generate, data, report_type)
+            handle = PayloadHandle(ref=ref)
+            handle.buffer.nbytes  # 打开映射不计入
+            hit_ref, hit = timed(cache.get_or_generate, handle, report_type)
+            assert hit["cached"]
+            rows.append([report_type, miss * 1000, hit_inline * 1000, hit_ref * 1000, miss / hit_ref])
+        
+        print(f"🚀 {count} 个数值的报告 (毫秒)")
+        print_table(["report_type", "miss_ms", "hit_inline_ms", "hit_ref_ms", "speedup(ref)"], rows)
+        
+        cache = ReportCache(root_dir=f"{root}/concurrent")
+        
+        async def burst():
+            return await asyncio.gather(*(cache.get_or_generate_async(ref, "detailed")
+                                          for _ in range(concurrency)))
+        
+        elapsed, results = timed(run_coroutine, burst())
+        stats = cache.stats()
+        print(f"\n🚀 {concurrency} 个并发的相同请求")
+        print_table(["requests", "seconds", "generations", "shared_waiters"],
+                    [[len(results), elapsed, stats["misses"], stats["process"]["shared"]]])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# benchmarks/bench_result_backend.py - 任务链结果后端写入基准
+"""
+比较结果策略 all（每一步写结果后端）与 final_only（只写最后一步）下，
+执行 OPERATION_CHAINS 时结果后端的写入次数与常驻内存。
+track_started 会为每一步额外写一次 STARTED 状态，因此分别测量开启与关闭的情况。
+
+使用内存 broker 与内存结果后端启动进程内 worker，不依赖 Redis。
+结果按每 10 万条任务链换算。
+
+用法:
+    python -m benchmarks.bench_result_backend [每种任务链执行次数]
+"""
+import sys
+import time
+
+from celery_app import QUEUES, app
+
+# 必须在首次访问 app.backend 之前切换到内存 broker/后端
+app.conf.update(
+    broker_url='memory://',
+    result_backend='cache+memory://',
+    broker_transport_options={'polling_interval': 0.001},
+)
+
+from celery.contrib.testing.worker import start_worker
+
+import tasks  # noqa: F401  注册任务
+from app.services.chain_service import ChainService
+from benchmarks.common import print_table, quiet
+
+PER_100K = 100_000
+MATH_CHAINS = ("add_multiply_divide", "power_sqrt", "complex_math")
+
+class BackendCounter:
+    """统计结果后端的写入次数与当前占用字节数"""
+    
+    def __init__(self, backend_class):
+        # app.backend 是线程局部的，worker 线程有自己的实例，因此在类上统计
+        self.writes = 0
+        self.sizes = {}
+        original_set, original_delete = backend_class.set, backend_class.delete
+        
+        def counting_set(backend, key, value, *args, **kwargs):
+            self.writes += 1
+            self.sizes[key] = len(value)
+            return original_set(backend, key, value, *args, **kwargs)
+        
+        def counting_delete(backend, key, *args, **kwargs):
+            self.sizes.pop(key, None)
+            return original_delete(backend, key, *args, **kwargs)
+        
+        backend_class.set, backend_class.delete = counting_set, counting_delete
+    
+    def reset(self):
+        self.writes = 0
+        self.sizes.clear()
+    
+    @property
+    def resident_bytes(self):
+        return sum(self.sizes.values())
+
+def run_chains(policy: str, runs: int, forget: bool, counter: BackendCounter):
+    counter.reset()
+    start = time.perf_counter()
+    for i in range(runs):
+        for chain_name in MATH_CHAINS:
+            workflow = ChainService.create_chain(chain_name, 3 + i % 5, 2, result_policy=policy)
+            result = workflow.apply_async()
+            result.get(timeout=30, interval=0.001)
+            if forget:
+                result.forget()
+    elapsed = time.perf_counter() - start
+    return counter.writes, counter.resident_bytes, elapsed
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    chains = runs * len(MATH_CHAINS)
+    scale = PER_100K / chains
+    counter = BackendCounter(type(app.backend))
+    
+    print(f"🚀 结果后端写入基准: {chains} 条任务链")
+    
+    scenarios = (
+        ("all", False, True),
+        ("final_only", False, True),
+        ("final_only", True, True),
+        ("final_only", True, False),
+    )
+    
+    rows = []
+    for policy, forget, track_started in scenarios:
+        # 跟踪开关在构建 tracer 时读取，需要重置后重新启动 worker
+        for task in app.tasks.values():
+            task.track_started = track_started
+            task.__trace__ = None
+        with quiet(), start_worker(app, pool='solo', perform_ping_check=False, queues=QUEUES, loglevel='ERROR'):
+            writes, resident, elapsed = run_chains(policy, runs, forget, counter)
+        label = policy + (" + forget" if forget else "")
+        rows.append([label, track_started, writes / chains, int(writes * scale),
+                     resident * scale / 1024 / 1024, chains / elapsed])
+    
+    print_table(["policy", "track_started", "writes/chain", "writes/100k", "MB resident/100k", "chains/s"], rows)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# benchmarks/bench_serializers.py - 消息序列化器基准
+"""
+比较 json / json-z / msgpack-typed 对典型 data.* 负载的编解码耗时与线上字节数。
+
+负载按 Celery 协议2的消息体构造: (args, kwargs, embed)
+
+用法:
+    python -m benchmarks.bench_serializers
+"""
+import random
+
+from kombu.serialization import dumps, loads
+
+from benchmarks.common import measure, print_table
+from serializers import register_serializers
+
+def _message(*args, **kwargs):
+    return (list(args), kwargs, {"callbacks": None, "errbacks": None, "chain": None, "chord": None})
+
+def build_payloads():
+    """典型的 data.* 任务负载"""
+    random.seed(42)
+    ints_10k = [random.randint(1, 100) for _ in range(10_000)]
+    ints_1m = list(range(1_000_000))
+    floats_100k = [random.random() * 1000 for _ in range(100_000)]
+    return {
+        "fetch_data(10)": _message(list(range(1, 11))),
+        "filter_data(10k ints)": _message(ints_10k, 50),
+        "process_items(1M ints)": _message(ints_1m, "square"),
+        "sort_data(100k floats)": _message(floats_100k, reverse=True),
+        "concat_chunks(20x5k)": _message([ints_10k[:5000]] * 20),
+        "merge_statistics(8 partials)": _message([
+            {"count": 1000, "total": 50500, "mean": 50.5, "m2": 833250.0, "min": 1, "max": 100, "sketch": None}
+        ] * 8),
+    }
+
+def main():
+    serializers = ["json", *register_serializers()]
+    payloads = build_payloads()
+    
+    print(f"🚀 序列化器基准: {', '.join(serializers)}")
+    
+    rows = []
+    for payload_name, payload in payloads.items():
+        json_size = None
+        for serializer in serializers:
+            content_type, encoding, body = dumps(payload, serializer=serializer)
+            size = len(body)
+            json_size = json_size or size
+            repeat = 3 if size > 1_000_000 else 20
+            encode = measure(lambda: dumps(payload, serializer=serializer), repeat=repeat)
+            decode = measure(lambda: loads(body, content_type, encoding), repeat=repeat)
+            rows.append([
+                payload_name, serializer, size, f"{size / json_size:.2f}x",
+                encode["median"] * 1000, decode["median"] * 1000
+            ])
+    
+    print_table(["payload", "serializer", "bytes", "vs json", "encode ms", "decode ms"], rows)
+
+if __name__ == "__main__":
+    main()
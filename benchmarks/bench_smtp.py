@@ -0,0 +1,75 @@
+# benchmarks/bench_smtp.py - SMTP 发送基准
+"""
+对本地 SMTP 替身服务器（模拟网络往返延迟）测量 io.send_email 的发送吞吐:
+
+1. 每封邮件新建连接（smtplib 默认用法）
+2. 连接池复用，服务器不支持 PIPELINING
+3. 连接池复用 + PIPELINING
+
+每封邮件3个收件人，三种方式使用相同的并发数（连接池大小），报告 msgs/s 与建立的连接数。
+
+用法:
+    python -m benchmarks.bench_smtp [邮件数] [往返延迟毫秒]
+"""
+import smtplib
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import print_table
+from benchmarks.smtp_stub import SMTPStubServer
+from tasks.async_support import run_coroutine
+from tasks.smtp_pool import SMTPPool, build_message
+
+POOL_SIZE = 4
+
+def make_messages(count: int):
+    return [build_message([f"user{i}@example.com", f"team{i}@example.com", "audit@example.com"],
+                          f"report #{i}", "benchmark body\n" * 20)
+            for i in range(count)]
+
+def connect_per_message(server: SMTPStubServer, messages):
+    def send(message):
+        with smtplib.SMTP(server.host, server.port) as smtp:
+            smtp.send_message(message)
+    
+    with ThreadPoolExecutor(POOL_SIZE) as pool:
+        list(pool.map(send, messages))
+
+def pooled(server: SMTPStubServer, messages):
+    pool = SMTPPool(host=server.host, port=server.port, pool_size=POOL_SIZE)
+    try:
+        results = run_coroutine(pool.send_batch(messages))
+    finally:
+        pool.close()
+    failed = [item for item in results if item["status"] != "sent"]
+    if failed:
+        raise RuntimeError(f"{len(failed)} 封邮件发送失败: {failed[0]['error']}")
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.002
+    messages = make_messages(count)
+    
+    scenarios = [
+        ("connect per message", connect_per_message, True),
+        ("pool", pooled, False),
+        ("pool + pipelining", pooled, True),
+    ]
+    
+    print(f"🚀 {count} 封邮件, 每封3个收件人, 并发 {POOL_SIZE}, 往返延迟 {latency * 1000:g}ms")
+    rows = []
+    for name, send, pipelining in scenarios:
+        with SMTPStubServer(latency=latency, pipelining=pipelining) as server:
+            start = time.perf_counter()
+            send(server, messages)
+            elapsed = time.perf_counter() - start
+            stats = dict(server.stats)
+        assert stats["messages"] == count and stats["recipients"] == count * 3, stats
+        rows.append([name, count, elapsed, count / elapsed, stats["connections"],
+                     stats["commands"] / count])
+    
+    print_table(["mode", "messages", "seconds", "msgs/s", "connections", "commands/msg"], rows)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# benchmarks/bench_task_logging.py - 任务日志开销基准
+"""
+测量 data.filter_data 形式的任务在不同日志方式下每次执行的日志耗时，及其相对任务本身的占比:
+
+- print: 旧实现，f-string 格式化完整输入与输出后 print
+- log: tasks.task_log，参数摘要后放入队列，由后台线程写出
+- log 1%: 同上，INFO 日志按 1% 采样
+- log off: 级别为 WARNING，INFO 日志直接返回
+
+输出写到 /dev/null，只测格式化与写入路径本身。"flush ms" 为 1000 次调用后
+等待后台线程写完剩余日志的时间，不在任务执行路径上。
+
+用法:
+    python -m benchmarks.bench_task_logging
+"""
+import contextlib
+import os
+import random
+
+from benchmarks.common import measure, print_table
+from tasks.task_log import configure_task_logging, flush_task_logs, get_task_log, task_log_stats
+
+SIZES = (10_000, 100_000, 1_000_000)
+THRESHOLD = 50
+
+log = get_task_log("benchmarks.task_logging")
+
+
+def filter_body(data):
+    return [x for x in data if x > THRESHOLD]
+
+
+def log_print(data, filtered):
+    print(f"🔍 过滤数据，阈值: {THRESHOLD}")
+    print(f"   输入数据: {data}")
+    print(f"✅ 过滤完成: {filtered}")
+
+
+def log_task_log(data, filtered):
+    log.info("🔍 过滤数据，阈值: %s, 输入数据: %s", THRESHOLD, data)
+    log.info("✅ 过滤完成: %s", filtered)
+
+
+def per_call(func, data, filtered, calls: int) -> float:
+    """单次调用的中位耗时（秒）"""
+    return measure(lambda: [func(data, filtered) for _ in range(calls)], repeat=5)["median"] / calls
+
+
+def main():
+    random.seed(42)
+    devnull = open(os.devnull, "w", encoding="utf-8")
+
+    print(f"🚀 任务日志开销基准: 数据量 {', '.join(str(size) for size in SIZES)}")
+
+    rows = []
+    for size in SIZES:
+        data = [random.randint(1, 100) for _ in range(size)]
+        filtered = filter_body(data)
+        body = measure(lambda: filter_body(data), repeat=5)["median"]
+        rows.append([size, "(任务本身)", body * 1e6, "-", "-"])
+
+        with contextlib.redirect_stdout(devnull):
+            printed = per_call(log_print, data, filtered, max(3, 1_000_000 // size))
+        rows.append([size, "print", printed * 1e6, f"{printed / body:.1%}", "-"])
+
+        for name, level, sample_rate in (("log", "INFO", 1.0), ("log 1%", "INFO", 0.01),
+                                         ("log off", "WARNING", 1.0)):
+            configure_task_logging(level=level, stream=devnull, filename="")
+            log.sample_rate = sample_rate
+            # 调用次数不超过队列容量，避免测到丢弃路径
+            elapsed = per_call(log_task_log, data, filtered, 1000)
+            flush = measure(flush_task_logs, repeat=1, warmup=0)["best"]
+            rows.append([size, name, elapsed * 1e6, f"{elapsed / body:.1%}", flush * 1000])
+
+    print_table(["size", "logging", "us/task", "vs task", "flush ms"], rows)
+    print(f"📋 日志队列: {task_log_stats()}")
+
+    devnull.close()
+
+if __name__ == "__main__":
+    main()
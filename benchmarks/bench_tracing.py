@@ -0,0 +1,102 @@
+# benchmarks/bench_tracing.py - 任务链追踪开销基准
+"""
+在单个 worker 上串行提交 complex_math 任务链（4步），比较开启与关闭追踪时
+每条任务链的端到端耗时，并输出一条任务链的时间线与关键路径。
+
+使用内存 broker、内存结果后端与临时 SQLite 数据库，不依赖 Redis。
+
+用法:
+    python -m benchmarks.bench_tracing [任务链数]
+"""
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+_db_path = os.path.join(tempfile.mkdtemp(prefix="trace-bench-"), "tasks.db")
+os.environ.setdefault("TRACE_DATABASE_URL", f"sqlite:///{_db_path}")
+
+from celery_app import QUEUES, app
+
+app.conf.update(
+    broker_url='memory://',
+    result_backend='cache+memory://',
+    broker_transport_options={'polling_interval': 0.001},
+)
+
+from celery import signals
+from celery.contrib.testing.worker import start_worker
+
+import tasks  # noqa: F401  注册任务
+from app.database import ORMDatabaseManager
+from app.services import TaskService
+from benchmarks.common import print_table, quiet
+from tasks.tracing import _propagate_trace, _trace_postrun, _trace_prerun, get_step_writer, install_tracing
+
+
+def run_chains(service: TaskService, count: int):
+    """串行提交并等待任务链，返回每条的耗时（秒）与最后一条的任务ID"""
+    samples = []
+    task_id = None
+    for index in range(count):
+        start = time.perf_counter()
+        submitted = service.submit_task(index, 3, "complex_math")
+        submitted["celery_result"].get(timeout=30, interval=0.001)
+        samples.append(time.perf_counter() - start)
+        # 在计时之外处理结果（更新任务记录、释放准入计数），避免后台轮询线程与计时竞争
+        service.result_tracker.poll()
+        task_id = submitted["task_id"]
+    return samples, task_id
+
+
+def disable_tracing():
+    signals.before_task_publish.disconnect(_propagate_trace, dispatch_uid='tracing.publish')
+    signals.task_prerun.disconnect(_trace_prerun, dispatch_uid='tracing.prerun')
+    signals.task_postrun.disconnect(_trace_postrun, dispatch_uid='tracing.postrun')
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    service = TaskService(ORMDatabaseManager(f"sqlite:///{_db_path}"))
+    service.result_tracker.close()
+
+    print(f"🚀 任务链追踪开销基准: {count} 条 complex_math 任务链（4步），单 worker 串行")
+
+    rows = []
+    with quiet(), start_worker(app, pool='solo', perform_ping_check=False, queues=QUEUES, loglevel='ERROR'):
+        run_chains(service, 20)  # 预热
+
+        results = {}
+        # 交替测量四轮，抵消预热与缓存的影响
+        for _ in range(4):
+            disable_tracing()
+            samples, _ = run_chains(service, count // 4)
+            results.setdefault("off", []).extend(samples)
+
+            install_tracing()
+            samples, task_id = run_chains(service, count // 4)
+            results.setdefault("on", []).extend(samples)
+
+        get_step_writer().flush()
+        timeline = service.get_task_timeline(task_id)
+
+    for name in ("off", "on"):
+        samples = results[name]
+        rows.append([name, len(samples), statistics.median(samples) * 1000, statistics.fmean(samples) * 1000])
+    print_table(["tracing", "chains", "median ms", "mean ms"], rows)
+    overhead = rows[1][2] / rows[0][2] - 1
+    print(f"📈 追踪开销（中位数）: {overhead:+.1%}, 写入 {get_step_writer().stats}")
+
+    print("\n🧭 最后一条任务链: API 阶段与关键路径")
+    print_table(["segment", "step", "ms"], [
+        [segment["segment"], segment["step"], segment["ms"]]
+        for segment in timeline["api_phases"] + timeline["critical_path"]
+    ])
+    print(f"   总耗时 {timeline['total_ms']}ms, 关键路径 {timeline['critical_path_ms']}ms, "
+          f"瓶颈: {json.dumps(timeline['bottleneck'], ensure_ascii=False)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+# benchmarks/bench_worker_profiles.py - 按队列的 worker 配置与全局设置的吞吐对比
+"""
+对 math / data / io 三类队列分别比较单个 worker 进程的吞吐:
+
+- global: 改造前所有队列共用的设置，prefork 执行池、并发数为 CPU 核数、worker_prefetch_multiplier=1、
+  worker_max_tasks_per_child=1000
+- profile: worker_profiles 中该队列的配置（WORKER_PROFILE_*）
+
+每类队列先把一批任务发布到 broker（不经过结果后端），计时到 worker 全部执行完。
+任务:
+- math: math.add，任务体只有一次加法
+- data: data.calculate_statistics，每个任务处理一个整数列表
+- io: io.send_notification，推送到本地 webhook 替身（每个请求 IO_LATENCY 秒）
+
+data 配置按任务数与常驻内存回收子进程，吞吐略低于全局设置，换取子进程内存有上限。
+
+使用内存 broker，不依赖 Redis。内存 broker 不支持事件循环，worker 使用阻塞的 synloop，
+预取窗口占满时每次 drain_events 最多阻塞 2 秒才处理线程池的确认，预取倍数为 1 时吞吐会被这一
+假象压到每秒不到 1 个；基准中把该超时缩短为 10 毫秒（Redis 使用事件循环，没有这一问题）。
+
+用法:
+    python -m benchmarks.bench_worker_profiles [任务数] [队列...]
+"""
+import contextlib
+import sys
+import time
+
+from celery_app import QUEUES, app
+from config import NotificationConfig
+
+app.conf.update(
+    broker_url='memory://',
+    result_backend='cache+memory://',
+    broker_transport_options={'polling_interval': 0.001},
+)
+
+from celery.contrib.testing.worker import start_worker
+from celery.worker import loops, state
+from kombu.utils.uuid import uuid
+
+import tasks  # noqa: F401  注册任务
+from benchmarks.common import print_table, quiet
+from benchmarks.http_stub import WebhookStubServer
+from worker_profiles import WorkerProfile, load_profiles
+
+# 改造前 celery_app 对所有队列的设置（并发数为 celery 默认的 CPU 核数）
+GLOBAL = dict(pool='prefork', concurrency=0, prefetch_multiplier=1, max_tasks_per_child=1000)
+
+IO_LATENCY = 0.05
+DATA_SIZE = 20000
+
+# 每类队列的任务: (任务名, 参数, 任务数相对 [任务数] 的比例)
+WORKLOADS = {
+    'math': ('math.add', (1, 2), 1.0),
+    'data': ('data.calculate_statistics', (list(range(DATA_SIZE)),), 0.25),
+    'io': ('io.send_notification', ("benchmark", "webhook"), 0.5),
+}
+
+_synloop = loops.synloop
+
+
+def fast_synloop(obj, connection, *args, **kwargs):
+    """drain_events 超时缩短为 10 毫秒的 synloop（见模块说明）"""
+    drain_events = connection.drain_events
+    connection.drain_events = lambda timeout=None, **options: drain_events(timeout=0.01, **options)
+    return _synloop(obj, connection, *args, **kwargs)
+
+
+@contextlib.contextmanager
+def worker(profile: WorkerProfile):
+    loops.synloop = fast_synloop
+    try:
+        with quiet(), start_worker(app, perform_ping_check=False, queues=QUEUES, loglevel='ERROR',
+                                   **profile.worker_options()):
+            yield
+    finally:
+        loops.synloop = _synloop
+
+
+def accepted() -> int:
+    return sum(state.total_count.values())
+
+
+def run_batch(task_name: str, args: tuple, task_count: int) -> float:
+    """发布 task_count 个任务并等待 worker 全部执行完，返回耗时（秒）"""
+    options = app.amqp.router.route({}, task_name)
+    done = accepted() + task_count
+    start = time.perf_counter()
+    with app.producer_or_acquire() as producer:
+        for _ in range(task_count):
+            message = app.amqp.create_task_message(uuid(), task_name, args, {})
+            app.amqp.send_task_message(producer, task_name, message, **options)
+    deadline = start + 300
+    # total_count 在任务开始执行时计数，全部开始且没有执行中的任务时才算完成
+    while accepted() < done or state.active_requests:
+        if time.perf_counter() > deadline:
+            raise TimeoutError(f"{task_name}: 300 秒内未执行完")
+        time.sleep(0.001)
+    return time.perf_counter() - start
+
+
+def main():
+    task_count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    queues = sys.argv[2:] or list(WORKLOADS)
+    profiles = load_profiles(queues)
+
+    print(f"🚀 worker 配置对比: 每类队列单个 worker 进程，math 任务 {task_count} 个")
+
+    # 推送器的连接上限不低于池并发数，吞吐只受执行池限制
+    NotificationConfig.COALESCE_WINDOW_MS = 0
+    NotificationConfig.MAX_CONNECTIONS = NotificationConfig.PER_HOST_LIMIT = 1000
+    server = WebhookStubServer(latency=IO_LATENCY).start()
+    NotificationConfig.WEBHOOK_URL = server.url
+
+    rows = []
+    try:
+        for queue in queues:
+            task_name, args, ratio = WORKLOADS[queue]
+            count = max(int(task_count * ratio), 1)
+            throughput = {}
+            for label, profile in (("global", WorkerProfile(queue, **GLOBAL)), ("profile", profiles[queue])):
+                with worker(profile):
+                    # 预热: 子进程导入与连接建立不计入
+                    run_batch(task_name, args, 1)
+                    elapsed = run_batch(task_name, args, count)
+                throughput[label] = count / elapsed
+                rows.append([queue, label, profile.describe(), count, elapsed, throughput[label]])
+            rows.append([queue, "speedup", "", "", "", f"{throughput['profile'] / throughput['global']:.1f}x"])
+    finally:
+        server.stop()
+
+    print_table(["queue", "settings", "worker args", "tasks", "seconds", "tasks/s"], rows)
+
+
+if __name__ == "__main__":
+    main()
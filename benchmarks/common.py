@@ -0,0 +1,70 @@
+# benchmarks/common.py - 基准测试公共工具
+import contextlib
+import io
+import logging
+import statistics
+import subprocess
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+def measure(func: Callable[[], Any], repeat: int = 5, warmup: int = 1) -> Dict[str, float]:
+    """
+    多次执行函数并统计耗时
+    
+    Args:
+        func: 被测函数（无参数）
+        repeat: 正式执行次数
+        warmup: 预热次数
+        
+    Returns:
+        耗时统计（秒）: best, median, mean, stdev
+    """
+    for _ in range(warmup):
+        func()
+    
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    
+    return {
+        "best": min(samples),
+        "median": statistics.median(samples),
+        "mean": statistics.fmean(samples),
+        "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0
+    }
+
+@contextlib.contextmanager
+def quiet():
+    """屏蔽任务函数中的 print 输出与 tasks.* 的 INFO 日志"""
+    logger = logging.getLogger("tasks")
+    level = logger.level
+    logger.setLevel(logging.WARNING)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+    finally:
+        logger.setLevel(level)
+
+def print_table(headers: List[str], rows: List[List[Any]]) -> None:
+    """打印对齐的结果表格"""
+    cells = [[str(h) for h in headers]] + [[_format(v) for v in row] for row in rows]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(headers))]
+    for index, row in enumerate(cells):
+        print("  ".join(value.rjust(width) for value, width in zip(row, widths)))
+        if index == 0:
+            print("  ".join("-" * width for width in widths))
+
+def git_commit() -> Optional[str]:
+    """当前提交的短哈希（记录在基准结果中，非 git 仓库时为 None）"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              timeout=5).stdout.strip() or None
+    except OSError:
+        return None
+
+def _format(value: Any) -> str:
+    if isinstance(value, float):
+        return f"{value:.4f}"
+    return str(value)
@@ -0,0 +1,104 @@
+# benchmarks/http_stub.py - 本地 HTTP 替身服务器
+"""
+最小化的本地 webhook 接收端，用于联调 io.send_notification 与基准测试
+
+- HTTP/1.1 keep-alive，统计连接数、请求数与收到的通知条数
+- latency 模拟每个请求的服务端处理与网络延迟
+- 路径中包含 "/fail" 的请求返回 500，便于验证失败处理
+
+用法:
+    python -m benchmarks.http_stub [端口] [延迟毫秒]
+    NOTIFY_WEBHOOK_URL=http://localhost:8080/notify celery -A celery_app worker ...
+"""
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class WebhookStubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # 响应头与响应体分两次写出，关闭 Nagle 避免 keep-alive 连接上的延迟确认等待
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.count(connections=1)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        payload = json.loads(body or b"{}")
+        if "messages" in payload:
+            notifications = len(payload["messages"])
+        else:
+            notifications = payload.get("text", "").count("\n") + 1
+        self.server.count(requests=1, notifications=notifications)
+
+        status = 500 if "/fail" in self.path else 200
+        response = b'{"ok":true}' if status == 200 else b'{"ok":false}'
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, format, *args):
+        pass
+
+class WebhookStubServer(ThreadingHTTPServer):
+    """在后台线程中运行的 webhook 替身服务器"""
+
+    daemon_threads = True
+    # 基准中的突发连接较多
+    request_queue_size = 128
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0):
+        super().__init__((host, port), WebhookStubHandler)
+        self.latency = latency
+        self.stats = {"connections": 0, "requests": 0, "notifications": 0}
+        self._stats_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/notify"
+
+    def count(self, **counts: int) -> None:
+        with self._stats_lock:
+            for name, value in counts.items():
+                self.stats[name] += value
+
+    def start(self) -> "WebhookStubServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="webhook-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+def main():
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8080
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.0
+
+    with WebhookStubServer(port=port, latency=latency) as server:
+        print(f"📮 Webhook替身服务器: {server.url}, 延迟 {latency * 1000:g}ms (Ctrl+C 退出)")
+        try:
+            while True:
+                time.sleep(5)
+                print(f"   {server.stats}")
+        except KeyboardInterrupt:
+            pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,522 @@
+# benchmarks/loadgen.py - API 负载生成与吞吐基准
+"""
+API 负载生成器（asyncio，HTTP/1.1 长连接）
+
+- 闭环（closed）: N 个并发用户各自循环"发请求 -> 等响应"，测系统的最大吞吐
+- 开环（open）: 按固定速率（泊松或均匀间隔）发起请求，不等待之前的请求完成；
+  延迟从计划发送时刻算起，连接池排队的时间也计入（避免协调遗漏）
+- 请求混合: /submit、/status/{task_id}、/tasks、/statistics 按权重随机选择，
+  /status 查询本次运行中提交过的任务
+- 输出每个端点与整体的吞吐、错误数及 p50/p95/p99/p999 延迟，可写为 JSON；
+  compare 比较两次运行的 JSON，超过阈值的退化以非零退出码报告
+
+未指定 --url 时在子进程中启动真实的 FastAPI 应用（uvicorn），Celery 使用内存 broker
+与进程内 worker（--celery worker）、本地执行（--celery eager）或嵌入模式（--celery embedded，
+EMBEDDED_MODE=true，按队列的线程池执行），不依赖 Redis；
+服务在临时目录中运行，数据库与追踪、指标文件都写在那里。
+
+用法:
+    python -m benchmarks.loadgen run --mode closed --concurrency 16 --duration 10 --output base.json
+    python -m benchmarks.loadgen run --mode open --rate 200 --duration 10 --mix submit=1,status=4
+    python -m benchmarks.loadgen run --url http://localhost:8000 --mode closed
+    python -m benchmarks.loadgen compare base.json new.json --threshold 0.1
+    python -m benchmarks.loadgen serve --port 8001 --celery worker
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from benchmarks.common import git_commit, print_table
+
+ENDPOINTS = ("submit", "status", "tasks", "statistics")
+DEFAULT_MIX = "submit=1,status=4,tasks=1,statistics=1"
+DEFAULT_CHAINS = "add_multiply_divide,complex_math"
+PERCENTILES = (("p50", 0.5), ("p95", 0.95), ("p99", 0.99), ("p999", 0.999))
+
+# /status 可查询的已提交任务ID（只保留最近的一部分）
+MAX_KNOWN_TASKS = 1000
+
+
+class HttpConnection:
+    """最小的 HTTP/1.1 长连接客户端（只支持本基准需要的请求与响应形式）"""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def request(self, method: str, path: str, body: Optional[bytes] = None) -> Tuple[int, bytes]:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        head = f"{method} {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+        if body is not None:
+            head += f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+        self.writer.write(head.encode("ascii") + b"\r\n" + (body or b""))
+
+        try:
+            status, headers = await self._read_head()
+            if headers.get("transfer-encoding", "").lower() == "chunked":
+                payload = await self._read_chunked()
+            else:
+                payload = await self.reader.readexactly(int(headers.get("content-length", 0)))
+        except BaseException:
+            # 响应读取中断时连接状态未知，丢弃连接
+            self.close()
+            raise
+        if headers.get("connection", "").lower() == "close":
+            self.close()
+        return status, payload
+
+    async def _read_head(self) -> Tuple[int, Dict[str, str]]:
+        raw = await self.reader.readuntil(b"\r\n\r\n")
+        lines = raw.decode("latin-1").split("\r\n")
+        status = int(lines[0].split(" ", 2)[1])
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+        return status, headers
+
+    async def _read_chunked(self) -> bytes:
+        chunks = []
+        while True:
+            size = int((await self.reader.readuntil(b"\r\n")).split(b";")[0], 16)
+            chunk = await self.reader.readexactly(size + 2)
+            if size == 0:
+                return b"".join(chunks)
+            chunks.append(chunk[:-2])
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+class ConnectionPool:
+    """按需建立、最多 size 个的长连接池"""
+
+    def __init__(self, host: str, port: int, size: int):
+        self.host = host
+        self.port = port
+        self.size = size
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._created = 0
+
+    async def acquire(self) -> HttpConnection:
+        if self._idle.empty() and self._created < self.size:
+            self._created += 1
+            return HttpConnection(self.host, self.port)
+        return await self._idle.get()
+
+    def release(self, connection: HttpConnection) -> None:
+        self._idle.put_nowait(connection)
+
+    def close(self) -> None:
+        while not self._idle.empty():
+            self._idle.get_nowait().close()
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """解析 "submit=1,status=4" 形式的请求权重"""
+    mix = {}
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        name, _, weight = item.partition("=")
+        if name not in ENDPOINTS:
+            raise ValueError(f"未知端点: {name}（可选: {', '.join(ENDPOINTS)}）")
+        mix[name] = float(weight or 1)
+    if not mix or sum(mix.values()) <= 0:
+        raise ValueError(f"请求权重无效: {text}")
+    return mix
+
+
+class LoadGenerator:
+    """按请求混合生成请求并记录每个端点的延迟（秒）"""
+
+    def __init__(self, base_url: str, mix: Dict[str, float], chains: List[str], connections: int,
+                 seed: int = 42):
+        url = urlsplit(base_url)
+        self.pool = ConnectionPool(url.hostname, url.port or 80, connections)
+        self.names = list(mix)
+        self.weights = [mix[name] for name in self.names]
+        self.chains = chains
+        self.rng = random.Random(seed)
+        self.task_ids: List[str] = []
+        self.reset()
+
+    def reset(self) -> None:
+        self.latencies: Dict[str, List[float]] = {name: [] for name in ENDPOINTS}
+        self.errors: Dict[str, Dict[str, int]] = {name: {} for name in ENDPOINTS}
+
+    def _build(self, name: str) -> Tuple[str, str, Optional[bytes]]:
+        if name == "status" and self.task_ids:
+            return "GET", f"/status/{self.rng.choice(self.task_ids)}", None
+        if name == "tasks":
+            return "GET", "/tasks?limit=10", None
+        if name == "statistics":
+            return "GET", "/statistics", None
+        # submit（尚无已提交任务时 status 也退化为提交）
+        body = {"a": self.rng.randint(1, 100), "b": self.rng.randint(1, 10),
+                "operation_chain": self.rng.choice(self.chains)}
+        return "POST", "/submit", json.dumps(body).encode()
+
+    async def request(self, name: str, scheduled_at: Optional[float] = None) -> None:
+        """发送一个请求；开环模式下延迟从计划发送时刻 scheduled_at 算起"""
+        method, path, body = self._build(name)
+        name = "submit" if method == "POST" else name
+        start = time.perf_counter() if scheduled_at is None else scheduled_at
+        connection = await self.pool.acquire()
+        try:
+            status, payload = await connection.request(method, path, body)
+        except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+            self._error(name, type(e).__name__)
+            return
+        finally:
+            self.pool.release(connection)
+        elapsed = time.perf_counter() - start
+
+        if status >= 400:
+            self._error(name, str(status))
+            return
+        self.latencies[name].append(elapsed)
+        if name == "submit":
+            self.task_ids.append(json.loads(payload)["task_id"])
+            if len(self.task_ids) > MAX_KNOWN_TASKS:
+                del self.task_ids[:MAX_KNOWN_TASKS // 2]
+
+    def _error(self, name: str, kind: str) -> None:
+        self.errors[name][kind] = self.errors[name].get(kind, 0) + 1
+
+    def choose(self) -> str:
+        return self.rng.choices(self.names, self.weights)[0]
+
+    async def closed_loop(self, concurrency: int, duration: float) -> float:
+        """concurrency 个用户循环请求 duration 秒，返回实际耗时"""
+        deadline = time.perf_counter() + duration
+
+        async def user():
+            while time.perf_counter() < deadline:
+                await self.request(self.choose())
+
+        start = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+        return time.perf_counter() - start
+
+    async def open_loop(self, rate: float, duration: float, arrival: str = "poisson") -> float:
+        """按 rate 请求/秒发起 duration 秒的请求，等待全部完成后返回实际耗时"""
+        start = time.perf_counter()
+        scheduled_at = start
+        pending = set()
+        while True:
+            interval = self.rng.expovariate(rate) if arrival == "poisson" else 1 / rate
+            scheduled_at += interval
+            if scheduled_at - start >= duration:
+                break
+            delay = scheduled_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            task = asyncio.create_task(self.request(self.choose(), scheduled_at))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        if pending:
+            await asyncio.gather(*pending)
+        return time.perf_counter() - start
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """最近秩分位数"""
+    return sorted_values[max(0, math.ceil(q * len(sorted_values)) - 1)]
+
+
+def summarize(latencies: List[float], errors: Dict[str, int], elapsed: float) -> Dict[str, Any]:
+    values = sorted(latencies)
+    summary = {
+        "requests": len(values) + sum(errors.values()),
+        "errors": sum(errors.values()),
+        "error_kinds": dict(errors),
+        "throughput_rps": round(len(values) / elapsed, 2) if elapsed > 0 else 0.0,
+        "latency_ms": {}
+    }
+    if values:
+        summary["latency_ms"] = {
+            **{label: round(percentile(values, q) * 1000, 3) for label, q in PERCENTILES},
+            "mean": round(sum(values) / len(values) * 1000, 3),
+            "max": round(values[-1] * 1000, 3)
+        }
+    return summary
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_ready(base_url: str, timeout: float, server: Optional[subprocess.Popen]) -> None:
+    url = urlsplit(base_url)
+    deadline = time.perf_counter() + timeout
+    while True:
+        connection = HttpConnection(url.hostname, url.port or 80)
+        try:
+            status, _ = await connection.request("GET", "/chains")
+            if status == 200:
+                return
+        except OSError:
+            pass
+        finally:
+            connection.close()
+        if server is not None and server.poll() is not None:
+            raise RuntimeError(f"测试服务退出，退出码 {server.returncode}")
+        if time.perf_counter() > deadline:
+            raise RuntimeError(f"等待服务就绪超时: {base_url}")
+        await asyncio.sleep(0.2)
+
+
+def start_server(celery_mode: str) -> Tuple[subprocess.Popen, str, str]:
+    """在子进程中启动被测服务，返回 (进程, 地址, 日志文件)"""
+    port = _free_port()
+    log_path = os.path.join(tempfile.mkdtemp(prefix="loadgen-"), "server.log")
+    with open(log_path, "wb") as log_file:
+        server = subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.loadgen", "serve", "--port", str(port), "--celery", celery_mode],
+            stdout=subprocess.DEVNULL, stderr=log_file
+        )
+    return server, f"http://127.0.0.1:{port}", log_path
+
+
+async def run_load(args: argparse.Namespace, base_url: str) -> Dict[str, Any]:
+    generator = LoadGenerator(base_url, parse_mix(args.mix), args.chains.split(","),
+                              connections=args.connections if args.mode == "open" else args.concurrency,
+                              seed=args.seed)
+    # 预热: 建立连接并提交一批任务供 /status 查询
+    await asyncio.gather(*(generator.request("submit") for _ in range(args.warmup)))
+    generator.reset()
+
+    if args.mode == "closed":
+        elapsed = await generator.closed_loop(args.concurrency, args.duration)
+    else:
+        elapsed = await generator.open_loop(args.rate, args.duration, args.arrival)
+    generator.pool.close()
+
+    endpoints = {
+        name: summarize(generator.latencies[name], generator.errors[name], elapsed)
+        for name in ENDPOINTS if generator.latencies[name] or generator.errors[name]
+    }
+    all_errors: Dict[str, int] = {}
+    for name in ENDPOINTS:
+        for kind, count in generator.errors[name].items():
+            all_errors[kind] = all_errors.get(kind, 0) + count
+    endpoints["all"] = summarize([value for name in ENDPOINTS for value in generator.latencies[name]],
+                                 all_errors, elapsed)
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "url": args.url or "subprocess",
+            "celery": None if args.url else args.celery,
+            "mode": args.mode,
+            "concurrency": args.concurrency if args.mode == "closed" else None,
+            "rate": args.rate if args.mode == "open" else None,
+            "arrival": args.arrival if args.mode == "open" else None,
+            "duration_s": round(elapsed, 3),
+            "mix": args.mix,
+            "chains": args.chains
+        },
+        "endpoints": endpoints
+    }
+
+
+def print_result(result: Dict[str, Any]) -> None:
+    rows = []
+    for name, summary in result["endpoints"].items():
+        latency = summary["latency_ms"]
+        rows.append([name, summary["requests"], summary["errors"], summary["throughput_rps"],
+                     *(latency.get(label, "-") for label, _ in PERCENTILES), latency.get("max", "-")])
+    print_table(["endpoint", "requests", "errors", "rps", "p50 ms", "p95 ms", "p99 ms", "p999 ms", "max ms"], rows)
+
+
+def command_run(args: argparse.Namespace) -> int:
+    meta = f"{args.concurrency} 并发" if args.mode == "closed" else f"{args.rate} 请求/秒 ({args.arrival})"
+    server = log_path = None
+    base_url = args.url
+    if base_url is None:
+        server, base_url, log_path = start_server(args.celery)
+    print(f"🚀 API 负载测试: {args.mode} 模式, {meta}, {args.duration}s, 请求混合 {args.mix}, 目标 {base_url}")
+
+    try:
+        asyncio.run(wait_ready(base_url, 60, server))
+        result = asyncio.run(run_load(args, base_url))
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        if log_path:
+            print(f"   服务日志: {log_path}")
+        return 2
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    print_result(result)
+    if args.output == "-":
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    elif args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"💾 结果已写入 {args.output}")
+    return 0
+
+
+def compare(base: Dict[str, Any], new: Dict[str, Any], threshold: float, min_delta_ms: float) -> List[Dict[str, Any]]:
+    """
+    比较两次运行的结果
+
+    吞吐下降超过 threshold、或分位延迟上升超过 threshold 且绝对值超过 min_delta_ms、
+    或错误率上升时判为退化。
+
+    Returns:
+        每个端点每项指标的比较行: {"endpoint", "metric", "base", "new", "change", "regression"}
+    """
+    rows = []
+    for name, base_summary in base["endpoints"].items():
+        new_summary = new["endpoints"].get(name)
+        if new_summary is None:
+            continue
+
+        base_rps, new_rps = base_summary["throughput_rps"], new_summary["throughput_rps"]
+        rows.append({"endpoint": name, "metric": "rps", "base": base_rps, "new": new_rps,
+                     "change": new_rps / base_rps - 1 if base_rps else 0.0,
+                     "regression": new_rps < base_rps * (1 - threshold)})
+
+        for label, _ in PERCENTILES:
+            base_ms, new_ms = base_summary["latency_ms"].get(label), new_summary["latency_ms"].get(label)
+            if base_ms is None or new_ms is None:
+                continue
+            rows.append({"endpoint": name, "metric": f"{label} ms", "base": base_ms, "new": new_ms,
+                         "change": new_ms / base_ms - 1 if base_ms else 0.0,
+                         "regression": new_ms > base_ms * (1 + threshold) and new_ms - base_ms > min_delta_ms})
+
+        base_rate = base_summary["errors"] / max(base_summary["requests"], 1)
+        new_rate = new_summary["errors"] / max(new_summary["requests"], 1)
+        rows.append({"endpoint": name, "metric": "error rate", "base": round(base_rate, 4), "new": round(new_rate, 4),
+                     "change": new_rate - base_rate, "regression": new_rate > base_rate + 0.001})
+    return rows
+
+
+def command_compare(args: argparse.Namespace) -> int:
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+
+    for label, result in (("base", base), ("new", new)):
+        meta = result["meta"]
+        print(f"📋 {label}: {meta['timestamp']} {meta.get('git_commit') or ''} {meta['mode']} "
+              f"{meta.get('concurrency') or meta.get('rate')} {meta['mix']}")
+    if (base["meta"]["mode"], base["meta"]["mix"]) != (new["meta"]["mode"], new["meta"]["mix"]):
+        print("⚠️ 两次运行的模式或请求混合不同，结果不可直接比较")
+
+    rows = compare(base, new, args.threshold, args.min_delta_ms)
+    print_table(["endpoint", "metric", "base", "new", "change", ""], [
+        [row["endpoint"], row["metric"], row["base"], row["new"], f"{row['change']:+.1%}",
+         "❌ 退化" if row["regression"] else ""]
+        for row in rows
+    ])
+
+    regressions = [row for row in rows if row["regression"]]
+    if regressions:
+        print(f"❌ {len(regressions)} 项指标退化（阈值 {args.threshold:.0%}）")
+        return 1
+    print(f"✅ 无退化（阈值 {args.threshold:.0%}）")
+    return 0
+
+
+def command_serve(args: argparse.Namespace) -> int:
+    """启动被测服务: 真实 FastAPI 应用 + 内存 broker（不依赖 Redis）"""
+    # 在临时目录中运行: 数据库、追踪、指标等相对路径的文件都写在这里，不影响仓库中的 tasks.db
+    os.chdir(tempfile.mkdtemp(prefix="loadgen-"))
+    if args.celery == "embedded":
+        # 在导入 config 之前设置
+        os.environ["EMBEDDED_MODE"] = "true"
+
+    import contextlib
+
+    import uvicorn
+    from celery.contrib.testing.worker import start_worker
+
+    from celery_app import QUEUES, app as celery_app
+
+    celery_app.conf.update(
+        broker_url='memory://',
+        result_backend='cache+memory://',
+        broker_transport_options={'polling_interval': 0.001},
+        task_always_eager=args.celery == "eager",
+    )
+
+    import tasks  # noqa: F401  注册任务
+    from app.main import app
+
+    worker = contextlib.nullcontext() if args.celery in ("eager", "embedded") else \
+        start_worker(celery_app, pool='solo', perform_ping_check=False, queues=QUEUES, loglevel='ERROR')
+    with worker:
+        uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning", access_log=False)
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.loadgen", description="API 负载生成与吞吐基准")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="运行负载测试")
+    run.add_argument("--url", help="被测服务地址（默认在子进程中启动应用）")
+    run.add_argument("--celery", choices=("worker", "eager", "embedded"), default="worker",
+                     help="子进程服务的任务执行方式: 进程内 worker、本地执行或嵌入模式")
+    run.add_argument("--mode", choices=("closed", "open"), default="closed")
+    run.add_argument("--concurrency", type=int, default=16, help="闭环并发用户数")
+    run.add_argument("--rate", type=float, default=100.0, help="开环请求速率（请求/秒）")
+    run.add_argument("--arrival", choices=("poisson", "uniform"), default="poisson", help="开环到达间隔分布")
+    run.add_argument("--connections", type=int, default=64, help="开环最大连接数")
+    run.add_argument("--duration", type=float, default=10.0, help="测量时长（秒）")
+    run.add_argument("--warmup", type=int, default=20, help="测量前提交的任务数")
+    run.add_argument("--mix", default=DEFAULT_MIX, help=f"请求权重（默认 {DEFAULT_MIX}）")
+    run.add_argument("--chains", default=DEFAULT_CHAINS, help="/submit 随机使用的任务链")
+    run.add_argument("--seed", type=int, default=42)
+    run.add_argument("--output", help="结果 JSON 文件（- 为标准输出）")
+    run.set_defaults(handler=command_run)
+
+    diff = commands.add_parser("compare", help="比较两次运行的结果")
+    diff.add_argument("base")
+    diff.add_argument("new")
+    diff.add_argument("--threshold", type=float, default=0.10, help="相对变化阈值")
+    diff.add_argument("--min-delta-ms", type=float, default=1.0, help="延迟退化的最小绝对变化（毫秒）")
+    diff.set_defaults(handler=command_compare)
+
+    serve = commands.add_parser("serve", help="启动被测服务（内存 broker）")
+    serve.add_argument("--port", type=int, default=8001)
+    serve.add_argument("--celery", choices=("worker", "eager", "embedded"), default="worker")
+    serve.set_defaults(handler=command_serve)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if getattr(args, "mix", None):
+        parse_mix(args.mix)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
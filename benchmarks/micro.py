@@ -0,0 +1,353 @@
+# benchmarks/micro.py - 微基准套件
+"""
+微基准: 任务函数体、任务链构建与序列化、数据库层、TaskRecord.to_dict、/submit 准入判断
+
+- 每个基准先预热，再按 --min-time 自动确定每个样本的调用次数；之后轮流为每个基准采样，
+  共 --repeat 轮（样本为每次调用的耗时）
+- --save 把样本与统计量写入基线文件；--compare 与基线逐项做 Mann-Whitney U 检验，
+  差异显著（p < --alpha）且中位数变化超过 --threshold 时判为变慢/变快，有变慢的基准时退出码为 1
+- 全部离线运行: 任务函数直接调用（不经过 broker），数据库为临时 SQLite，负载存储写入临时目录
+
+data.fetch_data 的函数体中为模拟网络延迟的 sleep，不计入；io.* 任务见各自的专项基准。
+
+用法:
+    python -m benchmarks.micro                                  # 运行全部
+    python -m benchmarks.micro -k db. --sizes 1000,10000        # 只运行名称包含 db. 的基准
+    python -m benchmarks.micro --save                           # 保存为基线（默认 .benchmarks/micro.json）
+    python -m benchmarks.micro --compare                        # 与基线比较
+"""
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+_workdir = tempfile.mkdtemp(prefix="micro-bench-")
+os.environ.setdefault("PAYLOAD_STORE_DIR", os.path.join(_workdir, "payload_store"))
+
+from kombu.serialization import dumps
+
+from app.database import ORMDatabaseManager
+from app.models.database_models import TaskRecord
+from app.services.admission import AdmissionController, AdmissionRejected
+from app.services.chain_service import ChainService
+from benchmarks.common import git_commit, print_table, quiet
+from celery_app import app
+from tasks import data_tasks, math_tasks
+
+DEFAULT_BASELINE = os.path.join(".benchmarks", "micro.json")
+DEFAULT_SIZES = "1000,10000,100000,1000000"
+DATA_SIZE = 10_000
+
+# 基准名 -> 准备函数（返回被测的无参可调用对象）
+Setup = Callable[[], Callable[[], Any]]
+
+
+def task_benchmarks() -> Dict[str, Setup]:
+    """math.* / data.* 任务函数体（task.run，含装饰器，不含 Celery 调度）"""
+    rng = random.Random(42)
+    data = [rng.randint(1, 100) for _ in range(DATA_SIZE)]
+    partials = [data_tasks.partial_statistics.run(data[i::8]) for i in range(8)]
+
+    cases = {
+        "math.add": (math_tasks.add, (12, 30)),
+        "math.multiply": (math_tasks.multiply, (12, 30)),
+        "math.subtract": (math_tasks.subtract, (12, 30)),
+        "math.divide": (math_tasks.divide, (12, 30)),
+        "math.power": (math_tasks.power, (3, 40)),
+        "math.sqrt": (math_tasks.sqrt, (1764,)),
+        "data.filter_data(10k)": (data_tasks.filter_data, (data, 50)),
+        "data.sort_data(10k)": (data_tasks.sort_data, (data,)),
+        "data.aggregate_results(10k)": (data_tasks.aggregate_results, (data,)),
+        "data.calculate_statistics(10k)": (data_tasks.calculate_statistics, (data,)),
+        "data.partial_statistics(10k)": (data_tasks.partial_statistics, (data,)),
+        "data.merge_statistics(8)": (data_tasks.merge_statistics, (partials,)),
+        "data.map_shard(10k)": (data_tasks.map_shard, (data,)),
+        "data.process_item": (data_tasks.process_item, (21,)),
+        "data.process_items(10k)": (data_tasks.process_items, (data,)),
+        "data.concat_chunks(8x1250)": (data_tasks.concat_chunks, ([data[i::8] for i in range(8)],)),
+    }
+    return {
+        f"task.{name}": (lambda task=task, args=args: lambda: task.run(*args))
+        for name, (task, args) in cases.items()
+    }
+
+
+def chain_benchmarks() -> Dict[str, Setup]:
+    """ChainService.create_chain 与按任务序列化器序列化整个签名"""
+    serializer = app.conf.task_serializer
+    benchmarks = {}
+    for name in ChainService.OPERATION_CHAINS:
+        a, b = (1000, 8) if ChainService.OPERATION_CHAINS[name].get("type") == "map_reduce" else (12, 3)
+        benchmarks[f"chain.create.{name}"] = \
+            lambda name=name, a=a, b=b: lambda: ChainService.create_chain(name, a, b)
+        benchmarks[f"chain.create+serialize.{name}"] = \
+            lambda name=name, a=a, b=b: lambda: dumps(ChainService.create_chain(name, a, b), serializer=serializer)
+    return benchmarks
+
+
+def _populate(database_url: str, rows: int) -> ORMDatabaseManager:
+    """建表并批量写入 rows 条任务记录（ID 为 task-0000000 形式，创建时间递增）"""
+    with quiet():
+        manager = ORMDatabaseManager(database_url)
+    table = TaskRecord.__table__
+    chains = list(ChainService.OPERATION_CHAINS)
+    start = datetime(2024, 1, 1)
+    batch = 50_000
+    with manager.engine.begin() as connection:
+        for offset in range(0, rows, batch):
+            connection.execute(table.insert(), [
+                {"id": f"task-{i:07d}", "input_a": i % 1000, "input_b": i % 10,
+                 "operation_chain": chains[i % len(chains)], "celery_task_id": f"celery-{i:07d}",
+                 "status": "completed", "result": json.dumps(i * 2),
+                 "created_at": start + timedelta(seconds=i)}
+                for i in range(offset, min(offset + batch, rows))
+            ])
+    return manager
+
+
+def db_benchmarks(sizes: List[int]) -> Dict[str, Setup]:
+    """ORMDatabaseManager 在不同行数下的写入、更新与分页查询"""
+    managers: Dict[int, ORMDatabaseManager] = {}
+
+    def manager_for(rows: int) -> ORMDatabaseManager:
+        if rows not in managers:
+            managers[rows] = _populate(f"sqlite:///{os.path.join(_workdir, f'tasks_{rows}.db')}", rows)
+        return managers[rows]
+
+    def save(rows: int):
+        manager = manager_for(rows)
+        return lambda: manager.save_task_record(str(uuid.uuid4()), 12, 3, "complex_math", "celery-id")
+
+    def update(rows: int):
+        manager = manager_for(rows)
+        rng = random.Random(rows)
+        return lambda: manager.update_task_status(f"task-{rng.randrange(rows):07d}", "completed", {"value": 42})
+
+    def task_list(rows: int):
+        manager = manager_for(rows)
+        return lambda: manager.get_task_list(10, 0)
+
+    benchmarks = {}
+    for rows in sizes:
+        label = f"1e{round(math.log10(rows))}" if rows == 10 ** round(math.log10(rows)) else str(rows)
+        benchmarks[f"db.save_task_record[{label}]"] = lambda rows=rows: save(rows)
+        benchmarks[f"db.update_task_status[{label}]"] = lambda rows=rows: update(rows)
+        benchmarks[f"db.get_task_list[{label}]"] = lambda rows=rows: task_list(rows)
+    return benchmarks
+
+
+def model_benchmarks() -> Dict[str, Setup]:
+    def to_dict():
+        record = TaskRecord(id=str(uuid.uuid4()), input_a=12, input_b=3, operation_chain="complex_math",
+                            celery_task_id=str(uuid.uuid4()), status="completed", created_at=datetime.now(),
+                            updated_at=datetime.now())
+        record.set_result({"value": 42, "steps": [15, 180, 177, 88.5]})
+        return record.to_dict
+
+    return {"model.TaskRecord.to_dict": to_dict}
+
+
+def admission_benchmarks() -> Dict[str, Setup]:
+    """AdmissionController 每次提交的判断开销（admit + 结果监控的 release）"""
+    def admit_release(client_rate: float, clients: int):
+        controller = AdmissionController(high_water={}, default_high_water=1000, client_rate=client_rate,
+                                         client_burst=1_000_000, max_clients=clients)
+        names = [f"10.0.{i // 256}.{i % 256}" for i in range(clients)]
+        rng = random.Random(clients)
+
+        def run():
+            controller.admit("math", names[rng.randrange(clients)])
+            controller.release("math")
+        return run
+
+    def rejected():
+        controller = AdmissionController(high_water={"math": 0}, client_rate=0)
+
+        def run():
+            try:
+                controller.admit("math", "10.0.0.1")
+            except AdmissionRejected:
+                pass
+        return run
+
+    return {
+        "admission.admit+release": lambda: admit_release(0, 1),
+        "admission.admit+release.token_bucket[1e4 clients]": lambda: admit_release(1000, 10_000),
+        "admission.rejected": rejected,
+    }
+
+
+def collect(sizes: List[int]) -> Dict[str, Setup]:
+    return {**task_benchmarks(), **chain_benchmarks(), **db_benchmarks(sizes), **model_benchmarks(),
+            **admission_benchmarks()}
+
+
+def calibrate(func: Callable[[], Any], warmup: int, min_time: float) -> int:
+    """预热后确定每个样本的调用次数（样本耗时至少 min_time 秒）"""
+    for _ in range(warmup):
+        func()
+    number = 1
+    while True:
+        elapsed = time_sample(func, number) * number
+        if elapsed >= min_time:
+            return number
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9) * 1.2))
+
+
+def time_sample(func: Callable[[], Any], number: int) -> float:
+    """调用 number 次，返回每次调用的耗时（秒）；与 timeit 相同，计时期间关闭 GC"""
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        return (time.perf_counter() - start) / number
+    finally:
+        gc.enable()
+
+
+def run_benchmarks(funcs: Dict[str, Callable[[], Any]], warmup: int, repeat: int,
+                   min_time: float) -> Dict[str, Dict[str, Any]]:
+    """
+    轮流采样: 每一轮为每个基准各采一个样本，共 repeat 轮
+
+    机器负载的波动通常持续数秒，连续采完一个基准的全部样本时，整个基准可能都落在
+    同一个快或慢的时段；轮流采样让每个基准的样本分布在整个运行期间。
+    """
+    numbers = {name: calibrate(func, warmup, min_time) for name, func in funcs.items()}
+    samples: Dict[str, List[float]] = {name: [] for name in funcs}
+    for round_index in range(repeat):
+        print(f"   第 {round_index + 1}/{repeat} 轮", file=sys.stderr)
+        for name, func in funcs.items():
+            samples[name].append(time_sample(func, numbers[name]))
+
+    results = {}
+    for name, values in samples.items():
+        ordered = sorted(values)
+        results[name] = {
+            "number": numbers[name],
+            "median": statistics.median(values),
+            "mean": statistics.fmean(values),
+            "stdev": statistics.stdev(values) if len(values) > 1 else 0.0,
+            "min": ordered[0],
+            "iqr": ordered[(3 * len(ordered)) // 4] - ordered[len(ordered) // 4],
+            "samples": values
+        }
+    return results
+
+
+def mann_whitney_u(x: List[float], y: List[float]) -> float:
+    """双侧 Mann-Whitney U 检验的 p 值（正态近似，含并列校正）"""
+    n1, n2 = len(x), len(y)
+    if n1 == 0 or n2 == 0:
+        return 1.0
+    combined = sorted([(value, 0) for value in x] + [(value, 1) for value in y])
+
+    # 平均秩
+    ranks = [0.0] * len(combined)
+    tie_term = 0.0
+    index = 0
+    while index < len(combined):
+        end = index
+        while end + 1 < len(combined) and combined[end + 1][0] == combined[index][0]:
+            end += 1
+        for position in range(index, end + 1):
+            ranks[position] = (index + end) / 2 + 1
+        ties = end - index + 1
+        tie_term += ties ** 3 - ties
+        index = end + 1
+
+    rank_sum = sum(rank for rank, (_, group) in zip(ranks, combined) if group == 0)
+    u = rank_sum - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    variance = n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+    z = (abs(u - n1 * n2 / 2) - 0.5) / math.sqrt(variance)
+    return math.erfc(max(z, 0.0) / math.sqrt(2))
+
+
+def compare(baseline: Dict[str, Any], results: Dict[str, Any], alpha: float, threshold: float) -> List[List[Any]]:
+    """逐项与基线比较，返回表格行: [基准, 基线中位数us, 当前中位数us, 变化, p, 结论]"""
+    rows = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if base is None:
+            rows.append([name, "-", current["median"] * 1e6, "-", "-", "新增"])
+            continue
+        change = current["median"] / base["median"] - 1
+        p_value = mann_whitney_u(base["samples"], current["samples"])
+        verdict = ""
+        if p_value < alpha and abs(change) > threshold:
+            verdict = "❌ 变慢" if change > 0 else "✅ 变快"
+        rows.append([name, base["median"] * 1e6, current["median"] * 1e6, f"{change:+.1%}", f"{p_value:.4f}", verdict])
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.micro", description="微基准套件")
+    parser.add_argument("-k", dest="pattern", default="", help="只运行名称包含该字符串的基准")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="数据库基准的表行数")
+    parser.add_argument("--warmup", type=int, default=3, help="预热调用次数")
+    parser.add_argument("--repeat", type=int, default=15, help="样本数")
+    parser.add_argument("--min-time", type=float, default=0.02, help="每个样本的最短耗时（秒）")
+    parser.add_argument("--save", nargs="?", const=DEFAULT_BASELINE, help="保存为基线文件")
+    parser.add_argument("--compare", nargs="?", const=DEFAULT_BASELINE, help="与基线文件比较")
+    parser.add_argument("--alpha", type=float, default=0.01, help="显著性水平")
+    parser.add_argument("--threshold", type=float, default=0.10, help="中位数相对变化阈值")
+    args = parser.parse_args(argv)
+
+    sizes = [int(float(size)) for size in args.sizes.split(",") if size]
+    benchmarks = {name: setup for name, setup in collect(sizes).items() if args.pattern in name}
+    print(f"🚀 微基准: {len(benchmarks)} 项, 预热 {args.warmup} 次, {args.repeat} 个样本, 每个样本 ≥{args.min_time}s")
+
+    with quiet():
+        funcs = {name: setup() for name, setup in benchmarks.items()}
+        results = run_benchmarks(funcs, args.warmup, args.repeat, args.min_time)
+    rows = [
+        [name, result["number"], result["median"] * 1e6, result["min"] * 1e6, f"{result['stdev'] / result['mean']:.1%}"]
+        for name, result in results.items()
+    ]
+    print_table(["benchmark", "calls/sample", "median us", "min us", "cv"], rows)
+
+    status = 0
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"\n📋 与基线比较: {args.compare} ({baseline['meta'].get('git_commit') or '-'}, "
+              f"{baseline['meta']['timestamp']}), α={args.alpha}, 阈值 {args.threshold:.0%}")
+        compared = compare(baseline["results"], results, args.alpha, args.threshold)
+        print_table(["benchmark", "base us", "new us", "change", "p", ""], compared)
+        slower = [row for row in compared if row[-1] == "❌ 变慢"]
+        if slower:
+            print(f"❌ {len(slower)} 项基准变慢")
+            status = 1
+        else:
+            print("✅ 无显著变慢")
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.save) or ".", exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({
+                "meta": {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "git_commit": git_commit(),
+                         "python": platform.python_version(), "warmup": args.warmup, "repeat": args.repeat,
+                         "min_time": args.min_time},
+                "results": results
+            }, f, ensure_ascii=False, indent=2)
+        print(f"💾 基线已保存: {args.save}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,331 @@
+# benchmarks/replay.py - 录制流量回放
+"""
+回放 TrafficRecorderMiddleware 录制的 /submit 流量（TRAFFIC_RECORD_ENABLED=true 时写入 traffic.jsonl）
+
+- 按录制时间戳保持请求间隔回放: --speed 1 为原速，--speed 4 为 4 倍速（间隔缩短为 1/4），
+  延迟从计划发送时刻算起；--speed max 不保留间隔，以 --concurrency 个并发连接尽快发送
+- 报告每个任务链与整体的吞吐、延迟分位数，以及发送时刻相对计划的滞后（负载生成器跟不上时偏大）
+- 校验（默认开启）: 回放结束后轮询 /status/{task_id}，与本地直接执行任务函数得到的结果比较；
+  HTTP 状态与录制时不同、任务状态或结果不一致都计为不一致，有不一致时退出码为 1
+  （map_reduce 等非线性任务链只校验任务状态）
+
+未指定 --url 时与 benchmarks.loadgen 相同，在子进程中启动应用（内存 broker，不依赖 Redis）。
+
+用法:
+    python -m benchmarks.replay traffic.jsonl --speed 1
+    python -m benchmarks.replay traffic.jsonl --speed 10 --url http://localhost:8000 --output replay.json
+    python -m benchmarks.replay traffic.jsonl --speed max --concurrency 32 --limit 5000
+"""
+import argparse
+import asyncio
+import json
+import math
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from benchmarks.common import git_commit, print_table, quiet
+from benchmarks.loadgen import PERCENTILES, ConnectionPool, percentile, start_server, summarize, wait_ready
+
+# 校验时轮询任务状态的间隔（秒）
+POLL_INTERVAL = 0.05
+
+
+def load_records(path: str, limit: Optional[int] = None) -> Tuple[List[Dict[str, Any]], int]:
+    """读取录制文件，按时间戳排序；返回 (记录, 跳过的行数)"""
+    records, skipped = [], 0
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                skipped += 1
+                continue
+            if not isinstance(record, dict) or not {"ts", "chain", "a", "b"} <= record.keys():
+                skipped += 1
+                continue
+            records.append(record)
+    records.sort(key=lambda record: record["ts"])
+    return records[:limit] if limit else records, skipped
+
+
+class Replayer:
+    """回放录制的请求并记录每个请求的结果"""
+
+    def __init__(self, base_url: str, connections: int):
+        url = urlsplit(base_url)
+        self.pool = ConnectionPool(url.hostname, url.port or 80, connections)
+        # 与录制记录一一对应: {"status", "task_id", "latency", "lag"} 或 {"error"}
+        self.outcomes: List[Optional[Dict[str, Any]]] = []
+
+    async def send(self, index: int, record: Dict[str, Any], scheduled_at: Optional[float] = None) -> None:
+        sent_at = time.perf_counter()
+        start = sent_at if scheduled_at is None else scheduled_at
+        request = {"a": record["a"], "b": record["b"], "operation_chain": record["chain"]}
+        request.update({key: record[key] for key in ("priority", "tenant") if key in record})
+        body = json.dumps(request).encode()
+        connection = await self.pool.acquire()
+        try:
+            status, payload = await connection.request("POST", "/submit", body)
+        except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+            self.outcomes[index] = {"error": type(e).__name__}
+            return
+        finally:
+            self.pool.release(connection)
+
+        task_id = None
+        if status == 200:
+            task_id = json.loads(payload).get("task_id")
+        self.outcomes[index] = {"status": status, "task_id": task_id, "latency": time.perf_counter() - start,
+                                "lag": sent_at - start}
+
+    async def replay(self, records: List[Dict[str, Any]], speed: Optional[float], concurrency: int) -> float:
+        """speed 为 None 时尽快发送；返回回放耗时（秒）"""
+        self.outcomes = [None] * len(records)
+        start = time.perf_counter()
+
+        if speed is None:
+            position = iter(range(len(records)))
+
+            async def sender():
+                for index in position:
+                    await self.send(index, records[index])
+
+            await asyncio.gather(*(sender() for _ in range(concurrency)))
+            return time.perf_counter() - start
+
+        origin = records[0]["ts"]
+        pending = set()
+        for index, record in enumerate(records):
+            scheduled_at = start + (record["ts"] - origin) / speed
+            delay = scheduled_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            task = asyncio.create_task(self.send(index, record, scheduled_at))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        if pending:
+            await asyncio.gather(*pending)
+        return time.perf_counter() - start
+
+    async def fetch_final(self, task_id: str, deadline: float) -> Optional[Dict[str, Any]]:
+        """轮询任务状态直到完成或失败，超时返回 None"""
+        while time.perf_counter() < deadline:
+            connection = await self.pool.acquire()
+            try:
+                status, payload = await connection.request("GET", f"/status/{task_id}")
+            except (OSError, asyncio.IncompleteReadError, ValueError):
+                status, payload = None, b""
+            finally:
+                self.pool.release(connection)
+            if status == 200:
+                record = json.loads(payload)
+                if record["status"] in ("completed", "failed"):
+                    return record
+            await asyncio.sleep(POLL_INTERVAL)
+        return None
+
+
+class ExpectedResults:
+    """本地直接执行任务函数（不经过 Celery）得到任务链的期望结果"""
+
+    def __init__(self):
+        from celery.canvas import _chain
+
+        from app.services.chain_service import ChainService
+        from celery_app import app
+        import tasks  # noqa: F401  注册任务
+
+        self._chain_type = _chain
+        self._chain_service = ChainService
+        self._tasks = app.tasks
+        self._cache: Dict[Tuple[str, Any, Any], Tuple[str, Any]] = {}
+
+    def get(self, chain: str, a: Any, b: Any) -> Tuple[str, Any]:
+        """返回 (期望状态, 期望结果)；非线性任务链的结果为 None（只校验状态）"""
+        key = (chain, a, b)
+        if key not in self._cache:
+            self._cache[key] = self._compute(chain, a, b)
+        return self._cache[key]
+
+    def _compute(self, chain: str, a: Any, b: Any) -> Tuple[str, Any]:
+        workflow = self._chain_service.create_chain(chain, a, b)
+        if not isinstance(workflow, self._chain_type):
+            return "completed", None
+        value = None
+        try:
+            with quiet():
+                for index, signature in enumerate(workflow.tasks):
+                    args = tuple(signature.args) if index == 0 else (value, *signature.args)
+                    value = self._tasks[signature.task].run(*args, **signature.kwargs)
+        except Exception:
+            return "failed", None
+        return "completed", value
+
+
+def _same(expected: Any, actual: Any) -> bool:
+    if isinstance(expected, (int, float)) and isinstance(actual, (int, float)):
+        return math.isclose(expected, actual, rel_tol=1e-9, abs_tol=1e-12)
+    return expected == actual
+
+
+async def verify(replayer: Replayer, records: List[Dict[str, Any]], timeout: float) -> Dict[str, Any]:
+    """校验回放结果，返回不一致的统计与示例"""
+    expected_results = ExpectedResults()
+    deadline = time.perf_counter() + timeout
+    counts = {"checked": 0, "http_status": 0, "status": 0, "result": 0, "timeout": 0}
+    examples: List[Dict[str, Any]] = []
+
+    def mismatch(kind: str, record: Dict[str, Any], expected: Any, actual: Any) -> None:
+        counts[kind] += 1
+        if len(examples) < 5:
+            examples.append({"kind": kind, "chain": record["chain"], "a": record["a"], "b": record["b"],
+                             "expected": expected, "actual": actual})
+
+    async def check(record: Dict[str, Any], outcome: Dict[str, Any]) -> None:
+        counts["checked"] += 1
+        recorded_status = record.get("status", 200)
+        if outcome["status"] != recorded_status:
+            mismatch("http_status", record, recorded_status, outcome["status"])
+            return
+        if outcome["task_id"] is None:
+            return
+        final = await replayer.fetch_final(outcome["task_id"], deadline)
+        if final is None:
+            counts["timeout"] += 1
+            return
+        status, result = expected_results.get(record["chain"], record["a"], record["b"])
+        if final["status"] != status:
+            mismatch("status", record, status, final["status"])
+        elif result is not None and not _same(result, final["result"]):
+            mismatch("result", record, result, final["result"])
+
+    await asyncio.gather(*(
+        check(record, outcome) for record, outcome in zip(records, replayer.outcomes)
+        if outcome is not None and "error" not in outcome
+    ))
+    counts["mismatches"] = counts["http_status"] + counts["status"] + counts["result"]
+    return {**counts, "examples": examples}
+
+
+def report(records: List[Dict[str, Any]], outcomes: List[Optional[Dict[str, Any]]], elapsed: float) -> Dict[str, Any]:
+    """按任务链与整体汇总吞吐与延迟；传输错误与 5xx 计为错误"""
+    groups: Dict[str, Tuple[List[float], Dict[str, int]]] = {}
+    lags = []
+    for record, outcome in zip(records, outcomes):
+        for name in (record["chain"], "all"):
+            latencies, errors = groups.setdefault(name, ([], {}))
+            if outcome is None or "error" in outcome or outcome["status"] >= 500:
+                kind = "missing" if outcome is None else outcome.get("error") or str(outcome["status"])
+                errors[kind] = errors.get(kind, 0) + 1
+            else:
+                latencies.append(outcome["latency"])
+        if outcome is not None and "lag" in outcome:
+            lags.append(outcome["lag"])
+
+    chains = {name: summarize(latencies, errors, elapsed) for name, (latencies, errors) in groups.items()}
+    chains["all"] = chains.pop("all")
+    lags.sort()
+    return {
+        "chains": chains,
+        "schedule_lag_ms": {"p99": round(percentile(lags, 0.99) * 1000, 3),
+                            "max": round(lags[-1] * 1000, 3)} if lags else {}
+    }
+
+
+async def run_replay(args: argparse.Namespace, base_url: str, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    speed = None if args.speed == "max" else float(args.speed)
+    replayer = Replayer(base_url, args.connections if speed is not None else args.concurrency)
+    elapsed = await replayer.replay(records, speed, args.concurrency)
+    result = report(records, replayer.outcomes, elapsed)
+    result["elapsed_s"] = round(elapsed, 3)
+    result["recorded_span_s"] = round(records[-1]["ts"] - records[0]["ts"], 3)
+    if args.verify:
+        result["verification"] = await verify(replayer, records, args.verify_timeout)
+    replayer.pool.close()
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.replay", description="回放录制的 /submit 流量")
+    parser.add_argument("file", help="录制文件（JSONL）")
+    parser.add_argument("--url", help="被测服务地址（默认在子进程中启动应用）")
+    parser.add_argument("--celery", choices=("worker", "eager"), default="worker",
+                        help="子进程服务的任务执行方式: 进程内 worker 或本地执行")
+    parser.add_argument("--speed", default="1", help="回放速度: 倍数（1 为原速）或 max")
+    parser.add_argument("--concurrency", type=int, default=16, help="--speed max 时的并发连接数")
+    parser.add_argument("--connections", type=int, default=64, help="按间隔回放时的最大连接数")
+    parser.add_argument("--limit", type=int, help="只回放前 N 条")
+    parser.add_argument("--no-verify", dest="verify", action="store_false", help="不校验任务结果")
+    parser.add_argument("--verify-timeout", type=float, default=60.0, help="等待任务完成的最长时间（秒）")
+    parser.add_argument("--output", help="结果 JSON 文件（- 为标准输出）")
+    args = parser.parse_args(argv)
+    if args.speed != "max" and float(args.speed) <= 0:
+        parser.error("--speed 必须为正数或 max")
+
+    records, skipped = load_records(args.file, args.limit)
+    if not records:
+        print(f"❌ 录制文件中没有可回放的请求: {args.file}（跳过 {skipped} 行）")
+        return 2
+    mix = {}
+    for record in records:
+        mix[record["chain"]] = mix.get(record["chain"], 0) + 1
+    span = records[-1]["ts"] - records[0]["ts"]
+    print(f"🚀 回放 {len(records)} 个请求（录制时长 {span:.1f}s，跳过 {skipped} 行），速度 {args.speed}，"
+          f"任务链: {', '.join(f'{name}={count}' for name, count in mix.items())}")
+
+    server = log_path = None
+    base_url = args.url
+    if base_url is None:
+        server, base_url, log_path = start_server(args.celery)
+    try:
+        asyncio.run(wait_ready(base_url, 60, server))
+        result = asyncio.run(run_replay(args, base_url, records))
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        if log_path:
+            print(f"   服务日志: {log_path}")
+        return 2
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    rows = []
+    for name, summary in result["chains"].items():
+        latency = summary["latency_ms"]
+        rows.append([name, summary["requests"], summary["errors"], summary["throughput_rps"],
+                     *(latency.get(label, "-") for label, _ in PERCENTILES), latency.get("max", "-")])
+    print_table(["chain", "requests", "errors", "rps", "p50 ms", "p95 ms", "p99 ms", "p999 ms", "max ms"], rows)
+    lag = result["schedule_lag_ms"]
+    print(f"⏱️ 回放耗时 {result['elapsed_s']}s（录制 {result['recorded_span_s']}s），"
+          f"发送滞后 p99 {lag.get('p99', '-')}ms / 最大 {lag.get('max', '-')}ms")
+
+    status = 0
+    verification = result.get("verification")
+    if verification is not None:
+        print(f"🔎 校验 {verification['checked']} 个请求: HTTP 状态不一致 {verification['http_status']}, "
+              f"任务状态不一致 {verification['status']}, 结果不一致 {verification['result']}, "
+              f"超时 {verification['timeout']}")
+        for example in verification["examples"]:
+            print(f"   {json.dumps(example, ensure_ascii=False)}")
+        if verification["mismatches"]:
+            status = 1
+
+    result["meta"] = {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "git_commit": git_commit(),
+                      "file": args.file, "requests": len(records), "speed": args.speed,
+                      "url": args.url or "subprocess", "celery": None if args.url else args.celery}
+    if args.output == "-":
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    elif args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"💾 结果已写入 {args.output}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
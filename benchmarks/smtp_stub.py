@@ -0,0 +1,181 @@
+# benchmarks/smtp_stub.py - 本地 SMTP 替身服务器
+"""
+最小化的本地 SMTP 服务器，用于联调 io.send_email 与基准测试
+
+- 支持 EHLO/HELO/MAIL/RCPT/DATA/RSET/NOOP/QUIT，可选声明 PIPELINING
+- 只计数不投递；地址中包含 "reject" 的收件人返回 550，便于验证部分拒收
+- latency 模拟网络往返：每次客户端写入后的应答整体延迟 latency 秒，
+  流水线化的多条命令只付出一次往返
+
+用法:
+    python -m benchmarks.smtp_stub [端口] [往返延迟毫秒]
+    SMTP_HOST=localhost SMTP_PORT=1025 celery -A celery_app worker ...
+"""
+import asyncio
+import sys
+import time
+from collections import deque
+
+from tasks.async_support import EventLoopThread
+
+class SMTPStubProtocol(asyncio.Protocol):
+    """单个 SMTP 会话"""
+
+    def __init__(self, server: "SMTPStubServer"):
+        self.server = server
+        self.transport = None
+        self._buffer = b""
+        self._in_data = False
+        self._recipients = 0
+        self._replies = []
+        self._outgoing = deque()
+        self._closing = False
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.server.sessions.add(self)
+        self.server.stats["connections"] += 1
+        self._reply("220 stub ESMTP ready")
+        self._flush()
+
+    def connection_lost(self, exc):
+        self.server.sessions.discard(self)
+
+    def data_received(self, data: bytes):
+        self._buffer += data
+        while True:
+            if self._in_data:
+                # 邮件内容以单独一行 "." 结束
+                probe = b"\r\n" + self._buffer
+                end = probe.find(b"\r\n.\r\n")
+                if end < 0:
+                    break
+                self._buffer = probe[end + 5:]
+                self._in_data = False
+                self.server.stats["messages"] += 1
+                self.server.stats["recipients"] += self._recipients
+                self.server.stats["bytes"] += max(end, 0)
+                self._reply("250 OK queued")
+            else:
+                line, sep, rest = self._buffer.partition(b"\r\n")
+                if not sep:
+                    break
+                self._buffer = rest
+                self._command(line.decode("utf-8", "replace"))
+        self._flush()
+
+    def _command(self, line: str):
+        verb = line[:4].upper()
+        self.server.stats["commands"] += 1
+        if verb == "EHLO":
+            extensions = ["250-stub", "250-8BITMIME", "250-SIZE 10485760"]
+            if self.server.pipelining:
+                extensions.append("250-PIPELINING")
+            extensions.append("250 HELP")
+            self._reply("\r\n".join(extensions))
+        elif verb in ("HELO", "NOOP"):
+            self._reply("250 OK")
+        elif verb in ("MAIL", "RSET"):
+            self._recipients = 0
+            self._reply("250 OK")
+        elif verb == "RCPT":
+            if "reject" in line.lower():
+                self._reply("550 mailbox unavailable")
+            else:
+                self._recipients += 1
+                self._reply("250 OK")
+        elif verb == "DATA":
+            if self._recipients:
+                self._in_data = True
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+            else:
+                self._reply("554 no valid recipients")
+        elif verb == "QUIT":
+            self._reply("221 Bye")
+            self._closing = True
+        else:
+            self._reply("502 command not implemented")
+
+    def _reply(self, text: str):
+        self._replies.append(text.encode("utf-8") + b"\r\n")
+
+    def _flush(self):
+        if not self._replies:
+            return
+        payload, self._replies = b"".join(self._replies), []
+        closing = self._closing
+        if self.server.latency:
+            # 按顺序出队，保证多批应答的先后次序
+            self._outgoing.append((payload, closing))
+            asyncio.get_running_loop().call_later(self.server.latency, self._write_next)
+        else:
+            self._write(payload, closing)
+
+    def _write_next(self):
+        payload, closing = self._outgoing.popleft()
+        self._write(payload, closing)
+
+    def _write(self, payload: bytes, closing: bool):
+        if self.transport.is_closing():
+            return
+        self.transport.write(payload)
+        if closing:
+            self.transport.close()
+
+class SMTPStubServer:
+    """在后台事件循环中运行的 SMTP 替身服务器"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 pipelining: bool = True):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.pipelining = pipelining
+        self.stats = {"connections": 0, "commands": 0, "messages": 0, "recipients": 0, "bytes": 0}
+        self.sessions = set()
+        self._loop_thread = EventLoopThread(name="smtp-stub")
+        self._server = None
+
+    def start(self) -> "SMTPStubServer":
+        async def serve():
+            loop = asyncio.get_running_loop()
+            return await loop.create_server(lambda: SMTPStubProtocol(self), self.host, self.port)
+
+        self._server = self._loop_thread.run(serve())
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    def stop(self) -> None:
+        async def close():
+            self._server.close()
+            # 同时断开已建立的会话，模拟服务器重启
+            for session in list(self.sessions):
+                session.transport.close()
+            await self._server.wait_closed()
+
+        if self._server is not None:
+            self._loop_thread.run(close())
+            self._server = None
+        self._loop_thread.stop()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+def main():
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 1025
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.0
+
+    with SMTPStubServer(port=port, latency=latency) as server:
+        print(f"📮 SMTP替身服务器: {server.host}:{server.port}, 往返延迟 {latency * 1000:g}ms (Ctrl+C 退出)")
+        try:
+            while True:
+                time.sleep(5)
+                print(f"   {server.stats}")
+        except KeyboardInterrupt:
+            pass
+
+if __name__ == "__main__":
+    main()
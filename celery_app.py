@@ -1,36 +1,66 @@
 # celery_app.py - Celery应用配置和初始化
 from celery import Celery
-from config import CeleryConfig
+from config import CeleryConfig, MathCostConfig, ResultPolicyConfig, SerializationConfig
+from scheduling import PriorityRouter, install_scheduling, priority_queues
+from serializers import SerializerAnnotation, register_serializers
+
+# 注册自定义序列化器（json-z，以及安装了msgpack时的msgpack-typed）
+available_serializers = register_serializers()
 
 # 创建全局应用实例
 app = Celery('task_chain')
 
+# 任务路由: 按任务名前缀路由到 math / data / io，celery 为默认队列（chord_unlock 等内置任务）
+TASK_ROUTES = {
+    'math.*': 'math',
+    'data.*': 'data',
+    'io.*': 'io',
+    'add_multiply_divide': 'math',
+    'power_sqrt': 'math',
+    'complex_math': 'math',
+}
+
+# worker 需要消费的全部队列（math / data 按提交优先级拆分为 math.high / math / math.low；
+# 重计算队列只接收结果规模超过 MATH_HEAVY_DIGITS 的任务链，见 ChainService.get_queue）
+QUEUES = ('celery', *priority_queues('math'), *priority_queues('data'), *priority_queues('io'),
+          MathCostConfig.HEAVY_QUEUE)
+
 # 直接配置Celery - 更简洁直接的方式
 app.conf.update(
     broker_url=CeleryConfig.BROKER_URL,
     result_backend=CeleryConfig.RESULT_BACKEND,
-    task_serializer='json',
-    accept_content=['json'],
-    result_serializer='json',
+    task_serializer=SerializationConfig.TASK_SERIALIZER,
+    accept_content=['json', *available_serializers],
+    result_serializer=SerializationConfig.RESULT_SERIALIZER,
+    result_accept_content=['json', *available_serializers],
     timezone='Asia/Shanghai',
     enable_utc=True,
-    task_track_started=True,
+    task_track_started=ResultPolicyConfig.TRACK_STARTED,
+    # 中间步骤忽略结果时，错误仍写入后端并沿任务链传播到最后一步
+    task_store_errors_even_if_ignored=True,
+    result_expires=ResultPolicyConfig.RESULT_EXPIRES,
     task_time_limit=30 * 60,  # 30分钟
     task_soft_time_limit=25 * 60,  # 25分钟软限制
+    # worker 的默认预取与子进程回收；按队列的执行池、并发与预取见 worker_profiles.py
     worker_prefetch_multiplier=1,
     worker_max_tasks_per_child=1000,
     broker_connection_retry_on_startup=True,
-    # 任务路由配置
-    task_routes={
-        'tasks.math_tasks.*': {'queue': 'math'},
-        'tasks.data_tasks.*': {'queue': 'data'},
-        'tasks.io_tasks.*': {'queue': 'io'},
-        'add_multiply_divide': {'queue': 'math'},
-        'power_sqrt': {'queue': 'math'},
-        'complex_math': {'queue': 'math'},
+    # 任务路由配置（按任务名前缀，再按当前任务链的优先级选择队列）
+    task_routes=(PriorityRouter(TASK_ROUTES),),
+    # 定时回收未释放的claim-check负载（需启动 celery beat；嵌入模式由 EmbeddedExecutor 定时执行）
+    beat_schedule={
+        'collect-payload-garbage': {
+            'task': 'io.collect_payload_garbage',
+            'schedule': 3600.0,
+        },
     }
 )
 
+# 按任务/队列选择消息序列化器
+app.conf.task_annotations = [
+    SerializerAnnotation(app, SerializationConfig.TASK_SERIALIZERS, SerializationConfig.QUEUE_SERIALIZERS)
+]
+
 # 自动发现任务 - 更灵活的方式
 app.autodiscover_tasks([
     'tasks.math_tasks',
@@ -38,10 +68,22 @@ app.autodiscover_tasks([
     'tasks.io_tasks'
 ], force=True)
 
+# 通过信号为所有任务记录排队等待、执行耗时与消息大小（/metrics 汇总）
+from tasks.base import install_task_metrics
+install_task_metrics()
+
+# 经 API 提交的任务链：追踪ID随每一步传递，各步骤耗时批量写入 task_steps
+from tasks.tracing import install_tracing
+install_tracing()
+
+# 任务链的优先级与租户随每一步传递（FairPool 按其做加权公平排队）
+install_scheduling()
+
 # 输出配置信息
 print(f"✅ Celery应用启动完成")
 print(f"🔧 Broker: {app.conf.broker_url}")
 print(f"🔧 Result Backend: {app.conf.result_backend}")
+print(f"📦 序列化: 消息={app.conf.task_serializer}, 结果={app.conf.result_serializer}")
 print(f"⏰ 任务时间限制: {app.conf.task_time_limit}秒")
 print(f"👷 Worker预取: {app.conf.worker_prefetch_multiplier}")
 
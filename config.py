@@ -2,6 +2,24 @@
 import os
 from typing import Dict, Any
 
+def _parse_mapping(value: str) -> Dict[str, str]:
+    """解析 "key=value,key2=value2" 形式的环境变量"""
+    mapping = {}
+    for item in filter(None, (part.strip() for part in (value or '').split(','))):
+        key, _, val = item.partition('=')
+        mapping[key.strip()] = val.strip()
+    return mapping
+
+class EmbeddedConfig:
+    """嵌入模式: 任务链在 API 进程内执行，不需要 Redis 与 worker（边缘部署、CI）"""
+    
+    ENABLED = os.getenv('EMBEDDED_MODE', 'false').lower() == 'true'
+    
+    # 每个队列的执行线程数 "队列=线程数"；未配置的队列取同名 worker 配置（WORKER_PROFILE_*）的并发数，
+    # 两者都没有时为 DEFAULT_POOL_SIZE
+    POOL_SIZES = _parse_mapping(os.getenv('EMBEDDED_POOL_SIZES', ''))
+    DEFAULT_POOL_SIZE = int(os.getenv('EMBEDDED_DEFAULT_POOL_SIZE', 4))
+    
 class CeleryConfig:
     """Celery配置类 - 简化版，只保留连接配置"""
     
@@ -13,11 +31,316 @@ class CeleryConfig:
     
     # 构建Redis URL
     if REDIS_PASSWORD:
-        BROKER_URL = f"redis://:{REDIS_PASSWORD}@{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}"
-        RESULT_BACKEND = f"redis://:{REDIS_PASSWORD}@{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}"
+        REDIS_URL = f"redis://:{REDIS_PASSWORD}@{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}"
     else:
-        BROKER_URL = f"redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}"
-        RESULT_BACKEND = f"redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}"
+        REDIS_URL = f"redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}"
+    
+    # 可直接指定 broker 与结果后端；嵌入模式默认使用进程内存，不连接 Redis
+    BROKER_URL = os.getenv('CELERY_BROKER_URL') or ('memory://' if EmbeddedConfig.ENABLED else REDIS_URL)
+    RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND') or ('cache+memory://' if EmbeddedConfig.ENABLED else REDIS_URL)
+    
+class SerializationConfig:
+    """任务消息与结果的序列化配置（默认json，保持兼容）"""
+    
+    # 全局默认的消息/结果序列化器 (json, json-z, msgpack-typed)
+    TASK_SERIALIZER = os.getenv('CELERY_TASK_SERIALIZER', 'json')
+    RESULT_SERIALIZER = os.getenv('CELERY_RESULT_SERIALIZER', 'json')
+    
+    # 按任务名(glob)选择序列化器，如 "data.*=msgpack-typed"
+    TASK_SERIALIZERS = _parse_mapping(os.getenv('CELERY_TASK_SERIALIZERS', ''))
+    
+    # 按路由队列选择序列化器，如 "data=msgpack-typed,io=json-z"
+    QUEUE_SERIALIZERS = _parse_mapping(os.getenv('CELERY_QUEUE_SERIALIZERS', ''))
+    
+    # 超过该字节数的消息/结果进行zlib压缩
+    COMPRESSION_THRESHOLD = int(os.getenv('CELERY_COMPRESSION_THRESHOLD', 4096))
+    COMPRESSION_LEVEL = int(os.getenv('CELERY_COMPRESSION_LEVEL', 1))
+    
+class ResultPolicyConfig:
+    """任务链结果存储策略配置"""
+    
+    # 默认结果策略: final_only（只持久化最后一步）或 all（每一步都写结果后端）
+    CHAIN_RESULT_POLICY = os.getenv('CHAIN_RESULT_POLICY', 'final_only')
+    
+    # 结果后端中结果的过期时间（秒）
+    RESULT_EXPIRES = int(os.getenv('CELERY_RESULT_EXPIRES', 3600))
+    
+    # 是否记录STARTED状态（每个任务额外一次结果后端写入）
+    TRACK_STARTED = os.getenv('CELERY_TASK_TRACK_STARTED', 'True').lower() == 'true'
+    
+    # 最终结果写入数据库后是否从结果后端删除
+    FORGET_AFTER_READ = os.getenv('CHAIN_FORGET_AFTER_READ', 'True').lower() == 'true'
+    
+class MapReduceConfig:
+    """map-reduce 工作流配置"""
+    
+    # 单个工作流的最大分片数（chord 头部的签名数），通常不超过 data 队列 worker 的并发总数
+    MAX_SHARDS = int(os.getenv('MAP_REDUCE_MAX_SHARDS', 32))
+    
+class PayloadStoreConfig:
+    """大数据负载存储配置（claim-check：大负载存入存储，消息中只传引用）"""
+    
+    # 存储后端 (local，或通过 register_store 注册的共享存储)
+    BACKEND = os.getenv('PAYLOAD_STORE_BACKEND', 'local')
+    
+    # 本地存储目录
+    ROOT_DIR = os.getenv('PAYLOAD_STORE_DIR', 'payload_store')
+    
+    # 序列化后超过该字节数的负载替换为引用
+    THRESHOLD_BYTES = int(os.getenv('PAYLOAD_THRESHOLD_BYTES', 64 * 1024))
+    
+    # 引用未被释放的负载在该时间后由垃圾回收清理
+    TTL_SECONDS = int(os.getenv('PAYLOAD_TTL_SECONDS', 24 * 3600))
+    
+class FileSinkConfig:
+    """io.save_to_file 文件写入配置"""
+    
+    # 输出根目录，文件名均解析到该目录下
+    OUTPUT_DIR = os.getenv('FILE_SINK_DIR', 'output')
+    
+    # 覆盖写入的缓冲区大小（字节）；追加模式每批拼接后一次写入
+    BUFFER_SIZE = int(os.getenv('FILE_SINK_BUFFER_SIZE', 1024 * 1024))
+    
+    # 追加模式的合并窗口（毫秒）与单批最大字节数
+    BATCH_WINDOW_MS = int(os.getenv('FILE_SINK_BATCH_WINDOW_MS', 20))
+    BATCH_MAX_BYTES = int(os.getenv('FILE_SINK_BATCH_MAX_BYTES', 4 * 1024 * 1024))
+    
+    # 是否fsync（关闭后只保证写入页缓存）
+    FSYNC = os.getenv('FILE_SINK_FSYNC', 'True').lower() == 'true'
+    
+class DatabaseSinkConfig:
+    """io.save_to_database 数据库写入配置"""
+    
+    # 目标数据库（默认本地SQLite，可换成PostgreSQL/MySQL的URL）
+    DATABASE_URL = os.getenv('DB_SINK_URL', 'sqlite:///sink.db')
+    
+    # 连接池
+    POOL_SIZE = int(os.getenv('DB_SINK_POOL_SIZE', 5))
+    MAX_OVERFLOW = int(os.getenv('DB_SINK_MAX_OVERFLOW', 10))
+    
+    # 同一张表的并发小保存合并窗口（毫秒）与单个事务最大行数
+    BATCH_WINDOW_MS = int(os.getenv('DB_SINK_BATCH_WINDOW_MS', 5))
+    BATCH_MAX_ROWS = int(os.getenv('DB_SINK_BATCH_MAX_ROWS', 5000))
+    
+class EmailConfig:
+    """io.send_email SMTP 发送配置"""
+    
+    SMTP_HOST = os.getenv('SMTP_HOST', 'localhost')
+    SMTP_PORT = int(os.getenv('SMTP_PORT', 1025))
+    SMTP_USERNAME = os.getenv('SMTP_USERNAME', '')
+    SMTP_PASSWORD = os.getenv('SMTP_PASSWORD', '')
+    SMTP_STARTTLS = os.getenv('SMTP_STARTTLS', 'False').lower() == 'true'
+    SMTP_TIMEOUT = int(os.getenv('SMTP_TIMEOUT', 10))
+    FROM_ADDRESS = os.getenv('SMTP_FROM_ADDRESS', 'noreply@example.com')
+    
+    # 每个 worker 进程的持久连接数上限
+    POOL_SIZE = int(os.getenv('SMTP_POOL_SIZE', 4))
+    
+    # 单个连接发送该数量邮件后重建（部分服务器限制每个会话的邮件数）
+    MAX_MESSAGES_PER_CONNECTION = int(os.getenv('SMTP_MAX_MESSAGES_PER_CONNECTION', 100))
+    
+    # 空闲超过该秒数的连接复用前先 NOOP 检查；超过 IDLE_TIMEOUT 直接关闭重连
+    HEALTH_CHECK_INTERVAL = int(os.getenv('SMTP_HEALTH_CHECK_INTERVAL', 30))
+    IDLE_TIMEOUT = int(os.getenv('SMTP_IDLE_TIMEOUT', 240))
+    
+class NotificationConfig:
+    """io.send_notification webhook 推送配置"""
+    
+    # 默认推送地址，各渠道可单独配置，如 "slack=https://hooks.slack.com/services/xxx,sms=http://sms-gw/send"
+    WEBHOOK_URL = os.getenv('NOTIFY_WEBHOOK_URL', 'http://localhost:8080/notify')
+    CHANNEL_URLS = _parse_mapping(os.getenv('NOTIFY_CHANNEL_URLS', ''))
+    
+    # 每个 worker 进程的并发请求总数与单个主机的并发上限（keep-alive 连接复用）
+    MAX_CONNECTIONS = int(os.getenv('NOTIFY_MAX_CONNECTIONS', 32))
+    PER_HOST_LIMIT = int(os.getenv('NOTIFY_PER_HOST_LIMIT', 8))
+    TIMEOUT = int(os.getenv('NOTIFY_TIMEOUT', 10))
+    
+    # 同一渠道的突发通知在合并窗口（毫秒）内合并成一次请求，0 表示不合并
+    COALESCE_WINDOW_MS = int(os.getenv('NOTIFY_COALESCE_WINDOW_MS', 50))
+    COALESCE_MAX_MESSAGES = int(os.getenv('NOTIFY_COALESCE_MAX_MESSAGES', 100))
+    
+class BackupConfig:
+    """io.backup_data 备份存储配置"""
+    
+    # 本地内容寻址存储目录（分块与清单）
+    ROOT_DIR = os.getenv('BACKUP_DIR', 'backups')
+    
+    # 内容定义分块的最小/平均/最大块大小（字节），平均值取2的幂
+    MIN_CHUNK_SIZE = int(os.getenv('BACKUP_MIN_CHUNK_SIZE', 4 * 1024))
+    AVG_CHUNK_SIZE = int(os.getenv('BACKUP_AVG_CHUNK_SIZE', 16 * 1024))
+    MAX_CHUNK_SIZE = int(os.getenv('BACKUP_MAX_CHUNK_SIZE', 64 * 1024))
+    
+    # 分块压缩级别（zlib，0 表示不压缩）
+    COMPRESSION_LEVEL = int(os.getenv('BACKUP_COMPRESSION_LEVEL', 1))
+    
+class ReportCacheConfig:
+    """io.generate_report 报告缓存配置"""
+    
+    # 报告文件与缓存索引目录
+    ROOT_DIR = os.getenv('REPORT_DIR', 'reports')
+    
+    # 报告文件总大小上限，超过后按最近最少使用淘汰
+    MAX_BYTES = int(os.getenv('REPORT_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+    
+class TaskLogConfig:
+    """任务日志配置（tasks.* 日志经有界队列由后台线程写出）"""
+    
+    # 任务日志级别，低于该级别的日志不做任何格式化；为空时跟随 worker 的 -l（非 worker 进程为 INFO）
+    LEVEL = os.getenv('TASK_LOG_LEVEL', '')
+    
+    # DEBUG/INFO 日志的采样比例 (0~1)，WARNING 及以上始终记录
+    SAMPLE_RATE = float(os.getenv('TASK_LOG_SAMPLE_RATE', 1.0))
+    
+    # 参数摘要：容器最多展示的元素数，单个参数最多展示的字符数
+    MAX_ITEMS = int(os.getenv('TASK_LOG_MAX_ITEMS', 10))
+    MAX_CHARS = int(os.getenv('TASK_LOG_MAX_CHARS', 200))
+    
+    # 待写出日志的队列容量，队列满时丢弃并计数，不阻塞任务
+    QUEUE_SIZE = int(os.getenv('TASK_LOG_QUEUE_SIZE', 10000))
+    
+    # 单独的日志文件；为空时 worker 中交给 worker 的 handler（-f/--logfile），其他进程写到标准错误
+    FILE = os.getenv('TASK_LOG_FILE', '')
+    
+class MetricsConfig:
+    """任务与 API 指标配置（各进程写入共享目录，/metrics 汇总）"""
+    
+    # 是否为所有任务与 API 请求记录延迟直方图
+    ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() == 'true'
+    
+    # 各进程指标快照目录，worker 与 API 需共享
+    DIR = os.getenv('METRICS_DIR', 'metrics')
+    
+    # 快照写出间隔（秒）
+    FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 1.0))
+    
+    # 超过该秒数未更新的快照视为进程已退出，合并到归档后删除
+    STALE_SECONDS = int(os.getenv('METRICS_STALE_SECONDS', 60))
+    
+class TracingConfig:
+    """任务链追踪配置（每一步的入队/开始/结束时间写入 task_steps 表）"""
+    
+    # 是否为经 API 提交的任务链记录步骤耗时
+    ENABLED = os.getenv('TRACE_ENABLED', 'True').lower() == 'true'
+    
+    # task_steps 所在数据库，与任务记录同库
+    DATABASE_URL = os.getenv('TRACE_DATABASE_URL', 'sqlite:///tasks.db')
+    
+    # 步骤记录的批量写入间隔与单批最大行数
+    FLUSH_INTERVAL_MS = int(os.getenv('TRACE_FLUSH_INTERVAL_MS', 200))
+    BATCH_MAX_ROWS = int(os.getenv('TRACE_BATCH_MAX_ROWS', 500))
+    
+class TrafficRecordConfig:
+    """/submit 流量录制配置（录制的 JSONL 可由 benchmarks.replay 回放）"""
+    
+    # 是否录制（默认关闭）
+    ENABLED = os.getenv('TRAFFIC_RECORD_ENABLED', 'False').lower() == 'true'
+    
+    # 录制文件（每行一个请求，追加写入）
+    FILE = os.getenv('TRAFFIC_RECORD_FILE', 'traffic.jsonl')
+    
+class SchedulingConfig:
+    """提交优先级与租户公平调度配置"""
+    
+    # 按优先级拆分的队列: normal 使用原队列名，high / low 使用 "队列.high" / "队列.low"
+    PRIORITY_QUEUES = [queue.strip() for queue in os.getenv('PRIORITY_QUEUES', 'math,data').split(',') if queue.strip()]
+    
+    # FairPool 加权公平排队的权重（分流权重 = 优先级权重 × 租户权重，未配置的租户为 1）
+    PRIORITY_WEIGHTS = {key: float(value) for key, value in
+                        _parse_mapping(os.getenv('PRIORITY_WEIGHTS', 'high=16,normal=4,low=1')).items()}
+    TENANT_WEIGHTS = {key: float(value) for key, value in _parse_mapping(os.getenv('TENANT_WEIGHTS', '')).items()}
+    
+    # 请求未指定租户时使用的租户
+    DEFAULT_TENANT = os.getenv('DEFAULT_TENANT', 'default')
+    
+class AdmissionConfig:
+    """/submit 准入控制配置（按队列的未完成任务数与按客户端的令牌桶）"""
+    
+    ENABLED = os.getenv('ADMISSION_ENABLED', 'True').lower() == 'true'
+    
+    # 未完成任务数上限（高水位），如 "math=2000,math.low=500":
+    # 原队列名（math）为该队列全部优先级子队列合计的上限，未配置的队列使用 DEFAULT_HIGH_WATER；
+    # 子队列名（math.low）为该子队列单独的上限，同时仍受原队列合计上限约束
+    HIGH_WATER = {key: int(value) for key, value in _parse_mapping(os.getenv('ADMISSION_HIGH_WATER', '')).items()}
+    DEFAULT_HIGH_WATER = int(os.getenv('ADMISSION_DEFAULT_HIGH_WATER', 1000))
+    
+    # 每个客户端（按客户端地址）每秒补充的令牌数与桶容量，速率为 0 时不限速
+    CLIENT_RATE = float(os.getenv('ADMISSION_CLIENT_RATE', 0))
+    CLIENT_BURST = int(os.getenv('ADMISSION_CLIENT_BURST', 20))
+    # 内存中保留的客户端令牌桶数量（超过时淘汰最久未访问的）
+    MAX_CLIENTS = int(os.getenv('ADMISSION_MAX_CLIENTS', 10000))
+    
+    # 拒绝时 Retry-After 的上限（秒）
+    MAX_RETRY_AFTER = int(os.getenv('ADMISSION_MAX_RETRY_AFTER', 60))
+    
+    # 结果跟踪: 轮询已提交任务链结果的间隔（毫秒），以及放弃跟踪的时间（秒，默认为结果过期时间）
+    TRACK_INTERVAL_MS = int(os.getenv('ADMISSION_TRACK_INTERVAL_MS', 100))
+    TRACK_TIMEOUT = float(os.getenv('ADMISSION_TRACK_TIMEOUT', ResultPolicyConfig.RESULT_EXPIRES))
+    
+class MathCostConfig:
+    """math.power 的结果规模估算与分流（按结果的十进制位数）"""
+    
+    # 精确计算的结果位数上限（超过 json 序列化大整数的默认上限 4300 位，导入 tasks.numeric 时放宽进程的上限）
+    EXACT_MAX_DIGITS = int(os.getenv('MATH_EXACT_MAX_DIGITS', 1000000))
+    
+    # 超过上限的结果: approximate 在对数空间计算（结果为浮点数或 {"sign", "log10"}），reject 直接拒绝请求
+    OVERSIZE_POLICY = os.getenv('MATH_OVERSIZE_POLICY', 'approximate')
+    
+    # 精确结果在 (HEAVY_DIGITS, EXACT_MAX_DIGITS] 位之间的任务链路由到独立的重计算队列（需要单独的 worker 消费）；
+    # 超过 EXACT_MAX_DIGITS 的在对数空间计算，开销很小，仍在 math 队列。HEAVY_DIGITS 需小于 EXACT_MAX_DIGITS
+    HEAVY_DIGITS = int(os.getenv('MATH_HEAVY_DIGITS', 100000))
+    HEAVY_QUEUE = os.getenv('MATH_HEAVY_QUEUE', 'heavy')
+    
+class WorkerProfileConfig:
+    """按队列的 worker 配置（python worker_profiles.py 按配置启动）"""
+
+    # python worker_profiles.py 不指定配置名时启动的配置
+    ENABLED = [name.strip() for name in os.getenv('WORKER_PROFILES', 'celery,math,data,io,heavy').split(',') if name.strip()]
+
+    # 每个配置消费同名队列（含优先级子队列），参数为 "pool=执行池,concurrency=并发数（0 为 CPU 核数）,
+    # prefetch=预取倍数,max_tasks=子进程执行多少个任务后重启,max_memory_kb=子进程常驻内存上限（KiB）,
+    # processes=worker 进程数"，未给出的参数使用 celery_app 的全局设置
+    # - math: 任务体只有微秒级计算，放大预取窗口减少与 broker 的往返；FairPool 在窗口内按优先级/租户排队
+    # - data: 列表计算会留下大块内存，按任务数与常驻内存回收子进程
+    # - io: 任务时间主要在等待网络，事件循环执行池单进程承载数百个并发
+    # - heavy: 大整数幂运算，单并发、严格限制内存
+    # - celery: chord_unlock 等内置任务，线程池即可
+    PROFILES = {
+        name: _parse_mapping(os.getenv(f'WORKER_PROFILE_{name.upper()}', default))
+        for name, default in {
+            'celery': 'pool=threads,concurrency=4,prefetch=4',
+            'math': 'pool=worker_pools:FairPool,concurrency=0,prefetch=16,max_tasks=10000',
+            'data': 'pool=prefork,concurrency=0,prefetch=1,max_tasks=100,max_memory_kb=524288',
+            'io': 'pool=worker_pools:AsyncIOPool,concurrency=200,prefetch=1',
+            'heavy': 'pool=prefork,concurrency=1,prefetch=1,max_tasks=10,max_memory_kb=2097152',
+        }.items()
+    }
+
+    # 子进程意外退出时重新启动前的等待（秒）
+    RESTART_DELAY = float(os.getenv('WORKER_PROFILE_RESTART_DELAY', 5))
+
+class AutoscaleConfig:
+    """按队列深度自动伸缩 worker 的配置（python autoscaler.py）"""
+    
+    # 每个队列的 worker 进程数范围 "队列=最小:最大"；celery 为默认队列（chord_unlock 等内置任务）
+    BOUNDS = _parse_mapping(os.getenv('AUTOSCALE_BOUNDS', 'celery=1:1,math=1:4,data=1:4,io=1:4,heavy=0:2'))
+    
+    # 采样与决策间隔（秒）
+    INTERVAL = float(os.getenv('AUTOSCALE_INTERVAL', 5))
+    
+    # 每个 worker 的目标积压消息数，超过即扩容
+    TARGET_BACKLOG = int(os.getenv('AUTOSCALE_TARGET_BACKLOG', 20))
+    
+    # 排队等待时间 p95 的目标（毫秒），超过即扩容；需与 worker 共享 METRICS_DIR
+    TARGET_WAIT_MS = int(os.getenv('AUTOSCALE_TARGET_WAIT_MS', 2000))
+    
+    # 积压与等待都低于目标的该比例，并持续 SCALE_DOWN_DELAY 秒后才缩容（每次减少 1 个）
+    SCALE_DOWN_RATIO = float(os.getenv('AUTOSCALE_SCALE_DOWN_RATIO', 0.25))
+    SCALE_DOWN_DELAY = float(os.getenv('AUTOSCALE_SCALE_DOWN_DELAY', 60))
+    
+    # worker 进程的启动参数，按队列配置；未配置的队列使用同名 worker 配置（WORKER_PROFILE_*），
+    # 两者都没有时使用 DEFAULT_WORKER_ARGS
+    WORKER_ARGS = _parse_mapping(os.getenv('AUTOSCALE_WORKER_ARGS', ''))
+    DEFAULT_WORKER_ARGS = os.getenv('AUTOSCALE_DEFAULT_WORKER_ARGS', '-c 2')
     
 class AppConfig:
     """应用程序配置"""
@@ -0,0 +1,178 @@
+# scheduling.py - 提交优先级与租户公平调度
+"""
+优先级与租户公平调度
+
+- API 提交任务链时把优先级（high / normal / low）与租户写入消息头；worker 发布后续步骤时从当前
+  任务的请求中继承，整条链的每一步都使用同一优先级与租户
+- 发布端: PriorityRouter 把 math.* / data.* 路由到按优先级拆分的队列（normal 使用原队列名，
+  high / low 使用 "math.high" / "math.low"），低优先级的积压不会排在高优先级消息之前
+- worker 端: FairScheduler 对预取窗口内的任务按 (优先级, 租户) 分流做加权公平排队
+  （start-time fair queueing），权重 = 优先级权重 × 租户权重；worker_pools.FairPool 使用它
+  决定空闲执行槽位下一个执行哪个任务
+
+同一优先级内，broker 队列仍按先进先出投递；租户之间的公平只在 worker 已预取的消息中生效，
+窗口大小由 --prefetch-multiplier 决定。
+"""
+import contextlib
+import fnmatch
+import heapq
+import itertools
+import re
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from celery import signals
+from celery._state import get_current_task
+
+from config import SchedulingConfig
+
+PRIORITY_HEADER = 'priority_level'
+TENANT_HEADER = 'tenant'
+
+# 从高到低；worker 按此顺序声明要消费的队列
+PRIORITY_LEVELS = ('high', 'normal', 'low')
+DEFAULT_PRIORITY = 'normal'
+
+# API 侧当前请求的 (优先级, 租户)（worker 侧从当前任务的请求中读取）
+_current_schedule: ContextVar[Optional[Tuple[str, str]]] = ContextVar('schedule', default=None)
+
+
+def message_header(request, name: str) -> Any:
+    """读取消息头：worker 中为请求属性，本地执行（apply）时在 request.headers 中"""
+    value = getattr(request, name, None)
+    if value is None and request.headers:
+        value = request.headers.get(name)
+    return value
+
+
+def validate_priority(priority: Optional[str]) -> str:
+    """校验优先级，None 表示 normal"""
+    priority = priority or DEFAULT_PRIORITY
+    if priority not in PRIORITY_LEVELS:
+        raise ValueError(f"不支持的优先级: {priority}，可选: {', '.join(PRIORITY_LEVELS)}")
+    return priority
+
+
+def current_schedule() -> Tuple[Optional[str], Optional[str]]:
+    """当前上下文的 (优先级, 租户)，未设置时为 (None, None)"""
+    schedule = _current_schedule.get()
+    if schedule is not None:
+        return schedule
+    task = get_current_task()
+    if task is not None:
+        return message_header(task.request, PRIORITY_HEADER), message_header(task.request, TENANT_HEADER)
+    return None, None
+
+
+@contextlib.contextmanager
+def schedule_context(priority: str, tenant: str) -> Iterator[None]:
+    """在该上下文中发布的任务都带上优先级与租户"""
+    token = _current_schedule.set((validate_priority(priority), tenant or SchedulingConfig.DEFAULT_TENANT))
+    try:
+        yield
+    finally:
+        _current_schedule.reset(token)
+
+
+def priority_queue(queue: str, priority: Optional[str]) -> str:
+    """队列在该优先级下的实际队列名"""
+    if queue not in SchedulingConfig.PRIORITY_QUEUES or priority in (None, DEFAULT_PRIORITY):
+        return queue
+    return f"{queue}.{priority}"
+
+
+def priority_queues(queue: str) -> Tuple[str, ...]:
+    """worker 消费该队列时需要声明的全部队列（高优先级在前）"""
+    if queue not in SchedulingConfig.PRIORITY_QUEUES:
+        return (queue,)
+    return tuple(priority_queue(queue, priority) for priority in PRIORITY_LEVELS)
+
+
+def base_queue(queue: str) -> str:
+    """按优先级拆分的队列对应的原队列名"""
+    name, _, priority = queue.rpartition('.')
+    if name in SchedulingConfig.PRIORITY_QUEUES and priority in PRIORITY_LEVELS:
+        return name
+    return queue
+
+
+class PriorityRouter:
+    """
+    Celery 路由: 按任务名匹配队列，再按当前优先级选择拆分后的队列
+
+    Args:
+        routes: {任务名 glob: 队列}，如 {"math.*": "math"}
+    """
+
+    def __init__(self, routes: Dict[str, str]):
+        self.routes = [(re.compile(fnmatch.translate(pattern)), queue) for pattern, queue in routes.items()]
+
+    def __call__(self, name, args, kwargs, options, task=None, **kw):
+        for pattern, queue in self.routes:
+            if pattern.match(name):
+                return {'queue': priority_queue(queue, current_schedule()[0])}
+        return None
+
+
+def _propagate_schedule(headers=None, **kwargs):
+    """发布端：写入优先级与租户"""
+    if headers is None:
+        return
+    priority, tenant = current_schedule()
+    if priority is not None:
+        headers.setdefault(PRIORITY_HEADER, priority)
+    if tenant is not None:
+        headers.setdefault(TENANT_HEADER, tenant)
+
+
+def install_scheduling() -> None:
+    """通过 Celery 信号传递优先级与租户（重复调用无副作用）"""
+    signals.before_task_publish.connect(_propagate_schedule, weak=False, dispatch_uid='scheduling.publish')
+
+
+class FairScheduler:
+    """
+    按 (优先级, 租户) 分流的加权公平队列
+
+    每个任务的开始标签为 max(虚拟时间, 同一分流上一个任务的结束标签)，结束标签为开始标签 + 1/权重，
+    每次取出结束标签最小的任务，虚拟时间推进到它的开始标签。积压的分流按权重比例分得执行机会，
+    新到达的高权重任务最多等待正在执行的任务。
+    """
+
+    def __init__(self, priority_weights: Dict[str, float] = None, tenant_weights: Dict[str, float] = None):
+        self.priority_weights = SchedulingConfig.PRIORITY_WEIGHTS if priority_weights is None else priority_weights
+        self.tenant_weights = SchedulingConfig.TENANT_WEIGHTS if tenant_weights is None else tenant_weights
+        self.virtual_time = 0.0
+        self._heap: List[Tuple[float, int, float, Tuple[str, str], Any]] = []
+        self._sequence = itertools.count()
+        # 各分流最后一个任务的结束标签与排队任务数；分流排空后删除，重新到达时从当前虚拟时间开始
+        self._finish: Dict[Tuple[str, str], float] = {}
+        self._pending: Dict[Tuple[str, str], int] = {}
+
+    def weight(self, priority: Optional[str], tenant: Optional[str]) -> float:
+        return (self.priority_weights.get(priority or DEFAULT_PRIORITY, 1.0)
+                * self.tenant_weights.get(tenant or SchedulingConfig.DEFAULT_TENANT, 1.0))
+
+    def push(self, item: Any, priority: Optional[str] = None, tenant: Optional[str] = None) -> None:
+        flow = (priority or DEFAULT_PRIORITY, tenant or SchedulingConfig.DEFAULT_TENANT)
+        start = max(self.virtual_time, self._finish.get(flow, 0.0))
+        finish = start + 1.0 / self.weight(*flow)
+        self._finish[flow] = finish
+        self._pending[flow] = self._pending.get(flow, 0) + 1
+        heapq.heappush(self._heap, (finish, next(self._sequence), start, flow, item))
+
+    def pop(self) -> Any:
+        _, _, start, flow, item = heapq.heappop(self._heap)
+        self.virtual_time = max(self.virtual_time, start)
+        self._pending[flow] -= 1
+        if not self._pending[flow]:
+            del self._pending[flow]
+            del self._finish[flow]
+        return item
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def backlog(self) -> Dict[Tuple[str, str], int]:
+        """各分流排队的任务数"""
+        return dict(self._pending)
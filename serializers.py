@@ -0,0 +1,183 @@
+# serializers.py - 任务消息/结果的二进制序列化与压缩
+"""
+自定义 Celery 序列化器
+
+- msgpack-typed: msgpack 二进制编码，同类型数值列表（int64/float64）打包成定长数组
+- json-z: 与 json 完全兼容的数据模型，超过阈值时压缩
+
+两者都使用 1 字节帧头标记是否经过 zlib 压缩，小消息不压缩，避免无谓的CPU开销。
+默认仍使用 json，通过环境变量按任务/队列切换（见 config.SerializationConfig）。
+"""
+import json
+import sys
+import zlib
+from array import array
+from fnmatch import fnmatchcase
+from typing import Any, Dict, Optional
+
+from kombu.serialization import register
+
+from config import SerializationConfig
+
+try:
+    import msgpack
+except ImportError:  # msgpack 未安装时只提供 json-z
+    msgpack = None
+
+# 帧头
+_RAW = b'\x00'
+_ZLIB = b'\x01'
+
+# msgpack 扩展类型编号
+EXT_INT64_ARRAY = 1
+EXT_FLOAT64_ARRAY = 2
+EXT_BIGINT = 3
+
+# 达到该长度的同类型数值列表才打包为定长数组
+MIN_TYPED_ARRAY_LENGTH = 16
+
+_CONTAINER_TYPES = {list, tuple, dict}
+_INT64_MIN, _UINT64_MAX = -2 ** 63, 2 ** 64 - 1
+_LITTLE_ENDIAN = sys.byteorder == 'little'
+
+
+def compress_frame(data: bytes, threshold: int = None, level: int = None) -> bytes:
+    """超过阈值时压缩并加帧头"""
+    threshold = SerializationConfig.COMPRESSION_THRESHOLD if threshold is None else threshold
+    if len(data) >= threshold:
+        compressed = zlib.compress(data, SerializationConfig.COMPRESSION_LEVEL if level is None else level)
+        if len(compressed) < len(data):
+            return _ZLIB + compressed
+    return _RAW + data
+
+
+def decompress_frame(frame) -> bytes:
+    """去掉帧头，必要时解压"""
+    frame = bytes(frame) if not isinstance(frame, bytes) else frame
+    if frame[:1] == _ZLIB:
+        return zlib.decompress(frame[1:])
+    return frame[1:]
+
+
+def _typed_array(values: list, types: set) -> Optional[array]:
+    """同类型数值列表转定长数组，不满足条件时返回 None"""
+    if types == {int}:
+        try:
+            packed = array('q', values)
+        except OverflowError:  # 超出int64的大整数逐个编码
+            return None
+    elif types == {float}:
+        packed = array('d', values)
+    else:
+        return None
+    if not _LITTLE_ENDIAN:
+        packed.byteswap()
+    return packed
+
+
+def _pack_arrays(obj: Any) -> Any:
+    """递归地把数值列表替换为 msgpack 扩展类型"""
+    if isinstance(obj, (list, tuple)):
+        types = set(map(type, obj))
+        if len(obj) >= MIN_TYPED_ARRAY_LENGTH:
+            packed = _typed_array(obj, types)
+            if packed is not None:
+                code = EXT_INT64_ARRAY if packed.typecode == 'q' else EXT_FLOAT64_ARRAY
+                return msgpack.ExtType(code, packed.tobytes())
+        if int not in types and _CONTAINER_TYPES.isdisjoint(types):
+            return obj
+        return [_pack_arrays(item) for item in obj]
+    if isinstance(obj, dict):
+        return {key: _pack_arrays(value) for key, value in obj.items()}
+    if type(obj) is int and not _INT64_MIN <= obj <= _UINT64_MAX:
+        # msgpack 只支持64位整数，大整数（如幂运算结果）以十进制文本编码
+        return msgpack.ExtType(EXT_BIGINT, str(obj).encode('ascii'))
+    return obj
+
+
+def _ext_hook(code: int, data: bytes) -> Any:
+    if code in (EXT_INT64_ARRAY, EXT_FLOAT64_ARRAY):
+        values = array('q' if code == EXT_INT64_ARRAY else 'd')
+        values.frombytes(data)
+        if not _LITTLE_ENDIAN:
+            values.byteswap()
+        return values.tolist()
+    if code == EXT_BIGINT:
+        return int(data)
+    return msgpack.ExtType(code, data)
+
+
+def msgpack_typed_packb(obj: Any) -> bytes:
+    """msgpack-typed 编码（不加帧头，用于文件流）"""
+    return msgpack.packb(_pack_arrays(obj), use_bin_type=True)
+
+
+def msgpack_typed_unpacker(file_obj) -> "msgpack.Unpacker":
+    """按顺序读取 msgpack-typed 对象流"""
+    return msgpack.Unpacker(file_obj, raw=False, ext_hook=_ext_hook, strict_map_key=False,
+                            max_buffer_size=0)
+
+
+def msgpack_typed_dumps(obj: Any) -> bytes:
+    return compress_frame(msgpack_typed_packb(obj))
+
+
+def msgpack_typed_loads(frame) -> Any:
+    return msgpack.unpackb(decompress_frame(frame), raw=False, ext_hook=_ext_hook,
+                           strict_map_key=False)
+
+
+def json_z_dumps(obj: Any) -> bytes:
+    return compress_frame(json.dumps(obj, separators=(',', ':')).encode('utf-8'))
+
+
+def json_z_loads(frame) -> Any:
+    return json.loads(decompress_frame(frame))
+
+
+def register_serializers() -> list:
+    """
+    向 kombu 注册自定义序列化器
+
+    Returns:
+        已注册的序列化器名称
+    """
+    register('json-z', json_z_dumps, json_z_loads,
+             content_type='application/x-json-z', content_encoding='binary')
+    names = ['json-z']
+
+    if msgpack is not None:
+        register('msgpack-typed', msgpack_typed_dumps, msgpack_typed_loads,
+                 content_type='application/x-msgpack-typed', content_encoding='binary')
+        names.append('msgpack-typed')
+
+    return names
+
+
+class SerializerAnnotation:
+    """
+    按任务名（glob）或路由队列为任务选择消息序列化器
+
+    通过 task_annotations 挂载，任务类创建时设置其 serializer 属性。
+    """
+
+    def __init__(self, app, task_serializers: Dict[str, str], queue_serializers: Dict[str, str]):
+        self.app = app
+        self.task_serializers = task_serializers
+        self.queue_serializers = queue_serializers
+
+    def annotate(self, task):
+        for pattern, serializer in self.task_serializers.items():
+            if fnmatchcase(task.name, pattern):
+                return {'serializer': serializer}
+
+        if self.queue_serializers:
+            route = self.app.amqp.router.route({}, task.name)
+            queue = route.get('queue')
+            queue_name = getattr(queue, 'name', queue)
+            if queue_name in self.queue_serializers:
+                return {'serializer': self.queue_serializers[queue_name]}
+        return None
+
+    def annotate_any(self):
+        return None
@@ -0,0 +1,86 @@
+# tasks/async_support.py - 异步任务支持
+"""
+异步任务支持
+
+每个 worker 进程持有一个在后台线程中运行的事件循环，`async def` 任务体提交到该循环执行。
+配合 worker_pools.AsyncIOPool 使用时，数百个并发任务只占用一个进程：
+执行线程只是等待协程完成，真正的 I/O 等待都在同一个事件循环上复用。
+"""
+import asyncio
+import os
+import threading
+from functools import wraps
+from typing import Any, Awaitable, Callable, Optional
+
+class EventLoopThread:
+    """后台线程中运行的事件循环（按进程创建，fork 后自动重建）"""
+    
+    def __init__(self, name: str = "io-event-loop"):
+        self.name = name
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread: Optional[threading.Thread] = None
+        self.pid: Optional[int] = None
+        self._lock = threading.Lock()
+    
+    def get_loop(self) -> asyncio.AbstractEventLoop:
+        """获取事件循环，未启动或在子进程中时启动新的循环"""
+        if not self._is_running():
+            with self._lock:
+                if not self._is_running():
+                    self._start()
+        return self.loop
+    
+    def _is_running(self) -> bool:
+        return (self.loop is not None and self.pid == os.getpid()
+                and self.thread is not None and self.thread.is_alive())
+    
+    def _start(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        self.pid = os.getpid()
+        ready = threading.Event()
+        
+        def run():
+            asyncio.set_event_loop(self.loop)
+            self.loop.call_soon(ready.set)
+            self.loop.run_forever()
+        
+        self.thread = threading.Thread(target=run, name=self.name, daemon=True)
+        self.thread.start()
+        ready.wait()
+    
+    def run(self, coro: Awaitable, timeout: float = None) -> Any:
+        """在事件循环上执行协程并等待结果（在非事件循环线程中调用）"""
+        loop = self.get_loop()
+        if threading.current_thread() is self.thread:
+            raise RuntimeError("不能在事件循环线程中同步等待协程")
+        return asyncio.run_coroutine_threadsafe(coro, loop).result(timeout)
+    
+    def stop(self) -> None:
+        """停止事件循环"""
+        if self._is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout=5)
+        self.loop = self.thread = self.pid = None
+
+# 进程级事件循环
+event_loop_thread = EventLoopThread()
+
+def run_coroutine(coro: Awaitable, timeout: float = None) -> Any:
+    """在进程级事件循环上执行协程"""
+    return event_loop_thread.run(coro, timeout)
+
+def async_task(func: Callable[..., Awaitable]) -> Callable[..., Any]:
+    """
+    把 `async def` 任务体包装成同步调用，放在 @app.task 之下使用
+    
+    原始协程函数保存在 wrapper.coroutine，可在其他协程中直接 await。
+    """
+    if not asyncio.iscoroutinefunction(func):
+        raise TypeError(f"{func.__name__} 不是协程函数")
+    
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        return run_coroutine(func(*args, **kwargs))
+    
+    wrapper.coroutine = func
+    return wrapper
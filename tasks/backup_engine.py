@@ -0,0 +1,237 @@
+# tasks/backup_engine.py - io.backup_data 的备份引擎
+"""
+流式去重备份
+
+- 负载按内容定义分块（CDC）：分块边界只取决于附近约32字节的内容，
+  插入或删除数据只会改变附近的块，其余块与上次备份相同
+- 每块按 SHA-256 寻址，已存在的块不再写入；新块单独压缩后原子写入本地内容寻址存储
+- 每次备份写一份清单（块哈希列表）；整体内容未变时直接复用已有清单，不再分块
+- 按固定大小的窗口流式处理（负载引用为 mmap 缓冲区），内存占用与负载大小无关
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from config import BackupConfig
+from serializers import compress_frame, decompress_frame
+from tasks.payload_store import open_payload
+
+# 每次计算分块边界的窗口大小；窗口末尾多取若干字节，保证窗口内每个位置的边界判定与整体计算一致
+BLOCK_SIZE = 1024 * 1024
+_PAD = 48
+
+# 滚动哈希：4 个 64 位乘法哈希异或，每个位置的取值由其附近约 32 字节决定
+_MIX = ((0, 0x9E3779B97F4A7C15), (64, 0xC2B2AE3D27D4EB4F),
+        (128, 0x165667B19E3779F9), (192, 0xD6E8FEB86659FD93))
+
+
+def _window_hashes(block: bytes) -> bytes:
+    """逐位置的窗口哈希（每位置1字节），以大整数运算在C层整块完成"""
+    value = int.from_bytes(block, 'little')
+    mixed = 0
+    for shift, constant in _MIX:
+        mixed ^= (value >> shift) * constant
+    return mixed.to_bytes(len(block) + 8, 'little')[:len(block)]
+
+
+def _boundary_table(avg_size: int) -> bytes:
+    """哈希字节 -> 候选标记（0 为候选）；相邻两个位置都是候选时切分，概率约 1/avg_size"""
+    threshold = max(1, round(256 / avg_size ** 0.5))
+    return bytes(0 if value < threshold else 1 for value in range(256))
+
+
+def iter_chunks(buffer, min_size: int, avg_size: int, max_size: int) -> Iterator[Tuple[int, int]]:
+    """
+    内容定义分块
+
+    Args:
+        buffer: 字节缓冲区
+        min_size: 最小块大小
+        avg_size: 平均块大小
+        max_size: 最大块大小
+
+    Yields:
+        (起始偏移, 结束偏移)
+    """
+    view = memoryview(buffer)
+    total = view.nbytes
+    table = _boundary_table(avg_size)
+    block_size = max(BLOCK_SIZE, max_size)
+
+    start = 0
+    marks, marks_start, marks_valid = b"", 0, 0
+    while start < total:
+        limit = min(start + max_size, total)
+        if limit - start <= min_size:
+            yield start, limit
+            start = limit
+            continue
+
+        if limit > marks_start + marks_valid:
+            block_end = min(start + block_size + _PAD, total)
+            marks = _window_hashes(bytes(view[start:block_end])).translate(table)
+            marks_start = start
+            marks_valid = len(marks) if block_end == total else len(marks) - _PAD
+
+        found = marks.find(b"\x00\x00", start + min_size - marks_start, limit - marks_start)
+        cut = marks_start + found + 2 if found >= 0 else limit
+        yield start, cut
+        start = cut
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class BackupEngine:
+    """本地内容寻址备份存储（每个 worker 进程一个实例）"""
+
+    def __init__(self, root_dir: str = None, min_chunk_size: int = None, avg_chunk_size: int = None,
+                 max_chunk_size: int = None, compression_level: int = None):
+        self.root_dir = os.path.abspath(root_dir or BackupConfig.ROOT_DIR)
+        self.min_chunk_size = min_chunk_size or BackupConfig.MIN_CHUNK_SIZE
+        self.avg_chunk_size = avg_chunk_size or BackupConfig.AVG_CHUNK_SIZE
+        self.max_chunk_size = max_chunk_size or BackupConfig.MAX_CHUNK_SIZE
+        self.compression_level = (BackupConfig.COMPRESSION_LEVEL if compression_level is None
+                                  else compression_level)
+
+        # 已确认存在的块，省去重复的文件检查
+        self._known = set()
+        self._stats_lock = threading.Lock()
+        self.stats = {"backups": 0, "bytes": 0, "new_bytes": 0, "stored_bytes": 0}
+
+    def _path(self, kind: str, key: str) -> str:
+        return os.path.join(self.root_dir, kind, key[:2], key)
+
+    def _manifest_path(self, backup_id: str) -> str:
+        return os.path.join(self.root_dir, "manifests", f"{backup_id}.json")
+
+    def iter_chunks(self, buffer) -> Iterator[Tuple[int, int]]:
+        return iter_chunks(buffer, self.min_chunk_size, self.avg_chunk_size, self.max_chunk_size)
+
+    def backup(self, data: Any, location: str = "local",
+               chunker: Callable[[Any], Iterator[Tuple[int, int]]] = None) -> Dict[str, Any]:
+        """
+        备份数据（阻塞调用）
+
+        Args:
+            data: 数据、负载引用或负载句柄
+            location: 备份位置标签，记录在清单中
+            chunker: 分块函数，默认内容定义分块
+
+        Returns:
+            备份结果；dedup_ratio 为本次无需写入的字节占比
+        """
+        buffer = open_payload(data).buffer
+        size = buffer.nbytes
+        content_hash = hashlib.sha256(buffer).hexdigest()
+
+        previous = self._find_manifest(content_hash)
+        if previous is not None:
+            # 内容未变：复用已有清单，不分块、不读块
+            chunks, new_chunks, new_bytes, stored_bytes = previous["chunks"], 0, 0, 0
+        else:
+            chunks, new_chunks, new_bytes, stored_bytes = self._store_chunks(buffer, chunker or self.iter_chunks)
+
+        backup_id = f"bkp_{uuid.uuid4().hex[:16]}"
+        manifest = {
+            "backup_id": backup_id,
+            "location": location,
+            "content_hash": content_hash,
+            "size": size,
+            "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "chunks": chunks
+        }
+        manifest_path = self._manifest_path(backup_id)
+        _write_atomic(manifest_path, json.dumps(manifest, separators=(',', ':')).encode('utf-8'))
+        _write_atomic(self._path("index", content_hash), backup_id.encode('ascii'))
+
+        with self._stats_lock:
+            self.stats["backups"] += 1
+            self.stats["bytes"] += size
+            self.stats["new_bytes"] += new_bytes
+            self.stats["stored_bytes"] += stored_bytes
+
+        return {
+            "backup_id": backup_id,
+            "manifest_path": manifest_path,
+            "size": size,
+            "chunks": len(chunks),
+            "new_chunks": new_chunks,
+            "stored_bytes": stored_bytes,
+            "dedup_ratio": round(1 - new_bytes / size, 4) if size else 1.0,
+            "reused": previous is not None
+        }
+
+    def _find_manifest(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path("index", content_hash), "rb") as f:
+                backup_id = f.read().decode('ascii')
+            return self.load_manifest(backup_id)
+        except FileNotFoundError:
+            return None
+
+    def _store_chunks(self, buffer, chunker) -> Tuple[List[list], int, int, int]:
+        chunks = []
+        new_chunks = new_bytes = stored_bytes = 0
+        for start, end in chunker(buffer):
+            piece = buffer[start:end]
+            key = hashlib.sha256(piece).hexdigest()
+            chunks.append([key, end - start])
+            if key in self._known:
+                continue
+
+            path = self._path("chunks", key)
+            if not os.path.exists(path):
+                raw = bytes(piece)
+                if self.compression_level:
+                    frame = compress_frame(raw, threshold=0, level=self.compression_level)
+                else:
+                    frame = b'\x00' + raw
+                _write_atomic(path, frame)
+                new_chunks += 1
+                new_bytes += len(raw)
+                stored_bytes += len(frame)
+            self._known.add(key)
+        return chunks, new_chunks, new_bytes, stored_bytes
+
+    def load_manifest(self, backup_id: str) -> Dict[str, Any]:
+        with open(self._manifest_path(backup_id), "rb") as f:
+            return json.load(f)
+
+    def restore(self, backup_id: str) -> Iterator[bytes]:
+        """按块流式读取备份内容，读完后校验整体哈希"""
+        manifest = self.load_manifest(backup_id)
+        digest = hashlib.sha256()
+        for key, _ in manifest["chunks"]:
+            with open(self._path("chunks", key), "rb") as f:
+                data = decompress_frame(f.read())
+            digest.update(data)
+            yield data
+        if digest.hexdigest() != manifest["content_hash"]:
+            raise ValueError(f"备份校验失败: {backup_id}")
+
+
+_backup_engine: Optional[BackupEngine] = None
+
+
+def get_backup_engine() -> BackupEngine:
+    """获取进程级备份引擎"""
+    global _backup_engine
+    if _backup_engine is None:
+        _backup_engine = BackupEngine()
+    return _backup_engine
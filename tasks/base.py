@@ -1,9 +1,19 @@
-# tasks/base.py - 任务基类
+# tasks/base.py - 任务基类与任务指标
+from celery import signals
 from celery.utils.log import get_task_logger
-from typing import Any, Callable
+from typing import Any, Callable, Dict
 from functools import wraps
+import logging
 import time
 
+from config import MetricsConfig
+from scheduling import message_header
+from tasks.metrics import get_metrics
+from tasks.task_log import summarize
+
+# 发布时写入消息头的时间戳，worker 据此计算排队等待时间
+PUBLISHED_AT_HEADER = 'published_at'
+
 class BaseTask:
     """任务基类，提供通用功能"""
     
@@ -13,15 +23,17 @@ class BaseTask:
     
     def log_start(self, *args, **kwargs):
         """记录任务开始"""
-        self.logger.info(f"开始执行任务 {self.name}, 参数: args={args}, kwargs={kwargs}")
+        if self.logger.isEnabledFor(logging.INFO):
+            self.logger.info("开始执行任务 %s, 参数: args=%s, kwargs=%s", self.name, summarize(args), summarize(kwargs))
     
     def log_success(self, result: Any):
         """记录任务成功"""
-        self.logger.info(f"任务 {self.name} 执行成功, 结果: {result}")
+        if self.logger.isEnabledFor(logging.INFO):
+            self.logger.info("任务 %s 执行成功, 结果: %s", self.name, summarize(result))
     
     def log_error(self, error: Exception):
         """记录任务错误"""
-        self.logger.error(f"任务 {self.name} 执行失败: {str(error)}")
+        self.logger.error("任务 %s 执行失败: %s", self.name, error)
 
 def task_wrapper(name: str = None, bind: bool = False, **task_kwargs):
     """任务装饰器，提供标准化的任务包装"""
@@ -32,8 +44,7 @@ def task_wrapper(name: str = None, bind: bool = False, **task_kwargs):
         
         @wraps(func)
         def wrapper(*args, **kwargs):
-            start_time = time.time()
-            
+            # 执行耗时由 install_task_metrics 注册的信号统一记录
             try:
                 # 记录开始
                 base_task.log_start(*args, **kwargs)
@@ -42,8 +53,6 @@ def task_wrapper(name: str = None, bind: bool = False, **task_kwargs):
                 result = func(*args, **kwargs)
                 
                 # 记录成功
-                execution_time = time.time() - start_time
-                base_task.logger.info(f"任务执行耗时: {execution_time:.2f}秒")
                 base_task.log_success(result)
                 
                 return result
@@ -70,3 +79,66 @@ def task_wrapper(name: str = None, bind: bool = False, **task_kwargs):
         return wrapped_func
     
     return decorator
+
+# 正在执行的任务的开始时间（perf_counter），按任务ID索引
+_started: Dict[str, float] = {}
+
+def _queue_of(request) -> str:
+    # 嵌入模式的执行器在本地执行时也给出队列
+    routing_key = (request.delivery_info or {}).get('routing_key')
+    if routing_key:
+        return routing_key
+    return 'eager' if getattr(request, 'is_eager', False) else 'celery'
+
+def _stamp_published(headers=None, **kwargs):
+    """发布端：在消息头中写入发布时间"""
+    if headers is not None and PUBLISHED_AT_HEADER not in headers:
+        headers[PUBLISHED_AT_HEADER] = time.time()
+
+def _record_received(request=None, **kwargs):
+    """worker 主进程：记录收到的消息体大小"""
+    body = request.body
+    if isinstance(body, (bytes, bytearray, str)):
+        labels = (('task', request.name), ('queue', _queue_of(request)))
+        get_metrics().observe('task_payload_bytes', len(body), labels)
+
+def _record_prerun(task_id=None, task=None, **kwargs):
+    """执行前：记录排队等待时间（延迟任务从 eta 起算）"""
+    request = task.request
+    published_at = message_header(request, PUBLISHED_AT_HEADER)
+    if published_at and not request.eta:
+        labels = (('task', task.name), ('queue', _queue_of(request)))
+        get_metrics().observe('task_queue_wait_seconds', time.time() - published_at, labels)
+    _started[task_id] = time.perf_counter()
+
+def _record_postrun(task_id=None, task=None, state=None, **kwargs):
+    """执行后：记录执行耗时与结束状态"""
+    started = _started.pop(task_id, None)
+    labels = (('task', task.name), ('queue', _queue_of(task.request)))
+    metrics = get_metrics()
+    if started is not None:
+        metrics.observe('task_runtime_seconds', time.perf_counter() - started, labels)
+    metrics.increment('task_total', labels + (('state', state or 'UNKNOWN'),))
+
+def _flush_metrics(**kwargs):
+    """子进程退出前写出最后一次快照"""
+    get_metrics().close()
+
+def install_task_metrics() -> bool:
+    """
+    通过 Celery 信号为所有已注册任务记录指标（重复调用无副作用）
+    
+    - 发布端: 消息头写入发布时间
+    - worker: 消息体大小、排队等待时间、执行耗时、按状态计数
+    
+    Returns:
+        是否已启用
+    """
+    if not MetricsConfig.ENABLED:
+        return False
+    signals.before_task_publish.connect(_stamp_published, weak=False, dispatch_uid='metrics.publish')
+    signals.task_received.connect(_record_received, weak=False, dispatch_uid='metrics.received')
+    signals.task_prerun.connect(_record_prerun, weak=False, dispatch_uid='metrics.prerun')
+    signals.task_postrun.connect(_record_postrun, weak=False, dispatch_uid='metrics.postrun')
+    signals.worker_process_shutdown.connect(_flush_metrics, weak=False, dispatch_uid='metrics.shutdown')
+    return True
@@ -1,10 +1,41 @@
 # tasks/data_tasks.py - 标准化的数据处理任务模块
 from celery_app import app
+from itertools import chain as iter_chain
 from typing import List, Any, Dict
+import operator
 import time
 import random
 
+from tasks.payload_store import claim_check, release, resolve
+from tasks.summary import StatsSummary
+from tasks.task_log import get_task_log
+
+log = get_task_log(__name__)
+
+# 操作表（逐项与批量处理共用）：操作 -> (C实现的运算符, 数据项作为参数的次数)
+# 批量时对整个列表做一次C级别的 map，不逐项分支
+OPERATIONS = {
+    "double": (operator.add, 2),   # x + x
+    "square": (operator.mul, 2),   # x * x
+    "negate": (operator.neg, 1),   # -x
+}
+
+def _apply_batch(items: List[Any], operation: str) -> List[Any]:
+    """对整个列表执行操作，未知操作原样返回"""
+    if operation not in OPERATIONS:
+        return list(items)
+    function, arity = OPERATIONS[operation]
+    return list(map(function, *[items] * arity))
+
+def _apply_operation(item: Any, operation: str) -> Any:
+    """对单个数据项执行操作 (double, square, negate)，未知操作原样返回"""
+    if operation not in OPERATIONS:
+        return item
+    function, arity = OPERATIONS[operation]
+    return function(*[item] * arity)
+
 @app.task(name='data.fetch_data')
+@claim_check(offload_result=True)
 def fetch_data(source: str) -> List[int]:
     """
     获取数据任务
@@ -15,7 +46,7 @@ def fetch_data(source: str) -> List[int]:
     Returns:
         数据列表
     """
-    print(f"📡 获取数据，来源: {source}")
+    log.info("📡 获取数据，来源: %s", source)
     
     # 模拟从不同数据源获取数据
     if source == "test":
@@ -28,10 +59,11 @@ def fetch_data(source: str) -> List[int]:
     # 模拟网络延迟
     time.sleep(0.5)
     
-    print(f"✅ 数据获取完成: {data}")
+    log.info("✅ 数据获取完成: %s", data)
     return data
 
 @app.task(name='data.filter_data')
+@claim_check(offload_result=True)
 def filter_data(data: List[int], threshold: int) -> List[int]:
     """
     过滤数据任务
@@ -43,15 +75,15 @@ def filter_data(data: List[int], threshold: int) -> List[int]:
     Returns:
         过滤后的数据列表
     """
-    print(f"🔍 过滤数据，阈值: {threshold}")
-    print(f"   输入数据: {data}")
+    log.info("🔍 过滤数据，阈值: %s, 输入数据: %s", threshold, data)
     
     filtered = [x for x in data if x > threshold]
     
-    print(f"✅ 过滤完成: {filtered}")
+    log.info("✅ 过滤完成: %s", filtered)
     return filtered
 
 @app.task(name='data.sort_data')
+@claim_check(offload_result=True)
 def sort_data(data: List[int], reverse: bool = False) -> List[int]:
     """
     排序数据任务
@@ -63,15 +95,15 @@ def sort_data(data: List[int], reverse: bool = False) -> List[int]:
     Returns:
         排序后的数据列表
     """
-    print(f"📊 排序数据，降序: {reverse}")
-    print(f"   输入数据: {data}")
+    log.info("📊 排序数据，降序: %s, 输入数据: %s", reverse, data)
     
     sorted_data = sorted(data, reverse=reverse)
     
-    print(f"✅ 排序完成: {sorted_data}")
+    log.info("✅ 排序完成: %s", sorted_data)
     return sorted_data
 
 @app.task(name='data.aggregate_results')
+@claim_check()
 def aggregate_results(data: List[int]) -> Dict[str, Any]:
     """
     聚合结果任务
@@ -82,23 +114,15 @@ def aggregate_results(data: List[int]) -> Dict[str, Any]:
     Returns:
         聚合结果字典
     """
-    print(f"📈 聚合数据: {data}")
+    log.info("📈 聚合数据: %s", data)
     
-    if not data:
-        result = {"count": 0, "sum": 0, "avg": 0, "min": None, "max": None}
-    else:
-        result = {
-            "count": len(data),
-            "sum": sum(data),
-            "avg": sum(data) / len(data),
-            "min": min(data),
-            "max": max(data)
-        }
-    
-    print(f"✅ 聚合完成: {result}")
+    result = StatsSummary.from_data(data).aggregate()
+    
+    log.info("✅ 聚合完成: %s", result)
     return result
 
 @app.task(name='data.calculate_statistics')
+@claim_check()
 def calculate_statistics(data: List[int]) -> Dict[str, float]:
     """
     计算统计信息任务
@@ -109,24 +133,86 @@ def calculate_statistics(data: List[int]) -> Dict[str, float]:
     Returns:
         统计信息字典
     """
-    print(f"📊 计算统计信息: {data}")
+    log.info("📊 计算统计信息: %s", data)
     
-    if not data:
-        return {"mean": 0, "variance": 0, "std_dev": 0}
+    result = StatsSummary.from_data(data).statistics()
     
-    mean = sum(data) / len(data)
-    variance = sum((x - mean) ** 2 for x in data) / len(data)
-    std_dev = variance ** 0.5
+    log.info("✅ 统计完成: %s", result)
+    return result
+
+@app.task(name='data.partial_statistics')
+@claim_check()
+def partial_statistics(data: List[int], with_quantiles: bool = False) -> Dict[str, Any]:
+    """
+    计算数据分片的可合并统计摘要任务
+    
+    Args:
+        data: 数据分片
+        with_quantiles: 是否维护近似分位数草图
+        
+    Returns:
+        可合并的摘要字典（StatsSummary.to_dict）
+    """
+    log.info("🧮 计算分片摘要，数据量: %s", len(data))
     
-    result = {
-        "mean": round(mean, 2),
-        "variance": round(variance, 2),
-        "std_dev": round(std_dev, 2)
-    }
+    summary = StatsSummary.from_data(data, with_quantiles=with_quantiles)
     
-    print(f"✅ 统计完成: {result}")
+    log.info("✅ 分片摘要完成: %s", summary)
+    return summary.to_dict()
+
+@app.task(name='data.merge_statistics')
+def merge_statistics(partials: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    合并分片摘要任务（chord回调）
+    
+    Args:
+        partials: 各分片的摘要字典列表
+        
+    Returns:
+        合并后的聚合结果与统计信息
+    """
+    log.info("🔗 合并 %s 个分片摘要", len(partials))
+    
+    summary = StatsSummary()
+    for partial in partials:
+        summary.merge(StatsSummary.from_dict(partial))
+    
+    result = {**summary.aggregate(), **summary.statistics()}
+    quantiles = summary.quantiles()
+    if quantiles is not None:
+        result["quantiles"] = quantiles
+    
+    log.info("✅ 合并完成: %s", result)
     return result
 
+@app.task(name='data.map_shard')
+@claim_check()
+def map_shard(shard: List[int], operation: str = None, threshold: int = None,
+              with_quantiles: bool = False) -> Dict[str, Any]:
+    """
+    map-reduce的map阶段任务：处理 -> 过滤 -> 分片摘要
+    
+    Args:
+        shard: 数据分片
+        operation: 逐项操作 (double, square, negate)，为空则不处理
+        threshold: 过滤阈值，只保留大于阈值的数据，为空则不过滤
+        with_quantiles: 是否维护近似分位数草图
+        
+    Returns:
+        可合并的摘要字典，由 data.merge_statistics 归约
+    """
+    log.info("🗺️ 处理分片，数据量: %s, 操作: %s, 阈值: %s", len(shard), operation, threshold)
+    
+    if operation:
+        shard = _apply_batch(shard, operation)
+    if threshold is not None:
+        shard = [x for x in shard if x > threshold]
+    
+    summary = StatsSummary.from_data(shard, with_quantiles=with_quantiles)
+    
+    log.info("✅ 分片处理完成: %s", summary)
+    return summary.to_dict()
+
 @app.task(name='data.process_item')
 def process_item(item: Any, operation: str = "double") -> Any:
     """
@@ -139,16 +225,51 @@ def process_item(item: Any, operation: str = "double") -> Any:
     Returns:
         处理后的数据项
     """
-    print(f"⚙️ 处理数据项: {item}, 操作: {operation}")
+    log.info("⚙️ 处理数据项: %s, 操作: %s", item, operation)
     
-    if operation == "double":
-        result = item * 2
-    elif operation == "square":
-        result = item ** 2
-    elif operation == "negate":
-        result = -item
-    else:
-        result = item  # 无操作
+    result = _apply_operation(item, operation)
     
-    print(f"✅ 处理完成: {result}")
-    return result
\ No newline at end of file
+    log.info("✅ 处理完成: %s", result)
+    return result
+
+@app.task(name='data.process_items')
+@claim_check(offload_result=True)
+def process_items(items: List[Any], operation: str = "double") -> List[Any]:
+    """
+    批量处理数据项任务（一条消息处理整个列表）
+    
+    Args:
+        items: 数据项列表
+        operation: 操作类型 (double, square, negate)
+        
+    Returns:
+        处理后的数据项列表
+    """
+    log.info("⚙️ 批量处理数据项，数量: %s, 操作: %s", len(items), operation)
+    
+    result = _apply_batch(items, operation)
+    
+    log.info("✅ 批量处理完成，数量: %s", len(result))
+    return result
+
+@app.task(name='data.concat_chunks')
+@claim_check(offload_result=True)
+def concat_chunks(chunks: List[List[Any]]) -> List[Any]:
+    """
+    拼接分块结果任务（chord回调）
+    
+    Args:
+        chunks: 按原始顺序排列的分块结果（数据或负载引用）
+        
+    Returns:
+        拼接后的列表
+    """
+    log.info("🧩 拼接 %s 个分块结果", len(chunks))
+    
+    # chord 回调收到的是各分块结果列表，其中的大分块可能是负载引用
+    result = list(iter_chain.from_iterable(resolve(chunk) for chunk in chunks))
+    for chunk in chunks:
+        release(chunk)
+    
+    log.info("✅ 拼接完成，数量: %s", len(result))
+    return result
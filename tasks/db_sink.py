@@ -0,0 +1,315 @@
+# tasks/db_sink.py - io.save_to_database 的数据库写入
+"""
+批量数据库写入
+
+- 每个 worker 进程一个带连接池的 SQLAlchemy 引擎（默认本地 SQLite，WAL 模式）
+- 表结构按首批非空数据推断并缓存：字典的键成为列，标量写入 value 列，
+  之后出现的新键或类型不符的值写入 extra 列（JSON），不丢数据
+- 每次保存用一条 executemany 多行插入，不逐行提交
+- 合并窗口内对同一张表的并发小保存合并到一个事务中提交（组提交）；
+  事务失败时逐个保存重试，只有出错的保存失败
+"""
+import asyncio
+import json
+import os
+import re
+import threading
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import (BigInteger, Boolean, Column, DateTime, Float, Integer, MetaData,
+                        String, Table, Text, create_engine, event, inspect)
+from sqlalchemy.engine import Engine, make_url
+
+from config import DatabaseSinkConfig
+from tasks.payload_store import open_payload
+
+VALUE_COLUMN = "value"
+EXTRA_COLUMN = "extra"
+RESERVED_COLUMNS = ("id", "record_id", "created_at", EXTRA_COLUMN)
+
+# 推断表结构时最多检查的行数
+SCHEMA_SAMPLE_ROWS = 1000
+
+_IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]{0,62}$')
+_INT64_MIN, _INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+_json_encoder = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False)
+
+
+def to_rows(data: Any) -> List[Dict[str, Any]]:
+    """把任务数据展开为行：列表每项一行，字典一行，标量写入 value 列"""
+    if isinstance(data, (list, tuple)):
+        items = data
+    else:
+        items = [data]
+    return [item if isinstance(item, dict) else {VALUE_COLUMN: item} for item in items]
+
+
+def _infer_type(values: List[Any]):
+    """按样本值推断列类型，无法确定时使用 Text"""
+    types = set(type(value) for value in values if value is not None)
+    if types == {bool}:
+        return Boolean()
+    if types == {int}:
+        # 超出 int64 的大整数（如幂运算结果）按文本保存
+        if all(_INT64_MIN <= value <= _INT64_MAX for value in values if value is not None):
+            return BigInteger()
+        return Text()
+    if types and types <= {int, float}:
+        return Float()
+    return Text()
+
+
+_REJECT = object()
+
+
+def _coerce(column_type, value: Any) -> Any:
+    """把值转换为列类型可接受的形式，无法写入时返回 _REJECT（改写入 extra 列）"""
+    if value is None:
+        return None
+    kind = type(value)
+    if isinstance(column_type, Boolean):
+        return value if kind is bool else _REJECT
+    if isinstance(column_type, Integer):
+        return value if kind is int and _INT64_MIN <= value <= _INT64_MAX else _REJECT
+    if isinstance(column_type, Float):
+        return value if kind in (int, float) else _REJECT
+    # 文本列：非字符串按JSON文本保存
+    return value if kind is str else _json_encoder.encode(value)
+
+
+class DatabaseSink:
+    """数据库写入器（每个 worker 进程一个实例）"""
+
+    def __init__(self, database_url: str = None, pool_size: int = None, max_overflow: int = None,
+                 batch_window_ms: int = None, batch_max_rows: int = None):
+        self.database_url = database_url or DatabaseSinkConfig.DATABASE_URL
+        self.batch_window = (DatabaseSinkConfig.BATCH_WINDOW_MS if batch_window_ms is None
+                             else batch_window_ms) / 1000
+        self.batch_max_rows = batch_max_rows or DatabaseSinkConfig.BATCH_MAX_ROWS
+        self.engine = self._create_engine(
+            pool_size or DatabaseSinkConfig.POOL_SIZE,
+            DatabaseSinkConfig.MAX_OVERFLOW if max_overflow is None else max_overflow
+        )
+        self.pid = os.getpid()
+
+        # 表结构缓存: 表名 -> Table
+        self._metadata = MetaData()
+        self._tables: Dict[str, Table] = {}
+        self._schema_lock = threading.Lock()
+
+        # 待提交批次: 表名 -> [(记录ID, 行, future)]，只在事件循环线程中访问
+        self._pending: Dict[str, List[Tuple[str, List[Dict[str, Any]], asyncio.Future]]] = {}
+        self._pending_rows: Dict[str, int] = {}
+        self._flush_handles: Dict[str, asyncio.TimerHandle] = {}
+
+        self._stats_lock = threading.Lock()
+        self.stats = {"saves": 0, "rows": 0, "transactions": 0}
+
+    def _create_engine(self, pool_size: int, max_overflow: int) -> Engine:
+        url = make_url(self.database_url)
+        options = {"pool_pre_ping": True}
+        is_sqlite = url.get_backend_name() == "sqlite"
+        if not is_sqlite or url.database not in (None, "", ":memory:"):
+            options.update(pool_size=pool_size, max_overflow=max_overflow)
+        if is_sqlite:
+            options["connect_args"] = {"timeout": 30}
+
+        engine = create_engine(url, **options)
+
+        if is_sqlite:
+            @event.listens_for(engine, "connect")
+            def _sqlite_pragmas(dbapi_connection, _):
+                # 多个 worker 进程并发写同一个文件
+                cursor = dbapi_connection.cursor()
+                cursor.execute("PRAGMA journal_mode=WAL")
+                cursor.execute("PRAGMA synchronous=NORMAL")
+                cursor.close()
+
+        return engine
+
+    def get_table(self, name: str, sample_rows: List[Dict[str, Any]]) -> Optional[Table]:
+        """获取表结构：先查缓存，再反射已有表，最后按样本行推断并建表（表不存在且没有样本行时返回 None）"""
+        table = self._tables.get(name)
+        if table is not None:
+            return table
+
+        if not _IDENTIFIER.match(name):
+            raise ValueError(f"非法表名: {name}")
+
+        with self._schema_lock:
+            if name in self._tables:
+                return self._tables[name]
+
+            if inspect(self.engine).has_table(name):
+                table = Table(name, self._metadata, autoload_with=self.engine)
+            elif not sample_rows:
+                # 没有可推断的数据时不建表，也不缓存，等第一批有数据的保存
+                return None
+            else:
+                table = Table(name, self._metadata, *self._infer_columns(sample_rows))
+                table.create(self.engine, checkfirst=True)
+            self._tables[name] = table
+            return table
+
+    def _infer_columns(self, rows: List[Dict[str, Any]]) -> List[Column]:
+        samples: Dict[str, List[Any]] = {}
+        for row in rows[:SCHEMA_SAMPLE_ROWS]:
+            for key, value in row.items():
+                if key in RESERVED_COLUMNS or not _IDENTIFIER.match(str(key)):
+                    continue
+                samples.setdefault(key, []).append(value)
+
+        return [
+            Column("id", Integer, primary_key=True, autoincrement=True),
+            Column("record_id", String(40), index=True),
+            Column("created_at", DateTime),
+            *(Column(key, _infer_type(values)) for key, values in samples.items()),
+            Column(EXTRA_COLUMN, Text),
+        ]
+
+    def _prepare(self, table: Table, saves: List[Tuple[str, List[Dict[str, Any]]]]) -> List[Dict[str, Any]]:
+        """把行整理成统一的参数字典（executemany 要求每行的键一致）"""
+        data_columns = [column for column in table.columns if column.name not in RESERVED_COLUMNS]
+        known = {column.name for column in data_columns}
+        has_extra = EXTRA_COLUMN in table.columns
+        has_record_id = "record_id" in table.columns
+        has_created_at = "created_at" in table.columns
+        created_at = datetime.now()
+
+        params = []
+        for record_id, rows in saves:
+            for row in rows:
+                values = {}
+                extra = {key: value for key, value in row.items() if key not in known}
+                for column in data_columns:
+                    value = _coerce(column.type, row.get(column.name))
+                    if value is _REJECT:
+                        values[column.name] = None
+                        extra[column.name] = row[column.name]
+                    else:
+                        values[column.name] = value
+
+                if extra:
+                    if not has_extra:
+                        raise ValueError(f"表 {table.name} 缺少列: {', '.join(map(str, extra))}")
+                    values[EXTRA_COLUMN] = _json_encoder.encode(extra)
+                elif has_extra:
+                    values[EXTRA_COLUMN] = None
+                if has_record_id:
+                    values["record_id"] = record_id
+                if has_created_at:
+                    values["created_at"] = created_at
+                params.append(values)
+        return params
+
+    def write_rows(self, table_name: str, saves: List[Tuple[str, List[Dict[str, Any]]]]) -> int:
+        """
+        在一个事务中写入多次保存的行（阻塞调用）
+
+        Args:
+            table_name: 表名
+            saves: [(记录ID, 行列表)]
+
+        Returns:
+            写入行数
+        """
+        sample = [row for _, rows in saves for row in rows[:SCHEMA_SAMPLE_ROWS]]
+        table = self.get_table(table_name, sample)
+        params = self._prepare(table, saves) if table is not None else []
+        if params:
+            with self.engine.begin() as conn:
+                conn.execute(table.insert(), params)
+
+        with self._stats_lock:
+            self.stats["saves"] += len(saves)
+            self.stats["rows"] += len(params)
+            self.stats["transactions"] += 1
+        return len(params)
+
+    async def save(self, table_name: str, data: Any) -> Dict[str, Any]:
+        """
+        保存数据：合并窗口内同一张表的多次保存合并到一个事务
+
+        Returns:
+            {"record_id": 记录ID, "rows": 本次写入行数, "batch_rows": 同一事务行数, "batch_size": 同批保存次数}
+        """
+        if not _IDENTIFIER.match(table_name):
+            raise ValueError(f"非法表名: {table_name}")
+
+        rows = to_rows(open_payload(data).value)
+        record_id = f"rec_{uuid.uuid4().hex[:16]}"
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.setdefault(table_name, []).append((record_id, rows, future))
+        self._pending_rows[table_name] = self._pending_rows.get(table_name, 0) + len(rows)
+
+        if self._pending_rows[table_name] >= self.batch_max_rows:
+            self._schedule_flush(table_name, 0)
+        elif table_name not in self._flush_handles:
+            self._schedule_flush(table_name, self.batch_window)
+
+        batch_rows, batch_size = await future
+        return {"record_id": record_id, "rows": len(rows),
+                "batch_rows": batch_rows, "batch_size": batch_size}
+
+    def _schedule_flush(self, table_name: str, delay: float) -> None:
+        handle = self._flush_handles.pop(table_name, None)
+        if handle is not None:
+            handle.cancel()
+        loop = asyncio.get_running_loop()
+        self._flush_handles[table_name] = loop.call_later(
+            delay, lambda: loop.create_task(self._flush(table_name))
+        )
+
+    async def _flush(self, table_name: str) -> None:
+        self._flush_handles.pop(table_name, None)
+        batch = self._pending.pop(table_name, [])
+        self._pending_rows.pop(table_name, None)
+        if not batch:
+            return
+
+        loop = asyncio.get_running_loop()
+        try:
+            written = await loop.run_in_executor(
+                None, self.write_rows, table_name, [(record_id, rows) for record_id, rows, _ in batch]
+            )
+        except Exception as e:
+            if len(batch) == 1:
+                _, _, future = batch[0]
+                if not future.done():
+                    future.set_exception(e)
+                return
+            # 一次保存出错（缺少列、约束冲突等）会回滚整个事务，逐个重试，只让出错的保存失败
+            for record_id, rows, future in batch:
+                try:
+                    written = await loop.run_in_executor(None, self.write_rows, table_name, [(record_id, rows)])
+                except Exception as error:
+                    if not future.done():
+                        future.set_exception(error)
+                else:
+                    if not future.done():
+                        future.set_result((written, 1))
+            return
+
+        for _, _, future in batch:
+            if not future.done():
+                future.set_result((written, len(batch)))
+
+    def dispose(self) -> None:
+        """关闭连接池"""
+        self.engine.dispose()
+
+
+_db_sink: Optional[DatabaseSink] = None
+
+
+def get_db_sink() -> DatabaseSink:
+    """获取进程级数据库写入器（fork 出的子进程重建连接池）"""
+    global _db_sink
+    if _db_sink is None or _db_sink.pid != os.getpid():
+        _db_sink = DatabaseSink()
+    return _db_sink
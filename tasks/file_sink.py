@@ -0,0 +1,271 @@
+# tasks/file_sink.py - io.save_to_file 的文件写入
+"""
+缓冲文件写入
+
+- 格式: json（整体一个JSON值）、ndjson（列表每项一行）、binary（msgpack-typed 对象流）
+- 流式序列化：列表按块编码后写入大缓冲区，不构造整个 str(data)
+- 覆盖写入：写临时文件 -> fsync -> 原子改名，读者不会看到写了一半的文件
+- 追加模式：同一文件在合并窗口内的多次小保存合并成一次写入和一次 fsync（组提交）；
+  同一文件的批次按顺序逐个写入，每批以一次 os.write 写到 O_APPEND 文件描述符，
+  多个 worker 进程追加同一文件时记录也不会交错（本地文件系统）
+"""
+import asyncio
+import json
+import os
+import tempfile
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from config import FileSinkConfig
+from serializers import msgpack, msgpack_typed_packb, msgpack_typed_unpacker
+from tasks.payload_store import PayloadHandle, open_payload
+
+FORMATS = ("json", "ndjson", "binary")
+APPEND_FORMATS = ("ndjson", "binary")
+
+# 列表按块序列化的元素个数
+ENCODE_CHUNK_SIZE = 16384
+
+_json_encoder = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False)
+
+# 编码结果中不含逗号的标量类型，整块编码后可直接把逗号换成换行
+_SCALAR_TYPES = {int, float, bool, type(None)}
+
+
+def _iter_chunks(values: list) -> Iterator[list]:
+    for start in range(0, len(values), ENCODE_CHUNK_SIZE):
+        yield values[start:start + ENCODE_CHUNK_SIZE]
+
+
+def iter_encoded(payload: PayloadHandle, format_type: str) -> Iterator[bytes]:
+    """
+    流式序列化，逐块产出字节
+
+    Args:
+        payload: 负载句柄
+        format_type: json / ndjson / binary
+
+    Yields:
+        编码后的字节块
+    """
+    if format_type not in FORMATS:
+        raise ValueError(f"不支持的文件格式: {format_type}")
+
+    if format_type == "json":
+        if payload.ref is not None:
+            # 负载存储中就是紧凑JSON，直接写出 mmap 缓冲区
+            yield payload.buffer
+            return
+        value = payload.value
+        if isinstance(value, list):
+            yield b"["
+            for index, chunk in enumerate(_iter_chunks(value)):
+                encoded = _json_encoder.encode(chunk)[1:-1]
+                yield ((b"," if index else b"") + encoded.encode('utf-8'))
+            yield b"]"
+        else:
+            for part in _json_encoder.iterencode(value):
+                yield part.encode('utf-8')
+
+    elif format_type == "ndjson":
+        value = payload.value
+        if isinstance(value, list):
+            for chunk in _iter_chunks(value):
+                if _SCALAR_TYPES.issuperset(map(type, chunk)):
+                    lines = _json_encoder.encode(chunk)[1:-1].replace(",", "\n")
+                else:
+                    lines = "\n".join(map(_json_encoder.encode, chunk))
+                yield (lines + "\n").encode('utf-8')
+        else:
+            yield (_json_encoder.encode(value) + "\n").encode('utf-8')
+
+    else:
+        if msgpack is None:
+            raise ValueError("binary格式需要安装msgpack")
+        value = payload.value
+        if isinstance(value, list):
+            for chunk in _iter_chunks(value):
+                yield msgpack_typed_packb(chunk)
+        else:
+            yield msgpack_typed_packb([value])
+
+
+def read_file(path: str, format_type: str) -> Any:
+    """读取 save_to_file 写出的文件（append 模式下返回所有记录）"""
+    if format_type == "json":
+        with open(path, "rb") as f:
+            return json.load(f)
+    if format_type == "ndjson":
+        with open(path, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+    with open(path, "rb") as f:
+        records = []
+        for chunk in msgpack_typed_unpacker(f):
+            records.extend(chunk)
+        return records
+
+
+class FileSink:
+    """文件写入器（每个 worker 进程一个实例）"""
+
+    def __init__(self, root_dir: str = None, buffer_size: int = None,
+                 batch_window_ms: int = None, batch_max_bytes: int = None, fsync: bool = None):
+        self.root_dir = os.path.abspath(root_dir or FileSinkConfig.OUTPUT_DIR)
+        self.buffer_size = buffer_size or FileSinkConfig.BUFFER_SIZE
+        self.batch_window = (FileSinkConfig.BATCH_WINDOW_MS if batch_window_ms is None
+                             else batch_window_ms) / 1000
+        self.batch_max_bytes = batch_max_bytes or FileSinkConfig.BATCH_MAX_BYTES
+        self.fsync = FileSinkConfig.FSYNC if fsync is None else fsync
+
+        # 追加模式的待写批次: 路径 -> [(字节, future)]，只在事件循环线程中访问
+        self._pending: Dict[str, List[Tuple[bytes, asyncio.Future]]] = {}
+        self._pending_bytes: Dict[str, int] = {}
+        self._flush_handles: Dict[str, asyncio.TimerHandle] = {}
+        # 每个文件最近一次开始的批次写入，下一批等它结束后再写
+        self._writes: Dict[str, asyncio.Task] = {}
+
+        self._stats_lock = threading.Lock()
+        self.stats = {"saves": 0, "bytes": 0, "writes": 0, "fsyncs": 0}
+
+    def resolve_path(self, filename: str) -> str:
+        """把文件名解析到输出目录下，拒绝越界路径"""
+        path = os.path.abspath(os.path.join(self.root_dir, filename))
+        if os.path.commonpath([path, self.root_dir]) != self.root_dir or path == self.root_dir:
+            raise ValueError(f"非法文件名: {filename}")
+        return path
+
+    def _record(self, saves: int, size: int, fsyncs: int) -> None:
+        with self._stats_lock:
+            self.stats["saves"] += saves
+            self.stats["bytes"] += size
+            self.stats["writes"] += 1
+            self.stats["fsyncs"] += fsyncs
+
+    def _sync_dir(self, directory: str) -> None:
+        fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def write_atomic(self, filename: str, data: Any, format_type: str = "json") -> Dict[str, Any]:
+        """
+        覆盖写入：临时文件 + 原子改名（阻塞调用）
+
+        Returns:
+            {"path": 路径, "size": 写入字节数}
+        """
+        payload = open_payload(data)
+        path = self.resolve_path(filename)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".part")
+        size = 0
+        try:
+            with open(fd, "wb", buffering=self.buffer_size) as f:
+                for block in iter_encoded(payload, format_type):
+                    f.write(block)
+                    size += len(block)
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+            os.replace(temp_path, path)
+            if self.fsync:
+                self._sync_dir(directory)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        self._record(1, size, 2 if self.fsync else 0)
+        return {"path": path, "size": size}
+
+    async def append(self, filename: str, data: Any, format_type: str = "ndjson") -> Dict[str, Any]:
+        """
+        追加写入：合并窗口内同一文件的多次保存合并成一次写入与一次 fsync
+
+        Returns:
+            {"path": 路径, "size": 本次写入字节数, "batch_size": 同批保存次数}
+        """
+        if format_type not in APPEND_FORMATS:
+            raise ValueError(f"追加模式只支持: {', '.join(APPEND_FORMATS)}")
+
+        path = self.resolve_path(filename)
+        block = b"".join(iter_encoded(open_payload(data), format_type))
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.setdefault(path, []).append((block, future))
+        self._pending_bytes[path] = self._pending_bytes.get(path, 0) + len(block)
+
+        if self._pending_bytes[path] >= self.batch_max_bytes:
+            self._schedule_flush(path, 0)
+        elif path not in self._flush_handles:
+            self._schedule_flush(path, self.batch_window)
+
+        batch_size = await future
+        return {"path": path, "size": len(block), "batch_size": batch_size}
+
+    def _schedule_flush(self, path: str, delay: float) -> None:
+        handle = self._flush_handles.pop(path, None)
+        if handle is not None:
+            handle.cancel()
+        loop = asyncio.get_running_loop()
+        self._flush_handles[path] = loop.call_later(delay, lambda: loop.create_task(self._flush(path)))
+
+    async def _flush(self, path: str) -> None:
+        self._flush_handles.pop(path, None)
+        batch = self._pending.pop(path, [])
+        self._pending_bytes.pop(path, None)
+        if not batch:
+            return
+
+        # 达到字节上限时上一批可能还在执行器中写入，排在它之后，保证同一文件的批次顺序
+        previous = self._writes.get(path)
+        current = self._writes[path] = asyncio.current_task()
+        try:
+            if previous is not None:
+                # 上一批的异常由它自己的 future 报告
+                await asyncio.wait([previous])
+            await asyncio.get_running_loop().run_in_executor(
+                None, self._write_batch, path, b"".join(block for block, _ in batch), len(batch)
+            )
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            if self._writes.get(path) is current:
+                del self._writes[path]
+
+        for _, future in batch:
+            if not future.done():
+                future.set_result(len(batch))
+
+    def _write_batch(self, path: str, data: bytes, saves: int) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            # 整批一次写入，O_APPEND 下定位到末尾与写入是原子的；只有极少数情况（信号中断、
+            # 超过单次写入上限）才会部分写入，剩余部分继续追加
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+            if self.fsync:
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+        self._record(saves, len(data), 1 if self.fsync else 0)
+
+
+_file_sink: Optional[FileSink] = None
+
+
+def get_file_sink() -> FileSink:
+    """获取进程级文件写入器"""
+    global _file_sink
+    if _file_sink is None:
+        _file_sink = FileSink()
+    return _file_sink
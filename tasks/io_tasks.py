@@ -1,187 +1,289 @@
 # tasks/io_tasks.py - 标准化的IO任务模块
 from celery_app import app
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Union
+import asyncio
 import time
 import json
 
+from tasks.async_support import async_task
+from tasks.backup_engine import get_backup_engine
+from tasks.db_sink import get_db_sink
+from tasks.file_sink import get_file_sink
+from tasks.notifier import get_notifier
+from tasks.payload_store import claim_check, get_store, open_payload
+from tasks.reports import get_report_cache
+from tasks.smtp_pool import build_message, get_smtp_pool
+from tasks.task_log import get_task_log
+
+log = get_task_log(__name__)
+
 @app.task(name='io.send_email')
-def send_email(to_address: str, subject: str, body: str = "") -> Dict[str, Any]:
+@async_task
+async def send_email(to_address: Union[str, List[str]], subject: str, body: str = "") -> Dict[str, Any]:
     """
     发送邮件任务
     
     Args:
-        to_address: 收件人地址
+        to_address: 收件人地址（多个收件人用逗号分隔或传列表，在同一个SMTP事务中投递）
         subject: 邮件主题
         body: 邮件内容
         
     Returns:
         发送结果字典
     """
-    print(f"📧 发送邮件到: {to_address}")
-    print(f"   主题: {subject}")
-    print(f"   内容: {body}")
+    log.info("📧 发送邮件到: %s, 主题: %s, 内容: %s", to_address, subject, body)
     
-    # 模拟邮件发送延迟
-    time.sleep(1)
+    # 经由进程级SMTP连接池发送，连接在任务间复用
+    sent = await get_smtp_pool().send(build_message(to_address, subject, body))
     
     result = {
         "status": "sent",
         "to": to_address,
         "subject": subject,
+        "recipients": sent["recipients"],
+        "refused": sent["refused"],
         "sent_at": time.strftime("%Y-%m-%d %H:%M:%S"),
-        "message_id": f"msg_{int(time.time())}"
+        "message_id": sent["message_id"]
     }
     
-    print(f"✅ 邮件发送成功: {result['message_id']}")
+    log.info("✅ 邮件发送成功: %s", result['message_id'])
+    return result
+
+@app.task(name='io.send_email_batch')
+@async_task
+async def send_email_batch(emails: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    批量发送邮件任务
+    
+    Args:
+        emails: 邮件列表，每项为 {"to": 收件人, "subject": 主题, "body": 内容}
+        
+    Returns:
+        批量发送结果字典（单封失败不影响其他邮件）
+    """
+    log.info("📧 批量发送邮件: %s 封", len(emails))
+    
+    messages = [build_message(email["to"], email["subject"], email.get("body", "")) for email in emails]
+    results = await get_smtp_pool().send_batch(messages)
+    sent = sum(1 for item in results if item["status"] == "sent")
+    
+    result = {
+        "status": "sent" if sent == len(results) else "partial",
+        "total": len(results),
+        "sent": sent,
+        "failed": len(results) - sent,
+        "results": results,
+        "sent_at": time.strftime("%Y-%m-%d %H:%M:%S")
+    }
+    
+    log.info("✅ 批量发送完成: %s/%s", sent, len(results))
     return result
 
 @app.task(name='io.save_to_file')
-def save_to_file(data: Any, filename: str, format_type: str = "json") -> Dict[str, Any]:
+@claim_check(lazy=True)
+@async_task
+async def save_to_file(data: Any, filename: str, format_type: str = None,
+                       mode: str = "write") -> Dict[str, Any]:
     """
     保存数据到文件任务
     
     Args:
-        data: 要保存的数据
-        filename: 文件名
-        format_type: 文件格式 (json, txt)
+        data: 要保存的数据（或负载引用）
+        filename: 文件名（相对于输出目录）
+        format_type: 文件格式 (json, ndjson, binary)，默认 write 为 json、append 为 ndjson
+        mode: write 原子覆盖写入；append 追加写入（ndjson / binary），与同一文件的其他保存合并提交
         
     Returns:
         保存结果字典
     """
-    print(f"💾 保存数据到文件: {filename}")
-    print(f"   格式: {format_type}")
-    print(f"   数据: {data}")
+    format_type = format_type or ("ndjson" if mode == "append" else "json")
+    log.info("💾 保存数据到文件: %s, 格式: %s, 模式: %s, 数据: %s", filename, format_type, mode, data)
     
-    # 模拟文件写入延迟
-    time.sleep(0.5)
+    sink = get_file_sink()
+    if mode == "append":
+        written = await sink.append(filename, data, format_type)
+    elif mode == "write":
+        loop = asyncio.get_running_loop()
+        written = await loop.run_in_executor(None, sink.write_atomic, filename, data, format_type)
+    else:
+        raise ValueError(f"不支持的写入模式: {mode}")
     
-    # 这里只是模拟，实际项目中会真正写入文件
     result = {
         "status": "saved",
         "filename": filename,
+        "path": written["path"],
         "format": format_type,
-        "size": len(str(data)),
+        "mode": mode,
+        "size": written["size"],
+        "batch_size": written.get("batch_size", 1),
         "saved_at": time.strftime("%Y-%m-%d %H:%M:%S")
     }
     
-    print(f"✅ 文件保存成功: {filename}")
+    log.info("✅ 文件保存成功: %s", written['path'])
     return result
 
 @app.task(name='io.save_to_database')
-def save_to_database(data: Any, table: str = "results") -> Dict[str, Any]:
+@claim_check(lazy=True)
+@async_task
+async def save_to_database(data: Any, table: str = "results") -> Dict[str, Any]:
     """
     保存数据到数据库任务
     
     Args:
-        data: 要保存的数据
-        table: 数据表名
+        data: 要保存的数据（或负载引用）；列表每项一行，字典的键对应列
+        table: 数据表名（不存在时按数据推断结构创建）
         
     Returns:
         保存结果字典
     """
-    print(f"🗄️ 保存数据到数据库表: {table}")
-    print(f"   数据: {data}")
+    log.info("🗄️ 保存数据到数据库表: %s, 数据: %s", table, data)
     
-    # 模拟数据库写入延迟
-    time.sleep(0.8)
+    # 同一张表的并发小保存在合并窗口内合并到一个事务
+    saved = await get_db_sink().save(table, data)
     
-    # 这里只是模拟，实际项目中会连接真实数据库
     result = {
         "status": "saved",
         "table": table,
-        "record_id": f"rec_{int(time.time())}",
-        "rows_affected": 1,
+        "record_id": saved["record_id"],
+        "rows_affected": saved["rows"],
+        "batch_rows": saved["batch_rows"],
+        "batch_size": saved["batch_size"],
         "saved_at": time.strftime("%Y-%m-%d %H:%M:%S")
     }
     
-    print(f"✅ 数据库保存成功: {result['record_id']}")
+    log.info("✅ 数据库保存成功: %s", result['record_id'])
     return result
 
 @app.task(name='io.generate_report')
-def generate_report(data: Any, report_type: str = "summary") -> Dict[str, Any]:
+@claim_check(lazy=True)
+@async_task
+async def generate_report(data: Any, report_type: str = "summary") -> Dict[str, Any]:
     """
     生成报告任务
     
     Args:
-        data: 报告数据
+        data: 报告数据（或负载引用）
         report_type: 报告类型 (summary, detailed, chart)
         
     Returns:
-        报告生成结果字典
+        报告生成结果字典；相同数据与类型的报告直接从缓存返回
     """
-    print(f"📊 生成报告，类型: {report_type}")
-    print(f"   数据: {data}")
+    log.info("📊 生成报告，类型: %s, 数据: %s", report_type, data)
     
-    # 模拟报告生成延迟
-    time.sleep(1.2)
+    # 按 (数据, 类型) 的内容哈希缓存，并发的相同请求只生成一次
+    report = await get_report_cache().get_or_generate_async(data, report_type)
     
     result = {
         "status": "generated",
         "report_type": report_type,
-        "report_id": f"rpt_{int(time.time())}",
-        "pages": 3 if report_type == "detailed" else 1,
-        "generated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
-        "file_path": f"/reports/{report_type}_{int(time.time())}.pdf"
+        "report_id": report["report_id"],
+        "pages": report["pages"],
+        "cached": report["cached"],
+        "generated_at": report["generated_at"],
+        "file_path": report["path"]
     }
     
-    print(f"✅ 报告生成完成: {result['report_id']}")
+    log.info("✅ 报告%s: %s", '命中缓存' if report['cached'] else '生成完成', result['report_id'])
     return result
 
+@app.task(name='io.report_cache_stats')
+def report_cache_stats() -> Dict[str, Any]:
+    """
+    报告缓存统计任务
+    
+    Returns:
+        缓存条目数、占用字节、命中/未命中/淘汰次数
+    """
+    return get_report_cache().stats()
+
 @app.task(name='io.send_notification')
-def send_notification(message: str, channel: str = "slack") -> Dict[str, Any]:
+@async_task
+async def send_notification(message: str, channel: str = "slack") -> Dict[str, Any]:
     """
     发送通知任务
     
     Args:
         message: 通知消息
-        channel: 通知渠道 (slack, webhook, sms)
+        channel: 通知渠道 (slack, webhook, sms)，推送地址见 NotificationConfig
         
     Returns:
         通知发送结果字典
     """
-    print(f"📢 发送通知到 {channel}")
-    print(f"   消息: {message}")
+    log.info("📢 发送通知到 %s, 消息: %s", channel, message)
     
-    # 模拟通知发送延迟
-    time.sleep(0.3)
+    # 同一渠道的突发通知在合并窗口内合并成一次请求
+    sent = await get_notifier().notify(channel, message)
     
     result = {
         "status": "sent",
         "channel": channel,
         "message": message,
-        "notification_id": f"ntf_{int(time.time())}",
+        "notification_id": sent["notification_id"],
+        "status_code": sent["status_code"],
+        "batch_size": sent["batch_size"],
         "sent_at": time.strftime("%Y-%m-%d %H:%M:%S")
     }
     
-    print(f"✅ 通知发送成功: {result['notification_id']}")
+    log.info("✅ 通知发送成功: %s", result['notification_id'])
     return result
 
 @app.task(name='io.backup_data')
-def backup_data(data: Any, backup_location: str = "cloud") -> Dict[str, Any]:
+@claim_check(lazy=True)
+@async_task
+async def backup_data(data: Any, backup_location: str = "cloud") -> Dict[str, Any]:
     """
     备份数据任务
     
     Args:
-        data: 要备份的数据
+        data: 要备份的数据（或负载引用）
         backup_location: 备份位置 (cloud, local, remote)
         
     Returns:
         备份结果字典
     """
-    print(f"💿 备份数据到: {backup_location}")
-    print(f"   数据大小: {len(str(data))} 字符")
+    # 负载引用只需读取元数据中的大小，无需反序列化
+    log.info("💿 备份数据到: %s, 数据大小: %s 字节", backup_location, open_payload(data).nbytes)
     
-    # 模拟备份延迟
-    time.sleep(1.5)
+    # 分块、哈希与压缩都是阻塞操作，放到线程中执行
+    loop = asyncio.get_running_loop()
+    backup = await loop.run_in_executor(None, get_backup_engine().backup, data, backup_location)
     
     result = {
         "status": "backed_up",
         "location": backup_location,
-        "backup_id": f"bkp_{int(time.time())}",
-        "size": len(str(data)),
+        "backup_id": backup["backup_id"],
+        "size": backup["size"],
+        "chunks": backup["chunks"],
+        "new_chunks": backup["new_chunks"],
+        "stored_bytes": backup["stored_bytes"],
+        "dedup_ratio": backup["dedup_ratio"],
         "backed_up_at": time.strftime("%Y-%m-%d %H:%M:%S"),
-        "backup_path": f"/{backup_location}/backup_{int(time.time())}.dat"
+        "backup_path": backup["manifest_path"]
+    }
+    
+    log.info("✅ 备份完成: %s", result['backup_id'])
+    return result
+
+@app.task(name='io.collect_payload_garbage')
+def collect_payload_garbage(ttl: int = None) -> Dict[str, Any]:
+    """
+    回收负载存储任务
+    
+    Args:
+        ttl: 未释放引用的最长保留秒数，默认使用配置
+        
+    Returns:
+        回收结果字典
+    """
+    log.info("🧹 回收负载存储")
+    
+    collected = get_store().collect_garbage(ttl)
+    
+    result = {
+        "status": "collected",
+        "collected": collected,
+        "collected_at": time.strftime("%Y-%m-%d %H:%M:%S")
     }
     
-    print(f"✅ 备份完成: {result['backup_id']}")
+    log.info("✅ 回收完成: %s 个负载", collected)
     return result
@@ -3,6 +3,11 @@ from celery_app import app
 from typing import Union
 import time
 
+from tasks import numeric
+from tasks.task_log import get_task_log
+
+log = get_task_log(__name__)
+
 @app.task(name='math.add')
 def add(x: Union[int, float], y: Union[int, float]) -> Union[int, float]:
     """
@@ -15,9 +20,9 @@ def add(x: Union[int, float], y: Union[int, float]) -> Union[int, float]:
     Returns:
         两数之和
     """
-    print(f"🔢 执行加法: {x} + {y}")
+    log.info("🔢 执行加法: %s + %s", x, y)
     result = x + y
-    print(f"✅ 加法结果: {result}")
+    log.info("✅ 加法结果: %s", result)
     return result
 
 @app.task(name='math.multiply')
@@ -32,9 +37,9 @@ def multiply(x: Union[int, float], y: Union[int, float]) -> Union[int, float]:
     Returns:
         两数之积
     """
-    print(f"🔢 执行乘法: {x} * {y}")
+    log.info("🔢 执行乘法: %s * %s", x, y)
     result = x * y
-    print(f"✅ 乘法结果: {result}")
+    log.info("✅ 乘法结果: %s", result)
     return result
 
 @app.task(name='math.subtract')
@@ -49,9 +54,9 @@ def subtract(x: Union[int, float], y: Union[int, float]) -> Union[int, float]:
     Returns:
         两数之差
     """
-    print(f"🔢 执行减法: {x} - {y}")
+    log.info("🔢 执行减法: %s - %s", x, y)
     result = x - y
-    print(f"✅ 减法结果: {result}")
+    log.info("✅ 减法结果: %s", result)
     return result
 
 @app.task(name='math.divide')
@@ -72,13 +77,13 @@ def divide(x: Union[int, float], y: Union[int, float]) -> Union[int, float]:
     if y == 0:
         raise ValueError("除数不能为零")
     
-    print(f"🔢 执行除法: {x} / {y}")
+    log.info("🔢 执行除法: %s / %s", x, y)
     result = x / y
-    print(f"✅ 除法结果: {result}")
+    log.info("✅ 除法结果: %s", result)
     return result
 
 @app.task(name='math.power')
-def power(base: Union[int, float], exponent: Union[int, float]) -> Union[int, float]:
+def power(base: Union[int, float], exponent: Union[int, float]) -> Union[int, float, dict]:
     """
     幂运算任务
     
@@ -87,32 +92,32 @@ def power(base: Union[int, float], exponent: Union[int, float]) -> Union[int, fl
         exponent: 指数
         
     Returns:
-        幂运算结果
+        幂运算结果（精确结果超过 MATH_EXACT_MAX_DIGITS 位时为浮点数或 {"sign", "log10"} 对数值）
+        
+    Raises:
+        ValueError: 结果超限且 MATH_OVERSIZE_POLICY 为 reject
     """
-    print(f"🔢 执行幂运算: {base} ** {exponent}")
-    result = base ** exponent
-    print(f"✅ 幂运算结果: {result}")
+    digits = numeric.estimate_power_digits(base, exponent)
+    log.info("🔢 执行幂运算: %s ** %s（预计 %s 位）", base, exponent, digits)
+    result = numeric.power(base, exponent)
+    log.info("✅ 幂运算结果: %s", result)
     return result
 
 @app.task(name='math.sqrt')
-def sqrt(x: Union[int, float]) -> float:
+def sqrt(x: Union[int, float, dict]) -> Union[int, float, dict]:
     """
     平方根任务
     
     Args:
-        x: 被开方数
+        x: 被开方数（可以是 math.power 返回的对数值）
         
     Returns:
-        平方根结果
+        平方根结果（超出浮点范围的完全平方数为精确整数）
         
     Raises:
         ValueError: 当输入为负数时
     """
-    if x < 0:
-        raise ValueError("不能对负数开平方根")
-    
-    import math
-    print(f"🔢 执行开方: √{x}")
-    result = math.sqrt(x)
-    print(f"✅ 开方结果: {result}")
-    return result
\ No newline at end of file
+    log.info("🔢 执行开方: √%s", x)
+    result = numeric.sqrt(x)
+    log.info("✅ 开方结果: %s", result)
+    return result
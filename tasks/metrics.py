@@ -0,0 +1,368 @@
+# tasks/metrics.py - 延迟与负载直方图
+"""
+低开销的指标记录与多进程汇总
+
+- HdrHistogram：对数-线性分桶（每个2的幂区间再等分 32 个子桶），相对误差约 3%，
+  记录一次只是一次位运算与一次字典自增；分位数由桶计数直接求出
+- 每个进程一个 MetricsRegistry，后台线程每隔 METRICS_FLUSH_INTERVAL 秒把快照原子写入共享目录；
+  prefork 的各个子进程、worker 主进程与 API 进程各写各的文件
+- collect_metrics 读取目录中所有快照并合并；长时间未更新的快照（进程已退出）合并进归档文件后删除
+- render_prometheus 输出 Prometheus 文本格式：histogram（le 边界与桶边界对齐）加各分位数的 summary
+"""
+import fcntl
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from config import MetricsConfig
+
+PRECISION_BITS = 5
+SUB_BUCKETS = 1 << PRECISION_BITS
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# 延迟以微秒、大小以字节为单位记录；le 边界取 4 的幂，与桶边界对齐
+_MICROS = 1e-6
+LATENCY_BOUNDS = [4 ** k for k in range(3, 14)]   # 64us .. 67s
+SIZE_BOUNDS = [4 ** k for k in range(4, 16)]      # 256B .. 1GB
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+# 指标名 -> (类型, 说明, 单位换算, le 边界)
+METRICS = {
+    "task_queue_wait_seconds": ("histogram", "任务从发布到开始执行的等待时间", _MICROS, LATENCY_BOUNDS),
+    "task_runtime_seconds": ("histogram", "任务执行耗时", _MICROS, LATENCY_BOUNDS),
+    "task_payload_bytes": ("histogram", "worker 收到的任务消息体大小", 1, SIZE_BOUNDS),
+    "task_total": ("counter", "按结束状态统计的任务数", 1, None),
+    "http_request_duration_seconds": ("histogram", "API 请求处理耗时", _MICROS, LATENCY_BOUNDS),
+}
+
+
+def bucket_index(value: int) -> int:
+    """值所在的桶序号：保留最高 PRECISION_BITS+1 位"""
+    shift = value.bit_length() - PRECISION_BITS - 1
+    if shift <= 0:
+        return value
+    return shift * SUB_BUCKETS + (value >> shift)
+
+
+def bucket_bounds(index: int) -> Tuple[int, int]:
+    """桶序号对应的取值区间 [low, high)"""
+    if index < 2 * SUB_BUCKETS:
+        return index, index + 1
+    shift = index // SUB_BUCKETS - 1
+    mantissa = index - shift * SUB_BUCKETS
+    return mantissa << shift, (mantissa + 1) << shift
+
+
+class HdrHistogram:
+    """对数-线性分桶直方图（非负整数）"""
+
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def record(self, value: int) -> None:
+        index = bucket_index(value)
+        counts = self.counts
+        counts[index] = counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+        if self.min is None or value < self.min:
+            self.min = value
+
+    def merge(self, other: "HdrHistogram") -> "HdrHistogram":
+        counts = self.counts
+        for index, count in other.counts.items():
+            counts[index] = counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+        return self
+
+    def quantile(self, q: float) -> int:
+        """分位数（所在桶的上界，不超过最大值）"""
+        if not self.count:
+            return 0
+        rank = max(1, q * self.count)
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                low, high = bucket_bounds(index)
+                return max(min(high - 1, self.max), self.min)
+        return self.max
+
+    def cumulative(self, bounds: List[int]) -> List[int]:
+        """小于各边界的记录数（边界为桶边界时精确）"""
+        ordered = sorted(self.counts.items())
+        result, seen, position = [], 0, 0
+        for bound in bounds:
+            while position < len(ordered) and bucket_bounds(ordered[position][0])[1] <= bound:
+                seen += ordered[position][1]
+                position += 1
+            result.append(seen)
+        return result
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"counts": sorted(self.counts.items()), "count": self.count, "sum": self.total,
+                "min": self.min, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "HdrHistogram":
+        histogram = cls()
+        histogram.counts = {int(index): count for index, count in data["counts"]}
+        histogram.count = data["count"]
+        histogram.total = data["sum"]
+        histogram.min = data["min"]
+        histogram.max = data["max"]
+        return histogram
+
+
+class MetricsSnapshot:
+    """一组直方图与计数器，可合并、可序列化"""
+
+    def __init__(self):
+        self.histograms: Dict[Tuple[str, Labels], HdrHistogram] = {}
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+
+    def merge(self, other: "MetricsSnapshot") -> "MetricsSnapshot":
+        for key, histogram in other.histograms.items():
+            target = self.histograms.get(key)
+            if target is None:
+                target = self.histograms[key] = HdrHistogram()
+            target.merge(histogram)
+        for key, value in other.counters.items():
+            self.counters[key] = self.counters.get(key, 0) + value
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "histograms": [[name, list(labels), histogram.to_dict()]
+                           for (name, labels), histogram in self.histograms.items()],
+            "counters": [[name, list(labels), value] for (name, labels), value in self.counters.items()]
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "MetricsSnapshot":
+        snapshot = cls()
+        for name, labels, histogram in data.get("histograms", []):
+            snapshot.histograms[(name, tuple(map(tuple, labels)))] = HdrHistogram.from_dict(histogram)
+        for name, labels, value in data.get("counters", []):
+            snapshot.counters[(name, tuple(map(tuple, labels)))] = value
+        return snapshot
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class MetricsRegistry:
+    """进程级指标记录（后台线程定期写出快照）"""
+
+    def __init__(self, directory: str = None, flush_interval: float = None):
+        self.directory = os.path.abspath(directory or MetricsConfig.DIR)
+        self.flush_interval = flush_interval or MetricsConfig.FLUSH_INTERVAL
+        self.pid = os.getpid()
+        self.path = os.path.join(self.directory, f"proc_{socket.gethostname()}_{self.pid}.json")
+
+        self._lock = threading.Lock()
+        self._snapshot = MetricsSnapshot()
+        self._dirty = False
+        self._stopped = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+
+    def observe(self, name: str, value: float, labels: Labels) -> None:
+        """记录一次观测（秒或字节，按 METRICS 中的单位换算）"""
+        scaled = int(value / METRICS[name][2]) if value > 0 else 0
+        key = (name, labels)
+        with self._lock:
+            histogram = self._snapshot.histograms.get(key)
+            if histogram is None:
+                histogram = self._snapshot.histograms[key] = HdrHistogram()
+            histogram.record(scaled)
+            self._dirty = True
+        if self._flusher is None:
+            self._start_flusher()
+
+    def increment(self, name: str, labels: Labels, amount: float = 1) -> None:
+        key = (name, labels)
+        with self._lock:
+            counters = self._snapshot.counters
+            counters[key] = counters.get(key, 0) + amount
+            self._dirty = True
+        if self._flusher is None:
+            self._start_flusher()
+
+    def snapshot(self) -> MetricsSnapshot:
+        """当前进程指标的副本"""
+        with self._lock:
+            return MetricsSnapshot().merge(self._snapshot)
+
+    def flush(self) -> None:
+        """把快照写入共享目录；没有新数据时只更新修改时间，表明进程仍存活"""
+        with self._lock:
+            if not self._dirty:
+                data = None
+            else:
+                data = json.dumps(self._snapshot.to_dict(), separators=(',', ':')).encode('utf-8')
+                self._dirty = False
+        if data is not None:
+            os.makedirs(self.directory, exist_ok=True)
+            _write_atomic(self.path, data)
+        elif os.path.exists(self.path):
+            os.utime(self.path)
+
+    def _start_flusher(self) -> None:
+        with self._lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(target=self._run_flusher, name="metrics-flusher", daemon=True)
+        self._flusher.start()
+
+    def _run_flusher(self) -> None:
+        while not self._stopped.wait(self.flush_interval):
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+    def close(self) -> None:
+        """停止后台线程并写出最后一次快照"""
+        self._stopped.set()
+        self.flush()
+
+
+_registry: Optional[MetricsRegistry] = None
+
+
+def get_metrics() -> MetricsRegistry:
+    """获取进程级指标记录（fork 出的子进程从空的记录开始）"""
+    global _registry
+    if _registry is None or _registry.pid != os.getpid():
+        _registry = MetricsRegistry()
+    return _registry
+
+
+def collect_metrics(directory: str = None, stale_seconds: int = None) -> MetricsSnapshot:
+    """
+    合并共享目录中所有进程的快照
+
+    已退出进程的快照（超过 stale_seconds 未更新）合并进 archive.json 后删除，
+    计数在进程回收（worker_max_tasks_per_child）之后依然单调递增。
+    """
+    directory = os.path.abspath(directory or MetricsConfig.DIR)
+    stale_seconds = MetricsConfig.STALE_SECONDS if stale_seconds is None else stale_seconds
+    os.makedirs(directory, exist_ok=True)
+    archive_path = os.path.join(directory, "archive.json")
+
+    with open(os.path.join(directory, ".lock"), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        merged = MetricsSnapshot()
+        archive = _load(archive_path) or MetricsSnapshot()
+        stale = []
+        now = time.time()
+        for entry in os.scandir(directory):
+            if not (entry.name.startswith("proc_") and entry.name.endswith(".json")):
+                continue
+            snapshot = _load(entry.path)
+            if snapshot is None:
+                continue
+            try:
+                expired = now - entry.stat().st_mtime > stale_seconds
+            except FileNotFoundError:
+                continue
+            if expired:
+                archive.merge(snapshot)
+                stale.append(entry.path)
+            else:
+                merged.merge(snapshot)
+        if stale:
+            _write_atomic(archive_path, json.dumps(archive.to_dict(), separators=(',', ':')).encode('utf-8'))
+            for path in stale:
+                os.remove(path)
+    return merged.merge(archive)
+
+
+def _load(path: str) -> Optional[MetricsSnapshot]:
+    try:
+        with open(path, "rb") as f:
+            return MetricsSnapshot.from_dict(json.load(f))
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: Iterable[Tuple[str, str]], **extra: str) -> str:
+    pairs = [*labels, *extra.items()]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus(snapshot: MetricsSnapshot) -> str:
+    """按 Prometheus 文本格式输出"""
+    lines: List[str] = []
+    for name, (kind, help_text, scale, bounds) in METRICS.items():
+        if kind == "counter":
+            series = sorted((labels, value) for (metric, labels), value in snapshot.counters.items()
+                            if metric == name)
+            if not series:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for labels, value in series:
+                lines.append(f"{name}{_labels(labels)} {_number(value)}")
+            continue
+
+        series = sorted((labels, histogram) for (metric, labels), histogram in snapshot.histograms.items()
+                        if metric == name)
+        if not series:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for labels, histogram in series:
+            for bound, count in zip(bounds, histogram.cumulative(bounds)):
+                lines.append(f"{name}_bucket{_labels(labels, le=_number(bound * scale))} {count}")
+            lines.append(f'{name}_bucket{_labels(labels, le="+Inf")} {histogram.count}')
+            lines.append(f"{name}_sum{_labels(labels)} {_number(histogram.total * scale)}")
+            lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+
+        # HDR 桶计数求出的分位数，比 le 边界插值精确
+        summary = f"{name}_quantiles"
+        lines.append(f"# HELP {summary} {help_text}（分位数）")
+        lines.append(f"# TYPE {summary} summary")
+        for labels, histogram in series:
+            for q in QUANTILES:
+                value = histogram.quantile(q) * scale
+                lines.append(f"{summary}{_labels(labels, quantile=str(q))} {_number(value)}")
+            lines.append(f"{summary}_sum{_labels(labels)} {_number(histogram.total * scale)}")
+            lines.append(f"{summary}_count{_labels(labels)} {histogram.count}")
+    return "\n".join(lines) + "\n"
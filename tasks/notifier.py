@@ -0,0 +1,161 @@
+# tasks/notifier.py - io.send_notification 的 webhook 推送
+"""
+webhook 通知推送
+
+- 每个 worker 进程一个 requests.Session，按主机维护 keep-alive 连接池
+- 按主机限制并发请求数，等待在事件循环上进行，不占用发送线程
+- 合并窗口内发往同一渠道的突发通知合并成一次请求（slack 合并为多行文本，其他渠道为消息列表）
+"""
+import asyncio
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import NotificationConfig
+
+
+def format_payload(channel: str, messages: List[str]) -> Dict[str, Any]:
+    """按渠道生成请求体"""
+    if channel == "slack":
+        return {"text": "\n".join(messages)}
+    return {
+        "channel": channel,
+        "messages": messages,
+        "count": len(messages),
+        "sent_at": time.strftime("%Y-%m-%d %H:%M:%S")
+    }
+
+
+class WebhookNotifier:
+    """webhook 推送器（每个 worker 进程一个实例）"""
+
+    def __init__(self, webhook_url: str = None, channel_urls: Dict[str, str] = None,
+                 max_connections: int = None, per_host_limit: int = None, timeout: float = None,
+                 coalesce_window_ms: int = None, coalesce_max_messages: int = None):
+        self.webhook_url = webhook_url or NotificationConfig.WEBHOOK_URL
+        self.channel_urls = NotificationConfig.CHANNEL_URLS if channel_urls is None else channel_urls
+        self.max_connections = max_connections or NotificationConfig.MAX_CONNECTIONS
+        self.per_host_limit = per_host_limit or NotificationConfig.PER_HOST_LIMIT
+        self.timeout = timeout or NotificationConfig.TIMEOUT
+        self.coalesce_window = (NotificationConfig.COALESCE_WINDOW_MS if coalesce_window_ms is None
+                                else coalesce_window_ms) / 1000
+        self.coalesce_max = coalesce_max_messages or NotificationConfig.COALESCE_MAX_MESSAGES
+        self.pid = os.getpid()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=self.per_host_limit,
+                              pool_block=True, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(self.max_connections, thread_name_prefix="webhook")
+
+        # 以下状态只在事件循环线程中访问
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+        self._pending: Dict[str, List[Tuple[str, asyncio.Future]]] = {}
+        self._flush_handles: Dict[str, asyncio.TimerHandle] = {}
+
+        self._stats_lock = threading.Lock()
+        self.stats = {"notifications": 0, "requests": 0, "failures": 0}
+
+    def url_for(self, channel: str) -> str:
+        return self.channel_urls.get(channel) or self.webhook_url
+
+    def post(self, url: str, payload: Dict[str, Any]) -> int:
+        """发送一次请求（阻塞调用），返回状态码"""
+        response = self.session.post(url, json=payload, timeout=self.timeout)
+        response.raise_for_status()
+        return response.status_code
+
+    async def deliver(self, channel: str, messages: List[str]) -> int:
+        """把一组消息作为一次请求发往渠道，受单主机并发上限约束"""
+        url = self.url_for(channel)
+        host = urlsplit(url).netloc
+        slots = self._host_slots.get(host)
+        if slots is None:
+            slots = self._host_slots[host] = asyncio.Semaphore(self.per_host_limit)
+
+        async with slots:
+            try:
+                status_code = await asyncio.get_running_loop().run_in_executor(
+                    self._executor, self.post, url, format_payload(channel, messages)
+                )
+            except Exception:
+                self._count(requests=1, failures=1)
+                raise
+        self._count(requests=1, notifications=len(messages))
+        return status_code
+
+    def _count(self, **counts: int) -> None:
+        with self._stats_lock:
+            for name, value in counts.items():
+                self.stats[name] += value
+
+    async def notify(self, channel: str, message: str) -> Dict[str, Any]:
+        """
+        发送一条通知：合并窗口内同一渠道的通知合并成一次请求
+
+        Returns:
+            {"notification_id": 通知ID, "status_code": 状态码, "batch_size": 同一请求中的通知数}
+        """
+        notification_id = f"ntf_{uuid.uuid4().hex[:16]}"
+        if not self.coalesce_window:
+            status_code = await self.deliver(channel, [message])
+            return {"notification_id": notification_id, "status_code": status_code, "batch_size": 1}
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending = self._pending.setdefault(channel, [])
+        pending.append((message, future))
+
+        if len(pending) >= self.coalesce_max:
+            # 达到上限立即取出本批，之后的通知进入新批次
+            self._flush(channel)
+        elif channel not in self._flush_handles:
+            self._flush_handles[channel] = loop.call_later(self.coalesce_window, self._flush, channel)
+
+        status_code, batch_size = await future
+        return {"notification_id": notification_id, "status_code": status_code, "batch_size": batch_size}
+
+    def _flush(self, channel: str) -> None:
+        handle = self._flush_handles.pop(channel, None)
+        if handle is not None:
+            handle.cancel()
+        batch = self._pending.pop(channel, [])
+        if batch:
+            asyncio.get_running_loop().create_task(self._send_batch(channel, batch))
+
+    async def _send_batch(self, channel: str, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        try:
+            status_code = await self.deliver(channel, [message for message, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for _, future in batch:
+            if not future.done():
+                future.set_result((status_code, len(batch)))
+
+    def close(self) -> None:
+        """关闭连接池"""
+        self.session.close()
+        self._executor.shutdown(wait=False)
+
+
+_notifier: Optional[WebhookNotifier] = None
+
+
+def get_notifier() -> WebhookNotifier:
+    """获取进程级推送器（fork 出的子进程重建连接池）"""
+    global _notifier
+    if _notifier is None or _notifier.pid != os.getpid():
+        _notifier = WebhookNotifier()
+    return _notifier
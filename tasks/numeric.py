@@ -0,0 +1,109 @@
+# tasks/numeric.py - 大整数幂运算的规模估算与快速路径
+"""
+math.power / math.sqrt 的数值路径
+
+- estimate_power_digits: 计算前按 |指数| × log10|底数| 估算精确结果的十进制位数（不做大整数运算）
+- 位数不超过 MathCostConfig.EXACT_MAX_DIGITS 时精确计算；超过时在对数空间计算:
+  结果能用浮点数表示时返回浮点数，否则返回 {"sign": ±1, "log10": log10|x|}（对数值，可 JSON 序列化）
+- sqrt: 超出浮点范围的整数用 math.isqrt 精确开方（完全平方数返回整数），对数值直接减半指数
+
+权衡: 对数空间的结果只有约 15 位有效数字，且对数值不能再参与 math.add 等其他运算（目前只有
+power_sqrt 任务链使用 math.power）。精确结果超过 HEAVY_DIGITS 位的任务链分流到重计算队列
+（见 ChainService.get_queue），不占用 math worker。
+"""
+import math
+import sys
+from typing import Any, Dict, Union
+
+from config import MathCostConfig
+
+Number = Union[int, float]
+LogValue = Dict[str, float]
+
+# 浮点数能表示的最大 log10（约 1.8e308）
+FLOAT_MAX_LOG10 = math.log10(sys.float_info.max)
+
+# 精确结果需要按十进制序列化（json、日志、数据库），放宽进程的大整数转字符串上限
+if hasattr(sys, 'get_int_max_str_digits') and 0 < sys.get_int_max_str_digits() < MathCostConfig.EXACT_MAX_DIGITS:
+    sys.set_int_max_str_digits(MathCostConfig.EXACT_MAX_DIGITS)
+
+
+def estimate_power_digits(base: Number, exponent: Number) -> int:
+    """
+    估算 base ** exponent 精确结果的十进制位数
+
+    只有整数底数、非负整数指数时结果为大整数；其余情况结果为浮点数（不超过 1 位的开销），返回 1。
+    """
+    if not (isinstance(base, int) and isinstance(exponent, int)) or exponent < 0 or abs(base) <= 1:
+        return 1
+    try:
+        return int(exponent * math.log10(abs(base))) + 1
+    except OverflowError:
+        # 指数本身超出浮点范围
+        return sys.maxsize
+
+
+def is_oversized(base: Number, exponent: Number) -> bool:
+    """精确结果是否超过 EXACT_MAX_DIGITS"""
+    return estimate_power_digits(base, exponent) > MathCostConfig.EXACT_MAX_DIGITS
+
+
+def is_log_value(value: Any) -> bool:
+    return isinstance(value, dict) and 'log10' in value
+
+
+def from_log10(sign: int, log10: float) -> Union[float, LogValue]:
+    """由符号与 log10|x| 得到结果: 浮点数能表示时返回浮点数，否则返回对数值"""
+    if log10 < FLOAT_MAX_LOG10:
+        return sign * 10.0 ** log10
+    return {'sign': sign, 'log10': log10}
+
+
+def power(base: Number, exponent: Number) -> Union[Number, LogValue]:
+    """
+    base ** exponent: 规模可控时精确计算，否则在对数空间计算
+
+    Raises:
+        ValueError: 结果超过 EXACT_MAX_DIGITS 且 OVERSIZE_POLICY 为 reject，或对数空间也无法表示
+    """
+    if is_oversized(base, exponent):
+        if MathCostConfig.OVERSIZE_POLICY == 'reject':
+            raise ValueError(f"幂运算结果超过 {MathCostConfig.EXACT_MAX_DIGITS} 位")
+    else:
+        try:
+            return base ** exponent
+        except OverflowError:
+            # 浮点数溢出，改用对数空间
+            pass
+    if base == 0:
+        return 0
+    # 负底数只在整数指数时有实数结果，奇数次幂为负
+    sign = -1 if base < 0 and isinstance(exponent, int) and exponent % 2 else 1
+    try:
+        return from_log10(sign, exponent * math.log10(abs(base)))
+    except OverflowError:
+        raise ValueError("幂运算结果超出可表示范围") from None
+
+
+def sqrt(x: Union[Number, LogValue]) -> Union[Number, LogValue]:
+    """
+    平方根: 浮点范围内用 math.sqrt，超出浮点范围的整数用 math.isqrt（完全平方数结果精确），对数值减半
+
+    Raises:
+        ValueError: 输入为负数
+    """
+    if is_log_value(x):
+        if x.get('sign', 1) < 0:
+            raise ValueError("不能对负数开平方根")
+        return from_log10(1, x['log10'] / 2)
+    if x < 0:
+        raise ValueError("不能对负数开平方根")
+    if isinstance(x, int) and x.bit_length() >= sys.float_info.max_exp:
+        root = math.isqrt(x)
+        if root * root == x:
+            return root
+        # 非完全平方数: 整数部分超过 2^511，舍去的小数部分在浮点精度之下
+        if root.bit_length() < sys.float_info.max_exp:
+            return float(root)
+        return from_log10(1, math.log10(x) / 2)
+    return math.sqrt(x)
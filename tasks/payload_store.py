@@ -0,0 +1,348 @@
+# tasks/payload_store.py - claim-check 负载存储
+"""
+claim-check 负载存储
+
+大负载不再经由 Redis 在任务间传递：生产者把序列化后的数据写入负载存储，
+消息中只携带一个小的引用字典；消费者按需（惰性）解析引用。
+
+- LocalPayloadStore: 单机文件系统实现，按内容哈希寻址，mmap 零拷贝读取
+- 引用计数保存在 SQLite 中，计数归零即删除；超过 TTL 的泄漏负载由 collect_garbage 清理
+- 通过 register_store 注册共享存储实现（NFS、对象存储等）
+"""
+import abc
+import hashlib
+import json
+import mmap
+import os
+import sqlite3
+import tempfile
+import time
+from functools import wraps
+from typing import Any, Callable, Dict, Optional
+
+from config import PayloadStoreConfig
+
+# 引用字典中的标记键
+REF_KEY = "__payload_ref__"
+
+
+def is_payload_ref(value: Any) -> bool:
+    """判断是否为负载引用"""
+    return isinstance(value, dict) and REF_KEY in value
+
+
+def encode_payload(value: Any) -> bytes:
+    """负载序列化（紧凑JSON）"""
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def decode_payload(buffer) -> Any:
+    """负载反序列化"""
+    return json.loads(bytes(buffer))
+
+
+class PayloadStore(abc.ABC):
+    """负载存储基类，共享存储实现需提供以下方法（缺少任一方法时无法实例化）"""
+
+    name = "base"
+
+    @abc.abstractmethod
+    def put(self, data: bytes) -> str:
+        """写入负载（引用计数+1），返回键"""
+
+    @abc.abstractmethod
+    def open(self, key: str) -> memoryview:
+        """只读打开负载，返回缓冲区"""
+
+    @abc.abstractmethod
+    def incref(self, key: str, count: int = 1) -> None:
+        """增加引用计数（如同一引用扇出给多个任务）"""
+
+    @abc.abstractmethod
+    def decref(self, key: str) -> None:
+        """减少引用计数，归零时删除"""
+
+    @abc.abstractmethod
+    def collect_garbage(self, ttl: int = None) -> int:
+        """清理无引用或已过期的负载，返回清理数量"""
+
+
+class LocalPayloadStore(PayloadStore):
+    """本地文件系统负载存储（单机部署）"""
+
+    name = "local"
+
+    def __init__(self, root_dir: str = None):
+        self.root_dir = os.path.abspath(root_dir or PayloadStoreConfig.ROOT_DIR)
+        self.objects_dir = os.path.join(self.root_dir, "objects")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self.db_path = os.path.join(self.root_dir, "refs.db")
+
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS payload_refs ("
+                "key TEXT PRIMARY KEY, refcount INTEGER NOT NULL, "
+                "size INTEGER NOT NULL, updated_at REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        # 每次操作新建连接，fork 出的 worker 进程之间互不干扰
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.objects_dir, key[:2], key)
+
+    def put(self, data: bytes) -> str:
+        key = hashlib.sha256(data).hexdigest()
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # 在锁外写临时文件，锁内只做改名，缩短持锁时间
+        temp_path = None
+        if not os.path.exists(path):
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT INTO payload_refs (key, refcount, size, updated_at) VALUES (?, 1, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET refcount = refcount + 1, updated_at = excluded.updated_at",
+                (key, len(data), time.time())
+            )
+            if temp_path is not None:
+                if os.path.exists(path):
+                    os.remove(temp_path)
+                else:
+                    os.replace(temp_path, path)
+            elif not os.path.exists(path):
+                # 文件在检查后被回收，重新写入
+                with open(path, "wb") as f:
+                    f.write(data)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            if temp_path is not None and os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        finally:
+            conn.close()
+
+        return key
+
+    def open(self, key: str) -> memoryview:
+        with open(self._path(key), "rb") as f:
+            # 映射后即可关闭文件；即使文件随后被删除，映射仍然有效
+            return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def incref(self, key: str, count: int = 1) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE payload_refs SET refcount = refcount + ?, updated_at = ? WHERE key = ?",
+                (count, time.time(), key)
+            )
+
+    def decref(self, key: str) -> None:
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("UPDATE payload_refs SET refcount = refcount - 1 WHERE key = ?", (key,))
+            row = conn.execute("SELECT refcount FROM payload_refs WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[0] <= 0:
+                self._delete(conn, key)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def collect_garbage(self, ttl: int = None) -> int:
+        ttl = PayloadStoreConfig.TTL_SECONDS if ttl is None else ttl
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            keys = [row[0] for row in conn.execute(
+                "SELECT key FROM payload_refs WHERE refcount <= 0 OR updated_at < ?",
+                (time.time() - ttl,)
+            )]
+            for key in keys:
+                self._delete(conn, key)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return len(keys)
+
+    def _delete(self, conn: sqlite3.Connection, key: str) -> None:
+        conn.execute("DELETE FROM payload_refs WHERE key = ?", (key,))
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def stats(self) -> Dict[str, int]:
+        """存储统计"""
+        with self._connect() as conn:
+            count, total = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM payload_refs"
+            ).fetchone()
+        return {"payloads": count, "bytes": total}
+
+
+# 存储实现注册表: 名称 -> 工厂函数
+_STORE_FACTORIES: Dict[str, Callable[[], PayloadStore]] = {
+    "local": LocalPayloadStore,
+}
+_stores: Dict[str, PayloadStore] = {}
+
+
+def register_store(name: str, factory: Callable[[], PayloadStore]) -> None:
+    """注册共享存储实现"""
+    _STORE_FACTORIES[name] = factory
+    _stores.pop(name, None)
+
+
+def get_store(name: str = None) -> PayloadStore:
+    """获取存储实例（每个进程按名称缓存）"""
+    name = name or PayloadStoreConfig.BACKEND
+    if name not in _stores:
+        if name not in _STORE_FACTORIES:
+            raise ValueError(f"未注册的负载存储: {name}")
+        _stores[name] = _STORE_FACTORIES[name]()
+    return _stores[name]
+
+
+class PayloadHandle:
+    """
+    负载句柄：惰性解析
+
+    buffer 直接返回存储中的只读缓冲区（零拷贝），value 在首次访问时才反序列化。
+    非引用的内联数据同样可以包装成句柄，消费者无需区分两种情况。
+    """
+
+    def __init__(self, value: Any = None, ref: Optional[Dict[str, Any]] = None):
+        self.ref = ref
+        self._value = value
+        self._buffer = None
+        self._decoded = ref is None
+
+    @property
+    def buffer(self) -> memoryview:
+        """序列化后的字节（引用时为 mmap 缓冲区）"""
+        if self._buffer is None:
+            if self.ref is not None:
+                self._buffer = get_store(self.ref["store"]).open(self.ref[REF_KEY])
+            else:
+                self._buffer = memoryview(encode_payload(self._value))
+        return self._buffer
+
+    @property
+    def nbytes(self) -> int:
+        """序列化后的大小，引用时无需读取数据"""
+        if self.ref is not None:
+            return self.ref["size"]
+        return self.buffer.nbytes
+
+    @property
+    def value(self) -> Any:
+        """反序列化后的数据"""
+        if not self._decoded:
+            self._value = decode_payload(self.buffer)
+            self._decoded = True
+        return self._value
+
+    def __repr__(self):
+        if self.ref is not None:
+            return f"<PayloadHandle(ref='{self.ref[REF_KEY][:12]}', size={self.ref['size']})>"
+        return f"<PayloadHandle(inline, type={type(self._value).__name__})>"
+
+
+def open_payload(value: Any) -> PayloadHandle:
+    """把内联数据、引用或句柄统一为句柄"""
+    if isinstance(value, PayloadHandle):
+        return value
+    if is_payload_ref(value):
+        return PayloadHandle(ref=value)
+    return PayloadHandle(value=value)
+
+
+def offload(value: Any, threshold: int = None, store: str = None) -> Any:
+    """
+    超过阈值的负载写入存储并返回引用，否则原样返回
+
+    Args:
+        value: 任务结果
+        threshold: 字节阈值，默认使用配置
+        store: 存储名称，默认使用配置
+
+    Returns:
+        原数据或引用字典
+    """
+    if not isinstance(value, (list, tuple, dict, str)) or is_payload_ref(value):
+        return value
+
+    threshold = PayloadStoreConfig.THRESHOLD_BYTES if threshold is None else threshold
+    data = encode_payload(value)
+    if len(data) <= threshold:
+        return value
+
+    backend = get_store(store)
+    key = backend.put(data)
+    return {REF_KEY: key, "size": len(data), "store": backend.name}
+
+
+def resolve(value: Any) -> Any:
+    """把引用解析为数据，非引用原样返回"""
+    if is_payload_ref(value):
+        return PayloadHandle(ref=value).value
+    if isinstance(value, PayloadHandle):
+        return value.value
+    return value
+
+
+def release(value: Any) -> None:
+    """释放引用（引用计数-1）"""
+    if is_payload_ref(value):
+        get_store(value["store"]).decref(value[REF_KEY])
+
+
+def claim_check(offload_result: bool = False, lazy: bool = False):
+    """
+    任务装饰器：自动解析参数中的引用，成功后释放引用，并按需把大结果替换为引用
+
+    放在 @app.task 之下使用。
+
+    Args:
+        offload_result: 结果超过阈值时是否写入负载存储
+        lazy: 为 True 时引用参数以 PayloadHandle 传入，由任务按需读取
+    """
+
+    def decorator(func: Callable) -> Callable:
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            refs = [value for value in (*args, *kwargs.values()) if is_payload_ref(value)]
+            if refs:
+                convert = open_payload if lazy else resolve
+                args = [convert(value) if is_payload_ref(value) else value for value in args]
+                kwargs = {name: convert(value) if is_payload_ref(value) else value
+                          for name, value in kwargs.items()}
+
+            result = func(*args, **kwargs)
+
+            # 只在成功后释放，失败重试时引用仍然可用；泄漏的引用由 TTL 回收
+            for ref in refs:
+                release(ref)
+
+            return offload(result) if offload_result else result
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,325 @@
+# tasks/reports.py - io.generate_report 的报告生成与缓存
+"""
+报告生成与内容哈希缓存
+
+- 报告为 Markdown 文件：summary（汇总统计）、detailed（统计、分位数与明细分页）、chart（分布直方图）
+- 缓存键为 (报告类型, 规范化 JSON) 的 SHA-256：相同数据无论是否超过 claim-check 阈值、字典键顺序如何
+  都命中同一缓存；不含对象的负载引用直接对 mmap 缓冲区求哈希，无需反序列化
+- 命中时直接返回已有报告；索引保存在 SQLite 中，多个 worker 进程共享
+- 报告文件总大小超过上限时按最近最少使用（LRU）淘汰
+- 同一报告的并发请求只生成一次：进程内共享同一个 future，进程间用文件锁串行化后再查一次缓存
+"""
+import asyncio
+import fcntl
+import hashlib
+import json
+import math
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from config import ReportCacheConfig
+from tasks.payload_store import PayloadHandle, open_payload
+from tasks.summary import StatsSummary
+
+REPORT_TYPES = ("summary", "detailed", "chart")
+
+# 报告格式变化时递增，使旧缓存失效
+REPORT_VERSION = 1
+
+# detailed 报告的明细行数与每页行数
+DETAIL_ROWS = 200
+ROWS_PER_PAGE = 50
+
+# chart 报告的直方图分桶数与条形宽度
+HISTOGRAM_BUCKETS = 10
+BAR_WIDTH = 40
+
+_NUMBER_TYPES = {int, float}
+
+_canonical_encoder = json.JSONEncoder(sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+
+# 含有 "{"（可能有对象）或空格、换行（可能不是紧凑格式）的JSON需要解析后规范化；
+# 也可能只是字符串中的字符，此时结果相同，只是多一次解析。逐个字符查找（单字符模式走快速扫描）
+_NOT_CANONICAL = tuple(re.compile(re.escape(char)) for char in (b'{', b' ', b'\n'))
+
+
+def cache_key(payload: PayloadHandle, report_type: str) -> str:
+    """报告缓存键（数据的规范化 JSON，与数据是内联还是负载引用、字典键顺序无关）"""
+    digest = hashlib.sha256(f"{REPORT_VERSION}:{report_type}:".encode('ascii'))
+    if payload.ref is not None and not any(pattern.search(payload.buffer) for pattern in _NOT_CANONICAL):
+        # 存储中的紧凑JSON（encode_payload）不含对象时与规范化编码逐字节相同，直接对 mmap 缓冲区求哈希
+        digest.update(payload.buffer)
+    else:
+        digest.update(_canonical_encoder.encode(payload.value).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _histogram(values: List[float], minimum: float, maximum: float) -> List[int]:
+    counts = [0] * HISTOGRAM_BUCKETS
+    width = (maximum - minimum) / HISTOGRAM_BUCKETS or 1
+    for value in values:
+        counts[min(int((value - minimum) / width), HISTOGRAM_BUCKETS - 1)] += 1
+    return counts
+
+
+def render_report(data: Any, report_type: str) -> Dict[str, Any]:
+    """
+    生成报告内容
+
+    Args:
+        data: 报告数据，数值列表会计算统计量，其他数据只统计条目
+        report_type: summary / detailed / chart
+
+    Returns:
+        {"content": Markdown 字节, "pages": 页数}
+    """
+    if report_type not in REPORT_TYPES:
+        raise ValueError(f"不支持的报告类型: {report_type}")
+
+    items = data if isinstance(data, list) else [data]
+    numbers = [item for item in items if type(item) in _NUMBER_TYPES]
+    summary = StatsSummary.from_data(numbers, with_quantiles=report_type == "detailed")
+
+    lines = [
+        f"# {report_type} 报告",
+        "",
+        f"- 生成时间: {time.strftime('%Y-%m-%d %H:%M:%S')}",
+        f"- 数据项: {len(items)}（数值 {len(numbers)}）",
+        "",
+        "## 统计",
+        "",
+        "| 指标 | 值 |",
+        "| --- | --- |",
+    ]
+    lines.extend(f"| {name} | {value} |" for name, value in {**summary.aggregate(), **summary.statistics()}.items())
+    pages = 1
+
+    if report_type == "detailed":
+        quantiles = summary.quantiles() or {}
+        lines += ["", "## 分位数", "", "| 分位点 | 值 |", "| --- | --- |"]
+        lines.extend(f"| {name} | {value} |" for name, value in quantiles.items())
+        rows = items[:DETAIL_ROWS]
+        lines += ["", f"## 明细（前 {len(rows)} 项）"]
+        for page_start in range(0, len(rows), ROWS_PER_PAGE):
+            lines += ["", f"### 第 {page_start // ROWS_PER_PAGE + 1} 页", "", "| # | 值 |", "| --- | --- |"]
+            lines.extend(f"| {page_start + offset} | {item} |"
+                         for offset, item in enumerate(rows[page_start:page_start + ROWS_PER_PAGE]))
+        pages += math.ceil(len(rows) / ROWS_PER_PAGE)
+
+    elif report_type == "chart" and numbers:
+        counts = _histogram(numbers, summary.minimum, summary.maximum)
+        width = (summary.maximum - summary.minimum) / HISTOGRAM_BUCKETS
+        peak = max(counts)
+        lines += ["", "## 分布", "", "```"]
+        for index, count in enumerate(counts):
+            low = summary.minimum + index * width
+            bar = "█" * round(count / peak * BAR_WIDTH) if peak else ""
+            lines.append(f"{low:>14.4g} | {bar} {count}")
+        lines.append("```")
+
+    return {"content": ("\n".join(lines) + "\n").encode('utf-8'), "pages": pages}
+
+
+class ReportCache:
+    """报告缓存（每个 worker 进程一个实例，索引与文件在进程间共享）"""
+
+    def __init__(self, root_dir: str = None, max_bytes: int = None):
+        self.root_dir = os.path.abspath(root_dir or ReportCacheConfig.ROOT_DIR)
+        self.max_bytes = max_bytes or ReportCacheConfig.MAX_BYTES
+        self.locks_dir = os.path.join(self.root_dir, "locks")
+        os.makedirs(self.locks_dir, exist_ok=True)
+        self.db_path = os.path.join(self.root_dir, "cache.db")
+        self.pid = os.getpid()
+
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS report_cache ("
+                "key TEXT PRIMARY KEY, report_type TEXT NOT NULL, path TEXT NOT NULL, "
+                "size INTEGER NOT NULL, pages INTEGER NOT NULL, generated_at TEXT NOT NULL, "
+                "last_access REAL NOT NULL, hits INTEGER NOT NULL DEFAULT 0)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_report_cache_access ON report_cache (last_access)")
+            conn.execute("CREATE TABLE IF NOT EXISTS report_cache_counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+        # 进程内正在生成的报告: 缓存键 -> future，只在事件循环线程中访问
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._stats_lock = threading.Lock()
+        self.local_stats = {"hits": 0, "misses": 0, "shared": 0, "evictions": 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _count(self, conn: sqlite3.Connection, **counts: int) -> None:
+        for name, value in counts.items():
+            conn.execute(
+                "INSERT INTO report_cache_counters (name, value) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                (name, value)
+            )
+        with self._stats_lock:
+            for name, value in counts.items():
+                self.local_stats[name] += value
+
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        """查询缓存，命中时刷新访问时间"""
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT report_type, path, size, pages, generated_at FROM report_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or not os.path.exists(row[1]):
+                return None
+            conn.execute("UPDATE report_cache SET last_access = ?, hits = hits + 1 WHERE key = ?",
+                         (time.time(), key))
+            self._count(conn, hits=1)
+        finally:
+            conn.close()
+
+        report_type, path, size, pages, generated_at = row
+        return {"report_id": f"rpt_{key[:16]}", "report_type": report_type, "path": path,
+                "size": size, "pages": pages, "generated_at": generated_at, "cached": True}
+
+    def get_or_generate(self, data: Any, report_type: str, key: str = None) -> Dict[str, Any]:
+        """
+        命中缓存直接返回，否则生成报告（阻塞调用）
+
+        进程间通过缓存键对应的文件锁串行化，拿到锁后再查一次缓存，
+        等待中的进程直接使用先到者生成的报告。
+        """
+        payload = open_payload(data)
+        key = key or cache_key(payload, report_type)
+        cached = self.lookup(key)
+        if cached is not None:
+            return cached
+
+        # 按键前缀分段加锁（锁文件数量固定，不随报告数增长）
+        with open(os.path.join(self.locks_dir, f"{key[:2]}.lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                cached = self.lookup(key)
+                if cached is not None:
+                    return cached
+                return self._generate(key, payload, report_type)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    async def get_or_generate_async(self, data: Any, report_type: str) -> Dict[str, Any]:
+        """进程内的并发相同请求共享同一次生成（在事件循环线程中调用）"""
+        loop = asyncio.get_running_loop()
+        payload = open_payload(data)
+        key = await loop.run_in_executor(None, cache_key, payload, report_type)
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            with self._stats_lock:
+                self.local_stats["shared"] += 1
+            return {**await asyncio.shield(inflight), "shared": True}
+
+        future = self._inflight[key] = loop.create_future()
+        try:
+            result = await loop.run_in_executor(None, self.get_or_generate, payload, report_type, key)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # 没有其他等待者时避免 "exception was never retrieved" 警告
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._inflight[key]
+
+    def _generate(self, key: str, payload: PayloadHandle, report_type: str) -> Dict[str, Any]:
+        report = render_report(payload.value, report_type)
+        content = report["content"]
+        path = os.path.join(self.root_dir, key[:2], f"{report_type}_{key[:16]}.md")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        os.replace(temp_path, path)
+
+        generated_at = time.strftime("%Y-%m-%d %H:%M:%S")
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT OR REPLACE INTO report_cache "
+                "(key, report_type, path, size, pages, generated_at, last_access, hits) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, 0)",
+                (key, report_type, path, len(content), report["pages"], generated_at, time.time())
+            )
+            self._count(conn, misses=1)
+            self._evict(conn, keep=key)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        return {"report_id": f"rpt_{key[:16]}", "report_type": report_type, "path": path,
+                "size": len(content), "pages": report["pages"], "generated_at": generated_at,
+                "cached": False}
+
+    def _evict(self, conn: sqlite3.Connection, keep: str) -> None:
+        """总大小超过上限时按最近访问时间从旧到新淘汰（刚生成的报告保留）"""
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM report_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        evicted = 0
+        for key, path, size in conn.execute(
+            "SELECT key, path, size FROM report_cache WHERE key != ? ORDER BY last_access", (keep,)
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM report_cache WHERE key = ?", (key,))
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            evicted += 1
+        if evicted:
+            self._count(conn, evictions=evicted)
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计（跨进程累计值与本进程计数）"""
+        with self._connect() as conn:
+            entries, total = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM report_cache"
+            ).fetchone()
+            counters = dict(conn.execute("SELECT name, value FROM report_cache_counters"))
+        hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+        return {
+            "entries": entries,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "hits": hits,
+            "misses": misses,
+            "evictions": counters.get("evictions", 0),
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0,
+            "process": dict(self.local_stats)
+        }
+
+
+_report_cache: Optional[ReportCache] = None
+
+
+def get_report_cache() -> ReportCache:
+    """获取进程级报告缓存"""
+    global _report_cache
+    if _report_cache is None or _report_cache.pid != os.getpid():
+        _report_cache = ReportCache()
+    return _report_cache
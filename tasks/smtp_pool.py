@@ -0,0 +1,300 @@
+# tasks/smtp_pool.py - io.send_email 的 SMTP 连接池
+"""
+SMTP 持久连接池
+
+- 每个 worker 进程一个连接池，连接用完归还复用，省去每封邮件的 TCP/TLS 握手、EHLO 与认证
+- 复用空闲较久的连接前先 NOOP 健康检查，失效连接自动重建；发送中断开时换新连接重试一次
+- 一封邮件的多个收件人在同一个事务中投递（一次 DATA）
+- 服务器支持 PIPELINING（RFC 2920）时，MAIL/RCPT/DATA 合并成一次写入，每封邮件只需两个往返
+- 批量发送把邮件分摊到池中的多个连接上并行发送
+"""
+import asyncio
+import os
+import re
+import smtplib
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from email.message import EmailMessage
+from email.policy import SMTP as SMTP_POLICY
+from email.utils import formatdate, getaddresses, make_msgid
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from config import EmailConfig
+
+_LEADING_DOT = re.compile(br'(?m)^\.')
+
+
+def parse_recipients(to: Union[str, Sequence[str]]) -> List[str]:
+    """收件人列表：支持逗号分隔的字符串或地址列表"""
+    if isinstance(to, str):
+        to = to.split(",")
+    recipients = [address.strip() for address in to if address and address.strip()]
+    if not recipients:
+        raise ValueError("收件人不能为空")
+    return recipients
+
+
+def build_message(to: Union[str, Sequence[str]], subject: str, body: str = "",
+                  from_address: str = None) -> EmailMessage:
+    """构建邮件"""
+    from_address = from_address or EmailConfig.FROM_ADDRESS
+    message = EmailMessage()
+    message["From"] = from_address
+    message["To"] = ", ".join(parse_recipients(to))
+    message["Subject"] = subject
+    message["Date"] = formatdate(localtime=True)
+    # 显式传入域名，避免 make_msgid 每次做主机名解析
+    message["Message-ID"] = make_msgid(domain=from_address.rpartition("@")[2] or "localhost")
+    message.set_content(body)
+    return message
+
+
+def _envelope(message: EmailMessage) -> Tuple[str, List[str], bytes]:
+    """信封发件人、收件人与 SMTP 格式（CRLF）的邮件内容"""
+    from_address = getaddresses([message["From"]])[0][1]
+    recipients = [address for _, address in getaddresses(message.get_all("To", []) + message.get_all("Cc", []))]
+    return from_address, recipients, message.as_bytes(policy=SMTP_POLICY)
+
+
+def _is_fatal(error: Exception) -> bool:
+    """连接是否已不可用（服务器的错误应答不影响连接复用）"""
+    return isinstance(error, smtplib.SMTPServerDisconnected) or not isinstance(error, smtplib.SMTPException)
+
+
+class SMTPConnection:
+    """单个持久 SMTP 连接"""
+
+    def __init__(self, host: str, port: int, timeout: float, username: str = "",
+                 password: str = "", starttls: bool = False):
+        self.smtp = smtplib.SMTP(host, port, timeout=timeout)
+        try:
+            self.smtp.ehlo()
+            if starttls:
+                self.smtp.starttls()
+                self.smtp.ehlo()
+            if username:
+                self.smtp.login(username, password)
+        except Exception:
+            self.smtp.close()
+            raise
+        self.pipelining = self.smtp.has_extn("pipelining")
+        self.sent = 0
+        self.last_used = time.monotonic()
+
+    def is_healthy(self) -> bool:
+        """NOOP 健康检查"""
+        try:
+            return self.smtp.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def send(self, from_address: str, recipients: List[str], data: bytes) -> Dict[str, tuple]:
+        """
+        发送一封邮件（所有收件人在同一个事务中）
+
+        Returns:
+            被拒绝的收件人: {地址: (应答码, 应答)}
+        """
+        if self.pipelining:
+            refused = self._send_pipelined(from_address, recipients, data)
+        else:
+            refused = self.smtp.sendmail(from_address, recipients, data)
+        self.sent += 1
+        self.last_used = time.monotonic()
+        return refused
+
+    def _send_pipelined(self, from_address: str, recipients: List[str], data: bytes) -> Dict[str, tuple]:
+        smtp = self.smtp
+        commands = [f"MAIL FROM:<{from_address}>", *(f"RCPT TO:<{address}>" for address in recipients), "DATA"]
+        smtp.send("".join(f"{command}\r\n" for command in commands))
+
+        # 按命令顺序读取应答
+        mail_reply = smtp.getreply()
+        rcpt_replies = [smtp.getreply() for _ in recipients]
+        data_reply = smtp.getreply()
+
+        if mail_reply[0] != 250:
+            self._reset()
+            raise smtplib.SMTPSenderRefused(mail_reply[0], mail_reply[1], from_address)
+        refused = {address: reply for address, reply in zip(recipients, rcpt_replies)
+                   if reply[0] not in (250, 251)}
+        if data_reply[0] != 354:
+            self._reset()
+            if len(refused) == len(recipients):
+                raise smtplib.SMTPRecipientsRefused(refused)
+            raise smtplib.SMTPDataError(*data_reply)
+
+        body = _LEADING_DOT.sub(b"..", data)
+        if not body.endswith(b"\r\n"):
+            body += b"\r\n"
+        smtp.send(body + b".\r\n")
+        code, response = smtp.getreply()
+        if code != 250:
+            raise smtplib.SMTPDataError(code, response)
+        return refused
+
+    def _reset(self) -> None:
+        try:
+            self.smtp.rset()
+        except smtplib.SMTPServerDisconnected:
+            pass
+
+    def close(self) -> None:
+        try:
+            self.smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            self.smtp.close()
+
+
+class SMTPPool:
+    """SMTP 连接池（每个 worker 进程一个实例）"""
+
+    def __init__(self, host: str = None, port: int = None, pool_size: int = None,
+                 max_messages_per_connection: int = None, health_check_interval: float = None,
+                 idle_timeout: float = None, timeout: float = None, username: str = None,
+                 password: str = None, starttls: bool = None):
+        self.host = host or EmailConfig.SMTP_HOST
+        self.port = port or EmailConfig.SMTP_PORT
+        self.pool_size = pool_size or EmailConfig.POOL_SIZE
+        self.max_messages = max_messages_per_connection or EmailConfig.MAX_MESSAGES_PER_CONNECTION
+        self.health_check_interval = (EmailConfig.HEALTH_CHECK_INTERVAL if health_check_interval is None
+                                      else health_check_interval)
+        self.idle_timeout = EmailConfig.IDLE_TIMEOUT if idle_timeout is None else idle_timeout
+        self.timeout = timeout or EmailConfig.SMTP_TIMEOUT
+        self.username = EmailConfig.SMTP_USERNAME if username is None else username
+        self.password = EmailConfig.SMTP_PASSWORD if password is None else password
+        self.starttls = EmailConfig.SMTP_STARTTLS if starttls is None else starttls
+        self.pid = os.getpid()
+
+        # 空闲连接按后进先出复用，最近用过的连接最可能仍然有效
+        self._idle: deque = deque()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.pool_size)
+        # 专用发送线程，线程数即连接数上限，不占用事件循环的默认线程池
+        self._executor = ThreadPoolExecutor(self.pool_size, thread_name_prefix="smtp")
+
+        self._stats_lock = threading.Lock()
+        self.stats = {"messages": 0, "recipients": 0, "failures": 0,
+                      "connections": 0, "health_checks": 0, "reconnects": 0}
+
+    def _count(self, **counts: int) -> None:
+        with self._stats_lock:
+            for name, value in counts.items():
+                self.stats[name] += value
+
+    def _connect(self) -> SMTPConnection:
+        connection = SMTPConnection(self.host, self.port, self.timeout, self.username,
+                                    self.password, self.starttls)
+        self._count(connections=1)
+        return connection
+
+    def _checkout(self) -> SMTPConnection:
+        while True:
+            with self._lock:
+                connection = self._idle.pop() if self._idle else None
+            if connection is None:
+                return self._connect()
+
+            idle = time.monotonic() - connection.last_used
+            if idle > self.idle_timeout:
+                connection.close()
+                continue
+            if idle > self.health_check_interval:
+                self._count(health_checks=1)
+                if not connection.is_healthy():
+                    connection.close()
+                    continue
+            return connection
+
+    def _checkin(self, connection: SMTPConnection) -> None:
+        if connection.sent >= self.max_messages:
+            connection.close()
+            return
+        with self._lock:
+            self._idle.append(connection)
+
+    def send_messages(self, messages: List[EmailMessage], raise_errors: bool = False) -> List[Dict[str, Any]]:
+        """
+        在一个连接上依次发送多封邮件（阻塞调用）
+
+        Args:
+            messages: 邮件列表
+            raise_errors: 为 True 时发送失败直接抛出异常，否则记录在结果中
+
+        Returns:
+            每封邮件的发送结果
+        """
+        results = []
+        with self._slots:
+            connection = None
+            try:
+                for message in messages:
+                    from_address, recipients, data = _envelope(message)
+                    result = {"message_id": message["Message-ID"], "recipients": recipients}
+                    for attempt in range(2):
+                        try:
+                            if connection is None:
+                                connection = self._connect() if attempt else self._checkout()
+                            refused = connection.send(from_address, recipients, data)
+                        except Exception as e:
+                            if _is_fatal(e) and connection is not None:
+                                connection.close()
+                                connection = None
+                            if _is_fatal(e) and not attempt:
+                                # 连接在复用中被服务器关闭，换新连接重试一次
+                                self._count(reconnects=1)
+                                continue
+                            self._count(failures=1)
+                            if raise_errors:
+                                raise
+                            result.update(status="failed", error=f"{type(e).__name__}: {e}")
+                            break
+                        self._count(messages=1, recipients=len(recipients) - len(refused))
+                        result.update(status="sent", refused=sorted(refused))
+                        break
+                    results.append(result)
+            finally:
+                if connection is not None:
+                    self._checkin(connection)
+        return results
+
+    async def send(self, message: EmailMessage) -> Dict[str, Any]:
+        """发送单封邮件，失败时抛出异常"""
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(self._executor, self.send_messages, [message], True)
+        return results[0]
+
+    async def send_batch(self, messages: List[EmailMessage]) -> List[Dict[str, Any]]:
+        """批量发送：邮件轮流分配到池中的连接并行发送，结果按输入顺序返回"""
+        loop = asyncio.get_running_loop()
+        lanes = min(self.pool_size, len(messages))
+        groups = [messages[lane::lanes] for lane in range(lanes)]
+        lane_results = await asyncio.gather(*(
+            loop.run_in_executor(self._executor, self.send_messages, group) for group in groups
+        ))
+
+        results: List[Optional[Dict[str, Any]]] = [None] * len(messages)
+        for lane, group_results in enumerate(lane_results):
+            results[lane::lanes] = group_results
+        return results
+
+    def close(self) -> None:
+        """关闭所有空闲连接"""
+        with self._lock:
+            connections, self._idle = list(self._idle), deque()
+        for connection in connections:
+            connection.close()
+        self._executor.shutdown(wait=False)
+
+
+_smtp_pool: Optional[SMTPPool] = None
+
+
+def get_smtp_pool() -> SMTPPool:
+    """获取进程级 SMTP 连接池（fork 出的子进程重建）"""
+    global _smtp_pool
+    if _smtp_pool is None or _smtp_pool.pid != os.getpid():
+        _smtp_pool = SMTPPool()
+    return _smtp_pool
@@ -0,0 +1,270 @@
+# tasks/summary.py - 可合并的统计摘要
+"""
+单遍、可合并的统计摘要
+
+- 按块计算 count/sum/min/max 与二阶中心矩 M2，块间用 Chan 并行方差公式合并
+- 整数块使用精确的整数平方和，避免浮点抵消误差
+- 可选的近似分位数草图（KLL 风格的分层压缩），同样支持合并
+- 通过 to_dict/from_dict 以 JSON 形式在 chord 回调间传递
+"""
+from itertools import islice
+from operator import mul
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+# 每块元素个数，块足够小以便在缓存中完成所有归约
+DEFAULT_CHUNK_SIZE = 65536
+
+# 分位数草图每层的容量，越大越精确
+DEFAULT_SKETCH_SIZE = 256
+
+# 默认输出的分位点
+DEFAULT_QUANTILES = (0.25, 0.5, 0.75, 0.9, 0.99)
+
+
+def _chunk_moments(chunk: Sequence) -> tuple:
+    """
+    计算单个数据块的矩
+
+    Args:
+        chunk: 非空数值序列
+
+    Returns:
+        (count, total, mean, m2, min, max)
+    """
+    n = len(chunk)
+    total = sum(chunk)
+    if isinstance(total, int):
+        # 整数块：n*Σx² - (Σx)² 在整数域精确计算
+        sum_sq = sum(map(mul, chunk, chunk))
+        m2 = (n * sum_sq - total * total) / n
+    else:
+        mean = total / n
+        m2 = sum([(x - mean) * (x - mean) for x in chunk])
+    return n, total, total / n, m2, min(chunk), max(chunk)
+
+
+def _iter_chunks(data: Sequence, chunk_size: int) -> Iterable[Sequence]:
+    """按固定大小切分数据"""
+    if isinstance(data, (list, tuple)):
+        for start in range(0, len(data), chunk_size):
+            yield data[start:start + chunk_size]
+        return
+
+    iterator = iter(data)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class QuantileSketch:
+    """可合并的近似分位数草图（KLL 风格分层压缩）"""
+
+    def __init__(self, k: int = DEFAULT_SKETCH_SIZE, levels: Optional[List[list]] = None, compactions: int = 0):
+        self.k = k
+        self.levels = levels or [[]]
+        # 压缩次数的奇偶决定隔一取一的起点，交替取奇偶位置使误差正负抵消
+        self._compactions = compactions
+
+    def update(self, values: Iterable) -> None:
+        """加入一批数据"""
+        self.levels[0].extend(values)
+        self._compress()
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        """合并另一个草图"""
+        for level, values in enumerate(other.levels):
+            if level == len(self.levels):
+                self.levels.append([])
+            self.levels[level].extend(values)
+        self._compress()
+        return self
+
+    def _compress(self) -> None:
+        """超过容量的层排序后隔一取一，提升到上一层（权重翻倍）"""
+        level = 0
+        while level < len(self.levels):
+            values = self.levels[level]
+            if len(values) > self.k:
+                values.sort()
+                # 奇数个元素时保留最大值在本层，保证权重守恒
+                keep = [values.pop()] if len(values) % 2 else []
+                offset = self._compactions & 1
+                self._compactions += 1
+                if level + 1 == len(self.levels):
+                    self.levels.append([])
+                self.levels[level + 1].extend(values[offset::2])
+                self.levels[level] = keep
+            level += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """查询近似分位数"""
+        weighted = sorted(
+            (value, 1 << level)
+            for level, values in enumerate(self.levels)
+            for value in values
+        )
+        if not weighted:
+            return None
+
+        target = q * sum(weight for _, weight in weighted)
+        cumulative = 0
+        for value, weight in weighted:
+            cumulative += weight
+            if cumulative >= target:
+                return value
+        return weighted[-1][0]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"k": self.k, "levels": self.levels, "compactions": self._compactions}
+
+    @classmethod
+    def from_dict(cls, payload: Dict[str, Any]) -> "QuantileSketch":
+        return cls(k=payload["k"], levels=[list(values) for values in payload["levels"]],
+                   compactions=payload.get("compactions", 0))
+
+
+class StatsSummary:
+    """
+    可合并的统计摘要
+
+    单个 worker 对一个分片调用 update()，多个分片的摘要在 chord 回调中 merge()，
+    最终由同一个摘要产出 aggregate_results 与 calculate_statistics 的结果。
+    """
+
+    def __init__(self, with_quantiles: bool = False):
+        self.count = 0
+        self.total = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.minimum = None
+        self.maximum = None
+        self.sketch = QuantileSketch() if with_quantiles else None
+
+    @classmethod
+    def from_data(cls, data: Iterable, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                  with_quantiles: bool = False) -> "StatsSummary":
+        """
+        从数据构建摘要
+
+        Args:
+            data: 数值序列
+            chunk_size: 分块大小
+            with_quantiles: 是否维护分位数草图
+
+        Returns:
+            统计摘要
+        """
+        summary = cls(with_quantiles=with_quantiles)
+        for chunk in _iter_chunks(data, chunk_size):
+            summary.update(chunk)
+        return summary
+
+    def update(self, chunk: Sequence) -> "StatsSummary":
+        """加入一个数据块"""
+        if not chunk:
+            return self
+
+        n, total, mean, m2, minimum, maximum = _chunk_moments(chunk)
+        self._combine(n, total, mean, m2, minimum, maximum)
+        if self.sketch is not None:
+            self.sketch.update(chunk)
+        return self
+
+    def merge(self, other: "StatsSummary") -> "StatsSummary":
+        """合并另一个摘要（Chan 并行方差公式）"""
+        if other.count:
+            self._combine(other.count, other.total, other.mean, other.m2,
+                          other.minimum, other.maximum)
+        if other.sketch is not None:
+            if self.sketch is None:
+                self.sketch = QuantileSketch(k=other.sketch.k)
+            self.sketch.merge(other.sketch)
+        return self
+
+    def _combine(self, n, total, mean, m2, minimum, maximum) -> None:
+        if not self.count:
+            self.count, self.total, self.mean, self.m2 = n, total, mean, m2
+            self.minimum, self.maximum = minimum, maximum
+            return
+
+        count = self.count + n
+        delta = mean - self.mean
+        self.m2 += m2 + delta * delta * self.count * n / count
+        self.mean += delta * n / count
+        self.count = count
+        self.total += total
+        self.minimum = min(self.minimum, minimum)
+        self.maximum = max(self.maximum, maximum)
+
+    @property
+    def avg(self) -> float:
+        return self.total / self.count if self.count else 0
+
+    @property
+    def variance(self) -> float:
+        """总体方差"""
+        return self.m2 / self.count if self.count else 0
+
+    @property
+    def std_dev(self) -> float:
+        return self.variance ** 0.5
+
+    def quantiles(self, points: Sequence[float] = DEFAULT_QUANTILES) -> Optional[Dict[str, Any]]:
+        """近似分位数，未启用草图时返回 None"""
+        if self.sketch is None:
+            return None
+        return {f"p{point * 100:g}": self.sketch.quantile(point) for point in points}
+
+    def aggregate(self) -> Dict[str, Any]:
+        """aggregate_results 的结果格式"""
+        if not self.count:
+            return {"count": 0, "sum": 0, "avg": 0, "min": None, "max": None}
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "avg": self.avg,
+            "min": self.minimum,
+            "max": self.maximum
+        }
+
+    def statistics(self) -> Dict[str, float]:
+        """calculate_statistics 的结果格式"""
+        if not self.count:
+            return {"mean": 0, "variance": 0, "std_dev": 0}
+        return {
+            "mean": round(self.avg, 2),
+            "variance": round(self.variance, 2),
+            "std_dev": round(self.std_dev, 2)
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        """序列化为可JSON传输的字典"""
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.mean,
+            "m2": self.m2,
+            "min": self.minimum,
+            "max": self.maximum,
+            "sketch": self.sketch.to_dict() if self.sketch is not None else None
+        }
+
+    @classmethod
+    def from_dict(cls, payload: Dict[str, Any]) -> "StatsSummary":
+        """从字典恢复摘要"""
+        summary = cls()
+        summary.count = payload["count"]
+        summary.total = payload["total"]
+        summary.mean = payload["mean"]
+        summary.m2 = payload["m2"]
+        summary.minimum = payload["min"]
+        summary.maximum = payload["max"]
+        if payload.get("sketch"):
+            summary.sketch = QuantileSketch.from_dict(payload["sketch"])
+        return summary
+
+    def __repr__(self):
+        return (f"<StatsSummary(count={self.count}, mean={self.mean:.4f}, "
+                f"variance={self.variance:.4f}, min={self.minimum}, max={self.maximum})>")
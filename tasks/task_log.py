@@ -0,0 +1,289 @@
+# tasks/task_log.py - 任务日志
+"""
+低开销的任务日志
+
+- 惰性：级别未启用时直接返回，不对参数做任何格式化
+- 参数摘要：大列表、长字符串、超大整数只展示开头若干项与总量，摘要耗时与数据量无关
+- 采样：DEBUG/INFO 按 TASK_LOG_SAMPLE_RATE 采样，WARNING 及以上始终记录
+- 缓冲：日志记录放入有界队列，由后台线程格式化并写出；队列满时丢弃并计数，不阻塞任务
+- worker 中写到 worker 配置的 handler（-f/--logfile、-l），其他进程写到标准错误
+
+用法:
+    log = get_task_log(__name__)
+    log.info("🔍 过滤数据，阈值: %s, 输入: %s", threshold, data)
+"""
+import atexit
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional, Sequence
+
+from celery import signals
+
+from config import AppConfig, TaskLogConfig
+from tasks.payload_store import PayloadHandle, is_payload_ref
+
+# 所有任务模块的日志都挂在该 logger 之下
+ROOT_LOGGER = "tasks"
+
+# 超过该位数的整数只记录位数（十进制转换本身是平方级的）
+MAX_INT_BITS = 1024
+
+_LOG10_2 = 0.30103
+
+_BRACKETS = {tuple: "()", set: "{}", frozenset: "{}"}
+
+
+def summarize(value: Any, max_items: int = None, max_chars: int = None) -> str:
+    """
+    生成参数的有界摘要
+
+    Args:
+        value: 任意参数
+        max_items: 容器最多展示的元素数
+        max_chars: 最多展示的字符数
+
+    Returns:
+        摘要字符串，耗时只取决于展示的元素数
+    """
+    max_items = max_items or TaskLogConfig.MAX_ITEMS
+    max_chars = max_chars or TaskLogConfig.MAX_CHARS
+    if isinstance(value, str):
+        # 顶层字符串原样展示，与 f-string 输出一致
+        text = value
+    else:
+        text = _summarize(value, max_items, max_chars, depth=2)
+    if len(text) > max_chars:
+        text = text[:max_chars] + "..."
+    return text
+
+
+def _summarize(value: Any, max_items: int, max_chars: int, depth: int) -> str:
+    if isinstance(value, PayloadHandle):
+        return repr(value)
+    if isinstance(value, bool) or value is None or isinstance(value, float):
+        return repr(value)
+    if isinstance(value, int):
+        if value.bit_length() > MAX_INT_BITS:
+            return f"<int 约{int(value.bit_length() * _LOG10_2)}位>"
+        return repr(value)
+    if isinstance(value, (str, bytes, bytearray)):
+        if len(value) > max_chars:
+            return f"{value[:max_chars]!r}...(共{len(value)}字符)"
+        return repr(value)
+    if isinstance(value, dict):
+        if is_payload_ref(value):
+            return repr(PayloadHandle(ref=value))
+        if depth <= 0:
+            return f"{{...共{len(value)}项}}"
+        parts = []
+        for index, (key, item) in enumerate(value.items()):
+            if index >= max_items:
+                parts.append(f"...共{len(value)}项")
+                break
+            parts.append(f"{_summarize(key, max_items, max_chars, 0)}: "
+                         f"{_summarize(item, max_items, max_chars, depth - 1)}")
+        return "{" + ", ".join(parts) + "}"
+    if isinstance(value, (list, tuple, set, frozenset)):
+        opener, closer = _BRACKETS.get(type(value), "[]")
+        if depth <= 0:
+            return f"{opener}...共{len(value)}项{closer}"
+        parts = []
+        for index, item in enumerate(value):
+            if index >= max_items:
+                parts.append(f"...共{len(value)}项")
+                break
+            parts.append(_summarize(item, max_items, max_chars, depth - 1))
+        return opener + ", ".join(parts) + closer
+    text = repr(value)
+    return text if len(text) <= max_chars else text[:max_chars] + "..."
+
+
+class BufferedHandler(QueueHandler):
+    """把日志记录放入有界队列，由后台线程格式化并交给目标 handler 写出"""
+
+    def __init__(self, targets: Sequence[logging.Handler], capacity: int = None, owns_targets: bool = True):
+        self.capacity = capacity or TaskLogConfig.QUEUE_SIZE
+        super().__init__(queue.Queue(self.capacity))
+        self.targets = list(targets)
+        # worker 的 handler 由 worker 管理，替换或关闭时不关闭它们
+        self.owns_targets = owns_targets
+        self.dropped = 0
+        self._unreported = 0
+        self._listener: Optional[QueueListener] = None
+        self._pid: Optional[int] = None
+        self._start_lock = threading.Lock()
+        # 多个执行线程同时写日志，丢弃计数的读改写需要加锁
+        self._dropped_lock = threading.Lock()
+
+    def _ensure_listener(self) -> None:
+        # 后台线程不会随 fork 复制：每个进程首次写日志时启动自己的线程与队列
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self.queue = queue.Queue(self.capacity)
+            self._listener = QueueListener(self.queue, *self.targets, respect_handler_level=True)
+            self._listener.start()
+            self._pid = os.getpid()
+            atexit.register(self._stop, self._pid)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 参数已是摘要字符串，格式化留给后台线程
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if self._pid != os.getpid():
+            self._ensure_listener()
+        if self._unreported:
+            self._report_dropped()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+                self._unreported += 1
+
+    def _report_dropped(self) -> None:
+        with self._dropped_lock:
+            count, self._unreported = self._unreported, 0
+        if not count:
+            return
+        notice = logging.LogRecord(ROOT_LOGGER, logging.WARNING, __file__, 0,
+                                   "⚠️ 日志队列已满，丢弃了 %d 条日志", (count,), None)
+        try:
+            self.queue.put_nowait(notice)
+        except queue.Full:
+            with self._dropped_lock:
+                self._unreported += count
+
+    def flush(self) -> None:
+        """等待队列中的日志全部写出"""
+        if self._pid == os.getpid() and self._listener is not None:
+            self.queue.join()
+        for target in self.targets:
+            target.flush()
+
+    def _stop(self, pid: int) -> None:
+        if self._pid == pid == os.getpid() and self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+            self._pid = None
+
+    def close(self) -> None:
+        self._stop(os.getpid())
+        if self.owns_targets:
+            for target in self.targets:
+                target.close()
+        super().close()
+
+
+class TaskLog:
+    """任务日志记录器：级别检查与采样在参数摘要之前完成"""
+
+    __slots__ = ("logger", "sample_rate", "sampled_out")
+
+    def __init__(self, name: str, sample_rate: float = None):
+        self.logger = logging.getLogger(name)
+        self.sample_rate = TaskLogConfig.SAMPLE_RATE if sample_rate is None else sample_rate
+        self.sampled_out = 0
+
+    def debug(self, msg: str, *args: Any) -> None:
+        self._log(logging.DEBUG, msg, args, sampled=True)
+
+    def info(self, msg: str, *args: Any) -> None:
+        self._log(logging.INFO, msg, args, sampled=True)
+
+    def warning(self, msg: str, *args: Any) -> None:
+        self._log(logging.WARNING, msg, args)
+
+    def error(self, msg: str, *args: Any, exc_info: bool = False) -> None:
+        self._log(logging.ERROR, msg, args, exc_info=exc_info)
+
+    def _log(self, level: int, msg: str, args: tuple, sampled: bool = False, exc_info: bool = False) -> None:
+        if not self.logger.isEnabledFor(level):
+            return
+        if sampled and self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            self.sampled_out += 1
+            return
+        # 直接取调用方栈帧，省去 Logger.findCaller 的逐帧查找
+        caller = sys._getframe(2)
+        record = self.logger.makeRecord(self.logger.name, level, caller.f_code.co_filename, caller.f_lineno,
+                                        msg, tuple(map(summarize, args)),
+                                        sys.exc_info() if exc_info else None, caller.f_code.co_name)
+        self.logger.handle(record)
+
+
+_handler: Optional[BufferedHandler] = None
+_configure_lock = threading.Lock()
+
+
+def configure_task_logging(level=None, stream=None, filename: str = None,
+                           handlers: Sequence[logging.Handler] = None) -> BufferedHandler:
+    """
+    为 tasks.* 日志安装缓冲 handler（重复调用时替换原有 handler）
+
+    Args:
+        level: 日志级别，默认 TASK_LOG_LEVEL（为空时 INFO）
+        stream: 输出流，默认进程原始的标准错误（不经过 worker 的 stdout 重定向）
+        filename: 日志文件，优先于 stream，默认 TASK_LOG_FILE
+        handlers: 已有的 handler（如 worker 配置的 handler），给出时忽略 stream 与 filename
+
+    Returns:
+        缓冲 handler
+    """
+    global _handler
+    with _configure_lock:
+        if handlers is not None:
+            targets, owns_targets = list(handlers), False
+        else:
+            filename = TaskLogConfig.FILE if filename is None else filename
+            if filename:
+                target = logging.FileHandler(filename, encoding="utf-8")
+            else:
+                target = logging.StreamHandler(stream or sys.__stderr__)
+            target.setFormatter(logging.Formatter(AppConfig.LOG_FORMAT))
+            targets, owns_targets = [target], True
+
+        logger = logging.getLogger(ROOT_LOGGER)
+        if _handler is not None:
+            logger.removeHandler(_handler)
+            _handler.close()
+        _handler = BufferedHandler(targets, owns_targets=owns_targets)
+        logger.addHandler(_handler)
+        logger.setLevel(level or TaskLogConfig.LEVEL or logging.INFO)
+        # 记录已交给目标 handler（含 worker 的 handler），不再向上传递以免重复写出
+        logger.propagate = False
+        return _handler
+
+
+@signals.after_setup_logger.connect
+def _use_worker_logging(logger: logging.Logger = None, loglevel=None, **kwargs) -> None:
+    """worker 配置好日志后，tasks.* 经缓冲队列交给 worker 的 handler，-f/--logfile 与 -l 同样生效"""
+    handlers = None if TaskLogConfig.FILE or logger is None else (logger.handlers or None)
+    configure_task_logging(level=TaskLogConfig.LEVEL or loglevel, handlers=handlers)
+
+
+def get_task_log(name: str) -> TaskLog:
+    """获取任务模块的日志记录器（首次调用时安装缓冲 handler）"""
+    if _handler is None:
+        configure_task_logging()
+    if name != ROOT_LOGGER and not name.startswith(ROOT_LOGGER + "."):
+        name = f"{ROOT_LOGGER}.{name}"
+    return TaskLog(name)
+
+
+def flush_task_logs() -> None:
+    """等待已记录的任务日志全部写出"""
+    if _handler is not None:
+        _handler.flush()
+
+
+def task_log_stats() -> Dict[str, int]:
+    """缓冲队列的当前长度与累计丢弃数"""
+    if _handler is None:
+        return {"queued": 0, "dropped": 0}
+    return {"queued": _handler.queue.qsize(), "dropped": _handler.dropped}
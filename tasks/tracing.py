@@ -0,0 +1,304 @@
+# tasks/tracing.py - 任务链端到端追踪
+"""
+任务链追踪
+
+- API 提交任务链时把任务记录ID作为追踪ID写入消息头；worker 发布后续步骤
+  （任务链的下一步、chord 回调）时从当前任务的请求中继承，整条链的每一步都带同一个追踪ID
+- 每一步在结束时生成一行记录：发布时间（消息头 published_at）、开始与结束时间、队列、worker、状态；
+  API 侧的构建任务链、发布、写任务记录同样作为阶段记录
+- 记录在进程内缓冲，由后台线程按批写入 task_steps 表，不在任务执行路径上访问数据库
+- critical_path 列出 API 各阶段耗时，并从最后结束的步骤沿 parent_id 回溯，
+  把任务链耗时拆成各步骤的排队等待、执行与步骤间交接
+
+时间戳为各进程的本地时钟，跨主机时受时钟偏差影响。
+"""
+import contextlib
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+from celery import signals
+from celery._state import get_current_task
+from sqlalchemy import create_engine, event
+
+from config import TracingConfig
+from scheduling import message_header
+from tasks.base import PUBLISHED_AT_HEADER
+
+TRACE_HEADER = 'trace_id'
+
+# API 侧当前请求的追踪ID（worker 侧从当前任务的请求中读取）
+_current_trace: ContextVar[Optional[str]] = ContextVar('trace_id', default=None)
+
+
+def current_trace_id() -> Optional[str]:
+    """当前上下文的追踪ID"""
+    trace_id = _current_trace.get()
+    if trace_id is None:
+        task = get_current_task()
+        if task is not None:
+            trace_id = message_header(task.request, TRACE_HEADER)
+    return trace_id
+
+
+@contextlib.contextmanager
+def trace_context(trace_id: str) -> Iterator[None]:
+    """在该上下文中发布的任务都带上追踪ID"""
+    token = _current_trace.set(trace_id)
+    try:
+        yield
+    finally:
+        _current_trace.reset(token)
+
+
+@contextlib.contextmanager
+def trace_span(trace_id: str, name: str) -> Iterator[None]:
+    """记录一个 API 阶段（如 api.publish、api.db_insert）的耗时"""
+    if not TracingConfig.ENABLED:
+        yield
+        return
+    started_at = time.time()
+    state = 'SUCCESS'
+    try:
+        yield
+    except BaseException:
+        state = 'FAILURE'
+        raise
+    finally:
+        get_step_writer().add({
+            'trace_id': trace_id, 'step_id': name, 'parent_id': None, 'name': name,
+            'queue': None, 'worker': 'api', 'state': state,
+            'enqueued_at': None, 'started_at': started_at, 'finished_at': time.time()
+        })
+
+
+class StepWriter:
+    """task_steps 批量写入器（每个进程一个实例，后台线程定时写入）"""
+
+    def __init__(self, database_url: str = None, flush_interval_ms: int = None, batch_max_rows: int = None):
+        self.database_url = database_url or TracingConfig.DATABASE_URL
+        self.flush_interval = (flush_interval_ms or TracingConfig.FLUSH_INTERVAL_MS) / 1000
+        self.batch_max_rows = batch_max_rows or TracingConfig.BATCH_MAX_ROWS
+        self.pid = os.getpid()
+
+        self._engine = None
+        self._table = None
+        self._rows: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._flusher: Optional[threading.Thread] = None
+        self.stats = {"rows": 0, "batches": 0, "errors": 0}
+
+    def _get_table(self):
+        if self._table is None:
+            from app.models.database_models import TaskStep
+
+            self._engine = create_engine(self.database_url, pool_pre_ping=True)
+            if self._engine.dialect.name == "sqlite":
+                @event.listens_for(self._engine, "connect")
+                def _set_sqlite_pragmas(connection, _record):
+                    cursor = connection.cursor()
+                    cursor.execute("PRAGMA journal_mode=WAL")
+                    cursor.execute("PRAGMA synchronous=NORMAL")
+                    cursor.close()
+            TaskStep.__table__.create(self._engine, checkfirst=True)
+            self._table = TaskStep.__table__
+        return self._table
+
+    def add(self, row: Dict[str, Any]) -> None:
+        """缓冲一行记录（不访问数据库）"""
+        with self._lock:
+            self._rows.append(row)
+            full = len(self._rows) >= self.batch_max_rows
+        if self._flusher is None:
+            self._start_flusher()
+        if full:
+            self._wakeup.set()
+
+    def flush(self) -> int:
+        """把缓冲的记录写入数据库，返回写入行数"""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+            if not rows:
+                return 0
+            try:
+                table = self._get_table()
+                with self._engine.begin() as connection:
+                    connection.execute(table.insert(), rows)
+            except Exception as e:
+                # 追踪数据不影响任务本身：写入失败时丢弃本批并计数
+                self.stats["errors"] += 1
+                print(f"⚠️ 写入任务步骤记录失败，丢弃 {len(rows)} 行: {e}")
+                return 0
+            self.stats["rows"] += len(rows)
+            self.stats["batches"] += 1
+            return len(rows)
+
+    def _start_flusher(self) -> None:
+        with self._lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(target=self._run_flusher, name="trace-writer", daemon=True)
+        self._flusher.start()
+
+    def _run_flusher(self) -> None:
+        while not self._stopped:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def close(self) -> None:
+        """停止后台线程并写入剩余记录"""
+        self._stopped = True
+        self._wakeup.set()
+        self.flush()
+
+
+_step_writer: Optional[StepWriter] = None
+
+
+def get_step_writer() -> StepWriter:
+    """获取进程级步骤写入器（fork 出的子进程重建连接与缓冲）"""
+    global _step_writer
+    if _step_writer is None or _step_writer.pid != os.getpid():
+        _step_writer = StepWriter()
+    return _step_writer
+
+
+# 正在执行的已追踪任务的开始时间，按任务ID索引
+_started: Dict[str, float] = {}
+
+
+def _propagate_trace(headers=None, **kwargs):
+    """发布端：写入追踪ID与发布时间"""
+    if headers is None:
+        return
+    trace_id = current_trace_id()
+    if trace_id is not None:
+        headers.setdefault(TRACE_HEADER, trace_id)
+        headers.setdefault(PUBLISHED_AT_HEADER, time.time())
+
+
+def _trace_prerun(task_id=None, task=None, **kwargs):
+    if message_header(task.request, TRACE_HEADER) is not None:
+        _started[task_id] = time.time()
+
+
+def _trace_postrun(task_id=None, task=None, state=None, **kwargs):
+    started_at = _started.pop(task_id, None)
+    if started_at is None:
+        return
+    request = task.request
+    delivery_info = request.delivery_info or {}
+    get_step_writer().add({
+        'trace_id': message_header(request, TRACE_HEADER),
+        'step_id': task_id,
+        'parent_id': request.parent_id,
+        'name': task.name,
+        'queue': 'eager' if request.is_eager else delivery_info.get('routing_key'),
+        'worker': request.hostname,
+        'state': state,
+        'enqueued_at': message_header(request, PUBLISHED_AT_HEADER),
+        'started_at': started_at,
+        'finished_at': time.time()
+    })
+
+
+def _flush_steps(**kwargs):
+    get_step_writer().close()
+
+
+def install_tracing() -> bool:
+    """通过 Celery 信号追踪带追踪ID的任务（重复调用无副作用）"""
+    if not TracingConfig.ENABLED:
+        return False
+    signals.before_task_publish.connect(_propagate_trace, weak=False, dispatch_uid='tracing.publish')
+    signals.task_prerun.connect(_trace_prerun, weak=False, dispatch_uid='tracing.prerun')
+    signals.task_postrun.connect(_trace_postrun, weak=False, dispatch_uid='tracing.postrun')
+    signals.worker_process_shutdown.connect(_flush_steps, weak=False, dispatch_uid='tracing.shutdown')
+    return True
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+def critical_path(steps: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    计算任务链的时间线与关键路径
+
+    Args:
+        steps: task_steps 记录（TaskStep.to_dict）
+
+    Returns:
+        {"total_ms", "steps": 各步骤相对起点的时间, "api_phases": API 阶段耗时,
+         "critical_path": 任务链关键路径的分段耗时, "critical_path_ms", "bottleneck": 最大的一段}
+    """
+    if not steps:
+        return {"total_ms": 0.0, "steps": [], "api_phases": [], "critical_path": [],
+                "critical_path_ms": 0.0, "bottleneck": None}
+
+    origin = min(min(step['started_at'], step['enqueued_at'] or step['started_at']) for step in steps)
+    end = max(step['finished_at'] for step in steps)
+
+    timeline = []
+    for step in sorted(steps, key=lambda item: (item['enqueued_at'] or item['started_at'], item['started_at'])):
+        enqueued_at = step['enqueued_at']
+        timeline.append({
+            **{key: step[key] for key in ('step_id', 'parent_id', 'name', 'queue', 'worker', 'state')},
+            'enqueued_ms': _ms(enqueued_at - origin) if enqueued_at is not None else None,
+            'started_ms': _ms(step['started_at'] - origin),
+            'finished_ms': _ms(step['finished_at'] - origin),
+            'queue_wait_ms': _ms(step['started_at'] - enqueued_at) if enqueued_at is not None else None,
+            'run_ms': _ms(step['finished_at'] - step['started_at'])
+        })
+
+    # API 阶段（/submit 请求本身的耗时）
+    api_phases = [
+        {"segment": step['name'], "step": step['name'], "ms": _ms(step['finished_at'] - step['started_at'])}
+        for step in sorted((step for step in steps if step['queue'] is None), key=lambda item: item['started_at'])
+    ]
+
+    # 从最后结束的任务步骤沿 parent_id 回溯（chord 回调的父任务是最后完成的分片）
+    tasks_by_id = {step['step_id']: step for step in steps if step['queue'] is not None}
+    path = []
+    if tasks_by_id:
+        current = max(tasks_by_id.values(), key=lambda item: item['finished_at'])
+        while current is not None:
+            path.append(current)
+            current = tasks_by_id.get(current['parent_id'])
+        path.reverse()
+
+    # 下一步在上一步的收尾阶段（存储结果之前）就已发布：上一步的执行段截止到下一步入队
+    segments = []
+    for index, step in enumerate(path):
+        following = path[index + 1] if index + 1 < len(path) else None
+        finished_at = step['finished_at']
+        if following is not None and following['enqueued_at'] is not None:
+            finished_at = min(finished_at, following['enqueued_at'])
+
+        if step['enqueued_at'] is not None:
+            previous = path[index - 1] if index else None
+            if previous is not None and step['enqueued_at'] > previous['finished_at']:
+                segments.append({"segment": "handoff", "step": step['name'],
+                                 "ms": _ms(step['enqueued_at'] - previous['finished_at'])})
+            segments.append({"segment": "queue_wait", "step": step['name'], "queue": step['queue'],
+                             "ms": _ms(step['started_at'] - step['enqueued_at'])})
+        segments.append({"segment": "run", "step": step['name'], "worker": step['worker'],
+                         "ms": _ms(finished_at - step['started_at'])})
+
+    candidates = api_phases + segments
+    return {
+        "total_ms": _ms(end - origin),
+        "steps": timeline,
+        "api_phases": api_phases,
+        "critical_path": segments,
+        "critical_path_ms": _ms(path[-1]['finished_at'] - (path[0]['enqueued_at'] or path[0]['started_at']))
+        if path else 0.0,
+        "bottleneck": max(candidates, key=lambda segment: segment["ms"]) if candidates else None
+    }
@@ -0,0 +1,263 @@
+# test_admission.py - 准入控制与结果跟踪测试（虚拟时钟，不依赖 Redis）
+"""
+AdmissionController 的高水位、Retry-After 与令牌桶用注入的虚拟时钟驱动；
+TaskService.submit_task 使用假的任务链与数据库，不发布到 broker。
+
+    python -m pytest test_admission.py -q
+"""
+import pytest
+
+from app.services.admission import AdmissionController, AdmissionRejected
+from app.services.result_tracker import ResultTracker
+from app.services.task_service import TaskService
+from config import TracingConfig
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeResult:
+    """只实现结果跟踪用到的 AsyncResult 接口"""
+
+    def __init__(self, value=None):
+        self.id = "celery-id"
+        self.value = value
+        self.done = False
+
+    def ready(self) -> bool:
+        return self.done
+
+    def get(self, timeout=None):
+        if isinstance(self.value, Exception):
+            raise self.value
+        return self.value
+
+    def forget(self):
+        pass
+
+
+class FakeChain:
+    def __init__(self, result: FakeResult = None, error: Exception = None):
+        self.result = result
+        self.error = error
+
+    def apply_async(self):
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class FakeDatabase:
+    def __init__(self, error: Exception = None):
+        self.error = error
+        self.statuses = {}
+
+    def save_task_record(self, task_id, **kwargs):
+        if self.error is not None:
+            raise self.error
+        self.statuses[task_id] = "pending"
+        return task_id
+
+    def update_task_status(self, task_id, status, result=None, error=None):
+        self.statuses[task_id] = status
+
+
+def controller(clock=None, **options) -> AdmissionController:
+    options.setdefault("high_water", {})
+    options.setdefault("default_high_water", 1000)
+    options.setdefault("client_rate", 0)
+    options.setdefault("max_retry_after", 60)
+    return AdmissionController(clock=clock or Clock(), **options)
+
+
+def service(monkeypatch, admission: AdmissionController, chain: FakeChain, db: FakeDatabase = None) -> TaskService:
+    # 不写入 tasks.db 的步骤记录
+    monkeypatch.setattr(TracingConfig, "ENABLED", False)
+    task_service = TaskService(db_manager=db or FakeDatabase(), admission=admission)
+    task_service.result_tracker.close()
+    monkeypatch.setattr(task_service.chain_service, "create_chain", lambda name, a, b: chain)
+    return task_service
+
+
+def test_rejects_at_high_water_and_admits_after_release():
+    admission = controller(high_water={"math": 2})
+    admission.admit("math")
+    admission.admit("math")
+    with pytest.raises(AdmissionRejected):
+        admission.admit("math")
+    assert admission.stats == {"admitted": 2, "rejected_queue": 1, "rejected_client": 0}
+
+    admission.release("math")
+    admission.admit("math")
+    assert admission.outstanding() == {"math": 2}
+
+
+def test_high_water_applies_to_all_priority_queues():
+    # math=3 是 math.high / math / math.low 合计的上限，math.low=1 只额外限制 math.low
+    admission = controller(high_water={"math": 3, "math.low": 1})
+    admission.admit("math.low")
+    with pytest.raises(AdmissionRejected):
+        admission.admit("math.low")
+    admission.admit("math.high")
+    admission.admit("math")
+    with pytest.raises(AdmissionRejected):
+        admission.admit("math.high")
+    # 其他队列使用默认高水位
+    admission.admit("data")
+
+
+def test_retry_after_from_completion_interval():
+    clock = Clock()
+    admission = controller(clock, high_water={"math": 4})
+    for _ in range(4):
+        admission.admit("math")
+    # 还没有完成记录时按 1 秒
+    with pytest.raises(AdmissionRejected) as rejected:
+        admission.admit("math")
+    assert rejected.value.retry_after == 1
+
+    # 每 2.5 秒完成一个，补满到高水位后: 需要等 1 个完成
+    for _ in range(3):
+        clock.now += 2.5
+        admission.release("math")
+    for _ in range(3):
+        admission.admit("math")
+    with pytest.raises(AdmissionRejected) as rejected:
+        admission.admit("math")
+    assert rejected.value.retry_after == 3
+
+
+def test_retry_after_is_clamped():
+    clock = Clock()
+    admission = AdmissionController(high_water={"math": 1}, client_rate=0, max_retry_after=10, clock=clock)
+    admission.admit("math")
+    admission.release("math")
+    clock.now += 100
+    admission.release("math")
+    admission.admit("math")
+    with pytest.raises(AdmissionRejected) as rejected:
+        admission.admit("math")
+    assert rejected.value.retry_after == 10
+
+
+def test_token_bucket_per_client():
+    clock = Clock()
+    admission = controller(clock, client_rate=2, client_burst=3)
+    for _ in range(3):
+        admission.admit("math", "10.0.0.1")
+    with pytest.raises(AdmissionRejected) as rejected:
+        admission.admit("math", "10.0.0.1")
+    assert rejected.value.retry_after == 1
+    # 其他客户端不受影响
+    admission.admit("math", "10.0.0.2")
+
+    # 0.5 秒补充 1 个令牌
+    clock.now += 0.5
+    admission.admit("math", "10.0.0.1")
+    with pytest.raises(AdmissionRejected):
+        admission.admit("math", "10.0.0.1")
+    assert admission.stats["rejected_client"] == 2
+
+
+def test_token_bucket_evicts_least_recent_client():
+    admission = controller(client_rate=1, client_burst=1, max_clients=2)
+    admission.admit("math", "a")
+    admission.admit("math", "b")
+    admission.admit("math", "c")
+    # a 已被淘汰，重新获得完整的桶
+    admission.admit("math", "a")
+    with pytest.raises(AdmissionRejected):
+        admission.admit("math", "c")
+
+
+def test_submit_limits_by_client_not_tenant(monkeypatch):
+    admission = controller(client_rate=1, client_burst=1)
+    task_service = service(monkeypatch, admission, FakeChain(FakeResult()))
+    task_service.submit_task(1, 2, "complex_math", tenant="tenant-1", client="10.0.0.1")
+    with pytest.raises(AdmissionRejected):
+        task_service.submit_task(1, 2, "complex_math", tenant="tenant-2", client="10.0.0.1")
+
+
+def test_submit_releases_when_publish_fails(monkeypatch):
+    admission = controller(high_water={"math": 1})
+    task_service = service(monkeypatch, admission, FakeChain(error=ConnectionError("broker down")))
+    for _ in range(3):
+        with pytest.raises(ConnectionError):
+            task_service.submit_task(1, 2, "complex_math", priority="low")
+    assert admission.outstanding() == {"math.low": 0}
+
+
+def test_failed_publish_does_not_shorten_retry_after(monkeypatch):
+    clock = Clock()
+    admission = controller(clock, high_water={"math": 1})
+    for _ in range(2):
+        admission.admit("math")
+        clock.now += 10
+        admission.release("math")
+
+    # 连续的发布失败不是完成，不计入完成间隔
+    task_service = service(monkeypatch, admission, FakeChain(error=ConnectionError("broker down")))
+    for _ in range(5):
+        clock.now += 0.01
+        with pytest.raises(ConnectionError):
+            task_service.submit_task(1, 2, "complex_math")
+
+    admission.admit("math")
+    with pytest.raises(AdmissionRejected) as rejected:
+        admission.admit("math")
+    assert rejected.value.retry_after == 10
+
+
+def test_submit_releases_when_record_fails(monkeypatch):
+    admission = controller(high_water={"math": 1})
+    task_service = service(monkeypatch, admission, FakeChain(FakeResult()), FakeDatabase(error=RuntimeError("db")))
+    with pytest.raises(RuntimeError):
+        task_service.submit_task(1, 2, "complex_math")
+    assert admission.outstanding() == {"math": 0}
+    assert task_service.result_tracker.pending() == 0
+
+
+def test_released_only_when_chain_finishes(monkeypatch):
+    clock = Clock()
+    admission = controller(high_water={"math": 1})
+    result, db = FakeResult(42), FakeDatabase()
+    task_service = service(monkeypatch, admission, FakeChain(result), db)
+    task_service.result_tracker = ResultTracker(task_service._on_chain_done, timeout=3600, clock=clock)
+    task_service.result_tracker.close()
+
+    task_id = task_service.submit_task(1, 2, "complex_math")["task_id"]
+    # 积压超过 60 秒仍未结束: 保持计数，继续跟踪
+    clock.now += 600
+    assert task_service.result_tracker.poll() == 0
+    with pytest.raises(AdmissionRejected):
+        task_service.submit_task(1, 2, "complex_math")
+
+    result.done = True
+    assert task_service.result_tracker.poll() == 1
+    assert db.statuses[task_id] == "completed"
+    assert admission.outstanding() == {"math": 0}
+
+
+def test_failed_chain_and_tracking_timeout_release():
+    clock = Clock()
+    done = []
+    tracker = ResultTracker(lambda task_id, result, queue, error: done.append((task_id, queue, error)),
+                            timeout=100, clock=clock)
+    tracker.close()
+    failed, stuck = FakeResult(ValueError("boom")), FakeResult()
+    tracker.track("failed", failed, "math")
+    tracker.track("stuck", stuck, "io")
+
+    failed.done = True
+    assert tracker.poll() == 1
+    assert done == [("failed", "math", None)]
+
+    clock.now += 100
+    assert tracker.poll() == 1
+    assert done[1][:2] == ("stuck", "io") and isinstance(done[1][2], TimeoutError)
+    assert tracker.pending() == 0
@@ -0,0 +1,183 @@
+# test_autoscaler.py - 自动伸缩模拟测试（内存 broker，不依赖 Redis）
+"""
+用内存 broker 模拟突发负载: 任务真实发布到 math / io 队列，模拟的 worker 每个时间步
+从队列中取走固定数量的消息，自动伸缩按虚拟时钟每步采样一次队列深度并调整 worker 数。
+
+    python -m pytest test_autoscaler.py -q
+    python test_autoscaler.py              # 打印模拟过程
+"""
+from typing import Dict, List
+
+from kombu import Connection
+from kombu.utils.uuid import uuid
+
+import pytest
+
+from autoscaler import Autoscaler, LocalWorkerPool, QueueScaler, queue_depths
+from celery_app import app
+from worker_profiles import WorkerProfile
+
+# 每个模拟 worker 每个时间步处理的消息数
+SERVICE_RATE = {"math": 10, "io": 5}
+BOUNDS = {"math": (1, 4), "io": (1, 6)}
+
+
+class SimulatedPool:
+    """模拟的 worker 进程池: 每个 worker 每步从内存 broker 取走 SERVICE_RATE 条消息"""
+
+    def __init__(self, connection: Connection):
+        self.channel = connection.channel()
+        self.workers: Dict[str, int] = {}
+
+    def size(self, queue: str) -> int:
+        return self.workers.get(queue, 0)
+
+    def scale(self, queue: str, count: int) -> None:
+        self.workers[queue] = count
+
+    def consume(self) -> None:
+        for queue, count in self.workers.items():
+            for _ in range(count * SERVICE_RATE[queue]):
+                if self.channel.basic_get(queue=queue, no_ack=True) is None:
+                    break
+
+
+def publish(producer, task_name: str, count: int) -> None:
+    # 直接走 app.amqp 发布（与 send_task 相同的路由），不经过结果后端
+    options = app.amqp.router.route({}, task_name)
+    for _ in range(count):
+        message = app.amqp.create_task_message(uuid(), task_name, (1, 2), {})
+        app.amqp.send_task_message(producer, task_name, message, **options)
+
+
+def simulate(arrivals, steps: int, scale_down_delay: float = 5) -> List[Dict[str, Dict]]:
+    """
+    运行模拟
+
+    Args:
+        arrivals: 函数 (step) -> {任务名: 本步到达的任务数}
+        steps: 时间步数（每步 1 秒虚拟时间）
+
+    Returns:
+        每一步伸缩后的 {队列: {"depth", "wait", "workers"}}
+    """
+    with Connection('memory://') as connection:
+        channel = connection.channel()
+        for queue in BOUNDS:
+            # 按应用的队列定义声明（含 exchange 绑定），并清空上一次模拟的残留消息
+            app.amqp.queues[queue](channel).declare()
+            channel.queue_purge(queue)
+
+        clock = [0.0]
+        pool = SimulatedPool(connection)
+        autoscaler = Autoscaler(
+            pool,
+            depth_sampler=lambda queues: queue_depths(app, queues, connection=connection),
+            bounds=BOUNDS,
+            clock=lambda: clock[0],
+            target_backlog=20,
+            target_wait=1.0,
+            scale_down_ratio=0.25,
+            scale_down_delay=scale_down_delay
+        )
+
+        history = []
+        with connection.Producer() as producer:
+            for step in range(steps):
+                clock[0] = float(step)
+                for task_name, count in arrivals(step).items():
+                    publish(producer, task_name, count)
+                history.append(autoscaler.step())
+                pool.consume()
+        return history
+
+
+def burst(step: int) -> Dict[str, int]:
+    """math 稳定 8 个/秒；第 5~14 秒 io 突发 40 个/秒，其余时间 2 个/秒"""
+    return {"math.add": 8, "io.send_email": 40 if 5 <= step < 15 else 2}
+
+
+def test_io_burst_scales_io_only():
+    history = simulate(burst, steps=60)
+    io_workers = [state["io"]["workers"] for state in history]
+    math_workers = [state["math"]["workers"] for state in history]
+
+    # io 在突发期间扩到上限，math 负载稳定、始终保持最小值
+    assert max(io_workers[5:20]) == BOUNDS["io"][1]
+    assert set(math_workers) == {BOUNDS["math"][0]}
+
+    # 突发结束、积压消化后逐步缩回最小值
+    assert io_workers[-1] == BOUNDS["io"][0]
+    assert history[-1]["io"]["depth"] < 20
+
+
+def test_bounds_respected():
+    history = simulate(lambda step: {"math.add": 500, "io.send_email": 500}, steps=10)
+    for state in history:
+        for queue, (minimum, maximum) in BOUNDS.items():
+            assert minimum <= state[queue]["workers"] <= maximum
+
+
+def test_scale_down_waits_and_steps_by_one():
+    history = simulate(burst, steps=60, scale_down_delay=5)
+    io_workers = [state["io"]["workers"] for state in history]
+    decreases = [(step, io_workers[step - 1] - io_workers[step])
+                 for step in range(1, len(io_workers)) if io_workers[step] < io_workers[step - 1]]
+    assert decreases
+    # 每次只减少 1 个，相邻两次缩容至少间隔缩容延迟
+    assert all(amount == 1 for _, amount in decreases)
+    assert all(later - earlier >= 5 for (earlier, _), (later, _) in zip(decreases, decreases[1:]))
+
+
+def test_hysteresis_between_thresholds():
+    # 积压/worker 在缩容阈值（5）与扩容阈值（20）之间时不调整
+    scaler = QueueScaler("io", 1, 6, target_backlog=20, target_wait=1.0, scale_down_ratio=0.25, scale_down_delay=5)
+    workers = 3
+    for now, depth in enumerate([30, 45, 20, 59, 16, 40] * 5):
+        assert scaler.decide(workers, depth, None, float(now)) == workers
+
+
+def test_queue_wait_triggers_scale_up():
+    scaler = QueueScaler("io", 1, 6, target_backlog=20, target_wait=1.0, scale_down_ratio=0.25, scale_down_delay=5)
+    # 积压很小，但排队等待 p95 超过目标
+    assert scaler.decide(2, 3, 2.5, 0.0) == 3
+    # 等待仍在目标附近（高于缩容阈值）时不缩容
+    assert scaler.decide(3, 0, 0.5, 100.0) == 3
+    assert scaler.decide(3, 0, 0.5, 200.0) == 3
+
+
+def test_worker_profile_args():
+    profile = WorkerProfile.from_config("data", {"pool": "prefork", "concurrency": "2", "prefetch": "1",
+                                                 "max_tasks": "100", "max_memory_kb": "524288"})
+    assert profile.queues == ("data.high", "data", "data.low")
+    assert profile.worker_args() == ["-P", "prefork", "-c", "2", "--prefetch-multiplier", "1",
+                                     "--max-tasks-per-child", "100", "--max-memory-per-child", "524288"]
+    # 未给出的参数不出现在命令行中，使用全局设置
+    assert WorkerProfile.from_config("io", {"pool": "threads"}).worker_args() == ["-P", "threads"]
+    with pytest.raises(ValueError):
+        WorkerProfile.from_config("math", {"prefetch": "0"})
+    with pytest.raises(ValueError):
+        WorkerProfile.from_config("math", {"prefech": "16"})
+
+
+def test_worker_args_resolution():
+    profiles = {"io": WorkerProfile("io", pool="threads", concurrency=50)}
+    pool = LocalWorkerPool(worker_args={"math": "-c 8"}, default_args="-c 2", profiles=profiles)
+    # 显式的队列参数 > worker 配置 > 默认参数
+    assert pool.command("math")[-2:] == ["-c", "8"]
+    assert pool.command("io")[-4:] == ["-P", "threads", "-c", "50"]
+    assert pool.command("data")[-2:] == ["-c", "2"]
+    assert pool.command("io")[6:8] == ["-Q", "io"]
+
+
+def main():
+    history = simulate(burst, steps=60)
+    print("🧪 自动伸缩模拟: math 稳定 8 个/秒，io 在第 5~14 秒突发 40 个/秒")
+    print(" step  math积压  math worker  io积压  io worker")
+    for step, state in enumerate(history):
+        print(f"{step:5d}  {state['math']['depth']:8d}  {state['math']['workers']:11d}  "
+              f"{state['io']['depth']:6d}  {state['io']['workers']:9d}")
+
+
+if __name__ == "__main__":
+    main()
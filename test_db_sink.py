@@ -0,0 +1,87 @@
+# test_db_sink.py - 数据库写入器测试（临时 SQLite 数据库，不依赖 Redis）
+"""
+组提交、表结构推断与失败隔离: 同一事务中一次保存出错时只有它失败。
+
+    python -m pytest test_db_sink.py -q
+"""
+import asyncio
+import json
+
+import pytest
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import IntegrityError
+
+from tasks.db_sink import DatabaseSink
+
+
+@pytest.fixture
+def sink(tmp_path):
+    sink = DatabaseSink(f"sqlite:///{tmp_path / 'sink.db'}", batch_window_ms=20)
+    yield sink
+    sink.dispose()
+
+
+def save_all(sink, table, items):
+    """在同一个合并窗口内并发保存，返回各次保存的结果或异常"""
+    async def main():
+        return await asyncio.gather(*(sink.save(table, data) for data in items), return_exceptions=True)
+    return asyncio.run(main())
+
+
+def select(sink, sql):
+    with sink.engine.connect() as conn:
+        return [tuple(row) for row in conn.execute(text(sql))]
+
+
+def test_saves_in_window_share_one_transaction(sink):
+    results = save_all(sink, "results", [[1, 2], [3], 4])
+    assert [result["rows"] for result in results] == [2, 1, 1]
+    assert {(result["batch_rows"], result["batch_size"]) for result in results} == {(4, 3)}
+    assert sink.stats == {"saves": 3, "rows": 4, "transactions": 1}
+    assert select(sink, "SELECT value FROM results ORDER BY id") == [(1,), (2,), (3,), (4,)]
+
+
+def test_schema_inferred_from_first_rows(sink):
+    save_all(sink, "people", [[{"name": "a", "age": 30, "score": 1.5, "ok": True, "big": 10 ** 30}]])
+    columns = {column["name"]: type(column["type"]).__name__ for column in inspect(sink.engine).get_columns("people")}
+    assert columns == {"id": "INTEGER", "record_id": "VARCHAR", "created_at": "DATETIME", "name": "TEXT",
+                       "age": "BIGINT", "score": "FLOAT", "ok": "BOOLEAN", "big": "TEXT", "extra": "TEXT"}
+
+    # 新键与类型不符的值写入 extra 列
+    save_all(sink, "people", [{"name": "b", "age": "unknown", "city": "x"}])
+    assert select(sink, "SELECT name, age, extra FROM people WHERE name = 'b'") == \
+        [("b", None, json.dumps({"city": "x", "age": "unknown"}, separators=(',', ':')))]
+
+
+def test_empty_first_save_does_not_fix_schema(sink):
+    assert save_all(sink, "late", [[]])[0]["rows"] == 0
+    assert not inspect(sink.engine).has_table("late")
+
+    save_all(sink, "late", [[{"a": 1, "b": "x"}]])
+    assert {column["name"] for column in inspect(sink.engine).get_columns("late")} >= {"a", "b"}
+    assert select(sink, "SELECT a, b, extra FROM late") == [(1, "x", None)]
+
+
+def test_failing_save_does_not_fail_batch(sink):
+    # 已有表没有 extra 列，多出的键无法保存
+    with sink.engine.begin() as conn:
+        conn.execute(text("CREATE TABLE strict (id INTEGER PRIMARY KEY, record_id VARCHAR(40), "
+                          "created_at DATETIME, name TEXT UNIQUE)"))
+
+    results = save_all(sink, "strict", [{"name": "a"}, {"name": "b", "unknown": 1}, {"name": "c"}])
+    assert isinstance(results[1], ValueError)
+    assert [(result["rows"], result["batch_size"]) for result in (results[0], results[2])] == [(1, 1), (1, 1)]
+
+    # 约束冲突同样只影响出错的保存
+    results = save_all(sink, "strict", [{"name": "d"}, {"name": "a"}, {"name": "e"}])
+    assert isinstance(results[1], IntegrityError)
+    assert not isinstance(results[0], Exception) and not isinstance(results[2], Exception)
+    assert select(sink, "SELECT name FROM strict ORDER BY name") == [("a",), ("c",), ("d",), ("e",)]
+
+
+def test_single_failing_save_reports_error(sink):
+    with pytest.raises(ValueError):
+        asyncio.run(sink.save("bad-name", [1]))
+    with sink.engine.begin() as conn:
+        conn.execute(text("CREATE TABLE strict (id INTEGER PRIMARY KEY, name TEXT)"))
+    assert isinstance(save_all(sink, "strict", [{"other": 1}])[0], ValueError)
@@ -0,0 +1,117 @@
+# test_embedded.py - 嵌入模式执行器测试（进程内执行，不依赖 Redis 与 worker）
+"""
+EmbeddedExecutor 按队列的线程池执行真实的任务链；TaskService 使用假的数据库，
+任务链结束时由执行器直接回调更新记录。
+
+    python -m pytest test_embedded.py -q
+"""
+import threading
+from datetime import timedelta
+
+import pytest
+from celery import chain
+from celery.schedules import crontab
+
+from app.services.chain_service import ChainService
+from app.services.embedded_executor import EmbeddedExecutor, QueuePool
+from app.services.task_service import TaskService
+from celery_app import app
+from config import TracingConfig
+from tasks.payload_store import LocalPayloadStore, register_store
+from test_admission import FakeDatabase, controller
+
+
+@pytest.fixture
+def executor(monkeypatch):
+    # 不写入 tasks.db 的步骤记录
+    monkeypatch.setattr(TracingConfig, "ENABLED", False)
+    executor = EmbeddedExecutor(app, pool_sizes={"math": 2, "data": 2})
+    yield executor
+    executor.close()
+
+
+def test_chain_runs_on_routed_pools(executor):
+    assert executor.apply_async(ChainService.create_chain("complex_math", 3, 4)).get(timeout=10) == 8.5
+    result = executor.apply_async(ChainService.create_chain("map_reduce_statistics", 100, 4)).get(timeout=10)
+    assert result["count"] == 100 and result["sum"] == 5050
+    assert set(executor.stats()) == {"math", "data"}
+    assert executor.stats()["math"]["threads"] <= 2
+
+
+def test_priority_and_explicit_queue_routing(executor):
+    assert executor.route(app.signature("math.add"), "high") == "math.high"
+    assert executor.route(app.signature("data.sort_data"), None) == "data"
+    assert executor.route(app.signature("math.power").set(queue="heavy"), "low") == "heavy"
+    assert executor.route(app.signature("celery.chord_unlock"), None) == "celery"
+
+
+def test_failed_step_ends_chain(executor):
+    workflow = chain(app.signature("math.add", args=[1, 2]), app.signature("math.divide", args=[0]),
+                     app.signature("math.multiply", args=[2]))
+    result = executor.apply_async(workflow)
+    with pytest.raises(ValueError):
+        result.get(timeout=10)
+    assert result.state == "FAILURE"
+
+
+def test_pool_runs_higher_priority_first():
+    pool = QueuePool("math", 1)
+    started, release, order = threading.Event(), threading.Event(), []
+    pool.submit(1, lambda: (started.set(), release.wait(5)))
+    started.wait(5)
+    # 唯一的线程忙时依次放入 low / normal / high
+    done = threading.Event()
+    for rank, name in ((2, "low"), (1, "normal"), (0, "high")):
+        pool.submit(rank, lambda name=name: order.append(name))
+    pool.submit(3, done.set)
+    release.set()
+    assert done.wait(5)
+    assert order == ["high", "normal", "low"]
+    assert pool.stats()["threads"] == 1
+    pool.close()
+
+
+def test_task_service_updates_db_on_completion(executor):
+    admission, db = controller(high_water={"math": 1}), FakeDatabase()
+    task_service = TaskService(db_manager=db, admission=admission, executor=executor)
+    task_service.result_tracker.close()
+
+    submitted = task_service.submit_task(3, 4, "complex_math", priority="high")
+    assert submitted["queue"] == "math.high"
+    submitted["celery_result"].get(timeout=10)
+    # 回调在执行线程中运行，get 返回时可能尚未写完
+    for _ in range(100):
+        if db.statuses[submitted["task_id"]] != "pending":
+            break
+        threading.Event().wait(0.01)
+    assert db.statuses[submitted["task_id"]] == "completed"
+    assert admission.outstanding() == {"math.high": 0}
+    assert task_service.result_tracker.pending() == 0
+
+
+def test_periodic_tasks_collect_payload_garbage(executor, tmp_path):
+    store = LocalPayloadStore(str(tmp_path))
+    register_store("local", lambda: store)
+    try:
+        store.put(b"orphaned")
+        executor.start_periodic({
+            "collect": {"task": "io.collect_payload_garbage", "schedule": timedelta(seconds=0.05), "args": (0,)},
+            "nightly": {"task": "io.collect_payload_garbage", "schedule": crontab(hour=3)},
+        })
+        # 启动时立即执行一次
+        for _ in range(200):
+            if not store.stats()["payloads"]:
+                break
+            threading.Event().wait(0.01)
+        assert store.stats()["payloads"] == 0
+
+        # 之后按间隔执行
+        store.put(b"orphaned again")
+        for _ in range(200):
+            if not store.stats()["payloads"]:
+                break
+            threading.Event().wait(0.01)
+        assert store.stats()["payloads"] == 0
+    finally:
+        executor.close()
+        register_store("local", LocalPayloadStore)
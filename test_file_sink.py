@@ -0,0 +1,98 @@
+# test_file_sink.py - 文件写入器测试（临时目录，不依赖 Redis）
+"""
+追加模式下同一文件的并发保存：批次按顺序写入、记录不交错（同进程与多个进程）。
+
+    python -m pytest test_file_sink.py -q
+"""
+import asyncio
+import multiprocessing
+import time
+
+import pytest
+
+import tasks.file_sink as file_sink
+from tasks.file_sink import FileSink, read_file
+from tasks.io_tasks import save_to_file
+
+# 每条记录约 64KB，大于一次缓冲写入常见的分段
+RECORD_SIZE = 64 * 1024
+
+
+def record(writer: int, index: int) -> dict:
+    return {"writer": writer, "index": index, "pad": "x" * RECORD_SIZE}
+
+
+class SlowFirstBatchSink(FileSink):
+    """第一批写入较慢，使后面的批次在它写完之前就开始刷写"""
+
+    def _write_batch(self, path, data, saves):
+        if not self.stats["writes"]:
+            time.sleep(0.2)
+        super()._write_batch(path, data, saves)
+
+
+def test_overlapping_flushes_keep_batch_order(tmp_path):
+    # 每次保存都超过单批上限，立即刷写
+    sink = SlowFirstBatchSink(root_dir=str(tmp_path), batch_max_bytes=1, fsync=False)
+
+    async def main():
+        saves = []
+        for i in range(20):
+            saves.append(asyncio.create_task(sink.append("out.ndjson", record(0, i))))
+            await asyncio.sleep(0.005)
+        return await asyncio.gather(*saves)
+
+    results = asyncio.run(main())
+    assert [result["batch_size"] for result in results] == [1] * 20
+    assert [item["index"] for item in read_file(str(tmp_path / "out.ndjson"), "ndjson")] == list(range(20))
+    assert sink.stats["writes"] == 20
+
+
+def test_group_commit_in_window(tmp_path):
+    sink = FileSink(root_dir=str(tmp_path), batch_window_ms=50, fsync=False)
+
+    async def main():
+        return await asyncio.gather(*(sink.append("out.ndjson", [i, i]) for i in range(10)))
+
+    results = asyncio.run(main())
+    assert {result["batch_size"] for result in results} == {10}
+    assert read_file(str(tmp_path / "out.ndjson"), "ndjson") == [i for i in range(10) for _ in range(2)]
+    assert sink.stats == {"saves": 10, "bytes": 40, "writes": 1, "fsyncs": 0}
+
+
+def _append_records(root: str, writer: int, count: int) -> None:
+    sink = FileSink(root_dir=root, batch_window_ms=1, fsync=False)
+
+    async def main():
+        for start in range(0, count, 5):
+            await asyncio.gather(*(sink.append("shared.ndjson", record(writer, i))
+                                   for i in range(start, start + 5)))
+
+    asyncio.run(main())
+
+
+def test_processes_appending_one_file(tmp_path):
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=_append_records, args=(str(tmp_path), writer, 40)) for writer in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+        assert process.exitcode == 0
+
+    # 每行都是完整的记录，每个进程的记录保持自身顺序
+    records = read_file(str(tmp_path / "shared.ndjson"), "ndjson")
+    assert len(records) == 160
+    for writer in range(4):
+        assert [item["index"] for item in records if item["writer"] == writer] == list(range(40))
+
+
+def test_save_to_file_append_defaults_to_ndjson(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_sink, "_file_sink", FileSink(root_dir=str(tmp_path), batch_window_ms=1, fsync=False))
+
+    result = save_to_file([1, 2, 3], "log.ndjson", mode="append")
+    assert result["format"] == "ndjson"
+    assert save_to_file({"a": 1}, "snapshot.json")["format"] == "json"
+    assert read_file(str(tmp_path / "log.ndjson"), "ndjson") == [1, 2, 3]
+    with pytest.raises(ValueError):
+        save_to_file([1], "log.json", format_type="json", mode="append")
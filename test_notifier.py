@@ -0,0 +1,90 @@
+# test_notifier.py - webhook 推送器测试（本地 webhook 替身，不依赖 Redis）
+"""
+合并窗口、单批上限、按主机的并发上限与整批失败时每条通知都收到异常。
+
+    python -m pytest test_notifier.py -q
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+import requests
+
+from benchmarks.http_stub import WebhookStubServer
+from tasks.notifier import WebhookNotifier
+
+
+@pytest.fixture
+def server():
+    with WebhookStubServer() as server:
+        yield server
+
+
+def notify_all(notifier, items):
+    """同时发出一组 (渠道, 消息)，返回各条通知的结果或异常"""
+    async def main():
+        return await asyncio.gather(*(notifier.notify(channel, message) for channel, message in items),
+                                    return_exceptions=True)
+    try:
+        return asyncio.run(main())
+    finally:
+        notifier.close()
+
+
+class RecordingNotifier(WebhookNotifier):
+    """不发网络请求，记录每个主机同时进行中的请求数"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.in_flight, self.peak, self.payloads = {}, {}, []
+        self._lock = threading.Lock()
+
+    def post(self, url, payload):
+        with self._lock:
+            self.in_flight[url] = self.in_flight.get(url, 0) + 1
+            self.peak[url] = max(self.peak.get(url, 0), self.in_flight[url])
+            self.payloads.append(payload)
+        time.sleep(0.05)
+        with self._lock:
+            self.in_flight[url] -= 1
+        return 200
+
+
+def test_burst_is_coalesced_per_channel(server):
+    notifier = WebhookNotifier(webhook_url=server.url, coalesce_window_ms=50)
+    results = notify_all(notifier, [("slack", f"m{i}") for i in range(10)] + [("sms", "s1"), ("sms", "s2")])
+
+    assert [result["batch_size"] for result in results] == [10] * 10 + [2, 2]
+    assert len({result["notification_id"] for result in results}) == 12
+    assert server.stats["requests"] == 2 and server.stats["notifications"] == 12
+    assert notifier.stats == {"notifications": 12, "requests": 2, "failures": 0}
+
+
+def test_batch_is_capped():
+    notifier = RecordingNotifier(webhook_url="http://hooks.test/notify", coalesce_window_ms=1000,
+                                 coalesce_max_messages=10)
+    results = notify_all(notifier, [("email", f"m{i}") for i in range(25)])
+
+    assert sorted(payload["count"] for payload in notifier.payloads) == [5, 10, 10]
+    assert [f"m{i}" for i in range(10)] in [payload["messages"] for payload in notifier.payloads]
+    assert sorted({result["batch_size"] for result in results}) == [5, 10]
+
+
+def test_concurrency_is_limited_per_host():
+    notifier = RecordingNotifier(webhook_url="http://a.test/notify", channel_urls={"sms": "http://b.test/notify"},
+                                 per_host_limit=2, max_connections=16, coalesce_window_ms=0)
+    notify_all(notifier, [("webhook", f"a{i}") for i in range(8)] + [("sms", f"b{i}") for i in range(8)])
+
+    assert notifier.peak == {"http://a.test/notify": 2, "http://b.test/notify": 2}
+    assert notifier.stats["requests"] == 16
+
+
+def test_failed_request_fails_every_coalesced_notification(server):
+    notifier = WebhookNotifier(webhook_url=server.url, channel_urls={"pager": server.url.replace("/notify", "/fail")},
+                               coalesce_window_ms=20)
+    results = notify_all(notifier, [("pager", f"p{i}") for i in range(5)] + [("slack", "ok")])
+
+    assert all(isinstance(result, requests.HTTPError) for result in results[:5])
+    assert results[5]["status_code"] == 200
+    assert notifier.stats == {"notifications": 1, "requests": 2, "failures": 1}
@@ -0,0 +1,102 @@
+# test_numeric.py - 大整数幂运算测试（纯计算与任务链构建，不依赖 Redis）
+"""
+math.power 的位数估算、精确计算与对数空间的切换、math.sqrt 的各条路径，
+以及 power_sqrt 任务链按结果规模分流到重计算队列。
+
+    python -m pytest test_numeric.py -q
+"""
+import math
+import sys
+
+import pytest
+
+from app.services.chain_service import ChainService
+from config import MathCostConfig
+from tasks import numeric
+
+
+@pytest.mark.parametrize("base, exponent", [(2, 1000), (3, 500), (10, 4300), (-7, 1234), (999, 99), (12, 0)])
+def test_estimate_matches_exact_digits(base, exponent):
+    assert numeric.estimate_power_digits(base, exponent) == len(str(abs(base ** exponent)))
+
+
+@pytest.mark.parametrize("base, exponent", [(2.5, 1000), (10, 2.0), (10, -5), (1, 10 ** 9), (-1, 10 ** 9), (0, 10 ** 9)])
+def test_estimate_is_one_when_result_is_not_a_big_integer(base, exponent):
+    assert numeric.estimate_power_digits(base, exponent) == 1
+
+
+def test_estimate_for_exponent_beyond_float_range():
+    assert numeric.estimate_power_digits(10, 10 ** 400) == sys.maxsize
+
+
+def test_power_exact_up_to_limit_then_log_space(monkeypatch):
+    monkeypatch.setattr(MathCostConfig, "EXACT_MAX_DIGITS", 1000)
+    assert numeric.power(10, 999) == 10 ** 999
+    # 超过上限、仍在浮点范围内: 浮点数
+    assert numeric.power(2, 1000) == pytest.approx(2.0 ** 1000)
+    assert numeric.power(-2, 1001) == pytest.approx(-(2.0 ** 1001))
+    # 超出浮点范围: 对数值，负底数奇数次幂为负
+    result = numeric.power(-10, 5001)
+    assert result == {"sign": -1, "log10": pytest.approx(5001.0)}
+    assert numeric.power(0, 10 ** 9) == 0
+
+
+def test_power_float_overflow_falls_back_to_log_space():
+    assert numeric.power(10.0, 400) == {"sign": 1, "log10": pytest.approx(400.0)}
+    with pytest.raises(ValueError):
+        numeric.power(10, 10 ** 400)
+
+
+def test_power_reject_policy(monkeypatch):
+    monkeypatch.setattr(MathCostConfig, "EXACT_MAX_DIGITS", 1000)
+    monkeypatch.setattr(MathCostConfig, "OVERSIZE_POLICY", "reject")
+    assert numeric.power(10, 999) == 10 ** 999
+    with pytest.raises(ValueError):
+        numeric.power(10, 1000)
+    with pytest.raises(ValueError):
+        ChainService.check_cost("power_sqrt", 10, 1000)
+    ChainService.check_cost("power_sqrt", 10, 999)
+
+
+def test_sqrt_paths():
+    assert numeric.sqrt(81) == 9.0
+    # 超出浮点范围的完全平方数精确开方
+    assert numeric.sqrt(10 ** 1000) == 10 ** 500
+    # 非完全平方数: 浮点数或对数值
+    assert numeric.sqrt(10 ** 400 + 1) == pytest.approx(1e200)
+    assert numeric.sqrt(3 * 10 ** 1000) == {"sign": 1, "log10": pytest.approx(500 + math.log10(3) / 2)}
+    assert numeric.sqrt({"sign": 1, "log10": 5000.0}) == {"sign": 1, "log10": 2500.0}
+    assert numeric.sqrt({"sign": 1, "log10": 600.0}) == pytest.approx(1e300)
+    for negative in (-1, {"sign": -1, "log10": 5000.0}):
+        with pytest.raises(ValueError):
+            numeric.sqrt(negative)
+
+
+def test_default_heavy_threshold_is_reachable():
+    assert MathCostConfig.HEAVY_DIGITS < MathCostConfig.EXACT_MAX_DIGITS
+    assert ChainService.get_queue("power_sqrt", None, 10, 200000) == MathCostConfig.HEAVY_QUEUE
+
+
+@pytest.mark.parametrize("a, b, queue", [
+    (10, 1000, "math"),
+    (10, 99999, "math"),                # 100000 位，未超过重计算阈值
+    (10, 100000, "heavy"),
+    (10, 999999, "heavy"),
+    (10, 1000000, "math"),              # 超过精确上限，在对数空间计算
+    (10, 10 ** 7, "math"),
+])
+def test_power_sqrt_routed_by_exact_result_size(monkeypatch, a, b, queue):
+    monkeypatch.setattr(MathCostConfig, "EXACT_MAX_DIGITS", 1000000)
+    monkeypatch.setattr(MathCostConfig, "HEAVY_DIGITS", 100000)
+    queue = MathCostConfig.HEAVY_QUEUE if queue == "heavy" else queue
+    assert ChainService.get_queue("power_sqrt", None, a, b) == queue
+    # 准入计数与实际发布使用同一队列
+    workflow = ChainService.create_chain("power_sqrt", a, b)
+    expected = queue if queue == MathCostConfig.HEAVY_QUEUE else None
+    assert [step.options.get("queue") for step in workflow.tasks] == [expected, expected]
+
+
+def test_heavy_queue_ignores_priority_and_other_chains_are_not_heavy():
+    assert ChainService.get_queue("power_sqrt", "low", 10, 200000) == MathCostConfig.HEAVY_QUEUE
+    assert ChainService.get_queue("power_sqrt", "low", 10, 10) == "math.low"
+    assert ChainService.get_queue("complex_math", None, 10, 200000) == "math"
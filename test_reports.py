@@ -0,0 +1,85 @@
+# test_reports.py - 报告缓存测试（临时目录，不依赖 Redis）
+"""
+缓存键与数据的传递方式（内联或负载引用）、字典键顺序无关；命中、LRU 淘汰与统计。
+
+    python -m pytest test_reports.py -q
+"""
+import json
+import os
+
+import pytest
+
+from tasks.payload_store import LocalPayloadStore, PayloadHandle, REF_KEY, open_payload, register_store
+from tasks.reports import ReportCache, cache_key
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = LocalPayloadStore(str(tmp_path / "payloads"))
+    register_store("local", lambda: store)
+    yield store
+    register_store("local", LocalPayloadStore)
+
+
+def ref_to(store, encoded: str) -> PayloadHandle:
+    """按给定的 JSON 文本写入负载存储（模拟其他进程按插入顺序序列化的数据）"""
+    data = encoded.encode('utf-8')
+    return open_payload({REF_KEY: store.put(data), "size": len(data), "store": "local"})
+
+
+@pytest.mark.parametrize("value", [
+    list(range(1000)),
+    [1.5, -2, None, True, "text with {brace}"],
+    [{"b": 1, "a": [2, {"d": 3, "c": 4}]}, {"x": "y"}],
+    {"b": 1, "a": 2},
+])
+def test_key_is_same_inline_and_by_reference(store, value):
+    inline = cache_key(open_payload(value), "summary")
+    compact = json.dumps(value, separators=(',', ':'), ensure_ascii=False)
+    assert cache_key(ref_to(store, compact), "summary") == inline
+    # 其他进程以不同的格式序列化相同数据
+    assert cache_key(ref_to(store, json.dumps(value, indent=2)), "summary") == inline
+
+
+def test_key_ignores_dict_order_but_not_values(store):
+    first, second = {"a": 1, "b": [1, 2]}, {"b": [1, 2], "a": 1}
+    assert cache_key(open_payload(first), "chart") == cache_key(open_payload(second), "chart")
+    assert cache_key(ref_to(store, '{"a":1,"b":[1,2]}'), "chart") == \
+        cache_key(ref_to(store, '{"b":[1,2],"a":1}'), "chart")
+
+    assert cache_key(open_payload(first), "chart") != cache_key(open_payload(first), "summary")
+    assert cache_key(open_payload([1, 2]), "chart") != cache_key(open_payload([2, 1]), "chart")
+
+
+def test_hit_after_miss(store, tmp_path):
+    cache = ReportCache(root_dir=str(tmp_path / "reports"))
+    generated = cache.get_or_generate(list(range(100)), "detailed")
+    assert generated["cached"] is False and os.path.exists(generated["path"])
+
+    # 相同数据以负载引用传入时命中
+    hit = cache.get_or_generate(ref_to(store, json.dumps(list(range(100)))), "detailed")
+    assert hit["cached"] is True and hit["path"] == generated["path"]
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1 and cache.stats()["entries"] == 1
+
+
+def test_least_recently_used_is_evicted(tmp_path):
+    cache = ReportCache(root_dir=str(tmp_path / "reports"), max_bytes=10 ** 9)
+    first = cache.get_or_generate([1, 2, 3], "summary")
+    second = cache.get_or_generate([4, 5, 6], "summary")
+    # 访问第一份后，第二份最久未访问
+    assert cache.get_or_generate([1, 2, 3], "summary")["cached"] is True
+
+    cache.max_bytes = first["size"] + second["size"]
+    third = cache.get_or_generate([7, 8, 9], "summary")
+    assert not os.path.exists(second["path"])
+    assert os.path.exists(first["path"]) and os.path.exists(third["path"])
+    assert cache.get_or_generate([4, 5, 6], "summary")["cached"] is False
+    assert cache.stats()["evictions"] >= 1
+
+
+def test_new_report_is_kept_when_over_limit(tmp_path):
+    cache = ReportCache(root_dir=str(tmp_path / "reports"), max_bytes=1)
+    first = cache.get_or_generate([1], "summary")
+    second = cache.get_or_generate([2], "summary")
+    assert not os.path.exists(first["path"]) and os.path.exists(second["path"])
+    assert cache.stats()["entries"] == 1
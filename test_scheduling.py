@@ -0,0 +1,121 @@
+# test_scheduling.py - 加权公平排队测试（替身执行池，不依赖 Redis 与 worker）
+"""
+FairScheduler 按 (优先级, 租户) 权重分配执行机会、分流排空后重新到达；
+FairSchedulingMixin 的槽位计数: 每个任务只释放一次，槽位空闲时派发排队中的任务。
+
+    python -m pytest test_scheduling.py -q
+"""
+from collections import Counter
+
+from scheduling import PRIORITY_HEADER, TENANT_HEADER, FairScheduler
+from worker_pools import FairSchedulingMixin
+
+
+def pop_all(scheduler: FairScheduler) -> list:
+    return [scheduler.pop() for _ in range(len(scheduler))]
+
+
+def test_backlogged_flows_share_by_weight():
+    scheduler = FairScheduler(priority_weights={"high": 4, "low": 1}, tenant_weights={})
+    for i in range(20):
+        scheduler.push(("high", i), "high")
+        scheduler.push(("low", i), "low")
+
+    order = pop_all(scheduler)
+    assert Counter(priority for priority, _ in order[:10]) == {"high": 8, "low": 2}
+    # 同一分流内保持到达顺序
+    assert [i for priority, i in order if priority == "low"] == list(range(20))
+
+
+def test_tenant_weight_multiplies_priority_weight():
+    scheduler = FairScheduler(priority_weights={"normal": 1}, tenant_weights={"a": 2})
+    for i in range(9):
+        scheduler.push("a", tenant="a")
+        scheduler.push("b", tenant="b")
+    assert scheduler.backlog() == {("normal", "a"): 9, ("normal", "b"): 9}
+    assert Counter(pop_all(scheduler)[:9]) == {"a": 6, "b": 3}
+
+
+def test_drained_flow_is_removed_and_reenters_at_virtual_time():
+    scheduler = FairScheduler(priority_weights={}, tenant_weights={})
+    for _ in range(3):
+        scheduler.push("a", tenant="a")
+    assert pop_all(scheduler) == ["a"] * 3
+    assert scheduler.backlog() == {} and scheduler._finish == {}
+
+    # 空闲期间不累积份额，也不背负之前的结束标签
+    for _ in range(3):
+        scheduler.push("b", tenant="b")
+    scheduler.push("a", tenant="a")
+    assert pop_all(scheduler) == ["b", "a", "b", "b"]
+    assert scheduler.backlog() == {}
+
+
+class FakePool:
+    """记录派发的任务，由测试调用回调模拟任务结束"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.dispatched = []
+
+    def apply_async(self, target, args=None, kwargs=None, callback=None, error_callback=None, **options):
+        self.dispatched.append((args[1], callback, error_callback))
+        return args[1]
+
+    def _get_info(self):
+        return {}
+
+
+class FakeFairPool(FairSchedulingMixin, FakePool):
+    pass
+
+
+def submit(pool, name, priority=None, tenant=None):
+    request = {PRIORITY_HEADER: priority, TENANT_HEADER: tenant}
+    return pool.apply_async(object(), args=("task", name, request), kwargs={})
+
+
+def finish(pool, name, error=False):
+    _, callback, error_callback = next(job for job in pool.dispatched if job[0] == name)
+    (error_callback if error else callback)(None)
+
+
+def test_jobs_queue_when_slots_are_full_and_run_on_release():
+    pool = FakeFairPool(limit=2)
+    pool._scheduler = FairScheduler(priority_weights={"high": 16, "low": 1}, tenant_weights={})
+    assert submit(pool, "r1", "low") == "r1" and submit(pool, "r2", "low") == "r2"
+    assert submit(pool, "low", "low") is None and submit(pool, "high", "high") is None
+    assert [name for name, *_ in pool.dispatched] == ["r1", "r2"]
+    assert pool._get_info()["fair-scheduler"] == {"running": 2, "queued": {"low/default": 1, "high/default": 1}}
+
+    # 槽位释放后先派发权重高的任务，运行数不变
+    finish(pool, "r1")
+    assert [name for name, *_ in pool.dispatched] == ["r1", "r2", "high"]
+    finish(pool, "r2", error=True)
+    assert [name for name, *_ in pool.dispatched][-1] == "low"
+    assert pool._running == 2 and len(pool._scheduler) == 0
+
+    finish(pool, "high")
+    finish(pool, "low")
+    assert pool._running == 0
+
+
+def test_each_job_releases_its_slot_once():
+    pool = FakeFairPool(limit=1)
+    calls = []
+    pool.apply_async(object(), args=("task", "a", {}), kwargs={}, callback=calls.append)
+    submit(pool, "b")
+    submit(pool, "c")
+
+    _, callback, error_callback = pool.dispatched[0]
+    callback("result")
+    # 回调被重复调用时不再释放槽位，不会多派发排队中的任务
+    callback("again")
+    error_callback(None)
+    assert calls == ["result", "again"]
+    assert [name for name, *_ in pool.dispatched] == ["a", "b"]
+    assert pool._running == 1 and len(pool._scheduler) == 1
+
+    finish(pool, "b")
+    finish(pool, "c")
+    assert pool._running == 0 and [name for name, *_ in pool.dispatched] == ["a", "b", "c"]
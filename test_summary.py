@@ -0,0 +1,113 @@
+# test_summary.py - 可合并统计摘要与分位数草图测试（纯计算，不依赖 Redis）
+"""
+StatsSummary 分片合并的结果应与单遍计算一致，to_dict/from_dict 往返后可继续合并；
+QuantileSketch 的分位数按排名误差检查。
+
+    python -m pytest test_summary.py -q
+"""
+import json
+import random
+import statistics
+
+import pytest
+
+from tasks.summary import QuantileSketch, StatsSummary
+
+
+def randoms(seed, count, scale=1.0, offset=0.0):
+    rng = random.Random(seed)
+    return [offset + scale * rng.random() for _ in range(count)]
+
+
+def shards(data, count):
+    size = -(-len(data) // count)
+    return [data[start:start + size] for start in range(0, len(data), size)]
+
+
+def round_trip(summary: StatsSummary) -> StatsSummary:
+    """经 JSON 传递（与 chord 回调收到的分片结果相同）"""
+    return StatsSummary.from_dict(json.loads(json.dumps(summary.to_dict())))
+
+
+def rank_error(data, value, q) -> float:
+    """value 的排名与目标排名之差，占数据量的比例"""
+    rank = sum(1 for x in data if x <= value)
+    return abs(rank - q * len(data)) / len(data)
+
+
+@pytest.mark.parametrize("data", [
+    list(range(1, 10001)),
+    randoms(1, 5000, scale=2e6, offset=-1e6),
+    randoms(2, 3000, offset=1e9),
+])
+def test_merge_equals_single_pass(data):
+    single = StatsSummary.from_data(data, chunk_size=512)
+    merged = StatsSummary()
+    for shard in shards(data, 7):
+        merged.merge(round_trip(StatsSummary.from_data(shard, chunk_size=100)))
+
+    assert merged.count == single.count == len(data)
+    assert merged.total == pytest.approx(single.total)
+    assert merged.minimum == min(data) and merged.maximum == max(data)
+    assert merged.avg == pytest.approx(statistics.fmean(data))
+    # 均值 1e9、方差 0.08 的数据，朴素的平方和公式会完全抵消
+    assert merged.variance == pytest.approx(statistics.pvariance(data), rel=1e-6)
+    assert merged.aggregate() == pytest.approx(single.aggregate())
+
+
+def test_integer_variance_is_exact():
+    data = list(range(10 ** 6, 10 ** 6 + 1000))
+    assert StatsSummary.from_data(data, chunk_size=64).variance == pytest.approx(statistics.pvariance(data),
+                                                                                 rel=1e-12)
+
+
+def test_empty_and_single_item_shards():
+    merged = StatsSummary(with_quantiles=True)
+    for shard in ([], [5], [], [1, 9], []):
+        merged.merge(round_trip(StatsSummary.from_data(shard, with_quantiles=True)))
+
+    assert merged.aggregate() == {"count": 3, "sum": 15, "avg": 5, "min": 1, "max": 9}
+    assert merged.quantiles((0.5,)) == {"p50": 5}
+
+    empty = round_trip(StatsSummary())
+    assert empty.aggregate() == {"count": 0, "sum": 0, "avg": 0, "min": None, "max": None}
+    assert empty.statistics() == {"mean": 0, "variance": 0, "std_dev": 0}
+    assert empty.quantiles() is None
+    assert QuantileSketch().quantile(0.5) is None
+
+
+def test_round_trip_preserves_state():
+    summary = StatsSummary.from_data(list(range(3000)), chunk_size=100, with_quantiles=True)
+    restored = round_trip(summary)
+
+    assert restored.to_dict() == summary.to_dict()
+    assert restored.sketch._compactions == summary.sketch._compactions
+    # 恢复后继续加入数据，与未经序列化的摘要结果相同
+    summary.update(list(range(3000, 4000)))
+    restored.update(list(range(3000, 4000)))
+    assert restored.to_dict() == summary.to_dict()
+
+
+def test_sketch_weight_is_conserved():
+    sketch = QuantileSketch(k=32)
+    for start in range(0, 10000, 37):
+        sketch.update(range(start, min(start + 37, 10000)))
+    assert sum(len(values) << level for level, values in enumerate(sketch.levels)) == 10000
+
+
+@pytest.mark.parametrize("q", [0.01, 0.25, 0.5, 0.75, 0.9, 0.99])
+def test_quantile_error_bound(q):
+    data = randoms(3, 50000)
+
+    single = StatsSummary.from_data(data, chunk_size=1000, with_quantiles=True)
+    merged = StatsSummary()
+    for shard in shards(data, 10):
+        merged.merge(round_trip(StatsSummary.from_data(shard, chunk_size=1000, with_quantiles=True)))
+
+    for summary in (single, merged):
+        assert rank_error(data, summary.sketch.quantile(q), q) < 0.02
+
+
+def test_small_data_quantiles_are_exact():
+    summary = StatsSummary.from_data([5, 1, 4, 2, 3], with_quantiles=True)
+    assert summary.quantiles((0.2, 0.6, 1.0)) == {"p20": 1, "p60": 3, "p100": 5}
@@ -0,0 +1,93 @@
+# test_task_log.py - 任务日志测试（不依赖 Redis）
+"""
+worker 的日志配置（-f/--logfile、-l）对 tasks.* 日志生效；多线程同时写满队列时丢弃计数不丢失。
+
+    python -m pytest test_task_log.py -q
+"""
+import logging
+import os
+import subprocess
+import sys
+import threading
+
+from config import TaskLogConfig
+from tasks.task_log import BufferedHandler, configure_task_logging, flush_task_logs, get_task_log
+
+WORKER_SCRIPT = """
+import sys
+from celery_app import app
+from tasks.task_log import flush_task_logs, get_task_log
+log = get_task_log("demo")
+# 与 worker 启动时相同的日志配置
+app.log.setup(loglevel="WARNING", logfile=sys.argv[1])
+log.info("filtered %s", 1)
+log.warning("kept %s", list(range(100)))
+flush_task_logs()
+"""
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+        self.closed = False
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+    def close(self):
+        self.closed = True
+        super().close()
+
+
+def test_worker_logfile_and_level_apply(tmp_path):
+    logfile = tmp_path / "worker.log"
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)), TASK_LOG_LEVEL="", TASK_LOG_FILE="")
+    subprocess.run([sys.executable, "-c", WORKER_SCRIPT, str(logfile)], env=env, check=True,
+                   capture_output=True, timeout=60)
+
+    lines = logfile.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 1
+    assert "WARNING" in lines[0] and "kept [0, 1, 2" in lines[0] and "...共100项]" in lines[0]
+
+
+def test_worker_handlers_are_reused_not_closed(monkeypatch):
+    monkeypatch.setattr(TaskLogConfig, "LEVEL", "")
+    monkeypatch.setattr(TaskLogConfig, "FILE", "")
+    target = ListHandler()
+    try:
+        handler = configure_task_logging(level=logging.INFO, handlers=[target])
+        get_task_log("demo").info("to worker %s", "handler")
+        flush_task_logs()
+        assert target.messages == ["to worker handler"]
+        assert handler.owns_targets is False
+
+        # 替换 handler 时不关闭 worker 的 handler
+        configure_task_logging(filename="", stream=open(os.devnull, "w"))
+        assert not target.closed
+    finally:
+        configure_task_logging()
+
+
+def test_dropped_count_is_exact_under_threads():
+    handler = BufferedHandler([ListHandler()], capacity=10)
+    # 不启动后台线程，队列写满后保持满
+    handler._pid = os.getpid()
+    record = logging.LogRecord("tasks.demo", logging.INFO, __file__, 0, "x", (), None)
+    threads, per_thread = 8, 5000
+
+    previous = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        workers = [threading.Thread(target=lambda: [handler.enqueue(record) for _ in range(per_thread)])
+                   for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    finally:
+        sys.setswitchinterval(previous)
+
+    assert handler.queue.qsize() == 10
+    assert handler.dropped == threads * per_thread - 10
+    assert handler._unreported == handler.dropped
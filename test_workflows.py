@@ -0,0 +1,87 @@
+# test_workflows.py - 工作流构建测试（只构建签名与本地执行任务函数，不依赖 Redis）
+"""
+map-reduce 的分片上限与大分片的负载存储引用；批量处理的自动分块与逐项/批量操作的一致性。
+
+    python -m pytest test_workflows.py -q
+"""
+import pytest
+
+from app.services.chain_service import ChainService
+from config import MapReduceConfig, PayloadStoreConfig
+from tasks.data_tasks import OPERATIONS, concat_chunks, map_shard, merge_statistics, process_item, process_items
+from tasks.payload_store import LocalPayloadStore, is_payload_ref, register_store
+from workflows import build_map_reduce, build_process_items, split_shards
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = LocalPayloadStore(str(tmp_path))
+    register_store("local", lambda: store)
+    yield store
+    register_store("local", LocalPayloadStore)
+
+
+def test_split_shards_is_balanced():
+    shards = split_shards(range(1, 11), 3)
+    assert shards == [[1, 2, 3, 4], [5, 6, 7], [8, 9, 10]]
+    assert split_shards([1, 2], 5) == [[1], [2]]
+    assert split_shards([], 4) == [[]]
+    with pytest.raises(ValueError):
+        split_shards([1], 0)
+
+
+def test_shard_count_is_capped(monkeypatch):
+    monkeypatch.setattr(MapReduceConfig, "MAX_SHARDS", 8)
+    assert len(build_map_reduce(range(100), shards=8).tasks) == 8
+    with pytest.raises(ValueError):
+        build_map_reduce(range(100), shards=9)
+    # 提交前检查（在准入控制之前，API 返回 400）
+    ChainService.check_cost("map_reduce_statistics", 1000, 8)
+    with pytest.raises(ValueError):
+        ChainService.check_cost("map_reduce_statistics", 1000, 1_000_000)
+    ChainService.check_cost("complex_math", 1, 1_000_000)
+
+
+def test_large_shards_go_through_payload_store(store, monkeypatch):
+    monkeypatch.setattr(PayloadStoreConfig, "THRESHOLD_BYTES", 1024)
+    workflow = build_map_reduce(range(1, 2001), shards=2)
+    shards = [signature.args[0] for signature in workflow.tasks]
+    assert all(is_payload_ref(shard) for shard in shards)
+    assert store.stats()["payloads"] == 2
+
+    # map_shard 解析引用并在成功后释放
+    partials = [map_shard(shard) for shard in shards]
+    assert merge_statistics(partials)["sum"] == 2001000
+    assert store.stats()["payloads"] == 0
+
+
+def test_small_shards_stay_inline(store):
+    workflow = build_map_reduce(range(1, 11), shards=2)
+    assert [signature.args[0] for signature in workflow.tasks] == [[1, 2, 3, 4, 5], [6, 7, 8, 9, 10]]
+    assert store.stats()["payloads"] == 0
+
+
+def test_process_items_single_message_up_to_chunk_size():
+    signature = build_process_items(range(10), "square", chunk_size=10)
+    assert signature.task == "data.process_items"
+    assert list(signature.args) == [list(range(10)), "square"]
+
+
+def test_process_items_chunks_in_order():
+    workflow = build_process_items(range(25), "double", chunk_size=10)
+    assert workflow.body.task == "data.concat_chunks"
+    chunks = [signature.args[0] for signature in workflow.tasks]
+    assert chunks == [list(range(0, 10)), list(range(10, 20)), list(range(20, 25))]
+    assert all(signature.args[1] == "double" for signature in workflow.tasks)
+
+    results = [process_items(*signature.args) for signature in workflow.tasks]
+    assert concat_chunks(results) == [x * 2 for x in range(25)]
+
+    with pytest.raises(ValueError):
+        build_process_items([1], chunk_size=0)
+
+
+@pytest.mark.parametrize("operation", [*OPERATIONS, "unknown"])
+def test_item_and_batch_operations_agree(operation):
+    items = [3, -2, 0, 1.5]
+    assert process_items(items, operation) == [process_item(item, operation) for item in items]
@@ -0,0 +1,104 @@
+# worker_pools.py - 自定义Celery执行池
+"""
+自定义执行池
+
+AsyncIOPool: io 队列专用。执行线程只负责任务追踪与等待，协程在进程级事件循环上复用，
+单进程即可承载数百个并发的 I/O 任务。
+
+FairPool / FairThreadPool: 执行槽位占满时，已预取的任务按 (优先级, 租户) 加权公平排队
+（scheduling.FairScheduler），槽位空闲时执行结束标签最小的任务，而不是按到达顺序。
+排队中的任务尚未确认，worker 退出后由 broker 重新投递。预取窗口需大于并发数才有排队的余地。
+
+启动方式:
+    celery -A celery_app worker -Q io -P worker_pools:AsyncIOPool -c 200
+    celery -A celery_app worker -Q math.high,math,math.low -P worker_pools:FairPool -c 4 --prefetch-multiplier 16
+"""
+import threading
+
+from celery.concurrency.prefork import TaskPool as PreforkTaskPool
+from celery.concurrency.thread import TaskPool as ThreadTaskPool
+
+from scheduling import PRIORITY_HEADER, TENANT_HEADER, FairScheduler
+from tasks.async_support import event_loop_thread
+
+class AsyncIOPool(ThreadTaskPool):
+    """基于事件循环的 io 执行池"""
+    
+    def on_start(self):
+        # 提前启动事件循环，避免第一批任务并发初始化
+        event_loop_thread.get_loop()
+        super().on_start()
+    
+    def on_stop(self):
+        super().on_stop()
+        event_loop_thread.stop()
+    
+    def _get_info(self):
+        info = super()._get_info()
+        info['event-loop'] = event_loop_thread.name if event_loop_thread.loop else None
+        return info
+
+class FairSchedulingMixin:
+    """执行池的加权公平排队（与 Celery 执行池组合使用）"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._scheduler = FairScheduler()
+        self._scheduler_lock = threading.Lock()
+        self._running = 0
+    
+    def apply_async(self, target, args=None, kwargs=None, **options):
+        # Request.execute_using_pool 的第 3 个参数为请求字典（含消息头）
+        request = args[2] if args and len(args) > 2 and isinstance(args[2], dict) else {}
+        job = (target, args, kwargs, options)
+        with self._scheduler_lock:
+            if self._running >= self.limit:
+                self._scheduler.push(job, request.get(PRIORITY_HEADER), request.get(TENANT_HEADER))
+                return None
+            self._running += 1
+        return self._submit(job)
+    
+    def _submit(self, job):
+        target, args, kwargs, options = job
+        released = []
+        
+        def on_done(callback):
+            def wrapper(*callback_args, **callback_kwargs):
+                try:
+                    if callback is not None:
+                        return callback(*callback_args, **callback_kwargs)
+                finally:
+                    # callback 与 error_callback 只会调用其一，防御性地只释放一次
+                    if not released:
+                        released.append(True)
+                        self._release()
+            return wrapper
+        
+        options = dict(options, callback=on_done(options.get('callback')),
+                       error_callback=on_done(options.get('error_callback')))
+        return super().apply_async(target, args, kwargs, **options)
+    
+    def _release(self):
+        """一个任务结束: 取出下一个排队的任务，没有则释放槽位"""
+        with self._scheduler_lock:
+            if not self._scheduler:
+                self._running -= 1
+                return
+            job = self._scheduler.pop()
+        self._submit(job)
+    
+    def _get_info(self):
+        info = super()._get_info()
+        with self._scheduler_lock:
+            info['fair-scheduler'] = {
+                'running': self._running,
+                'queued': {f"{priority}/{tenant}": count
+                           for (priority, tenant), count in self._scheduler.backlog().items()}
+            }
+        return info
+
+class FairPool(FairSchedulingMixin, PreforkTaskPool):
+    """prefork 执行池 + 加权公平排队（math / data 队列）"""
+
+class FairThreadPool(FairSchedulingMixin, ThreadTaskPool):
+    """线程执行池 + 加权公平排队"""
@@ -0,0 +1,164 @@
+# worker_profiles.py - 按队列的 worker 配置与启动器
+"""
+worker 配置
+
+celery_app 的 worker_prefetch_multiplier / worker_max_tasks_per_child 对所有队列相同，而三类队列的任务
+特征差别很大: math 任务体只有微秒级计算，每取一条消息与 broker 往返一次的开销远大于执行本身；
+data 任务处理大列表，子进程的常驻内存会不断增长；io 任务几乎全部时间在等待网络。
+
+每个配置（WORKER_PROFILE_<名称>，见 config.WorkerProfileConfig）对应一个同名队列及其优先级子队列，
+给出执行池、并发数、预取倍数与子进程回收条件，启动 worker 时转换为命令行参数，未给出的参数
+仍使用 celery_app 的全局设置。
+
+启动方式:
+    python worker_profiles.py                 # 启动 WORKER_PROFILES 中的全部配置
+    python worker_profiles.py math io         # 只启动部分配置
+    python worker_profiles.py --dry-run       # 只打印 worker 命令
+
+自动伸缩（python autoscaler.py）启动的 worker 同样使用这些配置。
+"""
+import argparse
+import os
+import shlex
+import signal
+import threading
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from config import WorkerProfileConfig
+from scheduling import priority_queues
+
+
+class WorkerProfile(NamedTuple):
+    """一个队列的 worker 配置，None 表示使用全局设置"""
+
+    name: str
+    pool: Optional[str] = None
+    concurrency: Optional[int] = None
+    prefetch_multiplier: Optional[int] = None
+    max_tasks_per_child: Optional[int] = None
+    max_memory_per_child: Optional[int] = None
+    processes: int = 1
+
+    # 配置中的参数名 -> 字段名
+    OPTIONS = {
+        'pool': 'pool',
+        'concurrency': 'concurrency',
+        'prefetch': 'prefetch_multiplier',
+        'max_tasks': 'max_tasks_per_child',
+        'max_memory_kb': 'max_memory_per_child',
+        'processes': 'processes',
+    }
+
+    @classmethod
+    def from_config(cls, name: str, options: Dict[str, str]) -> 'WorkerProfile':
+        """由 {"pool": "prefork", "concurrency": "0", ...} 构建，参数名未知或数值无效时抛出 ValueError"""
+        fields = {}
+        for key, value in options.items():
+            if key not in cls.OPTIONS:
+                raise ValueError(f"worker 配置 {name} 的参数未知: {key}（可用: {', '.join(cls.OPTIONS)}）")
+            if key == 'pool':
+                fields['pool'] = value
+                continue
+            number = int(value)
+            if number < 0 or (number == 0 and key != 'concurrency'):
+                raise ValueError(f"worker 配置 {name} 的 {key} 无效: {value}")
+            fields[cls.OPTIONS[key]] = number
+        return cls(name, **fields)
+
+    @property
+    def queues(self) -> Tuple[str, ...]:
+        return priority_queues(self.name)
+
+    def resolved_concurrency(self) -> Optional[int]:
+        """并发数，0 为 CPU 核数"""
+        if self.concurrency == 0:
+            return os.cpu_count() or 1
+        return self.concurrency
+
+    def worker_args(self) -> List[str]:
+        """celery worker 的命令行参数（不含 -Q / -n）"""
+        args = []
+        if self.pool:
+            args += ['-P', self.pool]
+        if self.concurrency is not None:
+            args += ['-c', str(self.resolved_concurrency())]
+        if self.prefetch_multiplier is not None:
+            args += ['--prefetch-multiplier', str(self.prefetch_multiplier)]
+        if self.max_tasks_per_child is not None:
+            args += ['--max-tasks-per-child', str(self.max_tasks_per_child)]
+        if self.max_memory_per_child is not None:
+            args += ['--max-memory-per-child', str(self.max_memory_per_child)]
+        return args
+
+    def worker_options(self) -> Dict[str, object]:
+        """同一配置的 WorkController 关键字参数（进程内启动 worker 时使用，如基准测试）"""
+        options = {
+            'pool': self.pool,
+            'concurrency': self.resolved_concurrency(),
+            'prefetch_multiplier': self.prefetch_multiplier,
+            'max_tasks_per_child': self.max_tasks_per_child,
+            'max_memory_per_child': self.max_memory_per_child,
+        }
+        return {key: value for key, value in options.items() if value is not None}
+
+    def describe(self) -> str:
+        return shlex.join(self.worker_args()) or '（全局设置）'
+
+
+def load_profiles(names: List[str] = None) -> Dict[str, WorkerProfile]:
+    """读取配置；names 为空时返回全部已定义的配置"""
+    profiles = {name: WorkerProfile.from_config(name, options)
+                for name, options in WorkerProfileConfig.PROFILES.items()}
+    if names is None:
+        return profiles
+    unknown = [name for name in names if name not in profiles]
+    if unknown:
+        raise ValueError(f"未定义的 worker 配置: {', '.join(unknown)}（已定义: {', '.join(profiles)}）")
+    return {name: profiles[name] for name in names}
+
+
+def supervise(pool, profiles: Dict[str, WorkerProfile], stop: threading.Event, interval: float = None) -> None:
+    """按配置的进程数启动 worker，意外退出的进程在 interval 秒后重新启动，stop 被设置后全部停止"""
+    interval = interval if interval is not None else WorkerProfileConfig.RESTART_DELAY
+    try:
+        while not stop.is_set():
+            for profile in profiles.values():
+                if pool.size(profile.name) < profile.processes:
+                    pool.scale(profile.name, profile.processes)
+            stop.wait(interval)
+    finally:
+        pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按队列的 worker 配置启动 worker")
+    parser.add_argument('profiles', nargs='*', help=f"配置名，默认 {','.join(WorkerProfileConfig.ENABLED)}")
+    parser.add_argument('--dry-run', action='store_true', help="只打印 worker 命令")
+    args = parser.parse_args()
+
+    from autoscaler import LocalWorkerPool
+
+    try:
+        profiles = load_profiles(args.profiles or WorkerProfileConfig.ENABLED)
+    except ValueError as e:
+        parser.error(str(e))
+    pool = LocalWorkerPool(worker_args={}, profiles=profiles)
+    if args.dry_run:
+        for profile in profiles.values():
+            for _ in range(profile.processes):
+                print(shlex.join(pool.command(profile.name)))
+        return
+
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop.set())
+
+    for profile in profiles.values():
+        print(f"🚀 worker 配置 {profile.name}: 队列 {','.join(profile.queues)}, {profile.processes} 个进程, "
+              f"{profile.describe()}")
+    supervise(pool, profiles, stop)
+    print("🛑 worker 已全部退出")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,5 @@
+# workflows/__init__.py - 工作流构建模块
+from .map_reduce import split_shards, build_map_reduce
+from .batch import build_process_items
+
+__all__ = ["split_shards", "build_map_reduce", "build_process_items"]
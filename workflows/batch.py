@@ -0,0 +1,39 @@
+# workflows/batch.py - 批量处理工作流
+from celery import chord, group
+from celery_app import app as celery_app
+from typing import Any, Sequence
+
+# 单条消息承载的最大数据项数，超过后自动分块
+PROCESS_ITEMS_CHUNK_SIZE = 50_000
+
+def build_process_items(items: Sequence[Any], operation: str = "double",
+                        chunk_size: int = PROCESS_ITEMS_CHUNK_SIZE):
+    """
+    构建批量处理工作流，替代逐项提交 data.process_item
+    
+    数据量不超过 chunk_size 时只发送一条 data.process_items 消息；
+    更大的输入按 chunk_size 分块（类似 Celery chunks），各块并行处理后
+    由 data.concat_chunks 按原顺序拼接。
+    
+    Args:
+        items: 数据项
+        operation: 操作类型 (double, square, negate)
+        chunk_size: 每块数据项数
+        
+    Returns:
+        单任务签名或 chord 工作流
+    """
+    if chunk_size < 1:
+        raise ValueError("分块大小必须大于0")
+    
+    items = list(items)
+    if len(items) <= chunk_size:
+        return celery_app.signature('data.process_items', args=[items, operation])
+    
+    return chord(
+        group(
+            celery_app.signature('data.process_items', args=[items[start:start + chunk_size], operation])
+            for start in range(0, len(items), chunk_size)
+        ),
+        celery_app.signature('data.concat_chunks')
+    )
@@ -0,0 +1,74 @@
+# workflows/map_reduce.py - 分片并行 map-reduce 工作流
+from celery import chord, group
+from celery_app import app as celery_app
+from config import MapReduceConfig
+from tasks.payload_store import offload
+from typing import Any, List, Optional, Sequence
+
+# 单个工作流允许的最大数据量
+MAX_MAP_REDUCE_ITEMS = 1_000_000
+
+def split_shards(data: Sequence[Any], shards: int) -> List[List[Any]]:
+    """
+    将数据切分为大小均衡的连续分片
+    
+    Args:
+        data: 输入数据
+        shards: 分片数量（超过数据量时按数据量截断）
+        
+    Returns:
+        分片列表
+    """
+    if shards < 1:
+        raise ValueError("分片数量必须大于0")
+    
+    if not isinstance(data, (list, tuple, range)):
+        data = list(data)
+    shards = min(shards, len(data)) or 1
+    size, extra = divmod(len(data), shards)
+    
+    result = []
+    start = 0
+    for index in range(shards):
+        end = start + size + (1 if index < extra else 0)
+        result.append(list(data[start:end]))
+        start = end
+    return result
+
+def build_map_reduce(data: Sequence[Any], shards: int = 4, operation: Optional[str] = None,
+                     threshold: Optional[int] = None, with_quantiles: bool = False):
+    """
+    构建 map-reduce 工作流
+    
+    每个分片在 data 队列上执行 data.map_shard（处理 -> 过滤 -> 摘要），
+    由 chord 回调 data.merge_statistics 合并各分片的可合并摘要。
+    超过负载阈值的分片写入负载存储，消息中只携带引用（由 map_shard 解析并释放）。
+    
+    Args:
+        data: 输入数据
+        shards: 分片数量，通常与 data 队列的 worker 数一致，不超过 MAP_REDUCE_MAX_SHARDS
+        operation: 逐项操作 (double, square, negate)
+        threshold: 过滤阈值
+        with_quantiles: 是否计算近似分位数
+        
+    Returns:
+        chord 工作流
+    """
+    if len(data) > MAX_MAP_REDUCE_ITEMS:
+        raise ValueError(f"数据量超过上限: {len(data)} > {MAX_MAP_REDUCE_ITEMS}")
+    if shards > MapReduceConfig.MAX_SHARDS:
+        raise ValueError(f"分片数量超过上限: {shards} > {MapReduceConfig.MAX_SHARDS}")
+    
+    map_kwargs = {
+        "operation": operation,
+        "threshold": threshold,
+        "with_quantiles": with_quantiles
+    }
+    
+    return chord(
+        group(
+            celery_app.signature('data.map_shard', args=[offload(shard)], kwargs=map_kwargs)
+            for shard in split_shards(data, shards)
+        ),
+        celery_app.signature('data.merge_statistics')
+    )